@@ -1,4 +1,5 @@
 # main.py
+# Servidor de desarrollo (un proceso, con recarga). En producción: python -m src.servidor --workers N
 import uvicorn
 
 if __name__ == "__main__":
@@ -12,12 +13,27 @@ import json as js
 import ast  
 import re 
 import os
+import time
 
 import importlib
 import src.services as services
 importlib.reload(services)
 from src.services import exito_actor, exito_director, score_titulo, votos_titulo, cantidad_filmaciones_dia, cantidad_filmaciones_mes
-from fastapi import FastAPI
+from src.motores import DIRECTORIO_DATOS, crear_motor
+from src.colaboraciones import GrafoColaboraciones
+from src.grafo import GrafoCreditos
+from src.series import SeriesDiarias
+from src.texto import CAMPOS_TEXTO, IndiceTexto
+from src.rankings import METRICAS_RANKING, Rankings, ranking
+from src.aproximado import CUANTILES, METRICAS_APROXIMADAS, ConsultasAproximadas, ConsultasExactas
+from src.exportacion import FORMATOS_EXPORTACION, lotes_exportacion, serializar
+from src.ingesta import AlmacenDeltas, Ingesta, verificar_token
+from src.etl import cargar_parquet
+from src.codificacion import COLUMNAS_NUMERICAS
+from src.recommendation import PESOS_CARACTERISTICAS, MascarasCatalogo, cargar_indice, recomendacion
+from typing import List, Union
+from fastapi import Body, FastAPI, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 
 app = FastAPI()
 
@@ -34,21 +50,143 @@ from src.services import (
 # Creamos la instancia de FastAPI
 app = FastAPI()
 
-# Cargamos los csv data_movies, data_cast y data_crew
-data_movies = pd.read_csv('transformados_processed/data_movies.parquet', low_memory=False)
-data_cast = pd.read_csv('transformados_processed/data_cast.parquet', low_memory=False)
-data_crew = pd.read_csv('transformados_processed/data_crew.parquet', low_memory=False)
+# Creamos el motor de consultas (src/motores.py) sobre los parquet generados por el ETL.
+# Por defecto es 'pandas' (data_movies, data_cast y data_crew en memoria); con la variable de entorno
+# MOTOR_CONSULTAS=duckdb las consultas se ejecutan como SQL directamente sobre los parquet y con
+# MOTOR_CONSULTAS=snapshot se mapea en memoria el snapshot binario que genera el ETL (src/snapshot.py).
+inicio_carga = time.perf_counter()
+# Estado que informa /listo: el worker solo recibe tráfico cuando terminó de cargar todo
+estado_servicio = {'listo': False, 'motor': None, 'version_snapshot': None, 'carga_ms': None}
+motor = crear_motor()
+
+# Catálogo e índice del sistema de recomendación (src/recommendation.py). Con el motor duckdb solo
+# se leen las columnas que usa el recomendador; con el snapshot ya vienen precalculados.
+# INDICE_RECOMENDACION=lsh usa el índice aproximado (con el snapshot, el ETL debe haberlo generado con la
+# misma variable: si no lo incluye, la carga falla).
+if hasattr(motor, 'snapshot'):
+    data_movies = motor.snapshot.titulos
+    indice_recomendacion = motor.snapshot.indice
+    mascaras_catalogo = motor.snapshot.mascaras
+else:
+    if hasattr(motor, 'data_movies'):
+        data_movies = motor.data_movies
+    else:
+        data_movies = cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_movies.parquet'),
+                                     columnas=list(dict.fromkeys(['movie_id', 'title', 'release_year', 'original_language']
+                                                                 + list(PESOS_CARACTERISTICAS) + list(COLUMNAS_NUMERICAS)
+                                                                 + list(CAMPOS_TEXTO))))
+    indice_recomendacion = cargar_indice(data_movies)
+    mascaras_catalogo = MascarasCatalogo(data_movies)
+
+# Grafo de colaboraciones (src/colaboraciones.py): se precalcula sobre el grafo de créditos del motor
+# (o viene en el snapshot); con duckdb se arma un grafo solo con las columnas necesarias.
+if hasattr(motor, 'snapshot'):
+    colaboraciones = motor.snapshot.colaboraciones
+else:
+    if hasattr(motor, 'grafo'):
+        grafo_creditos, retornos = motor.grafo, motor.data_movies['return'].to_numpy()
+    else:
+        movies_retorno = cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_movies.parquet'), columnas=['movie_id', 'return'])
+        grafo_creditos = GrafoCreditos(
+            cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_cast.parquet'), columnas=['movie_id', 'name']),
+            cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_crew.parquet'), columnas=['movie_id', 'name', 'job']),
+            movies_retorno)
+        retornos = movies_retorno['return'].to_numpy()
+    colaboraciones = GrafoColaboraciones(grafo_creditos, retornos)
+
+# Sumas acumuladas diarias para /estadisticas (src/series.py)
+if hasattr(motor, 'snapshot'):
+    series_diarias = motor.snapshot.series
+elif hasattr(motor, 'data_movies'):
+    series_diarias = SeriesDiarias(motor.data_movies)
+else:
+    series_diarias = SeriesDiarias(cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_movies.parquet'),
+                                                  columnas=['release_date', 'return', 'budget', 'revenue', 'genres']))
+
+# Índice de texto para /palabras_frecuentes (src/texto.py): es el mismo que arma el bloque TF-IDF del
+# recomendador, así los textos se tokenizan una sola vez; con el snapshot viene precalculado.
+if hasattr(motor, 'snapshot'):
+    indice_texto = motor.snapshot.texto
+elif 'texto' in (getattr(indice_recomendacion, 'codificadores', None) or {}):
+    indice_texto = indice_recomendacion.codificadores['texto']
+else:
+    indice_texto = IndiceTexto().ajustar(data_movies)
+
+# Top-K precalculados por año / mes / género para /ranking (src/rankings.py)
+if hasattr(motor, 'snapshot'):
+    rankings = motor.snapshot.rankings
+elif hasattr(motor, 'data_movies'):
+    rankings = Rankings(motor.data_movies)
+else:
+    rankings = Rankings(cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_movies.parquet'),
+                                       columnas=list(METRICAS_RANKING.values()) + ['vote_count', 'release_date', 'genres']))
+
+# Consultas analíticas de tablero (src/aproximado.py): group-by exactos por defecto y, con aproximado=true,
+# respuestas desde las muestras y sketches por año / género (con el snapshot vienen precalculados).
+columnas_analitica = list(METRICAS_APROXIMADAS.values()) + ['release_date', 'release_year', 'genres']
+if hasattr(motor, 'data_movies'):
+    movies_analitica = motor.data_movies
+elif hasattr(motor, 'snapshot'):
+    # Tabla Arrow mapeada del snapshot: ConsultasExactas la lee sin convertir el catálogo a pandas
+    movies_analitica = motor.snapshot.columnas_movies(columnas_analitica)
+else:
+    movies_analitica = cargar_parquet(os.path.join(DIRECTORIO_DATOS, 'data_movies.parquet'), columnas=columnas_analitica)
+grafo_analitica = motor.grafo if hasattr(motor, 'grafo') else grafo_creditos
+consultas_exactas = ConsultasExactas(movies_analitica, grafo_analitica)
+if hasattr(motor, 'snapshot'):
+    consultas_aproximadas = motor.snapshot.aproximado
+else:
+    consultas_aproximadas = ConsultasAproximadas(movies_analitica, grafo_analitica)
+
+# Escrituras (src/ingesta.py): solo con el motor pandas, que mantiene el catálogo en memoria. Al arrancar
+# se aplican los deltas que todavía no se compactaron; desde ahí el recomendador usa el índice incremental.
+# Las colaboraciones y las consultas analíticas se reconstruyen (al pedirlas) después de cada escritura.
+ingesta = None
+if hasattr(motor, 'data_movies'):
+    derivadas = {
+        'colaboraciones': (colaboraciones, lambda df, grafo: GrafoColaboraciones(grafo, df['return'].to_numpy())),
+        'consultas_exactas': (consultas_exactas, ConsultasExactas),
+        'consultas_aproximadas': (consultas_aproximadas, ConsultasAproximadas),
+    }
+    ingesta = Ingesta(motor, indice_recomendacion, mascaras_catalogo, series_diarias, AlmacenDeltas(DIRECTORIO_DATOS),
+                      indice_texto, rankings, derivadas)
+    ingesta.reproducir()
+    indice_recomendacion = ingesta.indice
+    data_movies = motor.data_movies
+
+
+def _derivada(nombre, estructura):
+    """
+    Estructura al día con las escrituras de la API de ingesta (sin ingesta, la cargada al arrancar).
+    """
+    return ingesta.derivada(nombre) if ingesta is not None else estructura
+
+estado_servicio.update({
+    'motor': motor.nombre,
+    'version_snapshot': motor.snapshot.version if hasattr(motor, 'snapshot') else None,
+    'carga_ms': round((time.perf_counter() - inicio_carga) * 1000, 2),
+    'listo': True,
+})
 
 @app.get("/")
 def root():
     return {"message": "¡API funcionando correctamente!"}
 
+@app.get("/listo")
+def get_listo():
+    """
+    Readiness: indica si el worker terminó de cargar el motor y los índices, con qué motor,
+    qué versión del snapshot, cuánto tardó la carga y el pid del worker que responde. Responde 503
+    mientras no esté listo.
+    """
+    return JSONResponse({**estado_servicio, 'pid': os.getpid()}, status_code=200 if estado_servicio['listo'] else 503)
+
 @app.get("/cantidad_filmaciones_mes/{mes}")
 def get_cantidad_filmaciones_mes(mes: str):
     """
     Endpoint para consultar cuántas películas se estrenaron en el mes dado (ej: 'enero' o '2').
     """
-    resultado = cantidad_filmaciones_mes(mes, data_movies)
+    resultado = motor.cantidad_filmaciones_mes(mes)
     # Podemos retornar un dict para que sea JSON:
     return {"resultado": resultado}
 
@@ -57,7 +195,7 @@ def get_cantidad_filmaciones_dia(dia: str):
     """
     Endpoint para consultar cuántas películas se estrenaron en el día de la semana (ej: 'lunes' o '1').
     """
-    resultado = cantidad_filmaciones_dia(dia, data_movies)
+    resultado = motor.cantidad_filmaciones_dia(dia)
     return {"resultado": resultado}
 
 @app.get("/score_titulo/{titulo}")
@@ -65,7 +203,7 @@ def get_score_titulo(titulo: str):
     """
     Devuelve el score de la película y su año de estreno.
     """
-    resultado = score_titulo(titulo, data_movies)
+    resultado = motor.score_titulo(titulo)
     return {"resultado": resultado}
 
 @app.get("/votos_titulo/{titulo}")
@@ -73,7 +211,7 @@ def get_votos_titulo(titulo: str):
     """
     Devuelve la cantidad de votos y promedio de la película, siempre que tenga al menos 2000 valoraciones.
     """
-    resultado = votos_titulo(titulo, data_movies)
+    resultado = motor.votos_titulo(titulo)
     return {"resultado": resultado}
 
 @app.get("/exito_actor/{nombre_actor}")
@@ -81,7 +219,7 @@ def get_exito_actor(nombre_actor: str):
     """
     Devuelve la cantidad de filmaciones, retorno total y promedio del actor.
     """
-    resultado = exito_actor(nombre_actor, data_cast, data_movies)
+    resultado = motor.exito_actor(nombre_actor)
     return {"resultado": resultado}
 
 @app.get("/exito_director/{nombre_director}")
@@ -89,5 +227,218 @@ def get_exito_director(nombre_director: str):
     """
     Devuelve la info de las películas dirigidas por el director y su retorno.
     """
-    resultado = exito_director(nombre_director, data_crew, data_movies)
+    resultado = motor.exito_director(nombre_director)
+    return {"resultado": resultado}
+
+@app.get("/recomendacion/{titulo}")
+def get_recomendacion(titulo: str, anio_min: int = None, anio_max: int = None, idioma: str = None,
+                      votos_min: int = None):
+    """
+    Devuelve una lista con los 5 títulos más similares a la película indicada.
+    Opcionalmente filtra por año de estreno, idioma original y cantidad mínima de votos
+    (ej: /recomendacion/Toy Story?anio_min=2000&votos_min=2000).
+    """
+    resultado = recomendacion(titulo, data_movies, indice_recomendacion, mascaras=mascaras_catalogo,
+                              anio_min=anio_min, anio_max=anio_max, idioma=idioma, votos_min=votos_min)
+    return {"resultado": resultado}
+
+
+@app.get("/exportar/{tabla}")
+def get_exportar(tabla: str, formato: str = 'ndjson', anio_min: int = None, anio_max: int = None,
+                 mes: str = None, dia: str = None, persona: str = None, genero: str = None,
+                 columnas: str = None, gzip: bool = False):
+    """
+    Exporta en streaming la tabla 'movies', 'cast' o 'crew' filtrada por rango de años, mes, día de la
+    semana, persona o género, en formato 'ndjson', 'csv' o 'arrow' (Arrow IPC), opcionalmente con gzip
+    (ej: /exportar/movies?anio_min=1990&anio_max=1999&genero=Animation&formato=csv&gzip=true).
+    La respuesta se envía por partes (chunked) a medida que se leen los record batches. Las escrituras
+    de la API de ingesta todavía no compactadas se incluyen al final.
+    """
+    try:
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato '{formato}' no soportado. Opciones: {', '.join(FORMATOS_EXPORTACION)}.")
+        lotes = lotes_exportacion(DIRECTORIO_DATOS, tabla, columnas.split(',') if columnas else None,
+                                  anio_min=anio_min, anio_max=anio_max, mes=mes, dia=dia,
+                                  persona=persona, genero=genero)
+    except ValueError as error:
+        return JSONResponse({"resultado": str(error)}, status_code=400)
+    extension = {'ndjson': 'ndjson', 'csv': 'csv', 'arrow': 'arrows'}[formato] + ('.gz' if gzip else '')
+    encabezados = {'Content-Disposition': f'attachment; filename="{tabla}.{extension}"'}
+    # Con gzip se envía el archivo .gz tal cual (sin Content-Encoding, que los clientes descomprimen solos)
+    return StreamingResponse(serializar(lotes, formato, gzip),
+                             media_type='application/gzip' if gzip else FORMATOS_EXPORTACION[formato],
+                             headers=encabezados)
+
+
+@app.get("/colaboradores/{nombre}")
+def get_colaboradores(nombre: str, top: int = 10, rol: str = 'todos'):
+    """
+    Devuelve las personas con las que más películas compartió la persona indicada, con el retorno
+    total y promedio de esas películas. rol='todos' considera cast y crew; rol='cast' solo co-protagonistas
+    (ej: /colaboradores/Tom Hanks?top=5&rol=cast).
+    """
+    if rol not in ('todos', 'cast'):
+        return {"resultado": f"El rol '{rol}' no es válido. Opciones: todos, cast."}
+    try:
+        resultado = _derivada('colaboraciones', colaboraciones).colaboradores(nombre, top, rol)
+    except ValueError as error:
+        return {"resultado": str(error)}
+    if resultado is None:
+        return {"resultado": f"No se encontró a la persona '{nombre}'."}
+    return {"resultado": resultado}
+
+@app.get("/actores_director/{nombre_director}")
+def get_actores_director(nombre_director: str, top: int = 10):
+    """
+    Devuelve los actores con los que más películas hizo el director indicado (lista vacía si la persona
+    existe pero no dirigió películas con actores).
+    """
+    try:
+        resultado = _derivada('colaboraciones', colaboraciones).colaboradores(nombre_director, top, 'director_actor')
+    except ValueError as error:
+        return {"resultado": str(error)}
+    if resultado is None:
+        return {"resultado": f"No se encontró al director '{nombre_director}'."}
+    return {"resultado": resultado}
+
+@app.get("/pares_director_actor")
+def get_pares_director_actor(top: int = 10, min_peliculas: int = 2):
+    """
+    Devuelve los pares director - actor con mayor retorno promedio entre las películas que hicieron
+    juntos (con al menos min_peliculas películas en común).
+    """
+    try:
+        return {"resultado": _derivada('colaboraciones', colaboraciones).pares_director_actor(top, min_peliculas)}
+    except ValueError as error:
+        return {"resultado": str(error)}
+
+
+@app.get("/estadisticas")
+def get_estadisticas(desde: str = None, hasta: str = None, genero: str = None):
+    """
+    Devuelve la cantidad de estrenos y el retorno total/promedio, presupuesto y recaudación totales de
+    las películas estrenadas entre dos fechas (inclusive), opcionalmente de un género
+    (ej: /estadisticas?desde=2000-01-01&hasta=2009-12-31&genero=Animation).
+    """
+    try:
+        return {"resultado": series_diarias.consultar(desde, hasta, genero)}
+    except ValueError as error:
+        return {"resultado": str(error)}
+
+
+@app.get("/palabras_frecuentes")
+def get_palabras_frecuentes(top: int = 20, campo: str = 'title', anio: int = None, genero: str = None):
+    """
+    Devuelve las palabras más frecuentes de los títulos (campo=title) o de los resúmenes (campo=overview)
+    de todo el catálogo, de un año de estreno y/o de un género
+    (ej: /palabras_frecuentes?campo=title&genero=Animation&top=30).
+    """
+    try:
+        return {"resultado": indice_texto.palabras_frecuentes(top, campo, anio, genero)}
+    except ValueError as error:
+        return {"resultado": str(error)}
+
+
+@app.get("/ranking/{metrica}")
+def get_ranking(metrica: str, top: int = 10, anio: int = None, genero: str = None, mes: str = None,
+                votos_min: int = None):
+    """
+    Devuelve las películas con mayor retorno, puntaje, popularidad o recaudación de todo el catálogo o
+    de un año, mes y/o género, opcionalmente con un mínimo de votos
+    (ej: /ranking/retorno?anio=1995&top=10, /ranking/puntaje?genero=Drama&votos_min=2000).
+    """
+    try:
+        return {"resultado": ranking(data_movies, rankings, metrica, top, anio=anio, genero=genero, mes=mes,
+                                     votos_min=votos_min)}
+    except ValueError as error:
+        return {"resultado": str(error)}
+
+
+def _analitica(consulta, aproximado, **parametros):
+    """
+    Ejecuta una consulta analítica exacta o, con aproximado=True, desde las muestras y sketches.
+    """
+    try:
+        consultas = _derivada('consultas_aproximadas', consultas_aproximadas) if aproximado \
+            else _derivada('consultas_exactas', consultas_exactas)
+        return {"resultado": getattr(consultas, consulta)(**parametros)}
+    except ValueError as error:
+        return {"resultado": str(error)}
+
+
+@app.get("/analitica/personas_distintas")
+def get_personas_distintas(relacion: str = 'cast', por: str = 'anio', desde: int = None, hasta: int = None,
+                           genero: str = None, aproximado: bool = False):
+    """
+    Devuelve la cantidad de personas distintas de cast o crew por año de estreno (opcionalmente en un
+    rango de años) o por género (ej: /analitica/personas_distintas?relacion=cast&desde=1990&hasta=1999&aproximado=true).
+    """
+    return _analitica('personas_distintas', aproximado, relacion=relacion, por=por, desde=desde, hasta=hasta,
+                      genero=genero)
+
+
+@app.get("/analitica/cuantiles")
+def get_cuantiles(metrica: str = 'retorno', por: str = 'genero', desde: int = None, hasta: int = None,
+                  genero: str = None, cuantiles: str = ','.join(map(str, CUANTILES)), aproximado: bool = False):
+    """
+    Devuelve cuantiles de retorno, presupuesto, recaudación, popularidad o puntaje por género o por año
+    (ej: /analitica/cuantiles?metrica=retorno&por=genero&cuantiles=0.5,0.9&aproximado=true).
+    """
+    return _analitica('cuantiles', aproximado, metrica=metrica, por=por, desde=desde, hasta=hasta, genero=genero,
+                      cuantiles=cuantiles)
+
+
+@app.get("/analitica/jobs_frecuentes")
+def get_jobs_frecuentes(por: str = 'anio', desde: int = None, hasta: int = None, genero: str = None, top: int = 10,
+                        aproximado: bool = False):
+    """
+    Devuelve los jobs de crew con más créditos por año o por género
+    (ej: /analitica/jobs_frecuentes?desde=2000&hasta=2009&top=5&aproximado=true).
+    """
+    return _analitica('jobs_frecuentes', aproximado, por=por, desde=desde, hasta=hasta, genero=genero, top=top)
+
+
+@app.get("/analitica/promedio")
+def get_promedio(metrica: str = 'retorno', por: str = 'anio', desde: int = None, hasta: int = None,
+                 genero: str = None, aproximado: bool = False):
+    """
+    Devuelve el promedio de una métrica por año o por género; en modo aproximado, con el intervalo bootstrap-t del 95 %
+    (ej: /analitica/promedio?metrica=presupuesto&desde=1995&hasta=1999&aproximado=true).
+    """
+    return _analitica('promedio', aproximado, metrica=metrica, por=por, desde=desde, hasta=hasta, genero=genero)
+
+
+def _escribir(operacion, registros, authorization):
+    """
+    Verifica el token y aplica una escritura de la API de ingesta.
+    """
+    global data_movies
+    if not verificar_token(authorization):
+        return JSONResponse({"resultado": "No autorizado."}, status_code=401)
+    if ingesta is None:
+        return JSONResponse({"resultado": f"Las escrituras no están habilitadas (motor '{motor.nombre}'): requieren "
+                                          f"MOTOR_CONSULTAS=pandas en un solo proceso, no el servidor preforked "
+                                          f"(src/servidor.py)."}, status_code=409)
+    try:
+        resultado = getattr(ingesta, operacion)(registros)
+    except ValueError as error:
+        return JSONResponse({"resultado": str(error)}, status_code=400)
+    data_movies = motor.data_movies
     return {"resultado": resultado}
+
+@app.post("/movies")
+def post_movies(registros: Union[List[dict], dict] = Body(...), authorization: str = Header(None)):
+    """
+    Agrega o modifica películas con los campos de movies_dataset.csv (obligatorios: id y, para las altas,
+    title y release_date). Una modificación solo cambia los campos que envía. Requiere el encabezado
+    'Authorization: Bearer <TOKEN_INGESTA>'. Los cambios se ven en las consultas apenas responde.
+    """
+    return _escribir('movies', registros, authorization)
+
+@app.post("/creditos")
+def post_creditos(registros: Union[List[dict], dict] = Body(...), authorization: str = Header(None)):
+    """
+    Reemplaza el cast y el crew de películas con los campos de credits.csv (id, cast y crew).
+    Requiere el encabezado 'Authorization: Bearer <TOKEN_INGESTA>'.
+    """
+    return _escribir('creditos', registros, authorization)
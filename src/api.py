@@ -13,6 +13,7 @@ import importlib
 import src.services as services
 importlib.reload(services)
 from src.services import exito_actor, exito_director, score_titulo, votos_titulo, cantidad_filmaciones_dia, cantidad_filmaciones_mes
+from src.etl import cargar_parquet
 from fastapi import FastAPI
 
 app = FastAPI()
@@ -30,10 +31,12 @@ from src.services import (
 # Creamos la instancia de FastAPI
 app = FastAPI()
 
-# Cargamos los csv data_movies, data_cast y data_crew
-data_movies = pd.read_csv('transformados_processed/data_movies.parquet', low_memory=False)
-data_cast = pd.read_csv('transformados_processed/data_cast.parquet', low_memory=False)
-data_crew = pd.read_csv('transformados_processed/data_crew.parquet', low_memory=False)
+# Cargamos los parquet data_movies, data_cast y data_crew generados por el ETL.
+# data_movies ya trae precalculadas return, release_year, release_month y release_weekday
+# (etl.calcular_columnas_derivadas), así que la API no deriva ni repara esos campos.
+data_movies = cargar_parquet('transformados_processed/data_movies.parquet')
+data_cast = cargar_parquet('transformados_processed/data_cast.parquet')
+data_crew = cargar_parquet('transformados_processed/data_crew.parquet')
 
 @app.get("/")
 def root():
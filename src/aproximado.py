@@ -0,0 +1,683 @@
+# Modo aproximado para consultas analíticas pesadas, con muestras estratificadas y sketches combinables.
+#
+# Consultas de tablero como "actores distintos por año", "cuantiles del retorno por género" o "jobs de
+# crew más comunes" recorren todos los créditos: sobre catálogos escalados (src/sintetico.py) el
+# group-by exacto de ConsultasExactas tarda segundos. ConsultasAproximadas guarda, una sola vez en el
+# ETL (snapshot, carpeta aproximado/) o al arrancar la API, por cada año de estreno y cada género:
+#   - Un HyperLogLog de las personas de cast y de crew (personas distintas).
+#   - Un sketch de cuantiles con error relativo acotado (buckets logarítmicos, como DDSketch) de return,
+#     budget, revenue, popularity y vote_average.
+#   - Un count-min de los jobs de crew y una muestra de créditos que aporta los jobs candidatos.
+#   - Una muestra reservoir de películas (bottom-k por prioridad aleatoria) para los promedios, con
+#     réplicas bootstrap de su media y error estándar para intervalos bootstrap-t (las métricas tienen
+#     colas pesadas: el intervalo normal de 1.96 errores estándar cubre bastante menos del 95 %).
+# Los de varios años se combinan (máximo de registros, suma de contadores, estimador estratificado) para
+# responder un rango de años. Cada respuesta trae su cota de error y tarda milisegundos.
+# Como las colaboraciones, se construyen de una vez sobre el catálogo: después de una escritura de la API
+# de ingesta se vuelven a construir la próxima vez que se consultan (ver Ingesta.derivada).
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.codificacion import CodificadorMultietiqueta
+from src.etl import ColumnaAnidada
+from src.grafo import _hash_nombres
+
+# Métrica -> columna de data_movies
+METRICAS_APROXIMADAS = {
+    'retorno': 'return',
+    'presupuesto': 'budget',
+    'recaudacion': 'revenue',
+    'popularidad': 'popularity',
+    'puntaje': 'vote_average',
+}
+RELACIONES = ('cast', 'crew')
+DIMENSIONES = ('anio', 'genero')
+CUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+PRECISION_HLL = 12            # 2^12 registros: error estándar 1.04 / 64 = 1.6 %
+ERROR_RELATIVO_CUANTILES = 0.01
+ANCHO_COUNT_MIN = 2048        # potencia de 2; error <= e / ancho * créditos con probabilidad 1 - e^-profundidad
+PROFUNDIDAD_COUNT_MIN = 4
+MUESTRA_PELICULAS = 200
+MUESTRA_CREDITOS = 2000
+Z_95 = 1.96
+REPLICAS_BOOTSTRAP = 200
+SEMILLA = 0
+
+
+def _catalogo(df_movies):
+    """
+    Años de estreno (0 sin fecha), vocabulario de géneros y pertenencia película x género (CSR).
+    df_movies puede ser un pa.Table (p. ej. el del snapshot): se lee sin pasar por pandas.
+    """
+    if isinstance(df_movies, pa.Table):
+        anios = df_movies.column('release_year') if 'release_year' in df_movies.column_names \
+            else pc.year(df_movies.column('release_date'))
+        anios = pc.fill_null(pc.cast(anios, pa.int64()), 0).to_numpy()
+        generos = ColumnaAnidada(df_movies.column('genres'))
+    else:
+        if 'release_year' in df_movies.columns:
+            anios = pd.to_numeric(df_movies['release_year'], errors='coerce')
+        else:
+            anios = pd.to_datetime(df_movies['release_date'], errors='coerce').dt.year
+        anios, generos = anios.fillna(0).to_numpy(dtype=np.int64), df_movies['genres']
+    codificador = CodificadorMultietiqueta().ajustar(generos)
+    return anios, codificador.vocabulario, codificador.transformar(generos).tocsr()
+
+
+def _valores(df_movies, columna):
+    """
+    Columna numérica de df_movies (pd.DataFrame o pa.Table) como float64, con NaN en los nulos.
+    """
+    if isinstance(df_movies, pa.Table):
+        return pc.cast(df_movies.column(columna), pa.float64()).to_numpy()
+    return pd.to_numeric(df_movies[columna], errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _aristas(grafo, relacion):
+    """
+    Fila de data_movies, persona y código de job (solo crew) de cada crédito del grafo.
+    """
+    aristas = getattr(grafo, relacion)
+    indptr = np.asarray(aristas.pelicula_indptr)
+    filas = np.asarray(grafo.filas)[np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))]
+    validas = filas >= 0
+    personas = np.asarray(aristas.pelicula_indices)[validas]
+    jobs = np.asarray(aristas.pelicula_roles)[validas] if aristas.pelicula_roles is not None else None
+    return filas[validas], personas, jobs
+
+
+def _estratos(filas, por, anios, pertenencia):
+    """
+    (posiciones, claves): cada elemento de `filas` (películas o créditos) una vez por estrato al que
+    pertenece; la clave es el año (sin los de fecha desconocida) o la posición del género.
+    """
+    if por == 'anio':
+        posiciones = np.flatnonzero(anios[filas] > 0)
+        return posiciones, anios[filas[posiciones]]
+    conteos = np.diff(pertenencia.indptr)[filas]
+    posiciones = np.repeat(np.arange(len(filas)), conteos)
+    desplazamientos = np.arange(len(posiciones)) - np.repeat(np.cumsum(conteos) - conteos, conteos)
+    return posiciones, pertenencia.indices[np.repeat(pertenencia.indptr[filas], conteos) + desplazamientos].astype(np.int64)
+
+
+def _bottom_k(estratos, prioridades, k):
+    """
+    Posiciones de los k elementos de menor prioridad de cada estrato, agrupadas por estrato. Con
+    prioridades uniformes es una muestra reservoir sin reemplazo de cada estrato.
+    """
+    orden = np.lexsort((prioridades, estratos))
+    ordenados = estratos[orden]
+    return orden[np.arange(len(orden)) - np.searchsorted(ordenados, ordenados) < k]
+
+
+def _punteros(estratos, n):
+    return np.concatenate([[0], np.cumsum(np.bincount(estratos, minlength=n))]).astype(np.int64)
+
+
+def _ceros_iniciales(valores):
+    """
+    Cantidad de ceros a la izquierda de cada uint64 (64 para el 0).
+    """
+    altos, bajos = (valores >> np.uint64(32)).astype(np.float64), (valores & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(altos > 0, 32 - np.frexp(altos)[1], 64 - np.frexp(bajos)[1])
+
+
+def _hll(estratos, hashes, n, precision):
+    """
+    Registros HyperLogLog (n estratos x 2^precision) de hashes uint64.
+    """
+    registros = np.zeros((n, 1 << precision), dtype=np.uint8)
+    buckets = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rangos = np.minimum(_ceros_iniciales(hashes << np.uint64(precision)) + 1, 64 - precision + 1)
+    np.maximum.at(registros, (estratos, buckets), rangos.astype(np.uint8))
+    return registros
+
+
+def _estimar_hll(registros):
+    """
+    Estimación de cardinalidad de cada fila de registros (con conteo lineal para cardinalidades chicas).
+    """
+    m = registros.shape[-1]
+    bruto = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-registros.astype(np.float64)), axis=-1)
+    vacios = np.sum(registros == 0, axis=-1)
+    lineal = m * np.log(m / np.maximum(vacios, 1))
+    return np.where((bruto <= 2.5 * m) & (vacios > 0), lineal, bruto)
+
+
+def _columnas_count_min(hashes, multiplicadores, ancho):
+    """
+    Columna de cada hash en cada fila del count-min (multiply-shift: ancho es potencia de 2).
+    """
+    desplazamiento = np.uint64(64 - (int(ancho).bit_length() - 1))
+    return ((hashes[np.newaxis, :] * multiplicadores[:, np.newaxis]) >> desplazamiento).astype(np.int64)
+
+
+def _count_min(estratos, hashes, n, multiplicadores, ancho):
+    """
+    Tablas count-min (n estratos x profundidad x ancho) de hashes uint64.
+    """
+    profundidad = len(multiplicadores)
+    indices = (estratos[np.newaxis, :] * profundidad + np.arange(profundidad)[:, np.newaxis]) * ancho \
+        + _columnas_count_min(hashes, multiplicadores, ancho)
+    return np.bincount(indices.ravel(), minlength=n * profundidad * ancho).reshape(n, profundidad, ancho).astype(np.int32)
+
+
+def _metrica(metrica):
+    columnas = {columna: metrica for metrica, columna in METRICAS_APROXIMADAS.items()}
+    metrica = columnas.get(metrica, metrica)
+    if metrica not in METRICAS_APROXIMADAS:
+        raise ValueError(f"La métrica '{metrica}' no es válida. Opciones: {', '.join(METRICAS_APROXIMADAS)}.")
+    return metrica
+
+
+def _dimension(por):
+    if por not in DIMENSIONES:
+        raise ValueError(f"El agrupamiento '{por}' no es válido. Opciones: {', '.join(DIMENSIONES)}.")
+    return por
+
+
+def _relacion(relacion):
+    if relacion not in RELACIONES:
+        raise ValueError(f"La relación '{relacion}' no es válida. Opciones: {', '.join(RELACIONES)}.")
+    return relacion
+
+
+def _top(top):
+    if int(top) < 1:
+        raise ValueError(f"top debe ser un entero positivo (se recibió {top}).")
+    return int(top)
+
+
+def _cuantiles(cuantiles):
+    """
+    Cuantiles pedidos como lista o como texto separado por comas ('0.25,0.5,0.75').
+    """
+    if isinstance(cuantiles, str):
+        cuantiles = cuantiles.split(',')
+    try:
+        cuantiles = [float(q) for q in cuantiles]
+    except ValueError:
+        raise ValueError("Los cuantiles deben ser números entre 0 y 1 separados por comas (ej: 0.25,0.5,0.75).")
+    if not cuantiles or not all(0 <= q <= 1 for q in cuantiles):
+        raise ValueError("Los cuantiles deben ser números entre 0 y 1 separados por comas (ej: 0.25,0.5,0.75).")
+    return cuantiles
+
+
+def _bootstrap(muestra, poblacion, replicas, rng):
+    """
+    Réplicas bootstrap (replicas x 2) de una muestra de un estrato: desvío de la media remuestreada
+    respecto de la media y error estándar de la réplica, ambos con corrección por población finita.
+    """
+    resultado = np.zeros((replicas, 2))
+    if len(muestra) > 1:
+        fpc = np.sqrt(max(1 - len(muestra) / poblacion, 0.0))
+        remuestras = muestra[rng.integers(0, len(muestra), size=(replicas, len(muestra)))]
+        resultado[:, 0] = fpc * (remuestras.mean(axis=1) - muestra.mean())
+        resultado[:, 1] = fpc * remuestras.std(axis=1, ddof=1) / np.sqrt(len(muestra))
+    return resultado
+
+
+def _intervalo_t(media, error, replicas):
+    """
+    Intervalo bootstrap-t del 95 %: [media - t_97.5 * error, media - t_2.5 * error], con los cuantiles
+    del estadístico t de las réplicas (las de error 0 se descartan; si quedan pocas, 1.96).
+    """
+    validas = replicas[:, 1] > 0
+    if error <= 0:
+        return media, media
+    if validas.sum() < len(replicas) // 2:
+        return media - Z_95 * error, media + Z_95 * error
+    t_inferior, t_superior = np.quantile(replicas[validas, 0] / replicas[validas, 1], [0.025, 0.975])
+    return media - t_superior * error, media - t_inferior * error
+
+
+def _nombre_cuantil(q):
+    return f"p{q * 100:g}"
+
+
+class _Estratos:
+    """
+    Base común: estratos por año de estreno o por género y filtro de los grupos que pide una consulta.
+    """
+    APROXIMADO = False
+
+    def _filtro(self, claves, por, desde=None, hasta=None, genero=None):
+        """
+        Máscara de las claves de estrato (años o posiciones de género) que pide la consulta.
+        """
+        if _dimension(por) == 'anio':
+            if genero is not None:
+                raise ValueError("El filtro por género requiere por=genero (los estratos son por año o por género).")
+            desde = desde if desde is not None else np.iinfo(np.int64).min
+            hasta = hasta if hasta is not None else np.iinfo(np.int64).max
+            return (claves >= desde) & (claves <= hasta)
+        if desde is not None or hasta is not None:
+            raise ValueError("El rango de años requiere por=anio (los estratos son por año o por género).")
+        if genero is None:
+            return np.ones(len(claves), dtype=bool)
+        if genero.lower() not in self._posicion_genero:
+            raise ValueError(f"El género '{genero}' no existe en el catálogo.")
+        return claves == self._posicion_genero[genero.lower()]
+
+    def _respuesta(self, por, claves, grupos, total):
+        """
+        Respuesta común de las consultas; el total (todos los grupos juntos) solo se da por año, porque
+        una película con varios géneros cuenta en cada uno.
+        """
+        return {
+            'aproximado': self.APROXIMADO,
+            'por': por,
+            'grupos': [{'grupo': int(clave) if por == 'anio' else str(self.generos[clave]), **grupo}
+                       for clave, grupo in zip(claves, grupos)],
+            'total': total if por == 'anio' else None,
+        }
+
+
+class ConsultasExactas(_Estratos):
+    """
+    Consultas analíticas por año o por género calculadas con group-bys de pandas sobre todos los
+    créditos del grafo y todas las películas (modo por defecto de la API y referencia del benchmark).
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame | pa.Table
+        Catálogo con las columnas de METRICAS_APROXIMADAS, release_year (o release_date) y genres
+        (con el snapshot, su tabla Arrow mapeada: no se convierte a pandas).
+    grafo : GrafoCreditos
+        Grafo de créditos cuyas filas apuntan a df_movies.
+    """
+
+    def __init__(self, df_movies, grafo):
+        self.grafo = grafo
+        self.anios, self.generos, self.pertenencia = _catalogo(df_movies)
+        self._posicion_genero = {str(g).lower(): i for i, g in enumerate(self.generos)}
+        self.valores = {metrica: _valores(df_movies, columna) for metrica, columna in METRICAS_APROXIMADAS.items()}
+
+    def _elementos(self, filas, por, desde, hasta, genero):
+        posiciones, claves = _estratos(filas, por, self.anios, self.pertenencia)
+        seleccion = self._filtro(claves, por, desde, hasta, genero)
+        return posiciones[seleccion], claves[seleccion]
+
+    def _peliculas(self, metrica, por, desde, hasta, genero):
+        valores = self.valores[_metrica(metrica)]
+        filas = np.flatnonzero(np.isfinite(valores))
+        posiciones, claves = self._elementos(filas, por, desde, hasta, genero)
+        return pd.DataFrame({'grupo': claves, 'valor': valores[filas[posiciones]]})
+
+    def personas_distintas(self, relacion='cast', por='anio', desde=None, hasta=None, genero=None):
+        """
+        Cantidad de personas distintas de cast o crew por año o por género. Ver ConsultasAproximadas.
+        """
+        filas, personas, _ = _aristas(self.grafo, _relacion(relacion))
+        posiciones, claves = self._elementos(filas, por, desde, hasta, genero)
+        creditos = pd.DataFrame({'grupo': claves, 'persona': personas[posiciones]})
+        distintas = creditos.groupby('grupo')['persona'].nunique()
+        return self._respuesta(por, distintas.index, [{'valor': int(valor), 'error': 0} for valor in distintas],
+                               {'valor': int(creditos['persona'].nunique()), 'error': 0})
+
+    def cuantiles(self, metrica='retorno', por='genero', desde=None, hasta=None, genero=None, cuantiles=CUANTILES):
+        """
+        Cuantiles de una métrica de las películas por año o por género. Ver ConsultasAproximadas.
+        """
+        cuantiles = _cuantiles(cuantiles)
+        peliculas = self._peliculas(metrica, por, desde, hasta, genero)
+
+        def resumen(valores):
+            valores = np.sort(valores)
+            posiciones = np.floor(np.array(cuantiles) * (len(valores) - 1)).astype(np.int64)
+            return {'cantidad': len(valores), 'error_relativo': 0.0,
+                    'cuantiles': {_nombre_cuantil(q): round(float(valores[p]), 4) for q, p in zip(cuantiles, posiciones)}}
+
+        grupos = [(clave, resumen(valores.to_numpy())) for clave, valores in peliculas.groupby('grupo')['valor']]
+        return self._respuesta(por, [clave for clave, _ in grupos], [grupo for _, grupo in grupos],
+                               resumen(peliculas['valor'].to_numpy()) if len(peliculas) else None)
+
+    def jobs_frecuentes(self, por='anio', desde=None, hasta=None, genero=None, top=10):
+        """
+        Jobs de crew con más créditos por año o por género. Ver ConsultasAproximadas.
+        """
+        top = _top(top)
+        filas, _, jobs = _aristas(self.grafo, 'crew')
+        posiciones, claves = self._elementos(filas, por, desde, hasta, genero)
+        nombres = np.asarray(self.grafo.jobs.to_pylist(), dtype=object)
+        creditos = pd.DataFrame({'grupo': claves, 'job': nombres[jobs[posiciones]]})
+
+        def resumen(creditos):
+            conteos = creditos['job'].value_counts()
+            conteos = conteos.iloc[np.lexsort((conteos.index.to_numpy(dtype=str), -conteos.to_numpy()))][:top]
+            return {'creditos': len(creditos), 'error': 0,
+                    'valores': [{'job': job, 'cantidad': int(cantidad)} for job, cantidad in conteos.items()]}
+
+        grupos = [(clave, resumen(grupo)) for clave, grupo in creditos.groupby('grupo')]
+        return self._respuesta(por, [clave for clave, _ in grupos], [grupo for _, grupo in grupos],
+                               resumen(creditos) if len(creditos) else None)
+
+    def promedio(self, metrica='retorno', por='anio', desde=None, hasta=None, genero=None):
+        """
+        Promedio de una métrica de las películas por año o por género. Ver ConsultasAproximadas.
+        """
+        peliculas = self._peliculas(metrica, por, desde, hasta, genero)
+        resumen = peliculas.groupby('grupo')['valor'].agg(['mean', 'size'])
+        def exacto(media, cantidad):
+            media = round(float(media), 4)
+            return {'valor': media, 'error': 0.0, 'intervalo': [media, media], 'cantidad': int(cantidad)}
+
+        return self._respuesta(por, resumen.index,
+                               [exacto(media, cantidad) for media, cantidad in resumen.itertuples(index=False)],
+                               exacto(peliculas['valor'].mean(), len(peliculas)) if len(peliculas) else None)
+
+
+class ConsultasAproximadas(_Estratos):
+    """
+    Consultas analíticas por año o por género respondidas con muestras y sketches precalculados.
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame
+        Catálogo con las columnas de METRICAS_APROXIMADAS, release_year (o release_date) y genres.
+    grafo : GrafoCreditos
+        Grafo de créditos cuyas filas apuntan a df_movies.
+    precision : int
+        Bits del índice de registro de los HyperLogLog (2^precision registros por estrato).
+    error_relativo : float
+        Error relativo máximo de los cuantiles.
+    ancho, profundidad : int
+        Dimensiones de cada count-min (ancho potencia de 2).
+    muestra_peliculas, muestra_creditos : int
+        Tamaño de las muestras por estrato.
+    replicas : int
+        Réplicas bootstrap de cada muestra de películas (intervalos de los promedios).
+    semilla : int
+        Semilla de las prioridades de las muestras y de los hashes del count-min.
+    """
+    APROXIMADO = True
+
+    def __init__(self, df_movies, grafo, precision=PRECISION_HLL, error_relativo=ERROR_RELATIVO_CUANTILES,
+                 ancho=ANCHO_COUNT_MIN, profundidad=PROFUNDIDAD_COUNT_MIN, muestra_peliculas=MUESTRA_PELICULAS,
+                 muestra_creditos=MUESTRA_CREDITOS, replicas=REPLICAS_BOOTSTRAP, semilla=SEMILLA):
+        anios, self.generos, pertenencia = _catalogo(df_movies)
+        self._posicion_genero = {str(g).lower(): i for i, g in enumerate(self.generos)}
+        self.error_relativo = error_relativo
+        rng = np.random.default_rng(semilla)
+        self.multiplicadores = rng.integers(0, 2**63, size=profundidad, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.claves = {'anio': np.unique(anios[anios > 0]), 'genero': np.arange(len(self.generos), dtype=np.int64)}
+        n = {por: len(claves) for por, claves in self.claves.items()}
+        valores = {metrica: pd.to_numeric(df_movies[columna], errors='coerce').to_numpy(dtype=np.float64)
+                   for metrica, columna in METRICAS_APROXIMADAS.items()}
+
+        def estratos(filas, por):
+            posiciones, claves = _estratos(filas, por, anios, pertenencia)
+            return posiciones, np.searchsorted(self.claves[por], claves)
+
+        # Personas distintas: HyperLogLog del hash del nombre normalizado (el id del grafo)
+        self.registros = {}
+        for relacion in RELACIONES:
+            filas, personas, _ = _aristas(grafo, relacion)
+            hashes = np.asarray(grafo.hashes)[personas].view(np.uint64)
+            for por in DIMENSIONES:
+                posiciones, indices = estratos(filas, por)
+                self.registros[(relacion, por)] = _hll(indices, hashes[posiciones], n[por], precision)
+
+        # Cuantiles: conteos por bucket logarítmico k = ceil(log_gamma(x)); la columna 0 cuenta los x <= 0
+        gamma = (1 + error_relativo) / (1 - error_relativo)
+        self.minimos, self.conteos = {}, {}
+        for metrica, v in valores.items():
+            filas = np.flatnonzero(np.isfinite(v))
+            positivos = v[filas] > 0
+            buckets = np.ceil(np.log(v[filas][positivos]) / np.log(gamma)).astype(np.int64)
+            self.minimos[metrica] = int(buckets.min()) if len(buckets) else 0
+            columnas = np.zeros(len(filas), dtype=np.int64)
+            columnas[positivos] = buckets - self.minimos[metrica] + 1
+            largo = int(columnas.max()) + 1 if len(columnas) else 1
+            for por in DIMENSIONES:
+                posiciones, indices = estratos(filas, por)
+                self.conteos[(metrica, por)] = np.bincount(indices * largo + columnas[posiciones], minlength=n[por] * largo) \
+                    .reshape(n[por], largo).astype(np.int32)
+
+        # Jobs frecuentes: count-min del hash del job y, como candidatos, los jobs de una muestra de créditos
+        filas, _, jobs = _aristas(grafo, 'crew')
+        nombres = np.asarray(grafo.jobs.to_pylist(), dtype=object)
+        hashes = _hash_nombres(nombres).view(np.uint64)[jobs]
+        prioridades = rng.random(len(filas))
+        self.contadores, muestras = {}, {}
+        for por in DIMENSIONES:
+            posiciones, indices = estratos(filas, por)
+            self.contadores[por] = _count_min(indices, hashes[posiciones], n[por], self.multiplicadores, ancho)
+            elegidas = _bottom_k(indices, prioridades[posiciones], muestra_creditos)
+            muestras[por] = np.unique(np.stack([indices[elegidas], jobs[posiciones[elegidas]]]), axis=1)
+        self.candidatos = np.unique(nombres[np.concatenate([pares[1] for pares in muestras.values()])]) \
+            if len(nombres) else np.empty(0, dtype=object)
+        self._hash_candidatos = _hash_nombres(self.candidatos).view(np.uint64)
+        self.candidatos_por = {por: (_punteros(pares[0], n[por]), np.searchsorted(self.candidatos, nombres[pares[1]]))
+                               for por, pares in muestras.items()}
+
+        # Promedios: muestra de películas por estrato (los valores no finitos se descartan al consultar)
+        # y réplicas bootstrap de los valores finitos de cada muestra
+        prioridades = rng.random(len(anios))
+        self.muestras, self.muestras_indptr, self.replicas = {}, {}, {}
+        for por in DIMENSIONES:
+            posiciones, indices = estratos(np.arange(len(anios)), por)
+            elegidas = _bottom_k(indices, prioridades[posiciones], muestra_peliculas)
+            indptr = self.muestras_indptr[por] = _punteros(indices[elegidas], n[por])
+            for metrica, v in valores.items():
+                muestras = self.muestras[(metrica, por)] = v[posiciones[elegidas]]
+                poblacion = self.conteos[(metrica, por)].sum(axis=1)
+                self.replicas[(metrica, por)] = np.stack([
+                    _bootstrap(muestra[np.isfinite(muestra)], poblacion[i], replicas, rng)
+                    for i, muestra in enumerate(np.split(muestras, indptr[1:-1]))]) if n[por] else np.zeros((0, replicas, 2))
+
+    def _seleccion(self, por, desde, hasta, genero, poblacion):
+        return np.flatnonzero(self._filtro(self.claves[por], por, desde, hasta, genero) & (poblacion > 0))
+
+    def personas_distintas(self, relacion='cast', por='anio', desde=None, hasta=None, genero=None):
+        """
+        Cantidad de personas distintas de cast o crew por año o por género (HyperLogLog).
+
+        Parámetros:
+        -----------
+        relacion : str
+            'cast' o 'crew'.
+        por : str
+            'anio' o 'genero'.
+        desde, hasta : int, opcional
+            Rango de años (solo con por='anio').
+        genero : str, opcional
+            Un solo género (solo con por='genero').
+
+        Retorno:
+        --------
+        dict
+            aproximado, por, grupos [{grupo, valor, error}] y total (todos los años juntos, o None por
+            género). error es la mitad del intervalo del 95 % (1.96 errores estándar). Lanza
+            ValueError si algún parámetro no es válido.
+        """
+        registros = self.registros[(_relacion(relacion), _dimension(por))]
+        seleccion = self._seleccion(por, desde, hasta, genero, registros.any(axis=1))
+        cota = Z_95 * 1.04 / np.sqrt(registros.shape[1])
+
+        def resumen(estimado):
+            return {'valor': int(round(float(estimado))), 'error': int(np.ceil(cota * estimado))}
+
+        return self._respuesta(por, self.claves[por][seleccion], [resumen(e) for e in _estimar_hll(registros[seleccion])],
+                               resumen(_estimar_hll(registros[seleccion].max(axis=0))) if len(seleccion) else None)
+
+    def cuantiles(self, metrica='retorno', por='genero', desde=None, hasta=None, genero=None, cuantiles=CUANTILES):
+        """
+        Cuantiles de una métrica de las películas por año o por género (sketch de buckets logarítmicos).
+
+        Parámetros:
+        -----------
+        metrica : str
+            'retorno', 'presupuesto', 'recaudacion', 'popularidad' o 'puntaje' (o la columna).
+        por, desde, hasta, genero :
+            Ver personas_distintas.
+        cuantiles : list | str
+            Cuantiles entre 0 y 1 (lista o texto separado por comas).
+
+        Retorno:
+        --------
+        dict
+            grupos [{grupo, cantidad, cuantiles {p50: ...}, error_relativo}] y total. Cada cuantil está a
+            menos de error_relativo * |valor| del valor exacto (de rango q * (cantidad - 1)).
+        """
+        metrica, cuantiles = _metrica(metrica), _cuantiles(cuantiles)
+        conteos = self.conteos[(metrica, _dimension(por))]
+        seleccion = self._seleccion(por, desde, hasta, genero, conteos.sum(axis=1))
+        gamma = (1 + self.error_relativo) / (1 - self.error_relativo)
+
+        def resumen(conteos):
+            acumulado = np.cumsum(conteos)
+            columnas = np.searchsorted(acumulado, np.floor(np.array(cuantiles) * (acumulado[-1] - 1)), side='right')
+            estimados = np.where(columnas > 0, 2 * gamma ** (columnas - 1 + self.minimos[metrica]) / (gamma + 1), 0.0)
+            return {'cantidad': int(acumulado[-1]), 'error_relativo': self.error_relativo,
+                    'cuantiles': {_nombre_cuantil(q): round(float(e), 4) for q, e in zip(cuantiles, estimados)}}
+
+        return self._respuesta(por, self.claves[por][seleccion], [resumen(conteos[i]) for i in seleccion],
+                               resumen(conteos[seleccion].sum(axis=0)) if len(seleccion) else None)
+
+    def jobs_frecuentes(self, por='anio', desde=None, hasta=None, genero=None, top=10):
+        """
+        Jobs de crew con más créditos por año o por género (count-min sobre los candidatos de la muestra).
+
+        Parámetros:
+        -----------
+        por, desde, hasta, genero :
+            Ver personas_distintas.
+        top : int
+            Cantidad de jobs por grupo (positiva).
+
+        Retorno:
+        --------
+        dict
+            grupos [{grupo, creditos, valores [{job, cantidad}], error}] y total. El count-min solo
+            sobreestima: cada cantidad supera a la exacta en a lo sumo `error` (e / ancho * créditos)
+            con probabilidad 1 - e^-profundidad. Lanza ValueError si algún parámetro no es válido.
+        """
+        top = _top(top)
+        contadores = self.contadores[_dimension(por)]
+        seleccion = self._seleccion(por, desde, hasta, genero, contadores[:, 0].sum(axis=1))
+        indptr, indices = self.candidatos_por[por]
+        filas = np.arange(contadores.shape[1])[:, np.newaxis]
+
+        def resumen(tabla, candidatos):
+            candidatos = np.unique(candidatos)
+            estimados = tabla[filas, _columnas_count_min(self._hash_candidatos[candidatos], self.multiplicadores,
+                                                         tabla.shape[1])].min(axis=0)
+            orden = np.lexsort((candidatos, -estimados))[:top]
+            creditos = int(tabla[0].sum())
+            return {'creditos': creditos, 'error': int(np.ceil(np.e / tabla.shape[1] * creditos)),
+                    'valores': [{'job': str(self.candidatos[c]), 'cantidad': int(e)}
+                                for c, e in zip(candidatos[orden], estimados[orden])]}
+
+        grupos = [resumen(contadores[i], indices[indptr[i]:indptr[i + 1]]) for i in seleccion]
+        total = resumen(contadores[seleccion].sum(axis=0, dtype=np.int64),
+                        np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in seleccion])) if len(seleccion) else None
+        return self._respuesta(por, self.claves[por][seleccion], grupos, total)
+
+    def promedio(self, metrica='retorno', por='anio', desde=None, hasta=None, genero=None):
+        """
+        Promedio de una métrica de las películas por año o por género, estimado con la muestra de cada
+        estrato (el total combina los años con el estimador estratificado).
+
+        Parámetros:
+        -----------
+        metrica : str
+            Ver cuantiles.
+        por, desde, hasta, genero :
+            Ver personas_distintas.
+
+        Retorno:
+        --------
+        dict
+            grupos [{grupo, valor, error, intervalo, cantidad}] y total. intervalo es el bootstrap-t del
+            95 % (asimétrico, con corrección por población finita: un punto si la muestra es todo el
+            estrato) y error su mitad. Con colas muy pesadas y muestras chicas la cobertura real puede
+            quedar algo por debajo del 95 % nominal.
+        """
+        metrica, por = _metrica(metrica), _dimension(por)
+        poblacion = self.conteos[(metrica, por)].sum(axis=1)
+        seleccion = self._seleccion(por, desde, hasta, genero, poblacion)
+        indptr, muestras = self.muestras_indptr[por], self.muestras[(metrica, por)]
+        replicas = np.asarray(self.replicas[(metrica, por)])[seleccion]
+        medias, varianzas = np.full(len(seleccion), np.nan), np.zeros(len(seleccion))
+        for j, i in enumerate(seleccion):
+            muestra = muestras[indptr[i]:indptr[i + 1]]
+            muestra = muestra[np.isfinite(muestra)]
+            if len(muestra):
+                medias[j] = muestra.mean()
+                varianzas[j] = (1 - len(muestra) / poblacion[i]) * muestra.var(ddof=1) / len(muestra) if len(muestra) > 1 else 0.0
+
+        def resumen(media, varianza, replicas, cantidad):
+            inferior, superior = _intervalo_t(media, np.sqrt(max(varianza, 0.0)), replicas)
+            return {'valor': round(float(media), 4), 'error': round(float(superior - inferior) / 2, 4),
+                    'intervalo': [round(float(inferior), 4), round(float(superior), 4)], 'cantidad': int(cantidad)}
+
+        validos = ~np.isnan(medias)
+        total = None
+        if validos.any():
+            # Total estratificado: las réplicas de cada estrato se combinan con los mismos pesos que las medias
+            pesos = poblacion[seleccion][validos] / poblacion[seleccion][validos].sum()
+            combinadas = np.stack([np.tensordot(pesos, replicas[validos][:, :, 0], axes=1),
+                                   np.sqrt(np.tensordot(pesos ** 2, replicas[validos][:, :, 1] ** 2, axes=1))], axis=1)
+            total = resumen(pesos @ medias[validos], (pesos ** 2) @ varianzas[validos], combinadas,
+                            poblacion[seleccion].sum())
+        return self._respuesta(por, self.claves[por][seleccion][validos],
+                               [resumen(m, v, r, poblacion[i]) for m, v, r, i in zip(medias[validos], varianzas[validos],
+                                                                                     replicas[validos], seleccion[validos])],
+                               total)
+
+    def arreglos(self):
+        """
+        Arreglos NumPy de la estructura (para persistirla en el snapshot).
+        """
+        arreglos = {'generos': self.generos.astype(str), 'candidatos': self.candidatos.astype(str),
+                    'multiplicadores': self.multiplicadores, 'error_relativo': np.array([self.error_relativo]),
+                    'minimos': np.array([self.minimos[metrica] for metrica in METRICAS_APROXIMADAS])}
+        for por in DIMENSIONES:
+            arreglos[f'claves_{por}'] = self.claves[por]
+            arreglos[f'count_min_{por}'] = self.contadores[por]
+            arreglos[f'candidatos_{por}_indptr'], arreglos[f'candidatos_{por}_indices'] = self.candidatos_por[por]
+            arreglos[f'muestra_{por}_indptr'] = self.muestras_indptr[por]
+            for relacion in RELACIONES:
+                arreglos[f'hll_{relacion}_{por}'] = self.registros[(relacion, por)]
+            for metrica in METRICAS_APROXIMADAS:
+                arreglos[f'cuantiles_{metrica}_{por}'] = self.conteos[(metrica, por)]
+                arreglos[f'muestra_{metrica}_{por}'] = self.muestras[(metrica, por)]
+                arreglos[f'bootstrap_{metrica}_{por}'] = self.replicas[(metrica, por)]
+        return arreglos
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        """
+        Reconstruye la estructura a partir de `arreglos()` (p. ej. mapeados en memoria desde el snapshot).
+        """
+        consultas = cls.__new__(cls)
+        consultas.generos = np.asarray(arreglos['generos'], dtype=object)
+        consultas._posicion_genero = {str(g).lower(): i for i, g in enumerate(consultas.generos)}
+        consultas.candidatos = np.asarray(arreglos['candidatos'], dtype=object)
+        consultas._hash_candidatos = _hash_nombres(consultas.candidatos).view(np.uint64)
+        consultas.multiplicadores = np.asarray(arreglos['multiplicadores'], dtype=np.uint64)
+        consultas.error_relativo = float(arreglos['error_relativo'][0])
+        consultas.minimos = {metrica: int(m) for metrica, m in zip(METRICAS_APROXIMADAS, arreglos['minimos'])}
+        consultas.claves = {por: arreglos[f'claves_{por}'] for por in DIMENSIONES}
+        consultas.contadores = {por: arreglos[f'count_min_{por}'] for por in DIMENSIONES}
+        consultas.candidatos_por = {por: (arreglos[f'candidatos_{por}_indptr'], arreglos[f'candidatos_{por}_indices'])
+                                    for por in DIMENSIONES}
+        consultas.muestras_indptr = {por: arreglos[f'muestra_{por}_indptr'] for por in DIMENSIONES}
+        consultas.registros = {(relacion, por): arreglos[f'hll_{relacion}_{por}']
+                               for relacion in RELACIONES for por in DIMENSIONES}
+        consultas.conteos = {(metrica, por): arreglos[f'cuantiles_{metrica}_{por}']
+                             for metrica in METRICAS_APROXIMADAS for por in DIMENSIONES}
+        consultas.muestras = {(metrica, por): arreglos[f'muestra_{metrica}_{por}']
+                              for metrica in METRICAS_APROXIMADAS for por in DIMENSIONES}
+        consultas.replicas = {(metrica, por): arreglos[f'bootstrap_{metrica}_{por}']
+                              for metrica in METRICAS_APROXIMADAS for por in DIMENSIONES}
+        return consultas
+
+    @property
+    def nbytes(self):
+        return sum(arreglo.nbytes for arreglo in self.arreglos().values())
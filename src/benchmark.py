@@ -0,0 +1,511 @@
+# Benchmarks de lectura y consulta sobre los datos procesados (transformados_processed o catálogos sintéticos)
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import urllib.parse
+import urllib.request
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.aproximado import ConsultasAproximadas, ConsultasExactas
+from src.etl import cargar_parquet, guardar_parquet, guardar_parquet_optimizado, normalizar_nombre
+from src.grafo import GrafoCreditos
+from src.motores import MOTORES, crear_motor
+from src.recommendation import construir_caracteristicas, crear_indice
+from src.servidor import memoria
+
+_OPERADORES = {
+    '==': lambda minimo, maximo, v: minimo <= v <= maximo,
+    '>=': lambda minimo, maximo, v: maximo >= v,
+    '>':  lambda minimo, maximo, v: maximo > v,
+    '<=': lambda minimo, maximo, v: minimo <= v,
+    '<':  lambda minimo, maximo, v: minimo < v,
+}
+
+
+def bytes_escaneados(ruta, filtros, columnas=None):
+    """
+    Estima los bytes que un lector con predicate pushdown debe leer: suma el tamaño comprimido de
+    las columnas proyectadas en los row groups cuyas estadísticas min/max no descartan el filtro.
+
+    Parámetros:
+    -----------
+    ruta : str
+        Ruta del archivo parquet.
+    filtros : list
+        Lista de tuplas (columna, operador, valor) combinadas con AND.
+    columnas : list, opcional
+        Columnas leídas; None cuenta todas.
+
+    Retorno:
+    --------
+    tuple
+        (bytes_leidos, row_groups_leidos, row_groups_totales)
+    """
+    metadata = pq.ParquetFile(ruta).metadata
+    nombres = [metadata.schema.column(i).path for i in range(metadata.num_columns)]
+    leidos, grupos = 0, 0
+    for g in range(metadata.num_row_groups):
+        grupo = metadata.row_group(g)
+        descartado = False
+        for columna, operador, valor in filtros:
+            stats = grupo.column(nombres.index(columna)).statistics
+            if stats is None or not stats.has_min_max:
+                continue
+            if not _OPERADORES[operador](stats.min, stats.max, valor):
+                descartado = True
+                break
+        if descartado:
+            continue
+        grupos += 1
+        leidos += sum(grupo.column(i).total_compressed_size for i, nombre in enumerate(nombres)
+                      if columnas is None or nombre in columnas)
+    return leidos, grupos, metadata.num_row_groups
+
+
+def medir_lectura(ruta, filtros, columnas=None, repeticiones=5):
+    """
+    Mide el tiempo medio (ms) de una lectura filtrada y los bytes escaneados estimados.
+    """
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        filas = len(cargar_parquet(ruta, columnas=columnas, filtros=filtros))
+    ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+    leidos, grupos, total = bytes_escaneados(ruta, filtros, columnas)
+    return {'ms': round(ms, 2), 'filas': filas, 'bytes_escaneados': leidos,
+            'row_groups': f"{grupos}/{total}", 'tamano_archivo': os.path.getsize(ruta)}
+
+
+def benchmark_layout(df, tabla, consultas, directorio=None):
+    """
+    Compara el parquet escrito con la configuración por defecto contra el layout de
+    etl.guardar_parquet_optimizado para una lista de consultas filtradas.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        Tabla procesada ('movies', 'cast' o 'crew').
+    tabla : str
+        Clave de etl.LAYOUT_PARQUET.
+    consultas : dict
+        Nombre de la consulta -> lista de filtros (columna, operador, valor).
+    directorio : str, opcional
+        Carpeta donde escribir los archivos de prueba (por defecto un directorio temporal).
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Una fila por (consulta, layout) con tiempo, filas, bytes escaneados y row groups leídos.
+    """
+    directorio = directorio or tempfile.mkdtemp()
+    ruta_antes = os.path.join(directorio, f'{tabla}_defecto.parquet')
+    ruta_despues = os.path.join(directorio, f'{tabla}_optimizado.parquet')
+
+    # El layout por defecto también lleva name_norm, para que ambas lecturas filtren por la misma columna
+    if tabla in ('cast', 'crew'):
+        df = df.assign(name_norm=normalizar_nombre(df['name']))
+    guardar_parquet(df, ruta_antes)
+    guardar_parquet_optimizado(df, ruta_despues, tabla)
+
+    filas = []
+    for nombre, filtros in consultas.items():
+        for layout, ruta in (('defecto', ruta_antes), ('optimizado', ruta_despues)):
+            filas.append({'consulta': nombre, 'layout': layout, **medir_lectura(ruta, filtros)})
+    return pd.DataFrame(filas)
+
+
+# Consultas por defecto del benchmark de motores: una por endpoint de la API
+CONSULTAS_API = [
+    ('cantidad_filmaciones_mes', 'febrero'),
+    ('cantidad_filmaciones_dia', 'viernes'),
+    ('score_titulo', 'Toy Story'),
+    ('votos_titulo', 'Toy Story'),
+    ('exito_actor', 'Tom Hanks'),
+    ('exito_director', 'John Lasseter'),
+]
+
+
+def _rss_mb():
+    """
+    Memoria residente del proceso en MB (Linux: /proc/self/statm), que incluye la memoria nativa
+    de pyarrow y duckdb que tracemalloc no ve.
+    """
+    with open('/proc/self/statm') as archivo:
+        paginas = int(archivo.read().split()[1])
+    return paginas * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def benchmark_motores(directorio, consultas=CONSULTAS_API, motores=tuple(MOTORES), repeticiones=20):
+    """
+    Ejecuta las mismas consultas con cada motor de src/motores.py y reporta la latencia media,
+    el tiempo de arranque y la memoria (RSS del proceso y pico de memoria Python) de cada uno.
+
+    Parámetros:
+    -----------
+    directorio : str
+        Carpeta con los parquet procesados.
+    consultas : list
+        Lista de tuplas (método del motor, argumento).
+    motores : tuple
+        Nombres de los motores a comparar.
+    repeticiones : int
+        Cantidad de ejecuciones por consulta para promediar.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Una fila por (motor, consulta).
+    """
+    filas = []
+    for nombre in motores:
+        rss_inicial = _rss_mb()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        motor = crear_motor(nombre, directorio)
+        arranque_ms = (time.perf_counter() - inicio) * 1000
+        for metodo, argumento in consultas:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                getattr(motor, metodo)(argumento)
+            filas.append({'motor': nombre, 'consulta': f'{metodo}({argumento})',
+                          'ms': round((time.perf_counter() - inicio) * 1000 / repeticiones, 3),
+                          'arranque_ms': round(arranque_ms, 1)})
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        for fila in filas:
+            if fila['motor'] == nombre:
+                fila['rss_mb'] = round(_rss_mb() - rss_inicial, 1)
+                fila['pico_python_mb'] = round(pico / 2**20, 1)
+        del motor
+    return pd.DataFrame(filas)
+
+
+# Requests con los que se ejercitan los workers antes de medir la memoria en benchmark_servidor
+PETICIONES_SERVIDOR = [
+    '/cantidad_filmaciones_mes/febrero', '/cantidad_filmaciones_dia/viernes', '/score_titulo/Toy Story',
+    '/votos_titulo/Toy Story', '/exito_actor/Tom Hanks', '/exito_director/John Lasseter',
+    '/recomendacion/Toy Story', '/estadisticas', '/palabras_frecuentes', '/colaboradores/Tom Hanks',
+]
+
+
+def _descendientes(pid):
+    """
+    Pids de todos los procesos descendientes de `pid` (Linux: /proc/<pid>/stat).
+    """
+    padres = {}
+    for entrada in os.listdir('/proc'):
+        if entrada.isdigit():
+            try:
+                with open(f'/proc/{entrada}/stat') as archivo:
+                    padres[int(entrada)] = int(archivo.read().rsplit(')', 1)[1].split()[1])
+            except (FileNotFoundError, ProcessLookupError, IndexError):
+                continue
+    descendientes, pendientes = [], [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        hijos = [p for p, padre in padres.items() if padre == actual]
+        descendientes += hijos
+        pendientes += hijos
+    return descendientes
+
+
+def _pedir(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def benchmark_servidor(workers=4, puerto=8765, peticiones=PETICIONES_SERVIDOR, repeticiones=50, directorio='.',
+                       motor='pandas', espera=600):
+    """
+    Compara la memoria total del nodo sirviendo la API con `uvicorn main:app --workers N` (cada worker
+    importa main.py y carga sus propios datos) contra el servidor preforked de src/servidor.py (los
+    datos se cargan una vez y los workers los comparten copy-on-write).
+
+    Cada modo se levanta como subproceso, se espera a que respondan sus N workers en /listo, se
+    ejercitan con `repeticiones` rondas de `peticiones` y se suma la memoria del árbol de procesos.
+
+    Parámetros:
+    -----------
+    workers : int
+        Cantidad de workers de cada modo.
+    puerto : int
+        Puerto local donde se levanta cada servidor (de a uno).
+    peticiones : list
+        Rutas de la API que se consultan.
+    repeticiones : int
+        Rondas de peticiones (se reparten entre los workers).
+    directorio : str
+        Carpeta del proyecto (donde están main.py y transformados_processed).
+    motor : str
+        MOTOR_CONSULTAS de los servidores.
+    espera : int
+        Segundos máximos para que arranquen todos los workers.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Una fila por modo con arranque, procesos y memoria en MB: rss (suma simple), pss (memoria real
+        del nodo, lo compartido se reparte entre procesos) y privada.
+    """
+    base = f'http://127.0.0.1:{puerto}'
+    modos = {
+        'uvicorn --workers': [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(puerto),
+                              '--workers', str(workers), '--log-level', 'warning'],
+        'preforked': [sys.executable, '-m', 'src.servidor', '--host', '127.0.0.1', '--puerto', str(puerto),
+                      '--workers', str(workers)],
+    }
+    filas = []
+    for modo, comando in modos.items():
+        inicio = time.perf_counter()
+        proceso = subprocess.Popen(comando, cwd=directorio, env={**os.environ, 'MOTOR_CONSULTAS': motor},
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            # Listo cuando respondieron los N workers (/listo informa el pid de cada uno)
+            pids = set()
+            while len(pids) < workers:
+                if proceso.poll() is not None or time.perf_counter() - inicio > espera:
+                    raise RuntimeError(f"El servidor '{modo}' no arrancó sus {workers} workers.")
+                try:
+                    pids.add(_pedir(f'{base}/listo', timeout=5)['pid'])
+                except OSError:
+                    time.sleep(0.5)
+            arranque = time.perf_counter() - inicio
+            for _ in range(repeticiones):
+                for ruta in peticiones:
+                    _pedir(base + urllib.parse.quote(ruta))
+            procesos = [proceso.pid, *_descendientes(proceso.pid)]
+            filas.append({'modo': modo, 'workers': workers, 'arranque_s': round(arranque, 1),
+                          'procesos': len(procesos), **{f'{k}_mb': v for k, v in memoria(procesos).items()}})
+        finally:
+            proceso.terminate()
+            proceso.wait()
+    return pd.DataFrame(filas)
+
+
+# Configuraciones LSH evaluadas por defecto en benchmark_recall (de más rápida a más precisa)
+CONFIGURACIONES_LSH = [
+    {'bits': 16, 'tablas': 4, 'sondas': 0},
+    {'bits': 12, 'tablas': 8, 'sondas': 0},
+    {'bits': 12, 'tablas': 8, 'sondas': 2},
+    {'bits': 10, 'tablas': 16, 'sondas': 2},
+]
+
+
+def benchmark_recall(df_movies, configuraciones=CONFIGURACIONES_LSH, k=5, n_consultas=500, semilla=0):
+    """
+    Mide recall@k y latencia de IndiceLSH contra la búsqueda exacta sobre el mismo catálogo.
+
+    El recall tiene en cuenta empates: un resultado aproximado cuenta como acierto si su similitud
+    es al menos la k-ésima similitud exacta (en este catálogo muchas películas comparten el mismo
+    vector de géneros/compañías, así que el top-k exacto no es único).
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame
+        Catálogo (por ejemplo transformados_processed/data_movies.parquet).
+    configuraciones : list
+        Parámetros de IndiceLSH a evaluar.
+    k : int
+        Cantidad de vecinos.
+    n_consultas : int
+        Cantidad de películas consultadas (muestra aleatoria).
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Una fila por índice con recall@k, latencia media por consulta y tiempo de construcción.
+    """
+    matriz, _ = construir_caracteristicas(df_movies)
+    rng = np.random.default_rng(semilla)
+    consultas = rng.choice(matriz.shape[0], size=min(n_consultas, matriz.shape[0]), replace=False)
+
+    exacto = crear_indice(matriz, 'exacto')
+    inicio = time.perf_counter()
+    umbrales = [exacto.buscar(int(fila), k)[1][-1] for fila in consultas]
+    filas = [{'indice': 'exacto', f'recall@{k}': 1.0,
+              'ms_consulta': round((time.perf_counter() - inicio) * 1000 / len(consultas), 3), 'construccion_s': 0.0}]
+
+    for parametros in configuraciones:
+        inicio = time.perf_counter()
+        indice = crear_indice(matriz, 'lsh', **parametros)
+        construccion = time.perf_counter() - inicio
+        aciertos = 0
+        inicio = time.perf_counter()
+        for fila, umbral in zip(consultas, umbrales):
+            _, similitudes = indice.buscar(int(fila), k)
+            aciertos += int((similitudes >= umbral - 1e-6).sum())
+        filas.append({'indice': 'lsh ' + ' '.join(f'{c}={v}' for c, v in parametros.items()),
+                      f'recall@{k}': round(aciertos / (k * len(consultas)), 4),
+                      'ms_consulta': round((time.perf_counter() - inicio) * 1000 / len(consultas), 3),
+                      'construccion_s': round(construccion, 2)})
+    return pd.DataFrame(filas)
+
+
+# Consultas de tablero evaluadas por defecto en benchmark_aproximado
+CONSULTAS_APROXIMADAS = [
+    ('personas_distintas', {'relacion': 'cast', 'por': 'anio'}),
+    ('personas_distintas', {'relacion': 'crew', 'por': 'genero'}),
+    ('cuantiles', {'metrica': 'retorno', 'por': 'genero'}),
+    ('cuantiles', {'metrica': 'puntaje', 'por': 'anio'}),
+    ('jobs_frecuentes', {'por': 'anio', 'top': 10}),
+    ('promedio', {'metrica': 'presupuesto', 'por': 'anio'}),
+]
+
+
+def _errores_aproximados(consulta, exacto, aproximado):
+    """
+    Compara una respuesta aproximada con la exacta, grupo por grupo (y el total).
+
+    Retorno:
+    --------
+    tuple
+        (errores relativos, si cada valor quedó dentro de la cota informada, precisión del top de
+        jobs_frecuentes o None)
+    """
+    exactos = {g['grupo']: g for g in exacto['grupos']}
+    pares = [(exactos.get(g['grupo']), g) for g in aproximado['grupos']]
+    if exacto['total'] is not None:
+        pares.append((exacto['total'], aproximado['total']))
+    errores, dentro, aciertos, total_top = [], [], 0, 0
+    for e, a in pares:
+        if e is None:
+            dentro.append(False)
+            continue
+        if consulta == 'cuantiles':
+            for nombre, valor in e['cuantiles'].items():
+                diferencia = abs(a['cuantiles'][nombre] - valor)
+                errores.append(diferencia / abs(valor) if valor else float(diferencia > 0))
+                dentro.append(diferencia <= a['error_relativo'] * abs(valor) + 1e-4)
+        elif consulta == 'jobs_frecuentes':
+            cantidades = {v['job']: v['cantidad'] for v in e['valores']}
+            aciertos += len(cantidades.keys() & {v['job'] for v in a['valores']})
+            total_top += len(cantidades)
+            for v in a['valores']:
+                if v['job'] in cantidades:
+                    errores.append((v['cantidad'] - cantidades[v['job']]) / cantidades[v['job']])
+                    dentro.append(0 <= v['cantidad'] - cantidades[v['job']] <= a['error'])
+        else:
+            errores.append(abs(a['valor'] - e['valor']) / abs(e['valor']) if e['valor'] else float(a['valor'] != 0))
+            if 'intervalo' in a:
+                dentro.append(a['intervalo'][0] - 1e-4 <= e['valor'] <= a['intervalo'][1] + 1e-4)
+            else:
+                dentro.append(abs(a['valor'] - e['valor']) <= a['error'] + 1e-4)
+    return errores, dentro, (aciertos / total_top if total_top else None)
+
+
+def benchmark_aproximado(df_movies, df_cast, df_crew, consultas=CONSULTAS_APROXIMADAS, repeticiones=3):
+    """
+    Compara el modo aproximado (src/aproximado.py) con los group-by exactos: latencia, error relativo
+    por grupo y fracción de valores dentro de la cota de error que informa cada respuesta.
+
+    Parámetros:
+    -----------
+    df_movies, df_cast, df_crew : pd.DataFrame
+        Catálogo y créditos (por ejemplo un catálogo escalado con src/sintetico.py).
+    consultas : list
+        Pares (método, parámetros) de ConsultasExactas / ConsultasAproximadas.
+    repeticiones : int
+        Ejecuciones de cada consulta (se informa la mediana).
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Una fila por consulta con ms_exacto, ms_aproximado, aceleracion, error_relativo_medio,
+        error_relativo_max, dentro_de_cota y precision_top (jobs_frecuentes). En attrs quedan los
+        tiempos de construcción y el tamaño de los sketches.
+    """
+    grafo = GrafoCreditos(df_cast, df_crew, df_movies)
+    inicio = time.perf_counter()
+    exactas = ConsultasExactas(df_movies, grafo)
+    inicio_aproximadas = time.perf_counter()
+    aproximadas = ConsultasAproximadas(df_movies, grafo)
+    fin = time.perf_counter()
+
+    def medir(consultas, metodo, parametros):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta = getattr(consultas, metodo)(**parametros)
+            tiempos.append(time.perf_counter() - inicio)
+        return respuesta, float(np.median(tiempos)) * 1000
+
+    filas = []
+    for metodo, parametros in consultas:
+        exacto, ms_exacto = medir(exactas, metodo, parametros)
+        aproximado, ms_aproximado = medir(aproximadas, metodo, parametros)
+        errores, dentro, precision = _errores_aproximados(metodo, exacto, aproximado)
+        errores = np.abs(errores) if errores else np.zeros(1)
+        filas.append({'consulta': metodo + ' ' + ' '.join(f'{c}={v}' for c, v in parametros.items()),
+                      'grupos': len(exacto['grupos']),
+                      'ms_exacto': round(ms_exacto, 2), 'ms_aproximado': round(ms_aproximado, 2),
+                      'aceleracion': round(ms_exacto / ms_aproximado, 1),
+                      'error_relativo_medio': round(float(errores.mean()), 4),
+                      'error_relativo_max': round(float(errores.max()), 4),
+                      'dentro_de_cota': round(float(np.mean(dentro)), 3) if dentro else None,
+                      'precision_top': round(precision, 3) if precision is not None else None})
+    resultado = pd.DataFrame(filas)
+    resultado.attrs.update({'construccion_exacta_s': round(inicio_aproximadas - inicio, 2),
+                            'construccion_aproximada_s': round(fin - inicio_aproximadas, 2),
+                            'sketches_mb': round(aproximadas.nbytes / 2**20, 1)})
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de lectura filtrada (layout), motores de consulta y recomendaciones.")
+    parser.add_argument('--origen', default='transformados_processed')
+    parser.add_argument('--actor', default='Tom Hanks')
+    parser.add_argument('--director', default='John Lasseter')
+    parser.add_argument('--mes', type=int, default=2)
+    parser.add_argument('--motores', action='store_true', help="Compara los motores de consulta en lugar del layout.")
+    parser.add_argument('--recall', action='store_true', help="Mide recall@5 del índice LSH contra la búsqueda exacta.")
+    parser.add_argument('--servidor', type=int, metavar='N',
+                        help="Compara la memoria del nodo con N workers: uvicorn --workers contra src/servidor.py.")
+    parser.add_argument('--aproximado', action='store_true',
+                        help="Mide el error y la latencia del modo aproximado contra los group-by exactos.")
+    args = parser.parse_args()
+
+    if args.aproximado:
+        pd.set_option('display.width', 1000)
+        pd.set_option('display.max_columns', None)
+        resultado = benchmark_aproximado(*(pd.read_parquet(os.path.join(args.origen, f'data_{tabla}.parquet'))
+                                           for tabla in ('movies', 'cast', 'crew')))
+        print(resultado)
+        print(resultado.attrs)
+        raise SystemExit
+
+    if args.servidor:
+        pd.set_option('display.width', 1000)
+        print(benchmark_servidor(args.servidor))
+        raise SystemExit
+
+    if args.recall:
+        pd.set_option('display.width', 1000)
+        print(benchmark_recall(pd.read_parquet(os.path.join(args.origen, 'data_movies.parquet'))))
+        raise SystemExit
+
+    if args.motores:
+        pd.set_option('display.width', 1000)
+        print(benchmark_motores(args.origen))
+        raise SystemExit
+
+    pd.set_option('display.width', 1000)
+    cast = pd.read_parquet(os.path.join(args.origen, 'data_cast.parquet'))
+    crew = pd.read_parquet(os.path.join(args.origen, 'data_crew.parquet'))
+    print(benchmark_layout(cast, 'cast', {'actor': [('name_norm', '==', normalizar_nombre(args.actor))]}))
+    print(benchmark_layout(crew, 'crew', {'director': [('name_norm', '==', normalizar_nombre(args.director))]}))
+
+    ruta_movies = os.path.join(args.origen, 'data_movies.parquet')
+    if os.path.exists(ruta_movies):
+        movies = pd.read_parquet(ruta_movies)
+        anio = int(movies['release_date'].dt.year.median())
+        desde = pd.Timestamp(anio, args.mes, 1)
+        hasta = desde + pd.offsets.MonthEnd(1)
+        print(benchmark_layout(movies, 'movies', {
+            'mes': [('release_date', '>=', desde), ('release_date', '<=', hasta)]}))
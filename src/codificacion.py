@@ -0,0 +1,280 @@
+# Codificación multi-etiqueta dispersa de los campos anidados (genres, production_companies,
+# production_countries, spoken_languages, ...) sin pasar por DataFrames one-hot densos, y tratamiento
+# de outliers / escalado de las columnas numéricas (TransformadorNumerico) con parámetros ajustados
+# una sola vez, en lugar de las transformaciones celda a celda del eda_notebook.
+
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+
+from src.etl import ColumnaAnidada
+
+# Columnas numéricas de data_movies que usa el recomendador y si llevan log1p (cola larga, ver eda_notebook)
+COLUMNAS_NUMERICAS = {
+    'budget': True,
+    'revenue': True,
+    'popularity': True,
+    'vote_count': True,
+    'vote_average': False,
+    'runtime': False,
+    'release_year': False,
+}
+# Cuantiles a los que se recorta cada columna antes de transformarla
+CUANTILES_RECORTE = (0.01, 0.99)
+
+
+def _aplanar(serie, campo):
+    """
+    Aplana una columna de listas de diccionarios en una Serie de etiquetas cuyo índice es la
+    posición (0..n-1) de la fila de origen.
+
+    Parámetros:
+    -----------
+    serie : pd.Series
+        Columna con listas de diccionarios (p. ej. [{'id': 18, 'name': 'Drama'}, ...]);
+        los valores que no son listas se consideran listas vacías.
+    campo : str
+        Llave del diccionario que se usa como etiqueta (por defecto 'name').
+
+    Retorno:
+    --------
+    pd.Series
+        Etiquetas no nulas, con índice = posición de la fila.
+    """
+    listas = serie.reset_index(drop=True).map(
+        lambda valor: valor if isinstance(valor, (list, np.ndarray)) else [])
+    return listas.explode().dropna().str.get(campo).dropna()
+
+
+class CodificadorMultietiqueta:
+    """
+    Convierte una columna de listas de diccionarios (pd.Series) o una columna list<struct> leída con
+    etl.cargar_anidado (ColumnaAnidada) en una matriz scipy.sparse CSR float32
+    (filas = películas, columnas = etiquetas del vocabulario).
+
+    El vocabulario se aprende una vez con `ajustar` (descartando etiquetas con menos de
+    `min_frecuencia` apariciones), se persiste con `guardar` y se reutiliza con `cargar`,
+    de modo que reportes de frecuencia y recomendador comparten exactamente las mismas columnas.
+    """
+
+    def __init__(self, campo='name', min_frecuencia=1):
+        self.campo = campo
+        self.min_frecuencia = min_frecuencia
+        self.vocabulario = np.empty(0, dtype=object)
+        self.frecuencias = np.empty(0, dtype=np.int64)
+        self._posiciones = {}
+
+    def ajustar(self, serie):
+        """
+        Aprende el vocabulario (ordenado por frecuencia descendente) a partir de la columna.
+        """
+        if isinstance(serie, ColumnaAnidada):
+            conteos = pc.value_counts(serie.campo(self.campo).drop_null())
+            conteos = pd.Series(conteos.field('counts').to_numpy(), index=conteos.field('values').to_pylist())
+            conteos = conteos.sort_values(ascending=False, kind='stable')
+        else:
+            conteos = _aplanar(serie, self.campo).value_counts()
+        conteos = conteos[conteos >= self.min_frecuencia]
+        self.vocabulario = conteos.index.to_numpy(dtype=object)
+        self.frecuencias = conteos.to_numpy(dtype=np.int64)
+        self._posiciones = {etiqueta: i for i, etiqueta in enumerate(self.vocabulario)}
+        return self
+
+    def transformar(self, serie):
+        """
+        Codifica la columna con el vocabulario aprendido; las etiquetas desconocidas se ignoran.
+
+        Retorno:
+        --------
+        scipy.sparse.csr_matrix
+            Matriz (len(serie) x len(vocabulario)) de float32 con 1.0 en cada etiqueta presente.
+        """
+        if isinstance(serie, ColumnaAnidada):
+            # Camino Arrow: offsets + hijos de la columna list<struct>, sin objetos Python por fila
+            vocabulario = pa.array(self.vocabulario.tolist(), type=serie.campo(self.campo).type)
+            columnas = pc.index_in(serie.campo(self.campo), value_set=vocabulario)
+            columnas = columnas.to_numpy(zero_copy_only=False).astype(np.float64)
+            filas = serie.filas()
+        else:
+            etiquetas = _aplanar(serie, self.campo)
+            columnas = etiquetas.map(self._posiciones).to_numpy(dtype=np.float64)
+            filas = etiquetas.index.to_numpy()
+        conocidas = ~np.isnan(columnas)
+        filas = filas[conocidas]
+        matriz = sp.csr_matrix(
+            (np.ones(conocidas.sum(), dtype=np.float32), (filas, columnas[conocidas].astype(np.int64))),
+            shape=(len(serie), len(self.vocabulario)), dtype=np.float32)
+        # Etiquetas repetidas en una misma fila se suman al construir la matriz; se dejan en 1
+        matriz.data[:] = 1.0
+        return matriz
+
+    def ajustar_transformar(self, serie):
+        return self.ajustar(serie).transformar(serie)
+
+    def reporte_frecuencias(self, top=None):
+        """
+        Retorna un DataFrame con cada etiqueta, su frecuencia y la proporción sobre el total.
+        """
+        reporte = pd.DataFrame({'etiqueta': self.vocabulario, 'frecuencia': self.frecuencias})
+        reporte['proporcion'] = reporte['frecuencia'] / max(reporte['frecuencia'].sum(), 1)
+        return reporte.head(top) if top else reporte
+
+    def guardar(self, ruta):
+        """
+        Persiste el vocabulario y sus frecuencias en un archivo JSON.
+        """
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump({'campo': self.campo, 'min_frecuencia': self.min_frecuencia,
+                       'vocabulario': self.vocabulario.tolist(), 'frecuencias': self.frecuencias.tolist()},
+                      archivo, ensure_ascii=False)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Reconstruye un codificador guardado con `guardar` (sin volver a ajustarlo).
+        """
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        codificador = cls(datos['campo'], datos['min_frecuencia'])
+        codificador.vocabulario = np.array(datos['vocabulario'], dtype=object)
+        codificador.frecuencias = np.array(datos['frecuencias'], dtype=np.int64)
+        codificador._posiciones = {etiqueta: i for i, etiqueta in enumerate(codificador.vocabulario)}
+        return codificador
+
+
+class TransformadorNumerico:
+    """
+    Tratamiento de outliers y escalado de columnas numéricas con parámetros aprendidos una sola vez
+    con `ajustar`:
+      1. Los nulos se imputan con la mediana y cada columna se recorta a sus cuantiles `cuantiles`.
+      2. log1p en las columnas marcadas (budget, revenue, popularity, vote_count por defecto).
+      3. Escalado robusto: (x - mediana) / rango intercuartil. Si el rango intercuartil es 0
+         (p. ej. budget, mayormente en 0) se divide por el rango de recorte.
+
+    Los parámetros se guardan en float32 y `transformar` aplica los tres pasos a todas las columnas
+    en una sola pasada vectorizada sobre una matriz float32 (sin pasar por float64), así que sirve
+    igual para el catálogo completo que para las películas que llegan por la API de ingesta. Los parámetros se persisten con `guardar` / `cargar`.
+
+    Parámetros:
+    -----------
+    columnas : dict
+        Columna -> si se le aplica log1p.
+    cuantiles : tuple
+        Cuantiles inferior y superior del recorte.
+    """
+
+    def __init__(self, columnas=COLUMNAS_NUMERICAS, cuantiles=CUANTILES_RECORTE):
+        self.columnas = dict(columnas)
+        self.cuantiles = tuple(cuantiles)
+        self._log = np.array(list(self.columnas.values()), dtype=bool)
+        vacio = np.zeros(len(self.columnas), dtype=np.float32)
+        self.imputacion, self.minimos, self.maximos, self.centros, self.escalas = (vacio.copy() for _ in range(5))
+        self.escalas += 1.0
+
+    def _matriz(self, df, dtype=np.float32):
+        faltantes = [c for c in self.columnas if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas numéricas: {', '.join(faltantes)}.")
+        x = np.empty((len(df), len(self.columnas)), dtype=dtype)
+        for j, columna in enumerate(self.columnas):
+            x[:, j] = pd.to_numeric(df[columna], errors='coerce')
+        return x
+
+    def _recortar(self, x):
+        np.copyto(x, np.broadcast_to(self.imputacion, x.shape), where=np.isnan(x))
+        np.clip(x, self.minimos, self.maximos, out=x)
+        x[:, self._log] = np.log1p(np.maximum(x[:, self._log], 0))
+        return x
+
+    def ajustar(self, df):
+        """
+        Aprende mediana de imputación, límites de recorte, centro y escala de cada columna. Los
+        estadísticos se calculan en float64 y se guardan en float32, el tipo con el que se transforma.
+        """
+        x = self._matriz(df, np.float64)
+        if len(x) == 0:
+            raise ValueError("No se puede ajustar el transformador con un DataFrame vacío.")
+        self.imputacion = np.nan_to_num(np.nanmedian(x, axis=0)).astype(np.float32)
+        x = np.where(np.isnan(x), self.imputacion, x)
+        self.minimos, self.maximos = np.quantile(x, self.cuantiles, axis=0).astype(np.float32)
+        x = self._recortar(x)
+        self.centros = np.median(x, axis=0).astype(np.float32)
+        q1, q3 = np.quantile(x, [0.25, 0.75], axis=0)
+        rango = x.max(axis=0) - x.min(axis=0)
+        self.escalas = np.where(q3 - q1 > 0, q3 - q1, np.where(rango > 0, rango, 1.0)).astype(np.float32)
+        return self
+
+    def transformar(self, df):
+        """
+        Aplica imputación, recorte, log1p y escalado robusto.
+
+        Retorno:
+        --------
+        np.ndarray
+            Matriz float32 (len(df) x len(columnas)).
+        """
+        x = self._recortar(self._matriz(df))
+        x -= self.centros
+        x /= self.escalas
+        return x
+
+    def ajustar_transformar(self, df):
+        return self.ajustar(df).transformar(df)
+
+    def reporte(self):
+        """
+        DataFrame con los parámetros aprendidos de cada columna.
+        """
+        return pd.DataFrame({'log1p': self._log, 'imputacion': self.imputacion, 'minimo': self.minimos,
+                             'maximo': self.maximos, 'centro': self.centros, 'escala': self.escalas},
+                            index=list(self.columnas))
+
+    def guardar(self, ruta):
+        """
+        Persiste los parámetros en un archivo JSON.
+        """
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump({'columnas': self.columnas, 'cuantiles': list(self.cuantiles),
+                       **{nombre: getattr(self, nombre).tolist()
+                          for nombre in ('imputacion', 'minimos', 'maximos', 'centros', 'escalas')}}, archivo)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Reconstruye un transformador guardado con `guardar` (sin volver a ajustarlo).
+        """
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        transformador = cls(datos['columnas'], datos['cuantiles'])
+        for nombre in ('imputacion', 'minimos', 'maximos', 'centros', 'escalas'):
+            setattr(transformador, nombre, np.array(datos[nombre], dtype=np.float32))
+        return transformador
+
+
+def codificar_campos(df, campos, min_frecuencia=1):
+    """
+    Ajusta un CodificadorMultietiqueta por cada campo anidado y retorna las matrices dispersas.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame de películas con las columnas anidadas ya parseadas (listas de diccionarios).
+    campos : list
+        Columnas a codificar, p. ej. ['genres', 'production_companies'].
+    min_frecuencia : int | dict
+        Frecuencia mínima para conservar una etiqueta (global o por campo).
+
+    Retorno:
+    --------
+    tuple
+        (dict campo -> CodificadorMultietiqueta, dict campo -> scipy.sparse.csr_matrix)
+    """
+    codificadores, matrices = {}, {}
+    for campo in campos:
+        minimo = min_frecuencia.get(campo, 1) if isinstance(min_frecuencia, dict) else min_frecuencia
+        codificadores[campo] = CodificadorMultietiqueta(min_frecuencia=minimo)
+        matrices[campo] = codificadores[campo].ajustar_transformar(df[campo])
+    return codificadores, matrices
@@ -0,0 +1,197 @@
+# Grafo de colaboraciones persona x persona precalculado a partir del grafo de créditos (src/grafo.py).
+#
+# Con la matriz de incidencia persona x película P (CSR, 1 si la persona participó) se obtienen con
+# productos dispersos, una sola vez al arrancar:
+#   - conteos  = P @ P.T           : cantidad de películas compartidas por cada par de personas.
+#   - retornos = P @ diag(r) @ P.T : suma del return de esas películas.
+# Las consultas "con quién trabajó más X" son entonces una fila de cada matriz (slice de CSR) y un
+# top-N con argpartition, sin self-joins de data_cast / data_crew por request.
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _incidencia(relacion, n_personas, n_peliculas, rol=None):
+    """
+    Matriz de incidencia persona x película (CSR float32 binaria) de una Relacion del grafo,
+    opcionalmente restringida a un código de rol (job) de crew.
+    """
+    indptr, indices = np.asarray(relacion.persona_indptr), np.asarray(relacion.persona_indices)
+    personas = np.repeat(np.arange(n_personas, dtype=np.int32), np.diff(indptr))
+    if rol is not None:
+        seleccion = np.asarray(relacion.persona_roles) == rol
+        personas, indices = personas[seleccion], indices[seleccion]
+    matriz = sp.csr_matrix((np.ones(len(personas), dtype=np.float32), (personas, indices)),
+                           shape=(n_personas, n_peliculas))
+    matriz.data[:] = 1.0
+    return matriz
+
+
+def _coocurrencias(filas, columnas, retornos, excluir_diagonal):
+    """
+    Conteos y suma de retornos de películas compartidas entre las personas de `filas` y `columnas`.
+
+    La suma se calcula ponderando por return + 1: así cada película compartida aporta al menos 1,
+    el producto ponderado tiene exactamente el mismo patrón de dispersión que el de conteos (un par
+    con retorno 0 no desaparece) y la suma de retornos es la diferencia de ambos `.data`. Las sumas
+    se acumulan en float64: hay retornos del orden de 1e7, donde float32 ya no distingue unidades.
+    """
+    filas = filas.astype(np.float64)
+    conteos = (filas @ columnas.T).tocsr()
+    desplazada = (filas.multiply(retornos[np.newaxis, :] + 1.0).tocsr() @ columnas.T).tocsr()
+    conteos.sort_indices()
+    desplazada.sort_indices()
+    sumas = desplazada.data - conteos.data
+
+    indptr, indices = conteos.indptr, conteos.indices
+    conservar = np.ones(len(indices), dtype=bool)
+    if excluir_diagonal:
+        conservar = np.repeat(np.arange(conteos.shape[0]), np.diff(indptr)) != indices
+    nuevo_indptr = np.concatenate([[0], np.cumsum(conservar)])[indptr]
+    conteos = sp.csr_matrix((conteos.data[conservar].astype(np.int32), indices[conservar], nuevo_indptr),
+                            shape=conteos.shape)
+    return conteos, sumas[conservar]
+
+
+def _validar_top(top):
+    if int(top) < 1:
+        raise ValueError(f"top debe ser un entero positivo (se recibió {top}).")
+
+
+class GrafoColaboraciones:
+    """
+    Co-ocurrencias precalculadas entre personas del grafo de créditos.
+
+    Matrices (persona x persona, CSR ordenada; las sumas de retorno alineadas con `.data`):
+      - cast            : actores que compartieron reparto.
+      - todos           : personas que compartieron película en cualquier rol (cast o crew).
+      - director_actor  : directores (filas) x actores (columnas).
+
+    Parámetros:
+    -----------
+    grafo : GrafoCreditos
+        Grafo de créditos (src/grafo.py).
+    retorno_por_fila : np.ndarray
+        Columna return de data_movies, en el orden de filas del catálogo (grafo.filas).
+    """
+
+    def __init__(self, grafo, retorno_por_fila):
+        self.grafo = grafo
+        retorno_por_fila = np.asarray(retorno_por_fila, dtype=np.float64)
+        filas = np.asarray(grafo.filas)
+        retornos = np.where(filas >= 0, retorno_por_fila[np.clip(filas, 0, None)], 0)
+
+        n_personas, n_peliculas = len(grafo.hashes), len(grafo.movie_ids)
+        cast = _incidencia(grafo.cast, n_personas, n_peliculas)
+        crew = _incidencia(grafo.crew, n_personas, n_peliculas)
+        todos = cast + crew
+        todos.data[:] = 1.0
+        director = grafo.codigo_job('Director')
+        directores = _incidencia(grafo.crew, n_personas, n_peliculas, director) if director >= 0 \
+            else sp.csr_matrix((n_personas, n_peliculas), dtype=np.float32)
+
+        self.matrices = {
+            'cast': _coocurrencias(cast, cast, retornos, True),
+            'todos': _coocurrencias(todos, todos, retornos, True),
+            'director_actor': _coocurrencias(directores, cast, retornos, False),
+        }
+
+    def arreglos(self):
+        """
+        Arreglos NumPy de las matrices (para persistirlas en el snapshot).
+        """
+        arreglos = {}
+        for nombre, (conteos, sumas) in self.matrices.items():
+            arreglos.update({f'{nombre}_indptr': conteos.indptr, f'{nombre}_indices': conteos.indices,
+                             f'{nombre}_conteos': conteos.data, f'{nombre}_retornos': sumas})
+        return arreglos
+
+    @classmethod
+    def desde_arreglos(cls, grafo, arreglos):
+        """
+        Reconstruye el objeto a partir de `arreglos()` (p. ej. mapeados en memoria desde el snapshot).
+        """
+        colaboraciones = cls.__new__(cls)
+        colaboraciones.grafo = grafo
+        n = len(grafo.hashes)
+        colaboraciones.matrices = {
+            nombre: (sp.csr_matrix((arreglos[f'{nombre}_conteos'], arreglos[f'{nombre}_indices'],
+                                    arreglos[f'{nombre}_indptr']), shape=(n, n), copy=False),
+                     arreglos[f'{nombre}_retornos'])
+            for nombre in ('cast', 'todos', 'director_actor')
+        }
+        return colaboraciones
+
+    @property
+    def nbytes(self):
+        return sum(arreglo.nbytes for arreglo in self.arreglos().values())
+
+    def colaboradores(self, nombre, top=10, matriz='todos', min_peliculas=1):
+        """
+        Personas con las que `nombre` compartió más películas (desempate por retorno total).
+
+        Parámetros:
+        -----------
+        nombre : str
+            Nombre de la persona (sin distinguir mayúsculas).
+        top : int
+            Cantidad de colaboradores.
+        matriz : str
+            'todos' (cualquier rol), 'cast' (co-protagonistas) o 'director_actor' (actores de un director).
+        min_peliculas : int
+            Mínimo de películas compartidas.
+
+        Retorno:
+        --------
+        list | None
+            Lista de diccionarios {nombre, peliculas, retorno_total, retorno_promedio}, o None si
+            la persona no existe. Lanza ValueError si top no es positivo.
+        """
+        _validar_top(top)
+        persona = self.grafo.buscar_persona(nombre)
+        if persona < 0:
+            return None
+        conteos, sumas = self.matrices[matriz]
+        inicio, fin = conteos.indptr[persona], conteos.indptr[persona + 1]
+        columnas = np.asarray(conteos.indices[inicio:fin])
+        cantidad = np.asarray(conteos.data[inicio:fin])
+        total = np.asarray(sumas[inicio:fin])
+        validos = cantidad >= min_peliculas
+        columnas, cantidad, total = columnas[validos], cantidad[validos], total[validos]
+        # Orden por películas compartidas y, a igualdad, por retorno total
+        orden = np.lexsort((-total, -cantidad))[:top]
+        return [self._fila(self.grafo.nombre(int(c)), int(n), float(t))
+                for c, n, t in zip(columnas[orden], cantidad[orden], total[orden])]
+
+    def pares_director_actor(self, top=10, min_peliculas=2):
+        """
+        Pares director - actor con mayor retorno promedio entre las películas que hicieron juntos.
+
+        Retorno:
+        --------
+        list
+            Lista de diccionarios {director, actor, peliculas, retorno_total, retorno_promedio}.
+            Lanza ValueError si top no es positivo.
+        """
+        _validar_top(top)
+        conteos, sumas = self.matrices['director_actor']
+        cantidad = np.asarray(conteos.data)
+        candidatos = np.flatnonzero(cantidad >= min_peliculas)
+        if len(candidatos) == 0:
+            return []
+        promedios = np.asarray(sumas)[candidatos] / cantidad[candidatos]
+        k = min(top, len(candidatos))
+        mejores = np.argpartition(-promedios, k - 1)[:k]
+        mejores = mejores[np.argsort(-promedios[mejores], kind='stable')]
+        directores = np.searchsorted(conteos.indptr, candidatos[mejores], side='right') - 1
+        pares = []
+        for posicion, director in zip(candidatos[mejores], directores):
+            fila = self._fila(self.grafo.nombre(int(conteos.indices[posicion])), int(cantidad[posicion]),
+                              float(sumas[posicion]))
+            pares.append({'director': self.grafo.nombre(int(director)), 'actor': fila.pop('nombre'), **fila})
+        return pares
+
+    @staticmethod
+    def _fila(nombre, peliculas, total):
+        return {'nombre': nombre, 'peliculas': peliculas, 'retorno_total': round(total, 2),
+                'retorno_promedio': round(total / peliculas, 2) if peliculas else 0.0}
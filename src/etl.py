@@ -1,10 +1,47 @@
 import pandas as pd
 import numpy as np
 import ast
+import inspect
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
 from sklearn.metrics.pairwise import cosine_similarity
 
 
+# Diccionarios de tipos esperados de los datasets crudos (movies_dataset.csv y credits.csv),
+# usados por convertir_tipos y validar_estructura_df
+DICCIONARIO_TIPOS_MOVIES = {
+    'adult': bool,  # Debe ser un valor booleano (True o False)
+    'belongs_to_collection': dict,  # Un diccionario con detalles de la colección a la que pertenece la película
+    'budget': int,  # Presupuesto de la película, debe ser un número entero
+    'genres': list,  # Lista de géneros en formato de diccionarios
+    'homepage': str,  # Página web oficial de la película
+    'id': int,  # ID único de la película
+    'imdb_id': str,  # ID de la película en IMDb
+    'original_language': str,  # Idioma original de la película
+    'original_title': str,  # Título original de la película
+    'overview': str,  # Resumen o descripción de la película
+    'popularity': float,  # Puntaje de popularidad, un número decimal
+    'poster_path': str,  # Ruta al póster de la película
+    'production_companies': list,  # Lista de compañías productoras (diccionarios)
+    'production_countries': list,  # Lista de países de producción (diccionarios)
+    'release_date': pd.Timestamp,  # Fecha de estreno de la película
+    'revenue': int,  # Recaudación total de la película
+    'runtime': float,  # Duración de la película en minutos
+    'spoken_languages': list,  # Lista de idiomas hablados en la película
+    'status': str,  # Estado de la película (por ejemplo, "Released")
+    'tagline': str,  # Frase célebre o eslogan de la película
+    'title': str,  # Título de la película
+    'video': bool,  # Indica si hay un video disponible
+    'vote_average': float,  # Promedio de votos recibidos
+    'vote_count': float  # Número total de votos
+}
+DICCIONARIO_TIPOS_CREDITS = {
+    'cast': list,  # Lista de diccionarios que representa los actores del reparto de la película.
+    'crew': list,  # Una lista de diccionarios que representa los miembros del equipo de producción de la película.
+    'id': int,  # ID único de la película
+}
+
 def validar_df(df):
     res = pd.DataFrame({
         "Tipo de Dato": df.dtypes,
@@ -79,7 +116,7 @@ def convertir_a_estructura(valor, tipo_esperado):
 
 ############################################################################################################
 
-def validar_estructura_df(df, diccionario):
+def validar_estructura_df(df, diccionario, mostrar=True):
     """
     Valida la estructura de cada fila del DataFrame comparando con el diccionario de tipos esperado.
     
@@ -92,6 +129,8 @@ def validar_estructura_df(df, diccionario):
          DataFrame a validar.
       diccionario : dict
          Diccionario donde las llaves son los nombres de columna y los valores son los tipos esperados.
+      mostrar : bool
+         Si es False no imprime el resumen (la API de ingesta valida en el camino de cada request).
          
     Retorna:
       tuple: (cantidad_inconsistentes, lista_indices)
@@ -151,9 +190,9 @@ def validar_estructura_df(df, diccionario):
         if fila_inconsistente:
             inconsistentes.append(idx)
     
-    if inconsistentes:
+    if mostrar and inconsistentes:
         print(f"Se encontraron {len(inconsistentes)} filas inconsistentes: {inconsistentes}")
-    else:
+    elif mostrar:
         print("No se encontraron filas inconsistentes.")
     
     return inconsistentes
@@ -239,7 +278,7 @@ def validar_tipo(valor, tipo_esperado):
     # Finalmente, comprobamos si el valor es del tipo esperado
     return isinstance(valor, tipo_esperado)
 
-def formato_fecha(df, columna_fecha):
+def formato_fecha(df, columna_fecha, mostrar=True):
     """
     Convierte una columna de tipo object a formato datetime.
 
@@ -249,6 +288,8 @@ def formato_fecha(df, columna_fecha):
         DataFrame que contiene la columna a convertir.
     columna_fecha : str
         Nombre de la columna que contiene las fechas en formato string.
+    mostrar : bool
+        Si es False no imprime la advertencia de fechas no convertidas.
 
     Retorno:
     --------
@@ -260,7 +301,7 @@ def formato_fecha(df, columna_fecha):
     
     # Verificar si hay errores en la conversión
     nulos = df[columna_fecha].isnull().sum()
-    if nulos > 0:
+    if nulos > 0 and mostrar:
         print(f"Advertencia: {nulos} valores no pudieron convertirse a formato fecha.")
     
     return df
@@ -289,8 +330,8 @@ def obtener_campos_json(df, columna):
             # Si el valor es una cadena, intentar evaluarla a estructura Python
             if isinstance(valor, str):
                 valor = ast.literal_eval(valor)
-            # Si es una lista, se itera sobre sus elementos
-            if isinstance(valor, list):
+            # Si es una lista (o el arreglo con el que pandas lee un list<struct> de parquet), se itera sobre sus elementos
+            if isinstance(valor, (list, np.ndarray)):
                 for elemento in valor:
                     if isinstance(elemento, dict):
                         campos.update(elemento.keys())
@@ -318,7 +359,7 @@ def extraer_campo(json_obj, campo):
             json_obj = ast.literal_eval(json_obj)
         if isinstance(json_obj, dict):
             return json_obj.get(campo)
-        elif isinstance(json_obj, list):
+        elif isinstance(json_obj, (list, np.ndarray)):
             for d in json_obj:
                 if isinstance(d, dict) and campo in d:
                     return d.get(campo)
@@ -367,3 +408,288 @@ def extraer_campos_json(df, columna_json, campos):
 
 ############################################################################################################
 
+def calcular_columnas_derivadas(df, columna_fecha='release_date'):
+    """
+    Calcula de forma vectorizada las columnas derivadas que consume la API, para que nunca
+    tengan que derivarse ni repararse en tiempo de consulta.
+
+    Columnas generadas:
+      - budget, revenue : int64 (nulos o no numéricos -> 0).
+      - return          : float64, revenue / budget redondeado a 2 decimales; vale 0 cuando el
+                          presupuesto es 0 o el cociente no es finito (requerimiento del README).
+      - release_year    : int16 (0 si la fecha es nula).
+      - release_month   : int8, 1..12 (0 si la fecha es nula).
+      - release_weekday : int8, 1 = lunes ... 7 = domingo (0 si la fecha es nula), igual que DIA_MAP.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame de películas con las columnas budget, revenue y la columna de fecha.
+    columna_fecha : str
+        Nombre de la columna con la fecha de estreno.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        El mismo DataFrame con las columnas derivadas agregadas o reemplazadas.
+    """
+    budget = pd.to_numeric(df['budget'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    revenue = pd.to_numeric(df['revenue'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    # División protegida: solo se divide donde el presupuesto es positivo, el resto queda en 0
+    retorno = np.zeros(len(df), dtype=np.float64)
+    np.divide(revenue, budget, out=retorno, where=budget > 0)
+    retorno[~np.isfinite(retorno)] = 0
+
+    df['budget'] = budget.astype(np.int64)
+    df['revenue'] = revenue.astype(np.int64)
+    df['return'] = np.round(retorno, 2)
+
+    fechas = pd.to_datetime(df[columna_fecha], errors='coerce')
+    nulas = fechas.isna().to_numpy()
+    df['release_year'] = np.where(nulas, 0, fechas.dt.year.fillna(0)).astype(np.int16)
+    df['release_month'] = np.where(nulas, 0, fechas.dt.month.fillna(0)).astype(np.int8)
+    # pandas usa dayofweek 0..6 (lunes=0); se suma 1 para que lunes sea 1 y domingo 7
+    df['release_weekday'] = np.where(nulas, 0, fechas.dt.dayofweek.fillna(-1) + 1).astype(np.int8)
+    return df
+
+# Tipos Arrow nativos de los campos anidados de TMDB. Se escriben en parquet como list<struct>
+# (o struct) en lugar de strings con la representación Python, así que al leerlos no hace falta
+# volver a parsear nada con ast.
+TIPO_ID_NOMBRE = pa.struct([('id', pa.int32()), ('name', pa.string())])
+TIPOS_ANIDADOS = {
+    'genres': pa.list_(TIPO_ID_NOMBRE),
+    'production_companies': pa.list_(TIPO_ID_NOMBRE),
+    'production_countries': pa.list_(pa.struct([('iso_3166_1', pa.string()), ('name', pa.string())])),
+    'spoken_languages': pa.list_(pa.struct([('iso_639_1', pa.string()), ('name', pa.string())])),
+    'belongs_to_collection': pa.struct([('id', pa.int32()), ('name', pa.string()),
+                                        ('poster_path', pa.string()), ('backdrop_path', pa.string())]),
+    'cast': pa.list_(pa.struct([('cast_id', pa.int32()), ('character', pa.string()), ('credit_id', pa.string()),
+                                ('gender', pa.int8()), ('id', pa.int32()), ('name', pa.string()),
+                                ('order', pa.int16()), ('profile_path', pa.string())])),
+    'crew': pa.list_(pa.struct([('credit_id', pa.string()), ('department', pa.string()), ('gender', pa.int8()),
+                                ('id', pa.int32()), ('job', pa.string()), ('name', pa.string()),
+                                ('profile_path', pa.string())])),
+}
+
+def a_arrow_anidado(serie, tipo):
+    """
+    Convierte una columna anidada (listas/diccionarios ya parseados, arreglos leídos de parquet o,
+    como último recurso, strings con la representación Python) en un arreglo Arrow del tipo indicado.
+    Es el único punto del pipeline donde todavía se usa ast.literal_eval; las llaves que no están
+    en el tipo se descartan y los valores no válidos quedan como nulos.
+
+    Parámetros:
+    -----------
+    serie : pd.Series
+        Columna anidada.
+    tipo : pa.DataType
+        Tipo Arrow destino (ver TIPOS_ANIDADOS).
+
+    Retorno:
+    --------
+    pa.Array
+    """
+    estructura = list if pa.types.is_list(tipo) else dict
+
+    def normalizar(valor):
+        if isinstance(valor, str):
+            valor = convertir_a_estructura(valor, estructura)
+        if isinstance(valor, np.ndarray):
+            valor = valor.tolist()
+        return valor if isinstance(valor, estructura) else None
+
+    return pa.array([normalizar(valor) for valor in serie], type=tipo, from_pandas=True)
+
+def tabla_arrow(df):
+    """
+    Convierte un DataFrame procesado en una tabla Arrow, tipando como list<struct>/struct los
+    campos anidados presentes en TIPOS_ANIDADOS.
+    """
+    anidados = [c for c in df.columns if c in TIPOS_ANIDADOS and df[c].dtype == object]
+    tabla = pa.Table.from_pandas(df.drop(columns=anidados), preserve_index=False)
+    for columna in anidados:
+        arreglo = a_arrow_anidado(df[columna], TIPOS_ANIDADOS[columna])
+        tabla = tabla.add_column(df.columns.get_loc(columna), columna, arreglo)
+    return tabla
+
+def guardar_parquet(df, ruta, **opciones):
+    """
+    Escribe un DataFrame procesado en formato Parquet guardando estadísticas (min/max/nulos)
+    por columna, necesarias para que el lector pueda descartar row groups al filtrar.
+    Los campos anidados se escriben con su tipo Arrow nativo (ver tabla_arrow).
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame | pa.Table
+        DataFrame (o tabla Arrow ya convertida) a guardar.
+    ruta : str
+        Ruta del archivo parquet de salida.
+    **opciones :
+        Argumentos adicionales para pyarrow.parquet.write_table.
+    """
+    tabla = df if isinstance(df, pa.Table) else tabla_arrow(df)
+    opciones.setdefault('write_statistics', True)
+    pq.write_table(tabla, ruta, **opciones)
+
+def cargar_parquet(ruta, columnas=None, filtros=None):
+    """
+    Lee un parquet procesado leyendo solo las columnas pedidas y empujando los filtros al lector,
+    por ejemplo: cargar_parquet(ruta, filtros=[('release_month', '==', 2)]).
+
+    Parámetros:
+    -----------
+    ruta : str
+        Ruta del archivo parquet.
+    columnas : list, opcional
+        Columnas a leer (proyección). None lee todas.
+    filtros : list, opcional
+        Filtros en el formato de pyarrow (lista de tuplas (columna, operador, valor)).
+
+    Retorno:
+    --------
+    pd.DataFrame
+    """
+    return pd.read_parquet(ruta, columns=columnas, filters=filtros)
+
+############################################################################################################
+
+# Parámetros de escritura de los parquet procesados.
+# Row groups pequeños permiten que un filtro sobre la columna de orden descarte la mayor parte del archivo;
+# todas las columnas se codifican como diccionario salvo las de alta cardinalidad ('sin_diccionario'),
+# donde el diccionario solo agrega costo, y las columnas de búsqueda puntual llevan bloom filter.
+FILAS_POR_GRUPO = 16384
+LAYOUT_PARQUET = {
+    'movies': {
+        'orden': ['release_date', 'movie_id'],
+        'sin_diccionario': ['movie_id', 'title', 'tagline', 'overview', 'popularity', 'runtime'],
+        'bloom': ['movie_id', 'title'],
+    },
+    'cast': {
+        'orden': ['name_norm', 'movie_id'],
+        'sin_diccionario': ['credit_id', 'character', 'profile_path'],
+        'bloom': ['name_norm', 'movie_id'],
+    },
+    'crew': {
+        'orden': ['name_norm', 'movie_id'],
+        'sin_diccionario': ['credit_id', 'profile_path'],
+        'bloom': ['name_norm', 'movie_id'],
+    },
+}
+# Los bloom filters solo se pueden escribir con versiones de pyarrow que soportan bloom_filter_options
+_SOPORTA_BLOOM = 'bloom_filter_options' in inspect.signature(pq.write_table).parameters
+
+def normalizar_nombre(valor):
+    """
+    Normaliza nombres de personas o títulos para búsquedas sin distinción de mayúsculas:
+    casefold y sin espacios en los extremos. Acepta un string o una pd.Series (vectorizado).
+    """
+    if isinstance(valor, pd.Series):
+        return valor.str.casefold().str.strip()
+    return str(valor).casefold().strip()
+
+def _rutas_hoja(tipo, prefijo=''):
+    """
+    Devuelve las rutas de las columnas hoja de un esquema Arrow tal como las nombra parquet.
+    """
+    if isinstance(tipo, pa.Schema):
+        return [r for campo in tipo for r in _rutas_hoja(campo.type, campo.name)]
+    if pa.types.is_struct(tipo):
+        return [r for campo in tipo for r in _rutas_hoja(campo.type, f'{prefijo}.{campo.name}')]
+    if pa.types.is_list(tipo) or pa.types.is_large_list(tipo):
+        return _rutas_hoja(tipo.value_type, f'{prefijo}.list.element')
+    return [prefijo]
+
+def guardar_parquet_optimizado(df, ruta, tabla, filas_por_grupo=FILAS_POR_GRUPO):
+    """
+    Escribe 'movies', 'cast' o 'crew' con el layout pensado para predicate pushdown:
+    filas ordenadas por la columna de búsqueda (release_date o nombre normalizado), row groups
+    de tamaño acotado, diccionario salvo en columnas de alta cardinalidad, estadísticas por página
+    (page index) y bloom filters cuando la versión de pyarrow lo permite.
+
+    Para cast y crew se agrega la columna name_norm (ver normalizar_nombre), que es la que
+    deben usar los filtros por persona.
+
+    Parámetros:
+    -----------
+    df : pd.DataFrame
+        DataFrame procesado a guardar.
+    ruta : str
+        Ruta del archivo parquet de salida.
+    tabla : str
+        'movies', 'cast' o 'crew' (clave de LAYOUT_PARQUET).
+    filas_por_grupo : int
+        Cantidad máxima de filas por row group.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        El DataFrame ordenado tal como quedó escrito.
+    """
+    layout = LAYOUT_PARQUET[tabla]
+    if tabla in ('cast', 'crew'):
+        df = df.assign(name_norm=normalizar_nombre(df['name']))
+    df = df.sort_values(layout['orden'], kind='stable', na_position='last').reset_index(drop=True)
+
+    # use_dictionary recibe rutas de columnas hoja (p. ej. 'genres.list.element.name')
+    tabla = tabla_arrow(df)
+    hojas = _rutas_hoja(tabla.schema)
+    opciones = {
+        'row_group_size': filas_por_grupo,
+        'use_dictionary': [h for h in hojas if h.split('.')[0] not in layout['sin_diccionario']],
+        'write_page_index': True,
+        'sorting_columns': [pq.SortingColumn(df.columns.get_loc(layout['orden'][0]))],
+    }
+    if _SOPORTA_BLOOM:
+        # El bloom filter se escribe por row group, así que su NDV se acota al tamaño del grupo
+        opciones['bloom_filter_options'] = {c: {'ndv': max(min(int(df[c].nunique()), filas_por_grupo), 1), 'fpp': 0.05}
+                                            for c in layout['bloom'] if c in df.columns}
+    guardar_parquet(tabla, ruta, **opciones)
+    return df
+
+############################################################################################################
+
+class ColumnaAnidada:
+    """
+    Vista plana (sin copias) de una columna list<struct> leída de parquet:
+      - offsets : np.ndarray int64 de largo n+1; los elementos de la fila i están en [offsets[i], offsets[i+1]).
+      - hijos   : pa.ChunkedArray de structs con todos los elementos, un chunk por cada chunk de la
+                  columna (no se concatenan); cada campo se obtiene con campo().
+    Solo se copian los offsets: se recorren los chunks desplazando los de cada uno por la cantidad de
+    elementos de los anteriores.
+    """
+
+    def __init__(self, arreglo):
+        chunks = arreglo.chunks if isinstance(arreglo, pa.ChunkedArray) else [arreglo]
+        offsets, base = [np.zeros(1, dtype=np.int64)], 0
+        for chunk in chunks:
+            propios = chunk.offsets.to_numpy().astype(np.int64)
+            offsets.append(propios[1:] - propios[0] + base)
+            base += int(propios[-1] - propios[0])
+        self.offsets = np.concatenate(offsets)
+        self.hijos = pa.chunked_array([chunk.flatten() for chunk in chunks], type=arreglo.type.value_type)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def campo(self, nombre):
+        """
+        Arreglo Arrow con el campo `nombre` de todos los elementos (p. ej. 'id' o 'name').
+        """
+        return pa.chunked_array([chunk.field(nombre) for chunk in self.hijos.chunks],
+                                type=self.hijos.type.field(nombre).type)
+
+    def filas(self):
+        """
+        Fila de origen de cada elemento (np.int64), útil para armar matrices dispersas.
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+
+def cargar_anidado(ruta, columna):
+    """
+    Lee un campo anidado list<struct> de un parquet procesado y lo expone como ColumnaAnidada
+    (offsets + arreglos hijos), sin convertirlo a objetos Python.
+    """
+    return ColumnaAnidada(pq.read_table(ruta, columns=[columna]).column(columna))
+
+############################################################################################################
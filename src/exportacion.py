@@ -0,0 +1,375 @@
+# Exportación masiva en streaming de movies / cast / crew filtrados.
+#
+# Los parquet procesados se recorren con pyarrow.dataset por record batches: los filtros por año,
+# mes y día de la semana se empujan al lector (proyección + descarte de row groups), el de género se
+# evalúa por batch con Arrow compute y cada batch se serializa y se envía apenas está listo. Así una
+# exportación de cientos de MB usa memoria constante (un batch a la vez) y empieza a devolver bytes
+# de inmediato.
+# Las escrituras de la API de ingesta que todavía no se compactaron (<directorio>/deltas, ver
+# src/ingesta.py) también se exportan: las filas base que reemplazan se descartan y sus versiones
+# vigentes se envían al final, con los mismos filtros. Una compactación concurrente no afecta una
+# exportación en curso: los deltas se leen y los parquet base se mapean con el flock de la
+# compactación tomado como compartido (ver _abrir).
+
+import io
+import os
+import json
+import zlib
+import fcntl
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from src.etl import normalizar_nombre
+from src.services import interpretar_dia, interpretar_mes
+
+TABLAS_EXPORTABLES = ('movies', 'cast', 'crew')
+FORMATOS_EXPORTACION = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+FILAS_POR_LOTE = 8192
+
+
+def _dataset(directorio, tabla):
+    """
+    Parquet base de una tabla abierto con memory-map: si una compactación lo reemplaza (os.replace)
+    mientras se exporta, se siguen leyendo las filas del archivo que había al abrirlo.
+    """
+    formato = ds.ParquetFileFormat()
+    fragmento = formato.make_fragment(pa.memory_map(os.path.join(directorio, f'data_{tabla}.parquet')))
+    return ds.FileSystemDataset([fragmento], fragmento.physical_schema, formato, pafs.LocalFileSystem())
+
+
+def _abrir(directorio):
+    """
+    Estado de los datos para una exportación: los parquet base abiertos y las escrituras pendientes,
+    tomados con el flock de AlmacenDeltas.compactar (<directorio>/deltas/.compactacion) como compartido,
+    así una compactación no borra deltas ni reemplaza parquet entre una lectura y otra. El candado se
+    suelta al terminar de abrir: la exportación sigue sin bloquear compactaciones.
+
+    Retorno:
+    --------
+    tuple
+        (bases, pendientes): tabla -> ds.Dataset del parquet base, y ver _pendientes.
+    """
+    ruta = os.path.join(directorio, 'deltas')
+    if not os.path.isdir(ruta):
+        return {tabla: _dataset(directorio, tabla) for tabla in TABLAS_EXPORTABLES}, None
+    with open(os.path.join(ruta, '.compactacion'), 'a') as candado:
+        fcntl.flock(candado, fcntl.LOCK_SH)
+        bases = {tabla: _dataset(directorio, tabla) for tabla in TABLAS_EXPORTABLES}
+        return bases, _pendientes(ruta, {tabla: dataset.schema for tabla, dataset in bases.items()})
+
+
+def _conformar(tabla, esquema):
+    """
+    Lleva una tabla de deltas al esquema del parquet base (mismas columnas, orden y tipos). Las
+    columnas que faltan o vienen vacías quedan nulas y name_norm se calcula a partir de name.
+    """
+    columnas = []
+    for campo in esquema:
+        if campo.name == 'name_norm' and campo.name not in tabla.column_names:
+            nombres = normalizar_nombre(pd.Series(tabla.column('name').to_pylist(), dtype=object).astype(str))
+            columnas.append(pa.array(nombres.to_numpy(), type=campo.type))
+            continue
+        if campo.name not in tabla.column_names or tabla.column(campo.name).null_count == tabla.num_rows:
+            columnas.append(pa.nulls(tabla.num_rows, type=campo.type))
+            continue
+        columna = tabla.column(campo.name)
+        if columna.type != campo.type:
+            try:
+                columna = columna.cast(campo.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                columna = pa.array(columna.to_pylist(), type=campo.type)
+        columnas.append(columna)
+    return pa.Table.from_arrays(columnas, schema=esquema)
+
+
+def _pendientes(ruta, esquemas):
+    """
+    Escrituras de la API de ingesta todavía no compactadas (los deltas de `ruta`, ver AlmacenDeltas en
+    src/ingesta.py), resueltas igual que en la compactación: cada película queda en su última versión
+    y los créditos de una película, con el último delta que los reemplazó. Se llama con el candado de
+    la compactación tomado (ver _abrir).
+
+    Retorno:
+    --------
+    dict | None
+        tabla -> (movie_ids reemplazados, pa.Table con las filas vigentes en el esquema del parquet
+        base de `esquemas`), para 'movies', 'cast' y 'crew'; None si no hay deltas pendientes.
+    """
+    archivos = sorted(a for a in os.listdir(ruta) if a.endswith('.parquet'))
+    if not archivos:
+        return None
+    movies, creditos, ultimo_credito = [], [], {}
+    for archivo in archivos:
+        tabla = pq.read_table(os.path.join(ruta, archivo))
+        if archivo.endswith('-movies.parquet'):
+            movies.append(tabla)
+        else:
+            creditos.append(tabla)
+            for movie_id in json.loads((tabla.schema.metadata or {})[b'movie_ids']):
+                ultimo_credito[movie_id] = len(creditos) - 1
+
+    pendientes = {}
+    if movies:
+        tabla = pa.concat_tables([_conformar(t, esquemas['movies']) for t in movies])
+        ids = tabla.column('movie_id').to_numpy()
+        # La última versión de cada película: primera aparición recorriendo al revés
+        _, ultimas = np.unique(ids[::-1], return_index=True)
+        filas = np.sort(len(ids) - 1 - ultimas)
+        pendientes['movies'] = (np.unique(ids), tabla.take(pa.array(filas)))
+    if creditos:
+        ids = np.array(sorted(ultimo_credito), dtype=np.int64)
+        for relacion in ('cast', 'crew'):
+            partes = []
+            for numero, tabla in enumerate(creditos):
+                tabla = tabla.filter(pc.equal(tabla.column('relacion'), relacion))
+                vigentes = [m for m, n in ultimo_credito.items() if n == numero]
+                partes.append(_conformar(tabla.filter(pc.is_in(tabla.column('movie_id'), pa.array(vigentes, pa.int64()))),
+                                         esquemas[relacion]))
+            pendientes[relacion] = (ids, pa.concat_tables(partes))
+    return pendientes
+
+
+def _filtro_movies(anio_min=None, anio_max=None, mes=None, dia=None):
+    """
+    Expresión de pyarrow.dataset con los filtros de películas que se pueden empujar al lector.
+    """
+    filtro = None
+    condiciones = []
+    if anio_min is not None:
+        condiciones.append(pc.field('release_year') >= anio_min)
+    if anio_max is not None:
+        condiciones.append(pc.field('release_year') <= anio_max)
+    if mes is not None:
+        condiciones.append(pc.field('release_month') == interpretar_mes(mes)[0])
+    if dia is not None:
+        condiciones.append(pc.field('release_weekday') == interpretar_dia(dia)[0])
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+    return filtro
+
+
+def _mascara_genero(lote, genero):
+    """
+    Máscara booleana de las filas del batch cuya lista 'genres' incluye el género (sin distinguir
+    mayúsculas), calculada sobre los hijos de la columna list<struct> sin convertir a Python.
+    """
+    generos = lote.column(lote.schema.get_field_index('genres'))
+    nombres = pc.utf8_lower(pc.struct_field(pc.list_flatten(generos), 'name'))
+    padres = pc.list_parent_indices(generos).to_numpy()
+    coincide = pc.fill_null(pc.equal(nombres, genero.lower()), False).to_numpy(zero_copy_only=False)
+    mascara = np.zeros(lote.num_rows, dtype=bool)
+    mascara[padres[coincide]] = True
+    return pa.array(mascara)
+
+
+def _fuentes(bases, tabla, pendientes):
+    """
+    Datasets a recorrer para una tabla: el parquet base (sin las filas que reemplazan los deltas
+    pendientes) y las filas vigentes de los deltas. Retorna una lista de (dataset, filtro extra).
+    """
+    dataset = bases[tabla]
+    if not pendientes or tabla not in pendientes:
+        return [(dataset, None)]
+    reemplazados, vigentes = pendientes[tabla]
+    return [(dataset, ~pc.field('movie_id').isin(reemplazados)), (ds.dataset(vigentes), None)]
+
+
+def _combinar(filtro, extra):
+    if extra is None:
+        return filtro
+    return extra if filtro is None else filtro & extra
+
+
+def _filtro_persona(esquema, persona):
+    if 'name_norm' in esquema.names:
+        return pc.field('name_norm') == normalizar_nombre(persona)
+    return pc.utf8_lower(pc.field('name')) == persona.lower()
+
+
+def _movie_ids_persona(bases, persona, pendientes=None):
+    """
+    movie_id de las películas en las que participa la persona (en cast o en crew).
+    """
+    ids = []
+    for tabla in ('cast', 'crew'):
+        for dataset, extra in _fuentes(bases, tabla, pendientes):
+            filtro = _combinar(_filtro_persona(dataset.schema, persona), extra)
+            ids.append(dataset.to_table(columns=['movie_id'], filter=filtro).column('movie_id').to_numpy())
+    return np.unique(np.concatenate(ids))
+
+
+def _movie_ids_filtrados(bases, filtro, genero, pendientes=None):
+    """
+    movie_id de las películas que cumplen los filtros, leyendo solo las columnas necesarias.
+    """
+    columnas = ['movie_id'] + (['genres'] if genero else [])
+    ids = []
+    for dataset, extra in _fuentes(bases, 'movies', pendientes):
+        for lote in dataset.to_batches(columns=columnas, filter=_combinar(filtro, extra)):
+            if genero:
+                lote = lote.filter(_mascara_genero(lote, genero))
+            ids.append(lote.column(0).to_numpy())
+    return np.unique(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+
+def lotes_exportacion(directorio, tabla, columnas=None, anio_min=None, anio_max=None, mes=None, dia=None,
+                      persona=None, genero=None, filas_por_lote=FILAS_POR_LOTE):
+    """
+    Prepara la exportación de una tabla filtrada y retorna un generador de pa.RecordBatch.
+
+    Los parámetros se validan al llamar a la función (antes de empezar a enviar datos): un mes,
+    un día, una tabla o una columna inválidos lanzan ValueError con el mensaje para el cliente.
+    Incluye las escrituras de la API de ingesta pendientes de compactar (ver _pendientes): sus filas
+    van al final, después de las del parquet base.
+
+    Parámetros:
+    -----------
+    directorio : str
+        Carpeta con data_movies.parquet, data_cast.parquet y data_crew.parquet.
+    tabla : str
+        'movies', 'cast' o 'crew'.
+    columnas : list, opcional
+        Columnas a exportar (por defecto todas).
+    anio_min, anio_max : int, opcional
+        Rango de año de estreno (inclusive).
+    mes, dia : str | int, opcional
+        Mes o día de la semana de estreno, como nombre o número (igual que los endpoints).
+    persona : str, opcional
+        Nombre de una persona: películas en las que participa, o sus créditos en cast/crew.
+    genero : str, opcional
+        Nombre de un género (p. ej. 'Animation').
+    filas_por_lote : int
+        Tamaño máximo de cada batch.
+
+    Retorno:
+    --------
+    generator
+        Record batches con las filas que cumplen todos los filtros (un batch vacío si no hay ninguna).
+    """
+    if tabla not in TABLAS_EXPORTABLES:
+        raise ValueError(f"La tabla '{tabla}' no es exportable. Opciones: {', '.join(TABLAS_EXPORTABLES)}.")
+    bases, pendientes = _abrir(directorio)
+    dataset = bases[tabla]
+    columnas = list(columnas) if columnas else [c for c in dataset.schema.names if c != 'name_norm']
+    desconocidas = [c for c in columnas if c not in dataset.schema.names]
+    if desconocidas:
+        raise ValueError(f"Columnas inexistentes en {tabla}: {', '.join(desconocidas)}.")
+
+    filtro_movies = _filtro_movies(anio_min, anio_max, mes, dia)
+    filtro, genero_por_lote = None, None
+    if tabla == 'movies':
+        filtro = filtro_movies
+        genero_por_lote = genero
+        if persona:
+            filtro = _combinar(filtro, pc.field('movie_id').isin(_movie_ids_persona(bases, persona, pendientes)))
+    else:
+        if persona:
+            filtro = _filtro_persona(dataset.schema, persona)
+        if filtro_movies is not None or genero:
+            ids = _movie_ids_filtrados(bases, filtro_movies, genero, pendientes)
+            filtro = _combinar(filtro, pc.field('movie_id').isin(ids))
+
+    # El filtro de género necesita la columna genres aunque no se exporte
+    lectura = columnas + (['genres'] if genero_por_lote and 'genres' not in columnas else [])
+
+    def generar():
+        vacio = True
+        for fuente, extra in _fuentes(bases, tabla, pendientes):
+            for lote in fuente.to_batches(columns=lectura, filter=_combinar(filtro, extra), batch_size=filas_por_lote):
+                if genero_por_lote:
+                    lote = lote.filter(_mascara_genero(lote, genero_por_lote))
+                if lote.num_rows:
+                    vacio = False
+                    yield lote.select(columnas)
+        # Sin resultados se envía un batch vacío, para que el cliente reciba igual el esquema (o el encabezado CSV)
+        if vacio:
+            esquema = pa.schema([dataset.schema.field(c) for c in columnas])
+            yield pa.RecordBatch.from_pylist([], schema=esquema)
+
+    return generar()
+
+
+def _a_texto(lote):
+    """
+    Convierte las columnas anidadas del batch a JSON (texto) para el CSV.
+    """
+    columnas = []
+    for arreglo, campo in zip(lote.columns, lote.schema):
+        if pa.types.is_nested(campo.type):
+            arreglo = pa.array([json.dumps(v, ensure_ascii=False) if v is not None else None
+                                for v in arreglo.to_pylist()], type=pa.string())
+        columnas.append(arreglo)
+    return pa.RecordBatch.from_arrays(columnas, names=lote.schema.names)
+
+
+def _ndjson(lotes):
+    for lote in lotes:
+        yield ''.join(json.dumps(fila, ensure_ascii=False, default=str) + '\n'
+                      for fila in lote.to_pylist()).encode('utf-8')
+
+
+def _csv(lotes):
+    encabezado = True
+    for lote in lotes:
+        yield _a_texto(lote).to_pandas().to_csv(index=False, header=encabezado).encode('utf-8')
+        encabezado = False
+
+
+def _arrow(lotes):
+    # Se escribe el stream IPC en un buffer que se vacía después de cada batch
+    buffer = io.BytesIO()
+    escritor = None
+    for lote in lotes:
+        if escritor is None:
+            escritor = pa.ipc.new_stream(buffer, lote.schema)
+        escritor.write_batch(lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if escritor is not None:
+        escritor.close()
+        yield buffer.getvalue()
+
+
+def serializar(lotes, formato='ndjson', comprimir=False):
+    """
+    Serializa un iterador de record batches en fragmentos de bytes, uno por batch.
+
+    Parámetros:
+    -----------
+    lotes : iterable
+        Record batches (p. ej. el resultado de lotes_exportacion).
+    formato : str
+        'ndjson', 'csv' o 'arrow' (Arrow IPC stream).
+    comprimir : bool
+        Si la salida se comprime con gzip (de forma incremental).
+
+    Retorno:
+    --------
+    generator
+        Fragmentos de bytes listos para enviar.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato '{formato}' no soportado. Opciones: {', '.join(FORMATOS_EXPORTACION)}.")
+    fragmentos = {'ndjson': _ndjson, 'csv': _csv, 'arrow': _arrow}[formato](lotes)
+    if not comprimir:
+        return fragmentos
+
+    def gzip():
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for fragmento in fragmentos:
+            comprimido = compresor.compress(fragmento)
+            if comprimido:
+                yield comprimido
+        yield compresor.flush()
+
+    return gzip()
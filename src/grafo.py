@@ -0,0 +1,293 @@
+# Representación compacta de los créditos (cast / crew) como grafo bipartito persona <-> película.
+#
+# En lugar de repetir el nombre de la persona en cada fila de data_cast / data_crew se guarda:
+#   - Una tabla de personas interned: hash del nombre normalizado (int64, ordenado) + nombre original
+#     en un arreglo Arrow (offsets + buffer de bytes, sin objetos Python por fila).
+#   - Una tabla de películas: movie_id (int64, ordenado) y su fila en data_movies.
+#   - Por cada relación (cast, crew) dos matrices CSR int32: persona -> películas y película -> personas.
+# Así "todas las películas de X" y "todas las personas de la película Y" son slices de arreglos.
+#
+# Las altas y modificaciones que llegan por la API de ingesta (src/ingesta.py) no reconstruyen las
+# matrices: se guardan en una capa delta (una fila por crédito) que las consultas combinan con ellas.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.etl import normalizar_nombre
+
+
+def _hash_nombres(nombres_norm):
+    """
+    Hash int64 estable de nombres normalizados (vectorizado con pandas).
+    """
+    return pd.util.hash_array(np.asarray(nombres_norm, dtype=object)).view(np.int64)
+
+
+def _csr(origen, destino, n_origen):
+    """
+    Construye la matriz CSR (indptr, indices) de origen -> destino a partir de pares de aristas.
+    Los destinos de cada origen quedan ordenados.
+    """
+    orden = np.lexsort((destino, origen))
+    conteos = np.bincount(origen, minlength=n_origen)
+    indptr = np.zeros(n_origen + 1, dtype=np.int32)
+    np.cumsum(conteos, out=indptr[1:])
+    return indptr, destino[orden].astype(np.int32), orden
+
+
+class Relacion:
+    """
+    Aristas persona <-> película de una tabla de créditos en formato CSR en ambos sentidos.
+    Opcionalmente guarda un código de rol (job) por arista, alineado con cada dirección.
+    """
+
+    def __init__(self, personas, peliculas, n_personas, n_peliculas, roles=None):
+        # Se eliminan aristas duplicadas (misma persona, misma película y mismo rol)
+        claves = [personas, peliculas] + ([roles] if roles is not None else [])
+        unicas = np.unique(np.stack(claves, axis=1), axis=0)
+        personas, peliculas = unicas[:, 0], unicas[:, 1]
+        roles = unicas[:, 2] if roles is not None else None
+
+        self.persona_indptr, self.persona_indices, orden = _csr(personas, peliculas, n_personas)
+        self.pelicula_indptr, self.pelicula_indices, orden_inv = _csr(peliculas, personas, n_peliculas)
+        self.persona_roles = roles[orden].astype(np.int16) if roles is not None else None
+        self.pelicula_roles = roles[orden_inv].astype(np.int16) if roles is not None else None
+
+    def peliculas(self, persona, rol=None):
+        inicio, fin = self.persona_indptr[persona], self.persona_indptr[persona + 1]
+        indices = self.persona_indices[inicio:fin]
+        if rol is not None:
+            indices = indices[self.persona_roles[inicio:fin] == rol]
+        return np.unique(indices)
+
+    def personas(self, pelicula, rol=None):
+        inicio, fin = self.pelicula_indptr[pelicula], self.pelicula_indptr[pelicula + 1]
+        indices = self.pelicula_indices[inicio:fin]
+        if rol is not None:
+            indices = indices[self.pelicula_roles[inicio:fin] == rol]
+        return np.unique(indices)
+
+    def arreglos(self):
+        return {nombre: valor for nombre, valor in vars(self).items() if valor is not None}
+
+    @property
+    def nbytes(self):
+        return sum(arreglo.nbytes for arreglo in self.arreglos().values())
+
+
+class GrafoCreditos:
+    """
+    Grafo de créditos compacto construido a partir de data_movies, data_cast y data_crew.
+
+    Atributos principales:
+      hashes      : int64 ordenado, hash del nombre normalizado de cada persona (id de persona = posición).
+      nombres     : pa.StringArray con el nombre original de cada persona, alineado con hashes.
+      movie_ids   : int64 ordenado, id de cada película (id interno = posición).
+      filas       : int64, fila de cada película en data_movies (-1 si no está). El ETL publica un
+                    movie_id por fila; si df_movies trae repetidos se toma la primera aparición.
+      jobs        : pa.StringArray con el vocabulario de jobs normalizados de crew.
+      cast, crew  : Relacion con las matrices CSR.
+
+    La capa delta (ver actualizar_creditos / actualizar_filas) se crea recién con la primera escritura.
+    """
+
+    def __init__(self, df_cast, df_crew, df_movies):
+        creditos = pd.concat([df_cast[['movie_id', 'name']], df_crew[['movie_id', 'name']]], ignore_index=True)
+        creditos = creditos[creditos['name'].notna()]
+
+        # Tabla de personas: se ordena por hash para poder buscar con np.searchsorted
+        norm = normalizar_nombre(creditos['name'].astype(str))
+        personas = pd.DataFrame({'hash': _hash_nombres(norm), 'name': creditos['name'].to_numpy()})
+        personas = personas.drop_duplicates('hash').sort_values('hash')
+        self.hashes = personas['hash'].to_numpy(dtype=np.int64)
+        self.nombres = pa.array(personas['name'].astype(str).to_numpy(), type=pa.string())
+
+        # Tabla de películas: unión de las películas del catálogo y las que aparecen en créditos
+        self.movie_ids = np.union1d(df_movies['movie_id'].to_numpy(dtype=np.int64),
+                                    creditos['movie_id'].to_numpy(dtype=np.int64))
+        unicos, primeras = np.unique(df_movies['movie_id'].to_numpy(dtype=np.int64), return_index=True)
+        self.filas = np.full(len(self.movie_ids), -1, dtype=np.int64)
+        self.filas[np.searchsorted(self.movie_ids, unicos)] = primeras
+
+        self.cast = self._relacion(df_cast)
+        jobs, codigos = self._codificar_jobs(df_crew)
+        self.jobs = pa.array(jobs, type=pa.string())
+        self.crew = self._relacion(df_crew, codigos)
+
+    def _codificar_jobs(self, df_crew):
+        validos = df_crew['name'].notna().to_numpy()
+        codigos, jobs = pd.factorize(normalizar_nombre(df_crew['job'].fillna('').astype(str))[validos])
+        return jobs.to_numpy(dtype=str), codigos
+
+    def _relacion(self, df, roles=None):
+        validos = df['name'].notna().to_numpy()
+        hashes = _hash_nombres(normalizar_nombre(df['name'][validos].astype(str)))
+        personas = np.searchsorted(self.hashes, hashes)
+        peliculas = np.searchsorted(self.movie_ids, df['movie_id'].to_numpy(dtype=np.int64)[validos])
+        return Relacion(personas, peliculas, len(self.hashes), len(self.movie_ids), roles)
+
+    def buscar_persona(self, nombre):
+        """
+        Retorna el id interno de la persona (sin distinguir mayúsculas) o -1 si no existe.
+        """
+        h = _hash_nombres([normalizar_nombre(nombre)])[0]
+        posicion = np.searchsorted(self.hashes, h)
+        if posicion < len(self.hashes) and self.hashes[posicion] == h:
+            return int(posicion)
+        return -1
+
+    def codigo_job(self, job):
+        """
+        Retorna el código del job (p. ej. 'director') o -1 si no existe en crew.
+        """
+        coincidencias = np.flatnonzero(np.asarray(self.jobs.to_numpy(zero_copy_only=False)) == normalizar_nombre(job))
+        return int(coincidencias[0]) if len(coincidencias) else -1
+
+    def nombre(self, persona):
+        return self.nombres[persona].as_py()
+
+    def peliculas_de(self, nombre, relacion='cast', job=None):
+        """
+        Películas (movie_id) en las que participó la persona en la relación indicada
+        ('cast' o 'crew'), opcionalmente restringidas a un job de crew (p. ej. 'Director').
+        """
+        persona = self.buscar_persona(nombre)
+        rol = self.codigo_job(job) if job is not None else None
+        if persona < 0 or rol == -1:
+            movie_ids = np.empty(0, dtype=np.int64)
+        else:
+            movie_ids = self.movie_ids[getattr(self, relacion).peliculas(persona, rol)]
+        if getattr(self, '_delta', None) is not None:
+            movie_ids = self._combinar_delta(movie_ids, nombre, relacion, job)
+        return movie_ids
+
+    def filas_de(self, nombre, relacion='cast', job=None):
+        """
+        Igual que peliculas_de pero retorna las filas de data_movies (ordenadas), listas para iloc.
+        """
+        if getattr(self, '_delta', None) is not None:
+            filas = self._filas_de_ids(self.peliculas_de(nombre, relacion, job))
+            return np.sort(filas[filas >= 0])
+        persona = self.buscar_persona(nombre)
+        if persona < 0:
+            return np.empty(0, dtype=np.int64)
+        rol = self.codigo_job(job) if job is not None else None
+        if rol == -1:
+            return np.empty(0, dtype=np.int64)
+        filas = self.filas[getattr(self, relacion).peliculas(persona, rol)]
+        return np.sort(filas[filas >= 0])
+
+    def personas_de(self, movie_id, relacion='cast'):
+        """
+        Nombres de las personas de la película movie_id en la relación indicada.
+        """
+        delta = getattr(self, '_delta', None)
+        if delta is not None and movie_id in self._reemplazadas:
+            seleccion = (delta['relacion'] == relacion) & (delta['movie_id'] == movie_id)
+            return delta.loc[seleccion, 'name'].drop_duplicates().tolist()
+        pelicula = np.searchsorted(self.movie_ids, movie_id)
+        if pelicula >= len(self.movie_ids) or self.movie_ids[pelicula] != movie_id:
+            return []
+        personas = getattr(self, relacion).personas(pelicula)
+        return self.nombres.take(pa.array(personas)).to_pylist()
+
+    ########################################################################################################
+    # Capa delta de la API de ingesta
+
+    def _iniciar_delta(self):
+        if getattr(self, '_delta', None) is None:
+            self._delta = pd.DataFrame({'relacion': pd.Series(dtype=object), 'movie_id': pd.Series(dtype=np.int64),
+                                        'hash': pd.Series(dtype=np.int64), 'name': pd.Series(dtype=object),
+                                        'job': pd.Series(dtype=object)})
+            self._reemplazadas = set()
+            self._filas_delta = {}
+
+    def actualizar_creditos(self, df_cast, df_crew):
+        """
+        Reemplaza los créditos (cast y crew completos) de las películas de df_cast / df_crew sin
+        reconstruir las matrices CSR: las aristas base de esas películas dejan de contarse y las
+        nuevas se agregan a la capa delta.
+
+        Parámetros:
+        -----------
+        df_cast, df_crew : pd.DataFrame
+            Créditos con movie_id, name y (en crew) job. Una película que figura solo en uno de los
+            dos queda sin créditos en el otro.
+        """
+        self._iniciar_delta()
+        partes = []
+        for relacion, df in (('cast', df_cast), ('crew', df_crew)):
+            df = df[df['name'].notna()]
+            jobs = normalizar_nombre(df['job'].fillna('').astype(str)) if 'job' in df.columns else None
+            partes.append(pd.DataFrame({
+                'relacion': relacion,
+                'movie_id': df['movie_id'].to_numpy(dtype=np.int64),
+                'hash': _hash_nombres(normalizar_nombre(df['name'].astype(str))),
+                'name': df['name'].astype(str).to_numpy(),
+                'job': jobs.to_numpy() if jobs is not None else None,
+            }))
+        movie_ids = set(np.concatenate([df_cast['movie_id'].to_numpy(dtype=np.int64),
+                                        df_crew['movie_id'].to_numpy(dtype=np.int64)]).tolist())
+        conservar = ~self._delta['movie_id'].isin(movie_ids)
+        self._delta = pd.concat([self._delta[conservar]] + partes, ignore_index=True)
+        self._reemplazadas |= movie_ids
+
+    def actualizar_filas(self, movie_ids, filas):
+        """
+        Registra la fila de data_movies de películas agregadas al catálogo después de construir el grafo.
+        """
+        self._iniciar_delta()
+        self._filas_delta.update(zip(np.asarray(movie_ids, dtype=np.int64).tolist(),
+                                     np.asarray(filas, dtype=np.int64).tolist()))
+
+    def creditos(self, relacion):
+        """
+        DataFrame con movie_id, name (y job normalizado, en crew) de los créditos vigentes de la relación:
+        los de las matrices CSR salvo los de películas reemplazadas, más los de la capa delta.
+        """
+        aristas = getattr(self, relacion)
+        indptr = np.asarray(aristas.pelicula_indptr)
+        df = pd.DataFrame({
+            'movie_id': self.movie_ids[np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))],
+            'name': self.nombres.take(pa.array(np.asarray(aristas.pelicula_indices))).to_numpy(zero_copy_only=False),
+        })
+        if aristas.pelicula_roles is not None:
+            df['job'] = self.jobs.take(pa.array(np.asarray(aristas.pelicula_roles))).to_numpy(zero_copy_only=False)
+        delta = getattr(self, '_delta', None)
+        if delta is not None:
+            df = df[~df['movie_id'].isin(list(self._reemplazadas))]
+            df = pd.concat([df, delta.loc[delta['relacion'] == relacion, df.columns]], ignore_index=True)
+        return df
+
+    def consolidar(self, df_movies):
+        """
+        Grafo nuevo (sin capa delta) con los créditos vigentes y las filas de df_movies, para las
+        estructuras que se precalculan sobre las matrices CSR (colaboraciones, consultas analíticas).
+        """
+        return GrafoCreditos(self.creditos('cast'), self.creditos('crew'), df_movies)
+
+    def _combinar_delta(self, movie_ids, nombre, relacion, job):
+        movie_ids = movie_ids[~np.isin(movie_ids, list(self._reemplazadas))]
+        seleccion = (self._delta['relacion'] == relacion) & \
+                    (self._delta['hash'] == _hash_nombres([normalizar_nombre(nombre)])[0])
+        if job is not None:
+            seleccion &= self._delta['job'] == normalizar_nombre(job)
+        return np.union1d(movie_ids, self._delta.loc[seleccion, 'movie_id'].to_numpy(dtype=np.int64))
+
+    def _filas_de_ids(self, movie_ids):
+        posiciones = np.searchsorted(self.movie_ids, movie_ids)
+        encontradas = posiciones < len(self.movie_ids)
+        encontradas[encontradas] = self.movie_ids[posiciones[encontradas]] == movie_ids[encontradas]
+        filas = np.full(len(movie_ids), -1, dtype=np.int64)
+        filas[encontradas] = np.asarray(self.filas)[posiciones[encontradas]]
+        return np.array([self._filas_delta.get(m, f) for m, f in zip(movie_ids.tolist(), filas.tolist())],
+                        dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        """
+        Memoria total ocupada por el grafo (arreglos NumPy y buffers Arrow), en bytes.
+        """
+        return (self.hashes.nbytes + self.nombres.nbytes + self.movie_ids.nbytes + self.filas.nbytes
+                + self.jobs.nbytes + self.cast.nbytes + self.crew.nbytes)
@@ -0,0 +1,480 @@
+# Ingesta en línea: altas y modificaciones de películas y créditos sin re-ejecutar el ETL.
+#
+# Cada escritura recibida por la API:
+#   1. Se valida y transforma con los mismos pasos del ETL (pipeline.tipar -> etl.convertir_tipos y
+#      etl.validar_estructura_df, pipeline.transformar_movies / pipeline.desanidar_creditos).
+#   2. Se agrega al AlmacenDeltas como un parquet chico e inmutable (<secuencia>-<tabla>.parquet); un
+#      proceso aparte (python -m src.ingesta <directorio>) compacta los deltas con los parquet base
+#      cuando se acumulan UMBRAL_COMPACTACION y, si existe, publica un snapshot nuevo (src/snapshot.py),
+#      sin ocupar el GIL ni la memoria del proceso que atiende la API.
+#   3. Se aplica en memoria sobre el motor pandas: data_movies (títulos y conteos por mes / día), la capa
+#      delta del grafo de créditos, el IndiceIncremental del recomendador, MascarasCatalogo, SeriesDiarias
+#      los conteos de IndiceTexto y los grupos afectados de Rankings.
+#      Nada se reconstruye: las consultas ven los cambios apenas termina el request.
+# Al arrancar, los deltas que todavía no se compactaron se vuelven a aplicar (Ingesta.reproducir).
+# Las colaboraciones (src/colaboraciones.py) no se actualizan en línea: se recalculan al reiniciar.
+
+import os
+import sys
+import hmac
+import json
+import fcntl
+import argparse
+import threading
+import subprocess
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src import etl
+from src.pipeline import desanidar_creditos, tipar, transformar_movies
+from src.recommendation import IndiceIncremental, construir_caracteristicas
+from src.snapshot import construir_snapshot
+
+UMBRAL_COMPACTACION = 8
+# Columnas de data_movies que calcula etl.calcular_columnas_derivadas (no vienen en los registros)
+COLUMNAS_DERIVADAS = ('return', 'release_year', 'release_month', 'release_weekday')
+
+
+def verificar_token(autorizacion):
+    """
+    Verifica el encabezado Authorization ('Bearer <token>') contra la variable de entorno TOKEN_INGESTA.
+    Sin TOKEN_INGESTA configurado las escrituras quedan deshabilitadas.
+    """
+    token = os.environ.get('TOKEN_INGESTA')
+    if not token or not autorizacion:
+        return False
+    return hmac.compare_digest(autorizacion.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
+
+def _registros(registros, diccionario, obligatorios):
+    """
+    DataFrame con las columnas del diccionario de tipos a partir de un registro o una lista de registros.
+    """
+    if isinstance(registros, dict):
+        registros = [registros]
+    if not registros:
+        raise ValueError("No se recibió ningún registro.")
+    df = pd.DataFrame(registros)
+    faltantes = [c for c in obligatorios if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan campos obligatorios: {', '.join(faltantes)}.")
+    return df.reindex(columns=list(dict.fromkeys(list(diccionario) + list(df.columns))))
+
+
+def _validar(df, diccionario):
+    """
+    Aplica pipeline.tipar (sin imprimir: corre dentro de cada request) y lanza ValueError con los
+    id de los registros rechazados.
+    """
+    ids = df['id'].astype(str).tolist()
+    df = df.assign(_registro=np.arange(len(df)))
+    tipado = tipar(df, diccionario, mostrar=False)
+    rechazados = sorted(set(range(len(df))) - set(tipado['_registro']))
+    rechazados += tipado.loc[tipado['id'] <= 0, '_registro'].tolist()
+    if rechazados:
+        raise ValueError(f"Registros con tipos o estructura inválidos (id): {', '.join(ids[i] for i in rechazados)}.")
+    return tipado.drop(columns='_registro')
+
+
+def preparar_movies(registros, actuales=None):
+    """
+    Valida y transforma películas recibidas por la API igual que el ETL.
+
+    Un registro cuyo id ya está en el catálogo es una modificación parcial: los campos que no trae
+    conservan su valor actual (las columnas derivadas se recalculan sobre la fila combinada), así
+    que el delta que se persiste siempre tiene la película completa.
+
+    Parámetros:
+    -----------
+    registros : dict | list
+        Registros con los campos de movies_dataset.csv. Obligatorios: id y, para las altas, title y
+        release_date en formato AAAA-MM-DD. Los campos anidados pueden venir como listas/diccionarios
+        o como texto.
+    actuales : callable, opcional
+        Recibe la lista de movie_id de los registros y retorna las filas vigentes de data_movies de
+        los que ya existen, indexadas por movie_id. Sin él todos los registros se tratan como altas.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Películas con las columnas de data_movies (una por movie_id, la última si se repite).
+        Lanza ValueError si algún registro no es válido.
+    """
+    registros = [registros] if isinstance(registros, dict) else list(registros or [])
+    df = _registros(registros, etl.DICCIONARIO_TIPOS_MOVIES, ['id'])
+    presentes = pd.DataFrame([{campo: True for campo in registro} for registro in registros],
+                             columns=df.columns).notna()
+    ultimos = ~df['id'].astype(str).duplicated(keep='last').to_numpy()
+    df, presentes = df[ultimos].reset_index(drop=True), presentes[ultimos].reset_index(drop=True)
+
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    previas = actuales([int(m) for m in ids.dropna()]) if actuales is not None else pd.DataFrame()
+    existentes = ids.isin(previas.index).to_numpy()
+    # Las modificaciones pueden omitir title y release_date: se completan con los valores vigentes
+    for campo in ('title', 'release_date'):
+        faltantes = existentes & ~presentes[campo].to_numpy()
+        if faltantes.any():
+            valores = previas[campo].reindex(ids[faltantes])
+            df[campo] = df[campo].astype(object)
+            df.loc[faltantes, campo] = (valores.dt.strftime('%Y-%m-%d') if campo == 'release_date' else valores).to_numpy()
+    incompletas = ~existentes & ~(presentes['title'] & presentes['release_date']).to_numpy()
+    if incompletas.any():
+        raise ValueError(f"Faltan campos obligatorios para dar de alta (title, release_date) (id): "
+                         f"{', '.join(df.loc[incompletas, 'id'].astype(str))}.")
+
+    # El formato se valida sobre el texto recibido: _validar convierte la fecha sin formato fijo
+    sin_fecha = df.loc[pd.to_datetime(df['release_date'], errors='coerce', format='%Y-%m-%d').isna(), 'id']
+    if len(sin_fecha):
+        raise ValueError(f"Registros sin fecha de estreno válida (id): {', '.join(map(str, sin_fecha))}.")
+    df = _validar(df, etl.DICCIONARIO_TIPOS_MOVIES)
+    df = transformar_movies(df, mostrar=False)
+
+    if existentes.any():
+        previas = previas.reindex(df['movie_id'])
+        for columna in df.columns:
+            campo = 'id' if columna == 'movie_id' else columna
+            if columna in COLUMNAS_DERIVADAS or columna not in previas.columns:
+                continue
+            faltantes = existentes & ~presentes[campo].to_numpy() if campo in presentes.columns else existentes
+            if faltantes.any():
+                valores = df[columna].to_numpy(dtype=object).copy()
+                valores[faltantes] = previas[columna].to_numpy(dtype=object)[faltantes]
+                df[columna] = pd.Series(valores, index=df.index).infer_objects()
+        df = etl.calcular_columnas_derivadas(df)
+    return df
+
+
+def preparar_creditos(registros):
+    """
+    Valida y separa en cast y crew los créditos recibidos por la API igual que el ETL.
+
+    Parámetros:
+    -----------
+    registros : dict | list
+        Registros con los campos de credits.csv: id (de la película), cast y crew.
+
+    Retorno:
+    --------
+    tuple
+        (df_cast, df_crew, movie_ids): los créditos y las películas cuyos créditos se reemplazan.
+    """
+    df = _validar(_registros(registros, etl.DICCIONARIO_TIPOS_CREDITS, ['id']), etl.DICCIONARIO_TIPOS_CREDITS)
+    df = df.drop_duplicates('id', keep='last').reset_index(drop=True)
+    for columna in ('cast', 'crew'):
+        df[columna] = df[columna].apply(lambda valor: valor if isinstance(valor, list) else [])
+    df_cast, df_crew = desanidar_creditos(df)
+    # Con listas vacías no hay campos que extraer: las columnas que leen el grafo y el almacén deben existir igual
+    df_cast = df_cast.reindex(columns=list(dict.fromkeys([*df_cast.columns, 'name'])))
+    df_crew = df_crew.reindex(columns=list(dict.fromkeys([*df_crew.columns, 'name', 'job'])))
+    return df_cast, df_crew, df['id'].to_numpy(dtype=np.int64)
+
+
+def _aplicar_movies(base, delta):
+    return pd.concat([base[~base['movie_id'].isin(delta['movie_id'])], delta], ignore_index=True)
+
+
+def _aplicar_creditos(base, delta, movie_ids):
+    return pd.concat([base[~base['movie_id'].isin(movie_ids)], delta], ignore_index=True)
+
+
+class AlmacenDeltas:
+    """
+    Almacén de escrituras estructurado como log: cada escritura es un parquet inmutable en
+    <directorio>/deltas con un número de secuencia creciente, y `compactar` las incorpora a
+    data_movies / data_cast / data_crew (reemplazo atómico con os.replace) y borra las ya aplicadas.
+
+      - <secuencia>-movies.parquet   : películas completas; reemplazan a las de igual movie_id.
+      - <secuencia>-creditos.parquet : cast y crew (columna 'relacion') de las películas listadas en
+                                       la metadata 'movie_ids'; reemplazan todos sus créditos.
+
+    Parámetros:
+    -----------
+    directorio : str
+        Carpeta de los parquet procesados.
+    umbral : int
+        Cantidad de deltas a partir de la cual compactar_en_segundo_plano lanza la compactación.
+
+    La compactación se serializa entre procesos con un flock sobre <directorio>/deltas/.compactacion.
+    """
+
+    def __init__(self, directorio, umbral=UMBRAL_COMPACTACION):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, 'deltas')
+        self.umbral = umbral
+        os.makedirs(self.ruta, exist_ok=True)
+        self._escritura = threading.Lock()
+        self._proceso = None
+        pendientes = self.pendientes()
+        self._secuencia = pendientes[-1][0] if pendientes else 0
+
+    def pendientes(self):
+        """
+        Lista ordenada de (secuencia, tabla, ruta) de los deltas todavía no compactados.
+        """
+        deltas = []
+        for archivo in os.listdir(self.ruta):
+            nombre, extension = os.path.splitext(archivo)
+            if extension == '.parquet' and '-' in nombre:
+                secuencia, tabla = nombre.split('-', 1)
+                deltas.append((int(secuencia), tabla, os.path.join(self.ruta, archivo)))
+        return sorted(deltas)
+
+    def _escribir(self, tabla, df, metadata=None):
+        with self._escritura:
+            self._secuencia += 1
+            ruta = os.path.join(self.ruta, f'{self._secuencia:010d}-{tabla}.parquet')
+            arrow = etl.tabla_arrow(df)
+            if metadata:
+                arrow = arrow.replace_schema_metadata({**(arrow.schema.metadata or {}),
+                                                       **{k.encode(): json.dumps(v).encode() for k, v in metadata.items()}})
+            etl.guardar_parquet(arrow, ruta + '.tmp')
+            os.replace(ruta + '.tmp', ruta)
+            return self._secuencia
+
+    def registrar_movies(self, df_movies):
+        return self._escribir('movies', df_movies)
+
+    def registrar_creditos(self, df_cast, df_crew, movie_ids):
+        creditos = pd.concat([df_cast.assign(relacion='cast'), df_crew.assign(relacion='crew')], ignore_index=True)
+        return self._escribir('creditos', creditos, {'movie_ids': [int(m) for m in movie_ids]})
+
+    @staticmethod
+    def leer(ruta):
+        """
+        Lee un delta. Retorna (df, movie_ids); movie_ids es None para los deltas de movies.
+        """
+        metadata = pq.read_schema(ruta).metadata or {}
+        movie_ids = json.loads(metadata[b'movie_ids']) if b'movie_ids' in metadata else None
+        return etl.cargar_parquet(ruta), movie_ids
+
+    @staticmethod
+    def creditos(df, relacion):
+        """
+        Filas de cast o crew de un delta de créditos (sin las columnas que solo tiene la otra relación).
+        """
+        df = df[df['relacion'] == relacion].drop(columns='relacion').dropna(axis=1, how='all')
+        necesarias = ['movie_id', 'name'] + (['job'] if relacion == 'crew' else [])
+        return df.reindex(columns=list(dict.fromkeys(necesarias + list(df.columns)))).reset_index(drop=True)
+
+    def compactar(self):
+        """
+        Incorpora los deltas pendientes a los parquet base y los borra. Si el directorio tiene un
+        snapshot (src/snapshot.py) se publica una versión nueva con los datos compactados. Los deltas
+        que llegan mientras tanto quedan pendientes para la próxima compactación.
+
+        Retorno:
+        --------
+        int
+            Cantidad de deltas compactados.
+        """
+        with open(os.path.join(self.ruta, '.compactacion'), 'w') as candado:
+            fcntl.flock(candado, fcntl.LOCK_EX)
+            pendientes = self.pendientes()
+            if not pendientes:
+                return 0
+            tablas = {tabla: etl.cargar_parquet(os.path.join(self.directorio, f'data_{tabla}.parquet'))
+                      for tabla in ('movies', 'cast', 'crew')}
+            for _, tabla, ruta in pendientes:
+                df, movie_ids = self.leer(ruta)
+                if tabla == 'movies':
+                    tablas['movies'] = _aplicar_movies(tablas['movies'], df)
+                else:
+                    for relacion in ('cast', 'crew'):
+                        tablas[relacion] = _aplicar_creditos(tablas[relacion], self.creditos(df, relacion), movie_ids)
+
+            escritas = {}
+            for tabla, df in tablas.items():
+                ruta = os.path.join(self.directorio, f'data_{tabla}.parquet')
+                escritas[tabla] = etl.guardar_parquet_optimizado(df.drop(columns='name_norm', errors='ignore'),
+                                                                 ruta + '.tmp', tabla)
+            for tabla in tablas:
+                ruta = os.path.join(self.directorio, f'data_{tabla}.parquet')
+                os.replace(ruta + '.tmp', ruta)
+            if os.path.isdir(os.path.join(self.directorio, 'snapshot')):
+                construir_snapshot(escritas['movies'], escritas['cast'], escritas['crew'],
+                                   os.path.join(self.directorio, 'snapshot'))
+            for _, _, ruta in pendientes:
+                os.remove(ruta)
+            return len(pendientes)
+
+    def compactar_en_segundo_plano(self):
+        """
+        Lanza la compactación en un proceso aparte (python -m src.ingesta) si hay al menos `umbral`
+        deltas y no hay otra en curso desde este proceso. Retorna True si la lanzó.
+        """
+        if len(self.pendientes()) < self.umbral or (self._proceso is not None and self._proceso.poll() is None):
+            return False
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self._proceso = subprocess.Popen([sys.executable, '-m', 'src.ingesta', os.path.abspath(self.directorio)],
+                                         cwd=raiz, stdout=subprocess.DEVNULL)
+        return True
+
+
+class Ingesta:
+    """
+    Aplica las escrituras de la API sobre el motor pandas (src/motores.py) y sus índices, y las
+    persiste en un AlmacenDeltas. Las escrituras se serializan con un lock.
+
+    Parámetros:
+    -----------
+    motor : MotorPandas
+        Motor con data_movies y el grafo de créditos en memoria.
+    indice : IndiceExacto | IndiceLSH | IndiceIncremental
+        Índice del recomendador (se envuelve en IndiceIncremental; usar `ingesta.indice` desde ahí).
+    mascaras : MascarasCatalogo
+    series : SeriesDiarias
+    almacen : AlmacenDeltas
+    texto : IndiceTexto, opcional
+        Índice de texto de /palabras_frecuentes (src/texto.py).
+    rankings : Rankings, opcional
+        Top-K precalculados de /ranking (src/rankings.py).
+    derivadas : dict, opcional
+        Estructuras que no se actualizan de forma incremental (colaboraciones, consultas analíticas):
+        nombre -> (estructura vigente, función(data_movies, grafo) que la reconstruye). Después de
+        cada escritura se reconstruyen la primera vez que se piden con `derivada`, sobre el grafo
+        de créditos consolidado (GrafoCreditos.consolidar).
+    """
+
+    def __init__(self, motor, indice, mascaras, series, almacen, texto=None, rankings=None, derivadas=None):
+        if not hasattr(motor, 'data_movies') or not hasattr(motor, 'grafo'):
+            raise ValueError(f"El motor '{motor.nombre}' no admite escrituras; use el motor 'pandas'.")
+        if not isinstance(indice, IndiceIncremental):
+            codificadores = getattr(indice, 'codificadores', None) or construir_caracteristicas(motor.data_movies)[1]
+            indice = IndiceIncremental(indice, codificadores)
+        self.motor, self.indice, self.mascaras, self.series, self.almacen = motor, indice, mascaras, series, almacen
+        self.texto, self.rankings = texto, rankings
+        # movie_id -> fila de data_movies (la primera, igual que las búsquedas por título)
+        ids = motor.data_movies['movie_id'].to_numpy(dtype=np.int64)
+        self._filas = dict(zip(ids[::-1].tolist(), range(len(ids) - 1, -1, -1)))
+        # Catálogo con filas de reserva al final para las altas (ver _escribir_filas)
+        self._reserva = motor.data_movies
+        self._lock = threading.Lock()
+        derivadas = derivadas or {}
+        self._reconstruir = {nombre: funcion for nombre, (_, funcion) in derivadas.items()}
+        self._derivadas = {nombre: estructura for nombre, (estructura, _) in derivadas.items()}
+        self._grafo = motor.grafo
+
+    def derivada(self, nombre):
+        """
+        Estructura derivada `nombre` al día con las escrituras (se reconstruye si hubo alguna desde
+        la última vez que se pidió).
+        """
+        with self._lock:
+            if nombre not in self._derivadas:
+                if self._grafo is None:
+                    self._grafo = self.motor.grafo.consolidar(self.motor.data_movies)
+                self._derivadas[nombre] = self._reconstruir[nombre](self.motor.data_movies, self._grafo)
+            return self._derivadas[nombre]
+
+    def _invalidar(self):
+        self._derivadas.clear()
+        self._grafo = None
+
+    def movies(self, registros):
+        """
+        Agrega o modifica películas (ver preparar_movies).
+
+        Retorno:
+        --------
+        dict
+            insertadas, actualizadas, secuencia del delta y si se lanzó una compactación.
+        """
+        with self._lock:
+            df = preparar_movies(registros, self._actuales)
+            secuencia = self.almacen.registrar_movies(df)
+            insertadas, actualizadas = self._aplicar_movies(df)
+        return {'insertadas': insertadas, 'actualizadas': actualizadas, 'secuencia': secuencia,
+                'compactando': self.almacen.compactar_en_segundo_plano()}
+
+    def _actuales(self, movie_ids):
+        """
+        Filas vigentes de data_movies de los movie_ids que ya están en el catálogo, indexadas por movie_id.
+        """
+        filas = [self._filas[m] for m in movie_ids if m in self._filas]
+        return self.motor.data_movies.iloc[filas].set_index('movie_id', drop=False).rename_axis(None)
+
+    def creditos(self, registros):
+        """
+        Reemplaza los créditos (cast y crew) de películas (ver preparar_creditos).
+
+        Retorno:
+        --------
+        dict
+            peliculas, filas de cast y crew, secuencia del delta y si se lanzó una compactación.
+        """
+        df_cast, df_crew, movie_ids = preparar_creditos(registros)
+        with self._lock:
+            secuencia = self.almacen.registrar_creditos(df_cast, df_crew, movie_ids)
+            self.motor.grafo.actualizar_creditos(df_cast, df_crew)
+            self._invalidar()
+        return {'peliculas': len(movie_ids), 'cast': len(df_cast), 'crew': len(df_crew), 'secuencia': secuencia,
+                'compactando': self.almacen.compactar_en_segundo_plano()}
+
+    def reproducir(self):
+        """
+        Aplica en memoria los deltas que todavía no se compactaron (al arrancar). Retorna cuántos aplicó.
+        """
+        pendientes = self.almacen.pendientes()
+        with self._lock:
+            for _, tabla, ruta in pendientes:
+                df, _ = self.almacen.leer(ruta)
+                if tabla == 'movies':
+                    self._aplicar_movies(df)
+                else:
+                    self.motor.grafo.actualizar_creditos(self.almacen.creditos(df, 'cast'),
+                                                         self.almacen.creditos(df, 'crew'))
+            if pendientes:
+                self._invalidar()
+        return len(pendientes)
+
+    def _escribir_filas(self, filas, df):
+        """
+        Escribe las películas de df en las `filas` del catálogo. Las altas ocupan filas de reserva al
+        final; cuando se acaban, la reserva se duplica, así el catálogo se copia una cantidad
+        logarítmica de veces y no en cada alta. motor.data_movies queda como la vista de las filas vigentes.
+        """
+        n = max(len(self.motor.data_movies), int(filas.max()) + 1)
+        if n > len(self._reserva):
+            extra = max(n, 2 * len(self._reserva)) - len(self._reserva)
+            self._reserva = pd.concat([self._reserva, df.iloc[np.arange(extra) % len(df)]], ignore_index=True)
+        for posicion, columna in enumerate(self._reserva.columns):
+            # Si los valores nuevos no entran en el tipo de la columna (p. ej. NaN en int64) se convierte antes
+            tipo = pd.concat([self._reserva[columna].iloc[:1], df[columna]]).dtype
+            if tipo != self._reserva[columna].dtype:
+                self._reserva[columna] = self._reserva[columna].astype(tipo)
+            self._reserva.iloc[filas, posicion] = df[columna].to_numpy()
+        self.motor.data_movies = self._reserva.iloc[:n]
+
+    def _aplicar_movies(self, df):
+        data = self.motor.data_movies
+        df = df.reindex(columns=data.columns)
+        filas = np.array([self._filas.get(m, -1) for m in df['movie_id'].tolist()], dtype=np.int64)
+        existentes = filas >= 0
+
+        # Modificaciones: se restan antes sus valores de las series; altas: van al final del catálogo
+        if existentes.any():
+            self.series.actualizar(data.iloc[filas[existentes]], signo=-1)
+        altas = df[~existentes]
+        filas[~existentes] = np.arange(len(data), len(data) + len(altas))
+        self._escribir_filas(filas, df)
+        if len(altas):
+            self.motor.grafo.actualizar_filas(altas['movie_id'], filas[~existentes])
+            self._filas.update(zip(altas['movie_id'].tolist(), filas[~existentes].tolist()))
+
+        self.indice.actualizar(filas, df)
+        self.mascaras.actualizar(filas, df)
+        self.series.actualizar(df)
+        if self.texto is not None:
+            self.texto.actualizar(filas, df)
+        if self.rankings is not None:
+            self.rankings.actualizar(filas, df)
+        self._invalidar()
+        return int((~existentes).sum()), int(existentes.sum())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacta los deltas de la API de ingesta con los parquet procesados.")
+    parser.add_argument("directorio", help="Carpeta de los parquet procesados (la que contiene deltas/).")
+    args = parser.parse_args()
+    print(f"{AlmacenDeltas(args.directorio).compactar()} delta(s) compactado(s).")
@@ -0,0 +1,245 @@
+# Motores de consulta intercambiables para los endpoints de la API.
+#
+# Ambos motores exponen los mismos métodos (uno por endpoint) y devuelven exactamente los mismos
+# mensajes, de modo que se pueden comparar latencia y memoria con el mismo benchmark:
+#   - MotorPandas : data_movies en memoria, grafo de créditos CSR y las funciones de src/services.py.
+#   - MotorDuckDB : SQL sobre los parquet procesados con DuckDB embebido (proyección y filtros
+#                   empujados al lector, escaneo multi-hilo); solo trae a memoria las filas del resultado.
+#   - MotorSnapshot : estructuras precalculadas por el ETL (src/snapshot.py) mapeadas en memoria;
+#                   arranque en milisegundos, pensado para levantar muchos workers.
+# El motor se elige con la variable de entorno MOTOR_CONSULTAS ('pandas' por defecto, 'duckdb' o 'snapshot').
+
+import os
+import pandas as pd
+
+from src import services
+from src.etl import cargar_parquet, normalizar_nombre
+from src.grafo import GrafoCreditos
+from src.snapshot import cargar_snapshot
+
+DIRECTORIO_DATOS = 'transformados_processed'
+MOTOR_POR_DEFECTO = 'pandas'
+
+# Columnas que necesitan los mensajes de exito_actor / exito_director
+_COLUMNAS_EXITO = ['movie_id', 'title', 'release_date', 'return', 'budget', 'revenue']
+
+
+class MotorPandas:
+    """
+    Motor de referencia: carga data_movies en memoria y delega en las funciones de src/services.py.
+    data_cast y data_crew se leen una sola vez para construir el grafo de créditos compacto
+    (src/grafo.py) y no se conservan: las consultas por persona son slices de sus matrices CSR.
+    """
+    nombre = 'pandas'
+
+    def __init__(self, directorio=DIRECTORIO_DATOS):
+        self.data_movies = cargar_parquet(os.path.join(directorio, 'data_movies.parquet'))
+        data_cast = cargar_parquet(os.path.join(directorio, 'data_cast.parquet'), columnas=['movie_id', 'name'])
+        data_crew = cargar_parquet(os.path.join(directorio, 'data_crew.parquet'), columnas=['movie_id', 'name', 'job'])
+        self.grafo = GrafoCreditos(data_cast, data_crew, self.data_movies)
+
+    def _creditos(self, nombre, relacion, job=None):
+        """
+        Arma los DataFrames mínimos (créditos y películas de la persona) que esperan
+        services.exito_actor / services.exito_director, a partir del grafo.
+        """
+        movie_ids = self.grafo.peliculas_de(nombre, relacion, job)
+        creditos = pd.DataFrame({'movie_id': movie_ids, 'name': nombre, 'job': job})
+        movies = self.data_movies.iloc[self.grafo.filas_de(nombre, relacion, job)]
+        return creditos, movies
+
+    def cantidad_filmaciones_mes(self, mes):
+        return services.cantidad_filmaciones_mes(mes, self.data_movies)
+
+    def cantidad_filmaciones_dia(self, dia):
+        return services.cantidad_filmaciones_dia(dia, self.data_movies)
+
+    def score_titulo(self, titulo):
+        return services.score_titulo(titulo, self.data_movies)
+
+    def votos_titulo(self, titulo):
+        return services.votos_titulo(titulo, self.data_movies)
+
+    def exito_actor(self, nombre_actor):
+        creditos, movies = self._creditos(nombre_actor, 'cast')
+        return services.exito_actor(nombre_actor, creditos, movies)
+
+    def exito_director(self, nombre_director):
+        creditos, movies = self._creditos(nombre_director, 'crew', 'Director')
+        return services.exito_director(nombre_director, creditos, movies)
+
+
+class MotorDuckDB:
+    """
+    Motor SQL sobre los parquet procesados. Cada tabla se registra como vista, así que cada
+    consulta lee del disco solo las columnas y row groups que necesita; los mensajes se arman
+    con las mismas funciones de src/services.py aplicadas al resultado (pocas filas).
+    """
+    nombre = 'duckdb'
+
+    def __init__(self, directorio=DIRECTORIO_DATOS, hilos=None):
+        try:
+            import duckdb
+        except ImportError as error:
+            raise ImportError("El motor 'duckdb' requiere instalar el paquete duckdb (pip install duckdb).") from error
+
+        self.conexion = duckdb.connect(database=':memory:')
+        if hilos:
+            self.conexion.execute(f"SET threads = {int(hilos)}")
+        for tabla in ('movies', 'cast', 'crew'):
+            ruta = os.path.join(directorio, f'data_{tabla}.parquet').replace("'", "''")
+            self.conexion.execute(f"""CREATE VIEW "{tabla}" AS """
+                                  f"""SELECT * FROM read_parquet('{ruta}', file_row_number = true)""")
+
+        # Los parquet escritos con etl.guardar_parquet_optimizado traen name_norm (ordenada);
+        # si no está se compara contra lower(name), igual que el motor pandas.
+        self._columna_nombre = {}
+        for tabla in ('cast', 'crew'):
+            columnas = set(self.sql(f'DESCRIBE "{tabla}"')['column_name'])
+            self._columna_nombre[tabla] = 'name_norm' if 'name_norm' in columnas else 'lower(name)'
+        columnas_movies = set(self.sql("DESCRIBE movies")['column_name'])
+        self._columna_mes = 'release_month' if 'release_month' in columnas_movies else 'month(release_date)'
+        self._columna_dia = 'release_weekday' if 'release_weekday' in columnas_movies else 'isodow(release_date)'
+
+    def sql(self, consulta, parametros=None):
+        """
+        Ejecuta una consulta SQL arbitraria sobre las vistas movies, "cast" y crew y retorna un DataFrame
+        (cast es palabra reservada en SQL, por eso esa vista se nombra entre comillas).
+        """
+        return self.conexion.execute(consulta, parametros or []).df()
+
+    def _contar(self, condicion, valor):
+        return int(self.conexion.execute(f"SELECT count(*) FROM movies WHERE {condicion} = ?", [valor]).fetchone()[0])
+
+    def cantidad_filmaciones_mes(self, mes):
+        try:
+            mes_num, mes_nombre = services.interpretar_mes(mes)
+        except ValueError as error:
+            return str(error)
+        count = self._contar(self._columna_mes, mes_num)
+        return f"{count} película(s) fueron estrenadas en el mes de {mes_nombre}."
+
+    def cantidad_filmaciones_dia(self, dia):
+        try:
+            dia_num, dia_nombre = services.interpretar_dia(dia)
+        except ValueError as error:
+            return str(error)
+        count = self._contar(self._columna_dia, dia_num)
+        return f"{count} película(s) fueron estrenadas en el día {dia_nombre}."
+
+    def _pelicula(self, titulo, columnas):
+        # Se ordena por posición en el archivo para devolver la misma fila que el motor pandas
+        return self.sql(f"SELECT {', '.join(columnas)} FROM movies WHERE lower(title) = ? "
+                        f"ORDER BY file_row_number LIMIT 1", [titulo.lower()])
+
+    def score_titulo(self, titulo):
+        fila = self._pelicula(titulo, ['title', 'release_date', 'vote_average'])
+        return services.score_titulo(titulo, fila)
+
+    def votos_titulo(self, titulo):
+        fila = self._pelicula(titulo, ['title', 'release_date', 'vote_count', 'vote_average'])
+        return services.votos_titulo(titulo, fila)
+
+    def _exito(self, tabla, nombre, condicion_extra=''):
+        columna = self._columna_nombre[tabla]
+        valor = normalizar_nombre(nombre) if columna == 'name_norm' else nombre.lower()
+        filtro = f'FROM "{tabla}" WHERE {columna} = ? {condicion_extra}'
+        job = 'job' if tabla == 'crew' else 'NULL AS job'
+        creditos = self.sql(f"SELECT movie_id, name, {job} {filtro}", [valor])
+        movies = self.sql(f"SELECT {', '.join(_COLUMNAS_EXITO)} FROM movies "
+                          f"WHERE movie_id IN (SELECT movie_id {filtro}) ORDER BY file_row_number", [valor])
+        return creditos, movies
+
+    def exito_actor(self, nombre_actor):
+        creditos, movies = self._exito('cast', nombre_actor)
+        return services.exito_actor(nombre_actor, creditos, movies)
+
+    def exito_director(self, nombre_director):
+        creditos, movies = self._exito('crew', nombre_director, "AND lower(job) = 'director'")
+        return services.exito_director(nombre_director, creditos, movies)
+
+
+class MotorSnapshot:
+    """
+    Motor sobre el snapshot binario del ETL (src/snapshot.py): los conteos por mes y día salen de
+    histogramas precalculados, los títulos de un índice de hashes y las personas del grafo de
+    créditos; solo las filas del resultado se convierten a pandas para armar los mensajes.
+    """
+    nombre = 'snapshot'
+
+    def __init__(self, directorio=DIRECTORIO_DATOS, verificar=False):
+        self.snapshot = cargar_snapshot(os.path.join(directorio, 'snapshot'), verificar=verificar)
+        self.grafo = self.snapshot.grafo
+
+    def cantidad_filmaciones_mes(self, mes):
+        try:
+            mes_num, mes_nombre = services.interpretar_mes(mes)
+        except ValueError as error:
+            return str(error)
+        count = int(self.snapshot.histograma_mes[mes_num])
+        return f"{count} película(s) fueron estrenadas en el mes de {mes_nombre}."
+
+    def cantidad_filmaciones_dia(self, dia):
+        try:
+            dia_num, dia_nombre = services.interpretar_dia(dia)
+        except ValueError as error:
+            return str(error)
+        count = int(self.snapshot.histograma_dia[dia_num])
+        return f"{count} película(s) fueron estrenadas en el día {dia_nombre}."
+
+    def _pelicula(self, titulo, columnas):
+        fila = self.snapshot.fila_titulo(titulo)
+        return self.snapshot.filas_movies([fila] if fila >= 0 else [], columnas)
+
+    def score_titulo(self, titulo):
+        fila = self._pelicula(titulo, ['title', 'release_date', 'vote_average'])
+        return services.score_titulo(titulo, fila)
+
+    def votos_titulo(self, titulo):
+        fila = self._pelicula(titulo, ['title', 'release_date', 'vote_count', 'vote_average'])
+        return services.votos_titulo(titulo, fila)
+
+    def _creditos(self, nombre, relacion, job=None):
+        movie_ids = self.grafo.peliculas_de(nombre, relacion, job)
+        creditos = pd.DataFrame({'movie_id': movie_ids, 'name': nombre, 'job': job})
+        movies = self.snapshot.filas_movies(self.grafo.filas_de(nombre, relacion, job), _COLUMNAS_EXITO)
+        return creditos, movies
+
+    def exito_actor(self, nombre_actor):
+        creditos, movies = self._creditos(nombre_actor, 'cast')
+        return services.exito_actor(nombre_actor, creditos, movies)
+
+    def exito_director(self, nombre_director):
+        creditos, movies = self._creditos(nombre_director, 'crew', 'Director')
+        return services.exito_director(nombre_director, creditos, movies)
+
+
+MOTORES = {
+    'pandas': MotorPandas,
+    'duckdb': MotorDuckDB,
+    'snapshot': MotorSnapshot,
+}
+
+
+def crear_motor(nombre=None, directorio=DIRECTORIO_DATOS, **opciones):
+    """
+    Crea el motor de consultas configurado.
+
+    Parámetros:
+    -----------
+    nombre : str, opcional
+        'pandas', 'duckdb' o 'snapshot'. Si no se indica se usa la variable de entorno MOTOR_CONSULTAS
+        y, en su defecto, MOTOR_POR_DEFECTO.
+    directorio : str
+        Carpeta con data_movies.parquet, data_cast.parquet y data_crew.parquet.
+    **opciones :
+        Argumentos adicionales del motor (por ejemplo hilos=4 para duckdb).
+
+    Retorno:
+    --------
+    MotorPandas | MotorDuckDB | MotorSnapshot
+    """
+    nombre = (nombre or os.environ.get('MOTOR_CONSULTAS', MOTOR_POR_DEFECTO)).lower()
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor de consultas '{nombre}' no soportado. Opciones: {', '.join(MOTORES)}.")
+    return MOTORES[nombre](directorio, **opciones)
@@ -0,0 +1,384 @@
+# Pipeline del ETL como grafo de etapas con caché por contenido.
+#
+# Cada etapa declara sus entradas y salidas por nombre. La clave de una etapa es el hash de:
+#   - el código fuente de su función (y de las funciones de src/etl.py o los módulos que usa),
+#   - sus parámetros,
+#   - las huellas de sus entradas (contenido de los archivos crudos o clave de la etapa que las produjo).
+# Las salidas se guardan como parquet en el directorio de caché con la clave en el nombre; si al volver
+# a ejecutar la clave no cambió, la etapa se salta y sus salidas se leen del caché solo si alguna
+# etapa posterior las necesita.
+#
+# Uso: python -m src.pipeline --crudos crudos_raw --destino transformados_processed
+
+import os
+import json
+import time
+import hashlib
+import inspect
+import argparse
+import pandas as pd
+import pyarrow as pa
+
+from src import aproximado, codificacion, colaboraciones, etl, grafo, rankings, recommendation, series, services, \
+    snapshot, texto
+from src.snapshot import construir_snapshot, indice_configurado
+
+DIRECTORIO_CACHE = '.cache_etl'
+
+# Columnas que el ETL descarta de movies_dataset.csv (ver etl_notebook)
+COLUMNAS_DESCARTADAS = ['video', 'imdb_id', 'adult', 'original_title', 'poster_path', 'homepage']
+# Módulos cuyas estructuras serializa construir_snapshot: cualquier cambio en ellos invalida la etapa 'snapshot'
+MODULOS_SNAPSHOT = [snapshot, grafo, colaboraciones, series, texto, rankings, aproximado, recommendation,
+                    codificacion, services]
+# Orden final de data_movies
+COLUMNAS_MOVIES = ['movie_id', 'title', 'tagline', 'release_date', 'release_year', 'runtime', 'budget', 'revenue',
+                   'genres', 'production_companies', 'production_countries', 'spoken_languages',
+                   'original_language', 'overview', 'popularity', 'vote_average', 'vote_count',
+                   'belongs_to_collection', 'status', 'return', 'release_month', 'release_weekday']
+
+
+def _hash_texto(*partes):
+    sha = hashlib.sha256()
+    for parte in partes:
+        sha.update(parte.encode('utf-8'))
+        sha.update(b'\0')
+    return sha.hexdigest()[:16]
+
+
+def _hash_archivo(ruta, bloque=2**20):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for datos in iter(lambda: archivo.read(bloque), b''):
+            sha.update(datos)
+    return sha.hexdigest()[:16]
+
+
+def _tabla_cache(df):
+    # Una salida en caché debe leerse tal como la etapa la retornó: los campos anidados que todavía
+    # son texto (cast/crew/genres de los CSV crudos) se guardan como string y no como list<struct>
+    texto = [c for c in df.columns if c in etl.TIPOS_ANIDADOS
+             and pd.api.types.infer_dtype(df[c], skipna=True) in ('string', 'empty')]
+    tabla = etl.tabla_arrow(df.drop(columns=texto))
+    for columna in texto:
+        tabla = tabla.add_column(df.columns.get_loc(columna), columna,
+                                 pa.array(df[columna], type=pa.string(), from_pandas=True))
+    return tabla
+
+
+class Etapa:
+    """
+    Etapa del pipeline.
+
+    Parámetros:
+    -----------
+    nombre : str
+        Nombre único de la etapa.
+    funcion : callable
+        Recibe las entradas en el orden declarado (DataFrames, o la ruta si la entrada es un archivo
+        crudo) más los parámetros como argumentos con nombre, y retorna un DataFrame o una tupla de
+        DataFrames alineada con `salidas`.
+    entradas : list
+        Nombres de artefactos (salidas de otras etapas o fuentes del pipeline).
+    salidas : list
+        Nombres de los artefactos que produce. Una etapa sin salidas es terminal (publica archivos):
+        su función debe retornar la lista de rutas escritas.
+    parametros : dict, opcional
+        Parámetros de la función; forman parte de la clave.
+    dependencias : list, opcional
+        Funciones, clases o módulos auxiliares cuyo código también forma parte de la clave.
+    """
+
+    def __init__(self, nombre, funcion, entradas, salidas, parametros=None, dependencias=()):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = list(entradas)
+        self.salidas = list(salidas)
+        self.parametros = parametros or {}
+        self.dependencias = list(dependencias)
+
+    def huella_codigo(self):
+        return _hash_texto(*(inspect.getsource(f) for f in [self.funcion] + self.dependencias))
+
+    def clave(self, huellas_entradas):
+        parametros = json.dumps(self.parametros, sort_keys=True, default=str)
+        return _hash_texto(self.nombre, self.huella_codigo(), parametros,
+                           *(huellas_entradas[e] for e in self.entradas))
+
+
+class Pipeline:
+    """
+    Ejecuta una lista de Etapa en orden topológico con caché por contenido.
+
+    Parámetros:
+    -----------
+    etapas : list
+        Etapas del pipeline (en cualquier orden).
+    fuentes : dict
+        Nombre de artefacto -> ruta de un archivo crudo (se identifica por el hash de su contenido).
+    cache : str
+        Directorio donde se guardan las salidas de cada etapa.
+    """
+
+    def __init__(self, etapas, fuentes, cache=DIRECTORIO_CACHE):
+        self.etapas = self._ordenar(etapas, fuentes)
+        self.fuentes = fuentes
+        self.cache = cache
+
+    @staticmethod
+    def _ordenar(etapas, fuentes):
+        productor = {salida: etapa for etapa in etapas for salida in etapa.salidas}
+        ordenadas, visitadas = [], set()
+
+        def visitar(etapa, camino):
+            if etapa.nombre in visitadas:
+                return
+            if etapa.nombre in camino:
+                raise ValueError(f"Ciclo en el pipeline: {' -> '.join(camino + [etapa.nombre])}")
+            for entrada in etapa.entradas:
+                if entrada in productor:
+                    visitar(productor[entrada], camino + [etapa.nombre])
+                elif entrada not in fuentes:
+                    raise ValueError(f"La entrada '{entrada}' de la etapa '{etapa.nombre}' no la produce ninguna etapa.")
+            visitadas.add(etapa.nombre)
+            ordenadas.append(etapa)
+
+        for etapa in etapas:
+            visitar(etapa, [])
+        return ordenadas
+
+    def _ruta(self, etapa, clave, salida):
+        return os.path.join(self.cache, etapa.nombre, f'{salida}-{clave}.parquet')
+
+    def _ruta_marca(self, etapa, clave):
+        return os.path.join(self.cache, etapa.nombre, f'{clave}.json')
+
+    def _huella_fuente(self, ruta):
+        # El hash del archivo crudo se recuerda por (tamaño, mtime) para no releerlo en cada corrida
+        estado = os.stat(ruta)
+        indice = os.path.join(self.cache, 'fuentes.json')
+        conocidas = {}
+        if os.path.exists(indice):
+            with open(indice, encoding='utf-8') as archivo:
+                conocidas = json.load(archivo)
+        firma = f'{os.path.abspath(ruta)}:{estado.st_size}:{estado.st_mtime_ns}'
+        if firma not in conocidas:
+            conocidas[firma] = _hash_archivo(ruta)
+            with open(indice, 'w', encoding='utf-8') as archivo:
+                json.dump(conocidas, archivo)
+        return conocidas[firma]
+
+    def _en_cache(self, etapa, clave):
+        if not etapa.salidas:
+            marca = self._ruta_marca(etapa, clave)
+            if not os.path.exists(marca):
+                return False
+            with open(marca, encoding='utf-8') as archivo:
+                return all(os.path.exists(ruta) for ruta in json.load(archivo)['archivos'])
+        return all(os.path.exists(self._ruta(etapa, clave, salida)) for salida in etapa.salidas)
+
+    def ejecutar(self, hasta=None, forzar=()):
+        """
+        Ejecuta el pipeline saltando las etapas cuya clave ya está en el caché.
+
+        Parámetros:
+        -----------
+        hasta : str, opcional
+            Nombre de la última etapa a ejecutar (solo se ejecutan ella y sus dependencias).
+        forzar : iterable
+            Nombres de etapas a ejecutar aunque estén en caché ('*' fuerza todas).
+
+        Retorno:
+        --------
+        pd.DataFrame
+            Una fila por etapa con su estado ('ejecutada' o 'cache'), segundos y clave.
+        """
+        os.makedirs(self.cache, exist_ok=True)
+        etapas = self.etapas
+        if hasta is not None:
+            necesarias = self._dependencias(hasta)
+            etapas = [etapa for etapa in etapas if etapa.nombre in necesarias]
+
+        huellas = {nombre: self._huella_fuente(ruta) for nombre, ruta in self.fuentes.items()}
+        valores = dict(self.fuentes)
+        rutas = {}
+        reporte = []
+        for etapa in etapas:
+            inicio = time.perf_counter()
+            clave = etapa.clave(huellas)
+            en_cache = self._en_cache(etapa, clave) and '*' not in forzar and etapa.nombre not in forzar
+            if not en_cache:
+                argumentos = [self._valor(entrada, valores, rutas) for entrada in etapa.entradas]
+                resultado = etapa.funcion(*argumentos, **etapa.parametros)
+                self._guardar(etapa, clave, resultado, valores)
+            for salida in etapa.salidas:
+                huellas[salida] = _hash_texto(clave, salida)
+                rutas[salida] = self._ruta(etapa, clave, salida)
+            reporte.append({'etapa': etapa.nombre, 'estado': 'cache' if en_cache else 'ejecutada',
+                            'segundos': round(time.perf_counter() - inicio, 3), 'clave': clave})
+        return pd.DataFrame(reporte)
+
+    def _dependencias(self, nombre):
+        productor = {salida: etapa for etapa in self.etapas for salida in etapa.salidas}
+        por_nombre = {etapa.nombre: etapa for etapa in self.etapas}
+        if nombre not in por_nombre:
+            raise ValueError(f"Etapa '{nombre}' no existe. Opciones: {', '.join(por_nombre)}.")
+        necesarias, pendientes = set(), [por_nombre[nombre]]
+        while pendientes:
+            etapa = pendientes.pop()
+            necesarias.add(etapa.nombre)
+            pendientes += [productor[e] for e in etapa.entradas if e in productor]
+        return necesarias
+
+    @staticmethod
+    def _valor(entrada, valores, rutas):
+        # Las salidas de etapas en caché se leen del parquet solo cuando alguien las pide
+        if entrada not in valores:
+            valores[entrada] = etl.cargar_parquet(rutas[entrada])
+        return valores[entrada]
+
+    def _guardar(self, etapa, clave, resultado, valores):
+        os.makedirs(os.path.join(self.cache, etapa.nombre), exist_ok=True)
+        if not etapa.salidas:
+            with open(self._ruta_marca(etapa, clave), 'w', encoding='utf-8') as archivo:
+                json.dump({'archivos': list(resultado)}, archivo)
+            return
+        if len(etapa.salidas) == 1:
+            resultado = (resultado,)
+        for salida, df in zip(etapa.salidas, resultado):
+            etl.guardar_parquet(_tabla_cache(df), self._ruta(etapa, clave, salida))
+            valores[salida] = df
+
+
+############################################################################################################
+# Etapas del ETL de movies_dataset.csv y credits.csv (mismos pasos que notebooks/etl_notebook.ipynb)
+
+def leer_csv(ruta):
+    return pd.read_csv(ruta, low_memory=False)
+
+
+def tipar(df, diccionario, mostrar=True):
+    """
+    Convierte los tipos según el diccionario y descarta las filas cuya estructura no coincide.
+    Con mostrar=False no se imprime el resumen de la validación.
+    """
+    df = etl.convertir_tipos(df, diccionario)
+    return df.drop(etl.validar_estructura_df(df, diccionario, mostrar)).reset_index(drop=True)
+
+
+def transformar_movies(df, mostrar=True):
+    """
+    Fecha de estreno como datetime (se descartan las nulas), columnas no usadas fuera,
+    movie_id como primera columna y columnas derivadas (return, release_year/month/weekday).
+    movies_dataset.csv trae algunas películas repetidas: se conserva la primera aparición de
+    cada movie_id, de modo que movie_id identifica una única fila de data_movies.
+    Con mostrar=False no se imprime la advertencia de fechas inválidas.
+    """
+    df = etl.formato_fecha(df, 'release_date', mostrar)
+    df = df.dropna(subset=['release_date'])
+    df = df.drop(columns=COLUMNAS_DESCARTADAS, errors='ignore').rename(columns={'id': 'movie_id'})
+    df = df.drop_duplicates('movie_id').reset_index(drop=True)
+    df = etl.calcular_columnas_derivadas(df)
+    return df.reindex(columns=COLUMNAS_MOVIES)
+
+
+def desanidar_creditos(df):
+    """
+    Separa credits en data_cast y data_crew extrayendo los campos de los diccionarios de cada columna.
+    """
+    df = df.rename(columns={'id': 'movie_id'})
+    tablas = []
+    for columna in ('cast', 'crew'):
+        campos = sorted(etl.obtener_campos_json(df, columna))
+        tabla = etl.extraer_campos_json(df, columna, campos)
+        tablas.append(tabla[['movie_id'] + [c for c in tabla.columns if c != 'movie_id']])
+    return tuple(tablas)
+
+
+def publicar(df_movies, df_cast, df_crew, destino, filas_por_grupo=etl.FILAS_POR_GRUPO):
+    """
+    Escribe los parquet que consume la API con el layout de etl.guardar_parquet_optimizado.
+    """
+    os.makedirs(destino, exist_ok=True)
+    rutas = []
+    for tabla, df in (('movies', df_movies), ('cast', df_cast), ('crew', df_crew)):
+        rutas.append(os.path.join(destino, f'data_{tabla}.parquet'))
+        etl.guardar_parquet_optimizado(df, rutas[-1], tabla, filas_por_grupo)
+    return rutas
+
+
+def publicar_snapshot(df_movies, df_cast, df_crew, directorio, orden, lsh=False):
+    """
+    Genera el snapshot binario que cargan los workers de la API (ver src/snapshot.py), con las
+    películas en el mismo orden en que publicar las escribe en data_movies.parquet.
+    """
+    df_movies = df_movies.sort_values(orden, kind='stable', na_position='last')
+    ruta = construir_snapshot(df_movies, df_cast, df_crew, directorio, lsh)
+    return [os.path.join(ruta, 'manifest.json')]
+
+
+def pipeline_etl(crudos='crudos_raw', destino='transformados_processed', cache=DIRECTORIO_CACHE,
+                 filas_por_grupo=etl.FILAS_POR_GRUPO, indice=None):
+    """
+    Arma el pipeline completo desde los CSV crudos hasta los parquet procesados.
+
+    Parámetros:
+    -----------
+    crudos : str
+        Carpeta con movies_dataset.csv y credits.csv.
+    destino : str
+        Carpeta donde se publican data_movies, data_cast, data_crew y el snapshot de la API.
+    cache : str
+        Directorio de caché de las etapas.
+    filas_por_grupo : int
+        Tamaño de row group de los parquet publicados.
+    indice : str, opcional
+        Índice del recomendador que usará la API ('exacto' o 'lsh'; por defecto INDICE_RECOMENDACION):
+        con 'lsh' el snapshot incluye el IndiceLSH. Es parámetro de la etapa, así que cambiarlo la invalida.
+
+    Retorno:
+    --------
+    Pipeline
+    """
+    fuentes = {'movies_csv': os.path.join(crudos, 'movies_dataset.csv'),
+               'credits_csv': os.path.join(crudos, 'credits.csv')}
+    etapas = [
+        Etapa('leer_movies', leer_csv, ['movies_csv'], ['movies_crudo']),
+        Etapa('leer_credits', leer_csv, ['credits_csv'], ['credits_crudo']),
+        Etapa('tipar_movies', tipar, ['movies_crudo'], ['movies_tipado'],
+              {'diccionario': etl.DICCIONARIO_TIPOS_MOVIES},
+              [etl.convertir_tipos, etl.convertir_a_estructura, etl.validar_estructura_df, etl.validar_tipo]),
+        Etapa('tipar_credits', tipar, ['credits_crudo'], ['credits_tipado'],
+              {'diccionario': etl.DICCIONARIO_TIPOS_CREDITS},
+              [etl.convertir_tipos, etl.convertir_a_estructura, etl.validar_estructura_df, etl.validar_tipo]),
+        Etapa('transformar_movies', transformar_movies, ['movies_tipado'], ['movies'],
+              dependencias=[etl.formato_fecha, etl.calcular_columnas_derivadas]),
+        Etapa('desanidar_creditos', desanidar_creditos, ['credits_tipado'], ['cast', 'crew'],
+              dependencias=[etl.obtener_campos_json, etl.extraer_campos_json, etl.extraer_campo]),
+        Etapa('publicar', publicar, ['movies', 'cast', 'crew'], [],
+              {'destino': destino, 'filas_por_grupo': filas_por_grupo},
+              [etl.guardar_parquet_optimizado, etl.guardar_parquet, etl._rutas_hoja, etl.tabla_arrow,
+               etl.a_arrow_anidado, etl.normalizar_nombre]),
+        Etapa('snapshot', publicar_snapshot, ['movies', 'cast', 'crew'], [],
+              {'directorio': os.path.join(destino, 'snapshot'), 'orden': etl.LAYOUT_PARQUET['movies']['orden'],
+               'lsh': indice_configurado(indice) == 'lsh'},
+              MODULOS_SNAPSHOT + [etl.tabla_arrow, etl.a_arrow_anidado, etl.normalizar_nombre]),
+    ]
+    return Pipeline(etapas, fuentes, cache)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ejecuta el ETL por etapas reutilizando las salidas en caché.")
+    parser.add_argument('--crudos', default='crudos_raw')
+    parser.add_argument('--destino', default='transformados_processed')
+    parser.add_argument('--cache', default=DIRECTORIO_CACHE)
+    parser.add_argument('--hasta', default=None, help="Ejecuta solo hasta esta etapa (y sus dependencias).")
+    parser.add_argument('--forzar', nargs='*', default=[], help="Etapas a ejecutar aunque estén en caché ('*' = todas).")
+    parser.add_argument('--indice', choices=['exacto', 'lsh'], default=None,
+                        help="Índice del recomendador del snapshot (por defecto INDICE_RECOMENDACION).")
+    args = parser.parse_args()
+
+    pd.set_option('display.width', 1000)
+    reporte = pipeline_etl(args.crudos, args.destino, args.cache, indice=args.indice).ejecutar(args.hasta, args.forzar)
+    print(reporte.to_string(index=False))
+    print(f"\n{(reporte['estado'] == 'ejecutada').sum()} etapa(s) ejecutada(s), "
+          f"{(reporte['estado'] == 'cache').sum()} en caché, {reporte['segundos'].sum():.2f} s en total.")
@@ -0,0 +1,361 @@
+# Rankings (top-N) de películas por año, mes y género con los top-K precalculados al cargar.
+#
+# Las películas se agrupan una sola vez por año de estreno, mes de estreno y género (un grupo por valor,
+# más el grupo 'todos') y de cada grupo se guarda, por métrica (return, vote_average, popularity,
+# revenue) y por umbral de votos (todas y las que tienen al menos services.VOTOS_MINIMOS), el top-K
+# ordenado, calculado con argpartition. "Top 10 por retorno de 1995" o "mejor puntuadas de Drama con
+# al menos 2000 votos" es entonces un slice de un arreglo, sin sort_values del catálogo por request.
+# Las combinaciones que no están precalculadas (año y género a la vez, otro mínimo de votos, top > K)
+# se resuelven con argpartition sobre los miembros del grupo más chico.
+# Las películas de la API de ingesta se incorporan con `actualizar`, que mueve solo esas filas entre
+# los grupos y corrige los top afectados partiendo del top anterior. El snapshot (ETL o compactación)
+# se construye siempre desde su catálogo, sin depender de la versión previa.
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.codificacion import _aplanar
+from src.services import VOTOS_MINIMOS, interpretar_mes
+from src.texto import _reemplazar_filas
+
+# Métrica -> columna de data_movies
+METRICAS_RANKING = {
+    'retorno': 'return',
+    'puntaje': 'vote_average',
+    'popularidad': 'popularity',
+    'recaudacion': 'revenue',
+}
+DIMENSIONES_RANKING = ('todos', 'anio', 'mes', 'genero')
+TOP_PRECALCULADO = 100
+UMBRALES_VOTOS = (0, VOTOS_MINIMOS)
+
+
+def _top(filas, valores, k):
+    """
+    Filas (de `filas`) con los k valores finitos más altos, en orden descendente (desempate por fila).
+    """
+    filas = filas[np.isfinite(valores[filas])]
+    if len(filas) > k:
+        candidatos = valores[filas]
+        umbral = candidatos[np.argpartition(-candidatos, k - 1)[k - 1]]
+        filas = filas[candidatos >= umbral]
+    return filas[np.lexsort((filas, -valores[filas]))][:k]
+
+
+def _agrupar(codigos):
+    """
+    (claves, indptr, filas) de los grupos de un arreglo de códigos: las filas del grupo claves[i]
+    son filas[indptr[i]:indptr[i + 1]], en orden creciente.
+    """
+    claves, inversos = np.unique(codigos, return_inverse=True)
+    filas = np.argsort(inversos, kind='stable')
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(inversos, minlength=len(claves)))])
+    return claves.astype(np.int64), indptr, filas
+
+
+def _contiene(grupo, filas):
+    """
+    Máscara de las `filas` que están en `grupo` (ordenado), con búsqueda binaria.
+    """
+    posiciones = np.minimum(np.searchsorted(grupo, filas), max(len(grupo) - 1, 0))
+    return (grupo[posiciones] == filas) if len(grupo) else np.zeros(len(filas), dtype=bool)
+
+
+def _partir(claves, indptr, filas):
+    return {int(clave): filas[indptr[i]:indptr[i + 1]] for i, clave in enumerate(claves)}
+
+
+def _unir(grupos):
+    claves = np.array(sorted(grupos), dtype=np.int64)
+    largos = [len(grupos[int(clave)]) for clave in claves]
+    filas = np.concatenate([grupos[int(clave)] for clave in claves]) if len(claves) else np.empty(0, dtype=np.int64)
+    return claves, np.concatenate([[0], np.cumsum(largos)]).astype(np.int64), filas.astype(np.int64)
+
+
+class Rankings:
+    """
+    Top-K precalculados por grupo (año, mes, género y todo el catálogo), métrica y umbral de votos.
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame
+        Catálogo con return, vote_average, popularity, revenue, vote_count, release_year /
+        release_month (o release_date) y genres.
+    k : int
+        Largo de cada top precalculado.
+    umbrales_votos : tuple
+        Mínimos de vote_count con top precalculado.
+    """
+
+    def __init__(self, df_movies, k=TOP_PRECALCULADO, umbrales_votos=UMBRALES_VOTOS):
+        self.k, self.umbrales_votos = k, tuple(umbrales_votos)
+        self.valores = {metrica: np.empty(0, dtype=np.float64) for metrica in METRICAS_RANKING}
+        self.votos = np.empty(0, dtype=np.float64)
+        self.anios, self.meses = np.empty(0, dtype=np.int16), np.empty(0, dtype=np.int8)
+        self.generos, self._posicion_genero = np.empty(0, dtype=object), {}
+        self.pertenencia = sp.csr_matrix((0, 0), dtype=np.int8)
+        self._asignar(np.arange(len(df_movies)), df_movies)
+        self.miembros = {dimension: _partir(*self._grupos(dimension)) for dimension in DIMENSIONES_RANKING}
+        self.tops = {(dimension, metrica, umbral): {clave: self._calcular(filas, metrica, umbral)
+                                                   for clave, filas in self.miembros[dimension].items()}
+                     for dimension in DIMENSIONES_RANKING for metrica in METRICAS_RANKING
+                     for umbral in self.umbrales_votos}
+
+    def _asignar(self, filas, df_movies):
+        """
+        Escribe las columnas de df_movies en las `filas` de los arreglos (extendiéndolos si son altas).
+        """
+        n = max(len(self.votos), int(filas.max()) + 1 if len(filas) else 0)
+
+        def extender(arreglo):
+            # (los arreglos mapeados desde el snapshot son de solo lectura: se copian la primera vez)
+            if len(arreglo) == n and arreglo.flags.writeable:
+                return arreglo
+            return np.concatenate([arreglo, np.zeros(n - len(arreglo), dtype=arreglo.dtype)])
+
+        for metrica, columna in METRICAS_RANKING.items():
+            self.valores[metrica] = extender(self.valores[metrica])
+            self.valores[metrica][filas] = pd.to_numeric(df_movies[columna], errors='coerce').to_numpy(dtype=np.float64)
+        self.votos = extender(self.votos)
+        self.votos[filas] = pd.to_numeric(df_movies['vote_count'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        fechas = pd.to_datetime(df_movies['release_date'], errors='coerce') if 'release_date' in df_movies.columns else None
+        anios = df_movies['release_year'] if 'release_year' in df_movies.columns else fechas.dt.year
+        meses = df_movies['release_month'] if 'release_month' in df_movies.columns else fechas.dt.month
+        self.anios, self.meses = extender(self.anios), extender(self.meses)
+        self.anios[filas] = pd.to_numeric(anios, errors='coerce').fillna(0).to_numpy(dtype=np.int16)
+        self.meses[filas] = pd.to_numeric(meses, errors='coerce').fillna(0).to_numpy(dtype=np.int8)
+
+        # Géneros: los nuevos se agregan al final; las filas asignadas se reemplazan
+        etiquetas = _aplanar(df_movies['genres'], 'name') if 'genres' in df_movies.columns else pd.Series([], dtype=object)
+        for genero in etiquetas.drop_duplicates():
+            if genero.lower() not in self._posicion_genero:
+                self._posicion_genero[genero.lower()] = len(self.generos)
+                self.generos = np.append(self.generos, np.array([genero], dtype=object))
+        columnas = etiquetas.str.lower().map(self._posicion_genero).to_numpy(dtype=np.int64)
+        nuevas = sp.csr_matrix((np.ones(len(columnas), dtype=np.int8), (etiquetas.index.to_numpy(), columnas)),
+                               shape=(len(filas), len(self.generos)))
+        nuevas.sum_duplicates()
+        nuevas.data[:] = 1
+        self.pertenencia = _reemplazar_filas(self.pertenencia, filas, nuevas, n)
+
+    def _grupos(self, dimension):
+        """
+        (claves, indptr, filas) de los grupos de una dimensión.
+        """
+        if dimension == 'todos':
+            return np.zeros(1, dtype=np.int64), np.array([0, len(self.votos)]), np.arange(len(self.votos))
+        if dimension == 'genero':
+            transpuesta = self.pertenencia.T.tocsr()
+            transpuesta.sort_indices()
+            return np.arange(len(self.generos), dtype=np.int64), transpuesta.indptr, transpuesta.indices.astype(np.int64)
+        return _agrupar(self.anios if dimension == 'anio' else self.meses)
+
+    def _calcular(self, filas, metrica, umbral):
+        if umbral:
+            filas = filas[self.votos[filas] >= umbral]
+        return _top(filas, self.valores[metrica], self.k)
+
+    def actualizar(self, filas, df_movies):
+        """
+        Actualiza las películas de df_movies, que ocupan las `filas` del catálogo (las posteriores al
+        final son altas): solo esas filas cambian de grupo y los top afectados se corrigen a partir
+        del top anterior (ver _corregir_top).
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        existentes = filas[filas < len(self.votos)]
+        viejas = self._pares(existentes)
+        valores_viejos = {metrica: dict(zip(existentes.tolist(), self.valores[metrica][existentes].tolist()))
+                          for metrica in METRICAS_RANKING}
+        self._asignar(filas, df_movies)
+
+        def limite(dimension, metrica, umbral, clave, top):
+            fila = int(top[-1])
+            return valores_viejos[metrica].get(fila, self.valores[metrica][fila]), fila
+        self._mover(np.unique(filas), viejas, self._pares(filas), limite)
+
+    def _pares(self, filas):
+        """
+        (filas, claves) de la pertenencia de las filas (que existen) a los grupos de cada dimensión.
+        """
+        pertenencia = self.pertenencia[filas]
+        return {
+            'todos': (filas, np.zeros(len(filas), dtype=np.int64)),
+            'anio': (filas, self.anios[filas].astype(np.int64)),
+            'mes': (filas, self.meses[filas].astype(np.int64)),
+            'genero': (np.repeat(filas, np.diff(pertenencia.indptr)), pertenencia.indices.astype(np.int64)),
+        }
+
+    def _mover(self, tocadas, viejas, nuevas, limite):
+        """
+        Saca las filas `tocadas` (ordenadas) de los grupos donde estaban (`viejas`), las agrega a los
+        grupos donde quedan (`nuevas`) y corrige los top de esos grupos.
+        """
+        vacio = np.empty(0, dtype=np.int64)
+        for dimension in DIMENSIONES_RANKING:
+            miembros = self.miembros[dimension]
+            (_, claves_viejas), (filas_nuevas, claves_nuevas) = viejas[dimension], nuevas[dimension]
+            afectadas = np.union1d(claves_viejas, claves_nuevas).tolist()
+            for clave in afectadas:
+                if dimension == 'todos':
+                    miembros[clave] = np.arange(len(self.votos), dtype=np.int64)
+                    continue
+                grupo = miembros.get(clave, vacio)
+                grupo = np.union1d(grupo[~_contiene(tocadas, grupo)], filas_nuevas[claves_nuevas == clave])
+                if len(grupo) or dimension == 'genero':
+                    miembros[clave] = grupo
+                else:
+                    miembros.pop(clave, None)
+            for metrica in METRICAS_RANKING:
+                for umbral in self.umbrales_votos:
+                    tops = self.tops[(dimension, metrica, umbral)]
+                    for clave in afectadas:
+                        if clave not in miembros:
+                            tops.pop(clave, None)
+                            continue
+                        actual = tops.get(clave, vacio)
+                        cota = limite(dimension, metrica, umbral, clave, actual) if len(actual) else None
+                        tops[clave] = self._corregir_top(actual, cota, miembros[clave], tocadas, metrica, umbral)
+
+    def _corregir_top(self, actual, cota, miembros, tocadas, metrica, umbral):
+        """
+        Top de un grupo después de modificar las filas `tocadas`, sin recorrer el grupo: los candidatos
+        son el top anterior sin las tocadas más las tocadas que siguen en el grupo. Si el top anterior
+        estaba completo, las demás películas del grupo quedaban por debajo de su último elemento
+        (`cota`: valor y fila que tenía); solo si el top nuevo no se mantiene por encima de esa cota
+        se recalcula sobre todos los miembros.
+        """
+        candidatos = np.union1d(actual[~_contiene(tocadas, actual)], tocadas[_contiene(miembros, tocadas)])
+        nuevo = self._calcular(candidatos, metrica, umbral)
+        if len(actual) < self.k:
+            return nuevo
+        valor, fila = cota
+        ultimo = self.valores[metrica][nuevo[-1]] if len(nuevo) else -np.inf
+        if len(nuevo) == self.k and (ultimo > valor or (ultimo == valor and nuevo[-1] <= fila)):
+            return nuevo
+        return self._calcular(miembros, metrica, umbral)
+
+    def top(self, metrica, top=10, anio=None, genero=None, mes=None, votos_min=None):
+        """
+        Filas y valores de las `top` películas con mayor `metrica` entre las que cumplen los filtros.
+
+        Parámetros:
+        -----------
+        metrica : str
+            'retorno', 'puntaje', 'popularidad' o 'recaudacion' (o la columna: return, vote_average, ...).
+        top : int
+            Cantidad de películas (positiva).
+        anio : int, opcional
+            Año de estreno.
+        genero : str, opcional
+            Nombre del género (sin distinguir mayúsculas).
+        mes : str | int, opcional
+            Mes de estreno, como nombre o número (igual que /cantidad_filmaciones_mes).
+        votos_min : int, opcional
+            Mínimo de vote_count.
+
+        Retorno:
+        --------
+        tuple
+            (np.ndarray de filas del catálogo, np.ndarray de valores). Lanza ValueError si la métrica,
+            el género, el mes o top no son válidos.
+        """
+        columnas = {columna: metrica for metrica, columna in METRICAS_RANKING.items()}
+        metrica = columnas.get(metrica, metrica)
+        if metrica not in METRICAS_RANKING:
+            raise ValueError(f"La métrica '{metrica}' no es válida. Opciones: {', '.join(METRICAS_RANKING)}.")
+        if int(top) < 1:
+            raise ValueError(f"top debe ser un entero positivo (se recibió {top}).")
+        filtros = []
+        if anio is not None:
+            filtros.append(('anio', int(anio)))
+        if mes is not None:
+            filtros.append(('mes', interpretar_mes(mes)[0]))
+        if genero is not None:
+            if genero.lower() not in self._posicion_genero:
+                raise ValueError(f"El género '{genero}' no existe en el catálogo.")
+            filtros.append(('genero', self._posicion_genero[genero.lower()]))
+        top, umbral = int(top), votos_min or 0
+
+        vacio = np.empty(0, dtype=np.int64)
+        if len(filtros) <= 1 and umbral in self.umbrales_votos and top <= self.k:
+            dimension, clave = filtros[0] if filtros else ('todos', 0)
+            filas = self.tops[(dimension, metrica, umbral)].get(clave, vacio)[:top]
+        else:
+            # Sin top precalculado: se parte de los miembros del grupo más chico y se filtra el resto
+            grupos = [(dimension, self.miembros[dimension].get(clave, vacio)) for dimension, clave in filtros] \
+                or [('todos', self.miembros['todos'][0])]
+            candidatos = min(grupos, key=lambda grupo: len(grupo[1]))[1]
+            for dimension, clave in filtros:
+                if dimension == 'anio':
+                    candidatos = candidatos[self.anios[candidatos] == clave]
+                elif dimension == 'mes':
+                    candidatos = candidatos[self.meses[candidatos] == clave]
+                else:
+                    candidatos = np.intersect1d(candidatos, self.miembros['genero'].get(clave, vacio))
+            if umbral:
+                candidatos = candidatos[self.votos[candidatos] >= umbral]
+            filas = _top(candidatos, self.valores[metrica], top)
+        return filas, self.valores[metrica][filas]
+
+    def arreglos(self):
+        """
+        Arreglos NumPy de la estructura (para persistirla en el snapshot).
+        """
+        arreglos = {f'valores_{metrica}': valores for metrica, valores in self.valores.items()}
+        arreglos.update({'votos': self.votos, 'anios': self.anios, 'meses': self.meses,
+                         'generos': self.generos.astype(str), 'parametros': np.array([self.k, *self.umbrales_votos]),
+                         'pertenencia_indptr': self.pertenencia.indptr, 'pertenencia_indices': self.pertenencia.indices})
+        for dimension, grupos in self.miembros.items():
+            for sufijo, arreglo in zip(('claves', 'indptr', 'filas'), _unir(grupos)):
+                arreglos[f'grupo_{dimension}_{sufijo}'] = arreglo
+        for (dimension, metrica, umbral), grupos in self.tops.items():
+            for sufijo, arreglo in zip(('claves', 'indptr', 'filas'), _unir(grupos)):
+                arreglos[f'top_{dimension}_{metrica}_{umbral}_{sufijo}'] = arreglo
+        return arreglos
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        """
+        Reconstruye la estructura a partir de `arreglos()` (p. ej. mapeados en memoria desde el snapshot).
+        """
+        rankings = cls.__new__(cls)
+        rankings.k, rankings.umbrales_votos = int(arreglos['parametros'][0]), tuple(int(u) for u in arreglos['parametros'][1:])
+        rankings.valores = {metrica: arreglos[f'valores_{metrica}'] for metrica in METRICAS_RANKING}
+        rankings.votos, rankings.anios, rankings.meses = arreglos['votos'], arreglos['anios'], arreglos['meses']
+        rankings.generos = np.asarray(arreglos['generos'], dtype=object)
+        rankings._posicion_genero = {str(g).lower(): i for i, g in enumerate(rankings.generos)}
+        indices = arreglos['pertenencia_indices']
+        rankings.pertenencia = sp.csr_matrix((np.ones(len(indices), dtype=np.int8), indices, arreglos['pertenencia_indptr']),
+                                             shape=(len(rankings.votos), len(rankings.generos)))
+        grupo = lambda prefijo: _partir(*(arreglos[f'{prefijo}_{sufijo}'] for sufijo in ('claves', 'indptr', 'filas')))
+        rankings.miembros = {dimension: grupo(f'grupo_{dimension}') for dimension in DIMENSIONES_RANKING}
+        rankings.tops = {(dimension, metrica, umbral): grupo(f'top_{dimension}_{metrica}_{umbral}')
+                         for dimension in DIMENSIONES_RANKING for metrica in METRICAS_RANKING
+                         for umbral in rankings.umbrales_votos}
+        return rankings
+
+
+def ranking(df_movies, rankings, metrica, top=10, **filtros):
+    """
+    Ranking de películas por una métrica, con los filtros de Rankings.top (anio, genero, mes, votos_min).
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame | snapshot.TitulosSnapshot
+        Catálogo con el que se construyó `rankings` (mismas filas, al menos la columna title), o los
+        títulos del snapshot.
+    rankings : Rankings
+    metrica : str
+        Ver Rankings.top.
+
+    Retorno:
+    --------
+    list
+        Lista de diccionarios {posicion, titulo, anio, votos, valor}.
+    """
+    filas, valores = rankings.top(metrica, top, **filtros)
+    titulos = df_movies.tomar(filas) if hasattr(df_movies, 'tomar') else df_movies['title'].iloc[filas].tolist()
+    return [{'posicion': posicion, 'titulo': titulo, 'anio': int(rankings.anios[fila]),
+             'votos': int(rankings.votos[fila]), 'valor': round(float(valor), 4)}
+            for posicion, (fila, titulo, valor) in enumerate(zip(filas, titulos, valores), start=1)]
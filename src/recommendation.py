@@ -0,0 +1,528 @@
+# Sistema de recomendación: películas similares por similitud del coseno sobre vectores de características.
+#
+# Las características se arman con los codificadores multi-etiqueta dispersos (src/codificacion.py),
+# las columnas numéricas transformadas y el TF-IDF de título y resumen (src/texto.py).
+# La búsqueda de los k vecinos más cercanos tiene dos implementaciones intercambiables:
+#   - IndiceExacto : producto disperso contra todo el catálogo (en bloques para consultas en lote).
+#   - IndiceLSH    : hiperplanos aleatorios (random-hyperplane LSH) con varias tablas; solo se
+#                    re-ordena exactamente el conjunto de candidatos. Se persiste en .npy y se carga
+#                    con memory-map, sin reconstruirlo al arrancar la API.
+# Las películas que llegan por la API de ingesta (src/ingesta.py) se incorporan con IndiceIncremental,
+# que envuelve a cualquiera de los dos sin reconstruirlo.
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pyarrow as pa
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from src.codificacion import COLUMNAS_NUMERICAS, CodificadorMultietiqueta, TransformadorNumerico
+from src.etl import tabla_arrow
+from src.texto import CAMPOS_TEXTO, IndiceTexto
+from src.services import VOTOS_MINIMOS
+
+# Peso de cada campo anidado en el vector de la película
+PESOS_CARACTERISTICAS = {
+    'genres': 1.0,
+    'production_companies': 0.5,
+    'production_countries': 0.25,
+    'spoken_languages': 0.25,
+}
+MIN_FRECUENCIA = {'production_companies': 2}
+# Peso del bloque de columnas numéricas (codificacion.TransformadorNumerico)
+PESO_NUMERICAS = 0.5
+# Peso del bloque TF-IDF de título y resumen (texto.IndiceTexto)
+PESO_TEXTO = 0.5
+DIRECTORIO_INDICE_LSH = os.path.join('transformados_processed', 'indice_lsh')
+
+
+def construir_caracteristicas(df_movies, codificadores=None, pesos=PESOS_CARACTERISTICAS,
+                              peso_numericas=PESO_NUMERICAS, peso_texto=PESO_TEXTO):
+    """
+    Construye la matriz de características (CSR float32, filas normalizadas L2) del catálogo.
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame
+        Catálogo con los campos anidados ya parseados.
+    codificadores : dict, opcional
+        Codificadores ya ajustados por campo (p. ej. cargados de disco), con el TransformadorNumerico
+        en la llave 'numericas' y el IndiceTexto en 'texto'. Si no se pasan se ajustan.
+    pesos : dict
+        Peso de cada campo en el vector final.
+    peso_numericas : float
+        Peso del bloque de columnas numéricas (0 lo omite).
+    peso_texto : float
+        Peso del bloque TF-IDF de texto (0 lo omite).
+
+    Retorno:
+    --------
+    tuple
+        (scipy.sparse.csr_matrix, dict campo -> CodificadorMultietiqueta / TransformadorNumerico / IndiceTexto)
+    """
+    codificadores = dict(codificadores or {})
+    bloques = []
+    for campo, peso in pesos.items():
+        if campo not in df_movies.columns:
+            continue
+        if campo not in codificadores:
+            codificadores[campo] = CodificadorMultietiqueta(min_frecuencia=MIN_FRECUENCIA.get(campo, 1))
+            codificadores[campo].ajustar(df_movies[campo])
+        bloque = codificadores[campo].transformar(df_movies[campo])
+        # Un vocabulario vacío (p. ej. ninguna productora con MIN_FRECUENCIA apariciones) no aporta columnas
+        if bloque.shape[1]:
+            bloques.append(normalize(bloque) * peso)
+    if peso_numericas:
+        if 'numericas' not in codificadores:
+            codificadores['numericas'] = TransformadorNumerico().ajustar(df_movies)
+        bloques.append(sp.csr_matrix(normalize(codificadores['numericas'].transformar(df_movies))) * peso_numericas)
+    if peso_texto and all(campo in df_movies.columns for campo in CAMPOS_TEXTO):
+        if 'texto' not in codificadores:
+            # Al ajustarlo ya quedan los conteos del catálogo: el TF-IDF sale de ahí sin volver a tokenizar
+            codificadores['texto'] = IndiceTexto().ajustar(df_movies)
+            bloques.append(codificadores['texto'].matriz * peso_texto)
+        else:
+            bloques.append(codificadores['texto'].transformar(df_movies) * peso_texto)
+    bloques = [bloque for bloque in bloques if bloque.shape[1]]
+    if not bloques:
+        raise ValueError("No hay características para construir la matriz del recomendador.")
+    matriz = normalize(sp.hstack(bloques, format='csr')).astype(np.float32)
+    return matriz, codificadores
+
+
+def huella_caracteristicas(df_movies, pesos=PESOS_CARACTERISTICAS, peso_numericas=PESO_NUMERICAS,
+                           peso_texto=PESO_TEXTO):
+    """
+    Hash (sha256 abreviado) de las columnas del catálogo de las que salen las características y de
+    los pesos: si no cambia, la matriz de construir_caracteristicas tampoco. Las columnas se
+    serializan en Arrow IPC, que es mucho más rápido que volver a construir la matriz.
+    """
+    columnas = [c for c in dict.fromkeys(['movie_id'] + list(pesos) + list(COLUMNAS_NUMERICAS) + list(CAMPOS_TEXTO))
+                if c in df_movies.columns]
+    tabla = tabla_arrow(df_movies[columnas].reset_index(drop=True))
+    salida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    sha = hashlib.sha256(salida.getvalue())
+    sha.update(json.dumps([pesos, peso_numericas, peso_texto], sort_keys=True).encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+def guardar_codificadores(codificadores, directorio):
+    """
+    Persiste los codificadores de construir_caracteristicas: un JSON por campo anidado,
+    numericas.json (TransformadorNumerico) y texto/*.npy (IndiceTexto.arreglos).
+    """
+    os.makedirs(os.path.join(directorio, 'texto'), exist_ok=True)
+    for campo, codificador in codificadores.items():
+        if campo == 'texto':
+            for nombre, arreglo in codificador.arreglos().items():
+                np.save(os.path.join(directorio, 'texto', f'{nombre}.npy'), np.ascontiguousarray(arreglo))
+        else:
+            codificador.guardar(os.path.join(directorio, f'{campo}.json'))
+
+
+def cargar_codificadores(directorio):
+    """
+    Carga los codificadores guardados con guardar_codificadores (sin volver a ajustarlos).
+    """
+    codificadores = {}
+    for nombre in sorted(os.listdir(directorio)):
+        if nombre == 'numericas.json':
+            codificadores['numericas'] = TransformadorNumerico.cargar(os.path.join(directorio, nombre))
+        elif nombre.endswith('.json'):
+            codificadores[nombre[:-5]] = CodificadorMultietiqueta.cargar(os.path.join(directorio, nombre))
+    carpeta = os.path.join(directorio, 'texto')
+    if os.listdir(carpeta):
+        # Sin memory-map: la API de ingesta actualiza los conteos del índice de texto
+        codificadores['texto'] = IndiceTexto.desde_arreglos(
+            {n[:-4]: np.load(os.path.join(carpeta, n)) for n in os.listdir(carpeta)})
+    return codificadores
+
+
+def _top_k(puntajes, k, excluir=None):
+    """
+    Índices de los k puntajes más altos (orden descendente) usando argpartition.
+    """
+    if excluir is not None:
+        puntajes[excluir] = -np.inf
+    k = min(k, len(puntajes))
+    candidatos = np.argpartition(-puntajes, k - 1)[:k]
+    return candidatos[np.argsort(-puntajes[candidatos], kind='stable')]
+
+
+class IndiceExacto:
+    """
+    Búsqueda exacta de vecinos por similitud del coseno (las filas ya vienen normalizadas).
+    """
+
+    def __init__(self, matriz):
+        self.matriz = matriz.tocsr()
+        self._transpuesta = self.matriz.T.tocsr()
+
+    def buscar(self, fila, k=5, mascara=None):
+        """
+        Retorna (índices, similitudes) de las k películas más similares a `fila` (excluyéndola).
+        Si se pasa `mascara` (arreglo booleano del catálogo) solo se consideran sus películas.
+        """
+        return self.buscar_vector(self.matriz[fila], k, mascara, excluir=fila)
+
+    def buscar_vector(self, vector, k=5, mascara=None, excluir=None):
+        """
+        Igual que buscar, a partir de un vector de características (1 x d) que no tiene por qué
+        estar en el índice; `excluir` es una fila a dejar fuera del resultado.
+        """
+        puntajes = np.asarray((vector @ self._transpuesta).todense()).ravel()
+        if mascara is not None:
+            puntajes[~mascara] = -np.inf
+        indices = _top_k(puntajes, k, excluir=excluir)
+        indices = indices[np.isfinite(puntajes[indices])]
+        return indices, puntajes[indices]
+
+    def buscar_lote(self, filas, k=5, bloque=1024):
+        """
+        Top-k exacto para muchas filas, procesando la matriz de similitudes por bloques
+        para acotar la memoria (bloque x n en lugar de n x n).
+        """
+        resultados = np.empty((len(filas), k), dtype=np.int64)
+        for inicio in range(0, len(filas), bloque):
+            lote = np.asarray(filas[inicio:inicio + bloque])
+            puntajes = (self.matriz[lote] @ self._transpuesta).toarray()
+            puntajes[np.arange(len(lote)), lote] = -np.inf
+            candidatos = np.argpartition(-puntajes, k - 1, axis=1)[:, :k]
+            orden = np.argsort(-np.take_along_axis(puntajes, candidatos, axis=1), axis=1, kind='stable')
+            resultados[inicio:inicio + len(lote)] = np.take_along_axis(candidatos, orden, axis=1)
+        return resultados
+
+
+class IndiceLSH:
+    """
+    Índice aproximado por hiperplanos aleatorios (random-hyperplane LSH).
+
+    Cada una de las `tablas` asigna a cada película una firma de `bits` bits (signo de la proyección
+    sobre hiperplanos aleatorios). En la consulta se toman como candidatas las películas que comparten
+    firma en alguna tabla (y, con `sondas` > 0, las que difieren en uno de los primeros bits), y se
+    re-ordenan con la similitud exacta.
+
+    Parámetros de ajuste (recall vs. latencia):
+      - bits   : más bits -> buckets más chicos -> menos candidatos (más rápido, menos recall).
+      - tablas : más tablas -> más candidatos (más recall, más memoria y latencia).
+      - sondas : bits vecinos a sondear por tabla (multi-probe), aumenta el recall sin más memoria.
+      - max_candidatos : tope de candidatos por bucket, para acotar la latencia en buckets grandes.
+    """
+
+    def __init__(self, matriz, bits=16, tablas=8, sondas=0, max_candidatos=2000, semilla=42):
+        if bits > 63:
+            raise ValueError("IndiceLSH admite como máximo 63 bits por tabla.")
+        self.matriz = matriz.tocsr()
+        self.bits, self.tablas, self.sondas, self.max_candidatos = bits, tablas, sondas, max_candidatos
+        rng = np.random.default_rng(semilla)
+        self.hiperplanos = rng.standard_normal((matriz.shape[1], bits * tablas)).astype(np.float32)
+
+        firmas = self._firmas(self.matriz)
+        # Por tabla (una fila contigua por tabla): películas ordenadas por firma, para resolver
+        # cada bucket con searchsorted
+        self.orden = np.argsort(firmas.T, axis=1, kind='stable').astype(np.int32)
+        self.firmas_ordenadas = np.take_along_axis(firmas.T, self.orden, axis=1)
+
+    def _firmas(self, vectores):
+        """
+        Firma int64 por (fila, tabla) a partir del signo de las proyecciones.
+        """
+        proyeccion = np.asarray(vectores @ self.hiperplanos) > 0
+        proyeccion = proyeccion.reshape(proyeccion.shape[0], self.tablas, self.bits)
+        potencias = (1 << np.arange(self.bits, dtype=np.int64))
+        return (proyeccion * potencias).sum(axis=2).astype(np.int64)
+
+    def candidatos(self, vector):
+        firmas = self._firmas(vector)[0]
+        grupos = []
+        for tabla, firma in enumerate(firmas):
+            sondeadas = [firma] + [firma ^ (1 << b) for b in range(min(self.sondas, self.bits))]
+            columna = self.firmas_ordenadas[tabla]
+            for valor in sondeadas:
+                inicio = np.searchsorted(columna, valor, side='left')
+                fin = min(np.searchsorted(columna, valor, side='right'), inicio + self.max_candidatos)
+                grupos.append(self.orden[tabla, inicio:fin])
+        return np.unique(np.concatenate(grupos)) if grupos else np.empty(0, dtype=np.int32)
+
+    def buscar(self, fila, k=5, mascara=None):
+        """
+        Retorna (índices, similitudes) aproximados de las k películas más similares a `fila`.
+
+        Con `mascara` los candidatos se filtran antes de re-ordenar; si en los buckets no quedan
+        al menos k candidatos válidos se recurre a la búsqueda exacta restringida a la máscara,
+        de modo que siempre se devuelven k resultados cuando existen.
+        """
+        return self.buscar_vector(self.matriz[fila], k, mascara, excluir=fila)
+
+    def buscar_vector(self, vector, k=5, mascara=None, excluir=None):
+        """
+        Igual que buscar, a partir de un vector de características (1 x d).
+        """
+        candidatos = self.candidatos(vector)
+        candidatos = candidatos[candidatos != excluir]
+        if mascara is not None:
+            candidatos = candidatos[mascara[candidatos]]
+            if len(candidatos) < k:
+                candidatos = np.flatnonzero(mascara)
+                candidatos = candidatos[candidatos != excluir]
+        puntajes = np.asarray((self.matriz[candidatos] @ vector.T).todense()).ravel()
+        orden = _top_k(puntajes, k) if len(candidatos) else np.empty(0, dtype=np.int64)
+        return candidatos[orden].astype(np.int64), puntajes[orden]
+
+    def guardar(self, directorio, huella=None):
+        """
+        Persiste el índice (matriz de características incluida) como archivos .npy y un JSON de parámetros.
+        `huella` (ver huella_caracteristicas) identifica el catálogo con el que se construyó.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        arreglos = {'hiperplanos': self.hiperplanos, 'orden': self.orden, 'firmas_ordenadas': self.firmas_ordenadas,
+                    'data': self.matriz.data, 'indices': self.matriz.indices, 'indptr': self.matriz.indptr}
+        for nombre, arreglo in arreglos.items():
+            np.save(os.path.join(directorio, f'{nombre}.npy'), arreglo)
+        with open(os.path.join(directorio, 'parametros.json'), 'w') as archivo:
+            json.dump({'bits': self.bits, 'tablas': self.tablas, 'sondas': self.sondas,
+                       'max_candidatos': self.max_candidatos, 'forma': list(self.matriz.shape),
+                       'huella': huella}, archivo)
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        """
+        Carga un índice guardado con `guardar`. Con mmap=True los arreglos se mapean en memoria
+        (np.load(mmap_mode='r')), así el arranque no copia ni reconstruye nada.
+        """
+        with open(os.path.join(directorio, 'parametros.json')) as archivo:
+            parametros = json.load(archivo)
+        modo = 'r' if mmap else None
+        cargar = lambda nombre: np.load(os.path.join(directorio, f'{nombre}.npy'), mmap_mode=modo)
+
+        indice = cls.__new__(cls)
+        indice.bits, indice.tablas = parametros['bits'], parametros['tablas']
+        indice.sondas, indice.max_candidatos = parametros['sondas'], parametros['max_candidatos']
+        indice.huella = parametros.get('huella')
+        indice.hiperplanos = cargar('hiperplanos')
+        indice.orden = cargar('orden')
+        indice.firmas_ordenadas = cargar('firmas_ordenadas')
+        indice.matriz = sp.csr_matrix((cargar('data'), cargar('indices'), cargar('indptr')),
+                                      shape=tuple(parametros['forma']), copy=False)
+        return indice
+
+
+class IndiceIncremental:
+    """
+    Índice de recomendación con altas y modificaciones en línea (API de ingesta, src/ingesta.py).
+
+    Envuelve un IndiceExacto o IndiceLSH sin modificarlo: los vectores de las películas nuevas o
+    modificadas se guardan en una matriz delta chica y cada búsqueda combina el top-k del índice
+    base (sin las filas reemplazadas) con la similitud exacta contra la delta. Los vectores se arman
+    con los codificadores con los que se construyó el índice, así que las etiquetas que no estaban
+    en su vocabulario no cuentan hasta reconstruirlo.
+
+    Parámetros:
+    -----------
+    indice : IndiceExacto | IndiceLSH
+        Índice base del catálogo.
+    codificadores : dict
+        Codificadores por campo con los que se construyó su matriz (ver construir_caracteristicas).
+    """
+
+    def __init__(self, indice, codificadores):
+        self.base = indice
+        self.codificadores = codificadores
+        self.n_base = indice.matriz.shape[0]
+        self.delta = sp.csr_matrix((0, indice.matriz.shape[1]), dtype=np.float32)
+        self.filas_delta = np.empty(0, dtype=np.int64)
+        self._reemplazadas = np.zeros(self.n_base, dtype=bool)
+        self._posiciones = {}
+
+    def actualizar(self, filas, df_movies):
+        """
+        Registra los vectores de las películas de df_movies, que ocupan las `filas` del catálogo
+        (una fila del índice base se reemplaza; una fila nueva es un alta).
+        """
+        vectores, _ = construir_caracteristicas(df_movies, self.codificadores)
+        filas = np.asarray(filas, dtype=np.int64)
+        conservar = ~np.isin(self.filas_delta, filas)
+        self.delta = sp.vstack([self.delta[conservar], vectores], format='csr')
+        self.filas_delta = np.concatenate([self.filas_delta[conservar], filas])
+        self._reemplazadas[filas[filas < self.n_base]] = True
+        self._posiciones = {fila: i for i, fila in enumerate(self.filas_delta.tolist())}
+
+    def buscar(self, fila, k=5, mascara=None):
+        """
+        Retorna (índices, similitudes) de las k películas más similares a `fila` (excluyéndola),
+        igual que el índice base pero sobre el catálogo actualizado.
+        """
+        posicion = self._posiciones.get(fila)
+        vector = self.delta[posicion] if posicion is not None else self.base.matriz[fila]
+        excluir = fila if fila < self.n_base else None
+        if mascara is not None:
+            indices, puntajes = self.base.buscar_vector(vector, k, mascara[:self.n_base] & ~self._reemplazadas,
+                                                        excluir)
+        else:
+            # Se piden de más para compensar las filas reemplazadas que se descartan
+            indices, puntajes = self.base.buscar_vector(vector, k + int(self._reemplazadas.sum()), None, excluir)
+            vigentes = ~self._reemplazadas[indices]
+            indices, puntajes = indices[vigentes], puntajes[vigentes]
+
+        validas = self.filas_delta != fila
+        if mascara is not None:
+            validas &= mascara[self.filas_delta]
+        puntajes_delta = np.asarray((self.delta[validas] @ vector.T).todense()).ravel()
+        indices = np.concatenate([indices, self.filas_delta[validas]])
+        puntajes = np.concatenate([puntajes, puntajes_delta])
+        orden = _top_k(puntajes, k) if len(indices) else np.empty(0, dtype=np.int64)
+        return indices[orden], puntajes[orden]
+
+
+def crear_indice(matriz, tipo='exacto', **parametros):
+    """
+    Crea el índice de vecinos: 'exacto' (IndiceExacto) o 'lsh' (IndiceLSH con sus parámetros).
+    """
+    if tipo == 'exacto':
+        return IndiceExacto(matriz)
+    if tipo == 'lsh':
+        return IndiceLSH(matriz, **parametros)
+    raise ValueError(f"Tipo de índice '{tipo}' no soportado. Opciones: exacto, lsh.")
+
+
+def cargar_indice(df_movies, tipo=None, directorio=DIRECTORIO_INDICE_LSH):
+    """
+    Obtiene el índice de recomendación para la API. El tipo se toma de la variable de entorno
+    INDICE_RECOMENDACION ('exacto' por defecto o 'lsh'). El índice LSH se carga con memory-map
+    desde `directorio` junto con sus codificadores si fue construido sobre este mismo catálogo (misma
+    cantidad de filas y misma huella_caracteristicas, p. ej. no cambió con una compactación de la
+    API de ingesta); si no, se construye y se guarda ahí.
+    """
+    tipo = (tipo or os.environ.get('INDICE_RECOMENDACION', 'exacto')).lower()
+    huella = huella_caracteristicas(df_movies) if tipo == 'lsh' else None
+    if tipo == 'lsh' and os.path.exists(os.path.join(directorio, 'parametros.json')) \
+            and os.path.isdir(os.path.join(directorio, 'codificadores')):
+        indice = IndiceLSH.cargar(directorio)
+        if indice.matriz.shape[0] == len(df_movies) and indice.huella == huella:
+            indice.codificadores = cargar_codificadores(os.path.join(directorio, 'codificadores'))
+            return indice
+    matriz, codificadores = construir_caracteristicas(df_movies)
+    indice = crear_indice(matriz, tipo)
+    # Se conservan para vectorizar las películas que lleguen por la API de ingesta
+    indice.codificadores = codificadores
+    if tipo == 'lsh':
+        shutil.rmtree(directorio, ignore_errors=True)
+        indice.guardar(directorio, huella)
+        guardar_codificadores(codificadores, os.path.join(directorio, 'codificadores'))
+    return indice
+
+
+class MascarasCatalogo:
+    """
+    Máscaras booleanas del catálogo para filtrar recomendaciones (año de estreno, idioma original
+    y cantidad de votos). Las columnas se guardan como arreglos NumPy compactos, las máscaras por
+    idioma y la de votos mínimos (services.VOTOS_MINIMOS) se precalculan, y cada combinación de
+    filtros consultada queda en caché, así que un filtro repetido no recorre el catálogo.
+    """
+
+    def __init__(self, df_movies, tamano_cache=256):
+        self.anios = self._anios(df_movies)
+        self.votos = df_movies['vote_count'].fillna(0).to_numpy(dtype=np.float32)
+        codigos, idiomas = pd.factorize(df_movies['original_language'].fillna('').str.lower())
+        self.idiomas = {idioma: codigos == i for i, idioma in enumerate(idiomas)}
+        self.votos_minimos = self.votos >= VOTOS_MINIMOS
+        self._cache = {}
+        self._tamano_cache = tamano_cache
+
+    @staticmethod
+    def _anios(df_movies):
+        anios = df_movies['release_year'] if 'release_year' in df_movies.columns \
+            else df_movies['release_date'].dt.year
+        return anios.fillna(0).to_numpy(dtype=np.int16)
+
+    def actualizar(self, filas, df_movies):
+        """
+        Actualiza las columnas de las películas de df_movies, que ocupan las `filas` del catálogo
+        (las filas posteriores al final son altas), y vacía la caché de máscaras.
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        n = max(len(self.anios), int(filas.max()) + 1 if len(filas) else 0)
+
+        def extender(arreglo):
+            return np.concatenate([arreglo, np.zeros(n - len(arreglo), dtype=arreglo.dtype)])
+
+        anios, votos = extender(self.anios), extender(self.votos)
+        anios[filas] = self._anios(df_movies)
+        votos[filas] = df_movies['vote_count'].fillna(0).to_numpy(dtype=np.float32)
+        idiomas = {idioma: extender(mascara) for idioma, mascara in self.idiomas.items()}
+        for mascara in idiomas.values():
+            mascara[filas] = False
+        for fila, idioma in zip(filas, df_movies['original_language'].fillna('').str.lower()):
+            idiomas.setdefault(idioma, np.zeros(n, dtype=bool))[fila] = True
+        self.anios, self.votos, self.idiomas = anios, votos, idiomas
+        self.votos_minimos = votos >= VOTOS_MINIMOS
+        self._cache = {}
+
+    def mascara(self, anio_min=None, anio_max=None, idioma=None, votos_min=None):
+        """
+        Retorna la máscara booleana de las películas que cumplen todos los filtros indicados,
+        o None si no se indicó ningún filtro.
+        """
+        clave = (anio_min, anio_max, idioma.lower() if idioma else None, votos_min)
+        if clave == (None, None, None, None):
+            return None
+        if clave not in self._cache:
+            mascara = np.ones(len(self.anios), dtype=bool)
+            if anio_min is not None:
+                mascara &= self.anios >= anio_min
+            if anio_max is not None:
+                mascara &= self.anios <= anio_max
+            if idioma:
+                mascara &= self.idiomas.get(clave[2], np.zeros(len(self.anios), dtype=bool))
+            if votos_min is not None:
+                mascara &= self.votos_minimos if votos_min == VOTOS_MINIMOS else self.votos >= votos_min
+            if len(self._cache) >= self._tamano_cache:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[clave] = mascara
+        return self._cache[clave]
+
+
+def recomendacion(titulo, df_movies, indice, k=5, mascaras=None, **filtros):
+    """
+    Dado el título de una película, retorna la lista con los títulos de las k películas más similares.
+
+    Parámetros:
+    -----------
+    titulo : str
+        Título de la película (sin distinguir mayúsculas/minúsculas).
+    df_movies : pd.DataFrame | snapshot.TitulosSnapshot
+        Catálogo con el que se construyó el índice (mismas filas y mismo orden), o los títulos del
+        snapshot (se buscan con su índice de hashes).
+    indice : IndiceExacto | IndiceLSH
+        Índice de vecinos del catálogo.
+    k : int
+        Cantidad de recomendaciones.
+    mascaras : MascarasCatalogo, opcional
+        Máscaras precalculadas del catálogo; necesarias si se pasan filtros.
+    **filtros :
+        anio_min, anio_max, idioma, votos_min (ver MascarasCatalogo.mascara). Se aplican dentro
+        de la búsqueda top-k, así que se devuelven k resultados siempre que haya suficientes películas.
+
+    Retorno:
+    --------
+    list | str
+        Lista de títulos recomendados, o un mensaje si la película no existe.
+    """
+    if hasattr(df_movies, 'fila'):
+        fila = df_movies.fila(titulo)
+    else:
+        filas = np.flatnonzero((df_movies['title'].str.lower() == titulo.lower()).to_numpy())
+        fila = int(filas[0]) if len(filas) else -1
+    if fila < 0:
+        return f"No se encontró la película '{titulo}'."
+    mascara = (mascaras or MascarasCatalogo(df_movies)).mascara(**filtros) if filtros else None
+    indices, _ = indice.buscar(fila, k, mascara=mascara)
+    if hasattr(df_movies, 'tomar'):
+        return df_movies.tomar(indices)
+    return df_movies['title'].iloc[indices].tolist()
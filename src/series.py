@@ -0,0 +1,210 @@
+# Agregados por rango de fechas con sumas acumuladas (prefix sums) por día de estreno.
+#
+# Al cargar se agrupan las películas en bins diarios (cantidad, return, budget y revenue) y se guardan
+# las sumas acumuladas; opcionalmente también una fila por género. Cualquier consulta "entre la fecha A
+# y la B" es entonces la diferencia de dos posiciones de cada arreglo: O(1), sin filtrar data_movies.
+# Las películas que llegan por la API de ingesta se suman (o restan) con `actualizar` en O(días).
+
+import numpy as np
+import pandas as pd
+
+from src.codificacion import CodificadorMultietiqueta, _aplanar
+
+# Métrica -> (columna de data_movies, tipo de la suma acumulada)
+METRICAS_SERIES = {
+    'cantidad': (None, np.int64),
+    'retorno': ('return', np.float64),
+    'presupuesto': ('budget', np.int64),
+    'recaudacion': ('revenue', np.int64),
+}
+
+
+def _acumular(indices, pesos, n):
+    """
+    Suma acumulada (con un 0 inicial) de los pesos agrupados por índice de bin.
+    """
+    acumulado = np.zeros(n + 1, dtype=pesos.dtype)
+    np.cumsum(np.bincount(indices, weights=pesos, minlength=n).astype(pesos.dtype), out=acumulado[1:])
+    return acumulado
+
+
+class SeriesDiarias:
+    """
+    Sumas acumuladas diarias de estrenos, return, budget y revenue (y por género, opcionalmente).
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame
+        Catálogo con release_date, return, budget, revenue y (si generos=True) genres.
+    generos : bool
+        Si también se arman las series por género.
+    """
+
+    def __init__(self, df_movies, generos=True):
+        fechas = pd.to_datetime(df_movies['release_date'], errors='coerce')
+        validas = fechas.notna().to_numpy()
+        dias = fechas[validas].to_numpy().astype('datetime64[D]')
+        self.origen = dias.min() if len(dias) else np.datetime64('1970-01-01')
+        self.n_dias = int((dias.max() - self.origen).astype(np.int64)) + 1 if len(dias) else 0
+        posiciones = (dias - self.origen).astype(np.int64)
+
+        valores = {}
+        for metrica, (columna, tipo) in METRICAS_SERIES.items():
+            if columna is None:
+                valores[metrica] = np.ones(len(posiciones), dtype=tipo)
+            else:
+                valores[metrica] = pd.to_numeric(df_movies[columna], errors='coerce').fillna(0).to_numpy()[validas].astype(tipo)
+        self.acumulados = {metrica: _acumular(posiciones, v, self.n_dias) for metrica, v in valores.items()}
+
+        # Por género: bins (género, día) en un solo bincount sobre el índice género * n_dias + día
+        self.generos = np.empty(0, dtype=object)
+        self.acumulados_genero = {}
+        if generos and 'genres' in df_movies.columns:
+            codificador = CodificadorMultietiqueta().ajustar(df_movies['genres'])
+            pertenencia = codificador.transformar(df_movies['genres'])[np.flatnonzero(validas)].tocoo()
+            self.generos = codificador.vocabulario
+            indices = pertenencia.col.astype(np.int64) * self.n_dias + posiciones[pertenencia.row]
+            n = len(self.generos) * self.n_dias
+            for metrica, v in valores.items():
+                bins = np.bincount(indices, weights=v[pertenencia.row], minlength=n).astype(v.dtype)
+                acumulado = np.zeros((len(self.generos), self.n_dias + 1), dtype=v.dtype)
+                np.cumsum(bins.reshape(len(self.generos), self.n_dias), axis=1, out=acumulado[:, 1:])
+                self.acumulados_genero[metrica] = acumulado
+        self._posicion_genero = {str(g).lower(): i for i, g in enumerate(self.generos)}
+
+    def arreglos(self):
+        """
+        Arreglos NumPy de la estructura (para persistirla en el snapshot).
+        """
+        arreglos = {'origen': np.array([self.origen], dtype='datetime64[D]'), 'generos': self.generos.astype(str)}
+        arreglos.update({f'acumulado_{m}': a for m, a in self.acumulados.items()})
+        arreglos.update({f'acumulado_genero_{m}': a for m, a in self.acumulados_genero.items()})
+        return arreglos
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        """
+        Reconstruye la estructura a partir de `arreglos()` (p. ej. mapeados en memoria desde el snapshot).
+        """
+        series = cls.__new__(cls)
+        series.origen = np.datetime64(arreglos['origen'][0], 'D')
+        series.generos = np.asarray(arreglos['generos'], dtype=object)
+        series.acumulados = {m: arreglos[f'acumulado_{m}'] for m in METRICAS_SERIES}
+        series.acumulados_genero = {m: arreglos[f'acumulado_genero_{m}'] for m in METRICAS_SERIES
+                                    if f'acumulado_genero_{m}' in arreglos}
+        series.n_dias = len(series.acumulados['cantidad']) - 1
+        series._posicion_genero = {str(g).lower(): i for i, g in enumerate(series.generos)}
+        return series
+
+    def _extender(self, dia_min, dia_max):
+        """
+        Amplía el rango de días para que incluya [dia_min, dia_max]: los días agregados al principio
+        acumulan 0 y los del final repiten el último acumulado.
+        """
+        antes = max(int((self.origen - dia_min).astype(np.int64)), 0)
+        despues = max(int((dia_max - self.origen).astype(np.int64)) + 1 - self.n_dias, 0)
+        if not antes and not despues:
+            return
+
+        def extender(acumulado):
+            inicio = np.zeros(acumulado.shape[:-1] + (antes,), dtype=acumulado.dtype)
+            fin = np.repeat(acumulado[..., -1:], despues, axis=-1)
+            return np.concatenate([inicio, acumulado, fin], axis=-1)
+
+        self.acumulados = {m: extender(a) for m, a in self.acumulados.items()}
+        self.acumulados_genero = {m: extender(a) for m, a in self.acumulados_genero.items()}
+        self.origen = self.origen - antes
+        self.n_dias += antes + despues
+
+    def actualizar(self, df_movies, signo=1):
+        """
+        Suma (signo=1) o resta (signo=-1) las películas de df_movies sin recalcular las series: los
+        valores se agrupan por día y se suma su acumulado a cada arreglo, en O(días). El rango de
+        fechas y los géneros se amplían si hace falta (p. ej. un estreno futuro o un género nuevo).
+        """
+        fechas = pd.to_datetime(df_movies['release_date'], errors='coerce')
+        validas = fechas.notna().to_numpy()
+        if not validas.any():
+            return
+        dias = fechas[validas].to_numpy().astype('datetime64[D]')
+        self._extender(dias.min(), dias.max())
+        posiciones = (dias - self.origen).astype(np.int64)
+
+        valores = {}
+        for metrica, (columna, tipo) in METRICAS_SERIES.items():
+            if columna is None:
+                v = np.ones(len(posiciones), dtype=tipo)
+            else:
+                v = pd.to_numeric(df_movies[columna], errors='coerce').fillna(0).to_numpy()[validas].astype(tipo)
+            valores[metrica] = v * signo
+            acumulado = self.acumulados[metrica]
+            acumulado[1:] += np.cumsum(np.bincount(posiciones, weights=valores[metrica],
+                                                   minlength=self.n_dias)).astype(acumulado.dtype)
+
+        if not self.acumulados_genero or 'genres' not in df_movies.columns:
+            return
+        etiquetas = _aplanar(df_movies['genres'][validas], 'name')
+        for genero in etiquetas.drop_duplicates():
+            if genero.lower() not in self._posicion_genero:
+                self._posicion_genero[genero.lower()] = len(self.generos)
+                self.generos = np.append(self.generos, np.array([genero], dtype=object))
+                self.acumulados_genero = {m: np.vstack([a, np.zeros((1, a.shape[1]), dtype=a.dtype)])
+                                          for m, a in self.acumulados_genero.items()}
+        filas_genero = etiquetas.str.lower().map(self._posicion_genero).to_numpy(dtype=np.int64)
+        indices = filas_genero * self.n_dias + posiciones[etiquetas.index.to_numpy()]
+        for metrica, v in valores.items():
+            acumulado = self.acumulados_genero[metrica]
+            bins = np.bincount(indices, weights=v[etiquetas.index.to_numpy()], minlength=acumulado.shape[0] * self.n_dias)
+            acumulado[:, 1:] += np.cumsum(bins.reshape(acumulado.shape[0], self.n_dias), axis=1).astype(acumulado.dtype)
+
+    def _posicion(self, fecha, defecto):
+        """
+        Posición en los arreglos acumulados de una fecha 'AAAA-MM-DD' (acotada al rango de datos).
+        """
+        if fecha is None:
+            return defecto
+        try:
+            dia = np.datetime64(pd.Timestamp(fecha).date(), 'D')
+        except (ValueError, TypeError):
+            raise ValueError(f"La fecha '{fecha}' no es válida. Use el formato AAAA-MM-DD.")
+        return int(np.clip((dia - self.origen).astype(np.int64), -1, self.n_dias))
+
+    def consultar(self, desde=None, hasta=None, genero=None):
+        """
+        Agregados de las películas estrenadas entre `desde` y `hasta` (inclusive).
+
+        Parámetros:
+        -----------
+        desde, hasta : str, opcional
+            Fechas 'AAAA-MM-DD'; por defecto la primera y la última fecha del catálogo.
+        genero : str, opcional
+            Nombre del género (sin distinguir mayúsculas).
+
+        Retorno:
+        --------
+        dict
+            cantidad, retorno_total, retorno_promedio, presupuesto_total y recaudacion_total.
+            Lanza ValueError si una fecha o el género no son válidos.
+        """
+        # Días [inicio, fin] inclusive -> acumulado[fin + 1] - acumulado[inicio]
+        inicio = max(self._posicion(desde, 0), 0)
+        fin = min(self._posicion(hasta, self.n_dias - 1), self.n_dias - 1) + 1
+        if genero is not None:
+            if genero.lower() not in self._posicion_genero:
+                raise ValueError(f"El género '{genero}' no existe en el catálogo.")
+            fila = self._posicion_genero[genero.lower()]
+            acumulados = {m: a[fila] for m, a in self.acumulados_genero.items()}
+        else:
+            acumulados = self.acumulados
+        totales = {m: (a[fin] - a[inicio]) if fin > inicio else a.dtype.type(0) for m, a in acumulados.items()}
+        cantidad = int(totales['cantidad'])
+        return {
+            'desde': str(self.origen + inicio) if desde is None else desde,
+            'hasta': str(self.origen + max(fin - 1, 0)) if hasta is None else hasta,
+            'genero': genero,
+            'cantidad': cantidad,
+            'retorno_total': round(float(totales['retorno']), 2),
+            'retorno_promedio': round(float(totales['retorno']) / cantidad, 2) if cantidad else 0.0,
+            'presupuesto_total': int(totales['presupuesto']),
+            'recaudacion_total': int(totales['recaudacion']),
+        }
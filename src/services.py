@@ -5,6 +5,7 @@ import numpy as np
 import ast
 from datetime import datetime
 from sklearn.metrics.pairwise import cosine_similarity
+from src.etl import normalizar_nombre
 
 def validar_df(df):
     res = pd.DataFrame({
@@ -385,62 +386,75 @@ DIA_MAP = {
 # Diccionario inverso para días: 0 corresponde a Lunes, etc.
 DIA_MAP_INV = {1: 'Lunes', 2: 'Martes', 3: 'Miércoles', 4: 'Jueves', 5: 'Viernes', 6: 'Sábado', 7: 'Domingo'}
 
-def cantidad_filmaciones_mes(mes, df_movies: pd.DataFrame) -> str:
+# Cantidad mínima de valoraciones para informar los votos de una película (votos_titulo)
+VOTOS_MINIMOS = 2000
+
+def interpretar_mes(mes):
     """
-    Devuelve la cantidad de películas estrenadas en el mes indicado.
-    Se acepta el mes como nombre (e.g. "Enero", "febrero") o como número (1-12).
-    En la salida se muestra el nombre del mes (ej. "Enero").
+    Interpreta un mes dado como nombre (e.g. "Enero", "febrero") o como número (1-12).
+    Retorna la tupla (mes_num, mes_nombre); si el mes no es válido lanza ValueError con el
+    mensaje que devuelve la API. Lo comparten todos los motores de consulta (src/motores.py).
     """
     # Verificar si mes es numérico o una cadena que represente un número
     if isinstance(mes, (int, float)) or (isinstance(mes, str) and mes.isdigit()):
         mes_num = int(mes)
         if not (1 <= mes_num <= 12):
-            return f"El número de mes '{mes_num}' no es válido. Debe estar entre 1 y 12."
-        mes_nombre = MES_MAP_INV[mes_num]
-    else:
-        mes_str = mes.lower()
-        if mes_str not in MES_MAP:
-            return f"El mes '{mes}' no es válido."
-        mes_num = MES_MAP[mes_str]
-        mes_nombre = mes_str.capitalize()
-    
-    # Asegurar que release_date es datetime (esto modifica df_movies in situ)
-    if not np.issubdtype(df_movies['release_date'].dtype, np.datetime64):
-        df_movies['release_date'] = pd.to_datetime(df_movies['release_date'], errors='coerce')
+            raise ValueError(f"El número de mes '{mes_num}' no es válido. Debe estar entre 1 y 12.")
+        return mes_num, MES_MAP_INV[mes_num]
+    mes_str = mes.lower()
+    if mes_str not in MES_MAP:
+        raise ValueError(f"El mes '{mes}' no es válido.")
+    return MES_MAP[mes_str], mes_str.capitalize()
+
+def interpretar_dia(dia):
+    """
+    Interpreta un día de la semana dado como nombre (e.g. "Lunes", "martes") o como número
+    (1 = lunes ... 7 = domingo). Retorna (dia_num, dia_nombre) o lanza ValueError.
+    """
+    if isinstance(dia, (int, float)) or (isinstance(dia, str) and dia.isdigit()):
+        dia_num = int(dia)
+        # Debe estar entre 1 y 7
+        if not (1 <= dia_num <= 7):
+            raise ValueError(f"El número de día '{dia_num}' no es válido. Debe estar entre 1 (lunes) y 7 (domingo).")
+        return dia_num, DIA_MAP_INV[dia_num]
+    # Si no es numérico, buscamos en DIA_MAP
+    dia_str = dia.lower()
+    if dia_str not in DIA_MAP:
+        raise ValueError(f"El día '{dia}' no es válido.")
+    dia_num = DIA_MAP[dia_str]
+    return dia_num, DIA_MAP_INV[dia_num]
+
+def cantidad_filmaciones_mes(mes, df_movies: pd.DataFrame) -> str:
+    """
+    Devuelve la cantidad de películas estrenadas en el mes indicado.
+    Se acepta el mes como nombre (e.g. "Enero", "febrero") o como número (1-12).
+    En la salida se muestra el nombre del mes (ej. "Enero").
+    df_movies debe traer la columna release_month del ETL (etl.calcular_columnas_derivadas).
+    """
+    try:
+        mes_num, mes_nombre = interpretar_mes(mes)
+    except ValueError as error:
+        return str(error)
     
-    count = df_movies[df_movies['release_date'].dt.month == mes_num].shape[0]
+    # Se usa la columna release_month precalculada por el ETL (0 si la fecha es nula)
+    count = int((df_movies['release_month'] == mes_num).sum())
     return f"{count} película(s) fueron estrenadas en el mes de {mes_nombre}."
 
 def cantidad_filmaciones_dia(dia, df_movies: pd.DataFrame) -> str:
     """
     Devuelve la cantidad de películas estrenadas en el día de la semana indicado.
     Se acepta el día como nombre (por ejemplo, "Lunes", "martes") o como número (1..7).
-    Internamente, pandas usa dayofweek = 0..6 (lunes=0, domingo=6),
-    así que sumamos 1 para que lunes sea 1, ... y domingo sea 7.
+    df_movies debe traer la columna release_weekday del ETL (etl.calcular_columnas_derivadas),
+    con 1 = lunes ... 7 = domingo, igual que DIA_MAP.
     """
-    # 1. Verificar si la entrada 'dia' es numérica
-    if isinstance(dia, (int, float)) or (isinstance(dia, str) and dia.isdigit()):
-        dia_num = int(dia)
-        # Debe estar entre 1 y 7
-        if not (1 <= dia_num <= 7):
-            return f"El número de día '{dia_num}' no es válido. Debe estar entre 1 (lunes) y 7 (domingo)."
-        dia_nombre = DIA_MAP_INV[dia_num]
-    else:
-        # 2. Si no es numérico, buscamos en DIA_MAP
-        dia_str = dia.lower()
-        if dia_str not in DIA_MAP:
-            return f"El día '{dia}' no es válido."
-        dia_num = DIA_MAP[dia_str]
-        dia_nombre = DIA_MAP_INV[dia_num]
-
-    # 3. Asegurar que release_date es datetime
-    if not np.issubdtype(df_movies['release_date'].dtype, np.datetime64):
-        df_movies['release_date'] = pd.to_datetime(df_movies['release_date'], errors='coerce')
-
-    # 4. Contar cuántas películas tienen dayofweek+1 = dia_num
-    #    (pandas: lunes=0, martes=1, ..., domingo=6; sumamos 1 para lunes=1,... domingo=7)
-    mask = (df_movies['release_date'].dt.dayofweek + 1 == dia_num)
-    count = df_movies[mask].shape[0]
+    # 1. Interpretar el día recibido (nombre o número)
+    try:
+        dia_num, dia_nombre = interpretar_dia(dia)
+    except ValueError as error:
+        return str(error)
+
+    # 2. Contar cuántas películas tienen el día pedido en la columna release_weekday del ETL
+    count = int((df_movies['release_weekday'] == dia_num).sum())
 
     return f"{count} película(s) fueron estrenadas en el día {dia_nombre}."
 
@@ -490,8 +504,8 @@ def votos_titulo(titulo: str, df_movies: pd.DataFrame) -> str:
         fila['release_date'] = pd.to_datetime(fila['release_date'], errors='coerce')
     
     vote_count = fila.iloc[0]['vote_count']
-    if vote_count < 2000:
-        return f"La película '{titulo}' no cumple con la condición de tener al menos 2000 valoraciones."
+    if vote_count < VOTOS_MINIMOS:
+        return f"La película '{titulo}' no cumple con la condición de tener al menos {VOTOS_MINIMOS} valoraciones."
     
     vote_average = fila.iloc[0]['vote_average']
     fecha = fila.iloc[0]['release_date']
@@ -502,6 +516,16 @@ def votos_titulo(titulo: str, df_movies: pd.DataFrame) -> str:
 
 
 
+def _nombres_normalizados(df_creditos: pd.DataFrame) -> pd.Series:
+    """
+    Nombres de cast / crew normalizados con etl.normalizar_nombre: la columna name_norm del parquet si
+    está, o name normalizada igual que en el ETL.
+    """
+    if 'name_norm' in df_creditos.columns:
+        return df_creditos['name_norm']
+    return normalizar_nombre(df_creditos['name'].fillna('').astype(str))
+
+
 def exito_actor(nombre_actor: str, df_cast: pd.DataFrame, df_movies: pd.DataFrame) -> str:
     """
     Dado el nombre de un actor, retorna un mensaje indicando la cantidad de filmaciones en las que ha participado,
@@ -511,8 +535,10 @@ def exito_actor(nombre_actor: str, df_cast: pd.DataFrame, df_movies: pd.DataFram
     Ejemplo de retorno:
       "El actor X ha participado en Y filmaciones, consiguiendo un retorno total de Z y un promedio de A por filmación."
     """
-    # Filtrar df_cast para encontrar filas donde el actor coincide (sin distinguir mayúsculas/minúsculas)
-    df_actor = df_cast[df_cast['name'].str.lower() == nombre_actor.lower()]
+    # Filtrar df_cast para encontrar filas donde el actor coincide (sin distinguir mayúsculas/minúsculas).
+    # Si el parquet trae name_norm (etl.guardar_parquet_optimizado) se compara directamente contra ella;
+    # si no, se normaliza name de la misma forma (normalizar_nombre).
+    df_actor = df_cast[_nombres_normalizados(df_cast) == normalizar_nombre(nombre_actor)]
     if df_actor.empty:
         return f"No se encontró al actor '{nombre_actor}'."
     
@@ -552,8 +578,8 @@ def exito_director(nombre_director: str, df_crew: pd.DataFrame, df_movies: pd.Da
        - ... "
     """
     # Filtrar df_crew para seleccionar únicamente las filas donde el job es "Director" (sin distinción de mayúsculas/minúsculas)
-    df_director = df_crew[(df_crew['job'].str.casefold() == 'director') &
-                          (df_crew['name'].str.casefold() == nombre_director.casefold())]
+    nombres = _nombres_normalizados(df_crew) == normalizar_nombre(nombre_director)
+    df_director = df_crew[(normalizar_nombre(df_crew['job'].fillna('').astype(str)) == 'director') & nombres]
     if df_director.empty:
         return f"No se encontró al director '{nombre_director}'."
     
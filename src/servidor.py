@@ -0,0 +1,220 @@
+# Servidor de producción preforked con los datos cargados una sola vez (copy-on-write).
+#
+# `uvicorn main:app --workers N` lanza N procesos que vuelven a importar main.py y cada uno carga su
+# propia copia del catálogo, el grafo de créditos y los índices. Acá el proceso maestro importa main.py
+# una sola vez, abre el socket y hace fork de los workers: todos comparten las páginas de memoria del
+# maestro y el kernel solo copia las que un worker escribe. Para que casi ninguna se escriba:
+#   - Las columnas de texto y anidadas de data_movies se pasan a buffers Arrow (compartir_catalogo):
+#     leerlas no toca el refcount de millones de objetos Python repartidos por todo el heap.
+#   - El recolector de basura se desactiva durante la carga y gc.freeze() mueve todos los objetos a la
+#     generación permanente antes del fork, así las recolecciones de los workers no los recorren.
+# Los workers se reciclan sin cortar requests: al llegar a `max_peticiones` (con una variación
+# aleatoria para que no se reinicien todos juntos), si su memoria privada supera `max_privada_mb`, o
+# con SIGHUP al maestro. El reemplazo es otro fork del maestro: arranca en milisegundos, sin recargar.
+# Las escrituras de la API de ingesta quedan deshabilitadas: cada worker tiene su propia copia en
+# memoria, así que requieren un solo proceso (python main.py).
+#
+# Uso: python -m src.servidor --workers 4 --puerto 8000   (memoria: kill -USR1 <pid del maestro>)
+
+import os
+import gc
+import sys
+import time
+import random
+import signal
+import socket
+import argparse
+import uvicorn
+import pandas as pd
+import pyarrow as pa
+
+INTERVALO_VIGILANCIA = 1.0
+
+
+def compartir_catalogo(df):
+    """
+    Pasa las columnas object de un DataFrame a arreglos respaldados por Arrow: los textos a
+    StringDtype('pyarrow_numpy') (las comparaciones siguen devolviendo bool de NumPy) y las listas
+    de diccionarios a ArrowDtype(list<struct>). Los datos quedan en unos pocos buffers contiguos.
+    """
+    df = df.copy(deep=False)
+    for columna in df.columns[df.dtypes == object]:
+        arreglo = pa.array(df[columna], from_pandas=True)
+        if pa.types.is_string(arreglo.type) or pa.types.is_large_string(arreglo.type):
+            df[columna] = df[columna].astype(pd.StringDtype('pyarrow_numpy'))
+        else:
+            df[columna] = pd.Series(pd.arrays.ArrowExtensionArray(arreglo), index=df.index, name=columna)
+    return df
+
+
+def memoria(pids):
+    """
+    Memoria de un conjunto de procesos en MB leída de /proc/<pid>/smaps_rollup (Linux).
+
+    Retorno:
+    --------
+    dict
+        rss (suma simple, cuenta varias veces lo compartido), pss (cada página compartida se divide
+        entre los procesos que la usan: su suma es la memoria real del nodo) y privada (USS).
+    """
+    totales = {'rss': 0, 'pss': 0, 'privada': 0}
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as archivo:
+                lineas = [linea.split() for linea in archivo]
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        # Líneas 'Nombre:   valor kB' (la primera es el rango de direcciones del rollup)
+        kb = {partes[0][:-1]: int(partes[1]) for partes in lineas if partes[0].endswith(':') and partes[1].isdigit()}
+        totales['rss'] += kb.get('Rss', 0)
+        totales['pss'] += kb.get('Pss', 0)
+        totales['privada'] += kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)
+    return {nombre: round(valor / 1024, 1) for nombre, valor in totales.items()}
+
+
+def _log(mensaje):
+    print(f"[servidor {os.getpid()}] {mensaje}", file=sys.stderr, flush=True)
+
+
+class Maestro:
+    """
+    Proceso maestro: carga la app una sola vez, hace fork de los workers y los reemplaza cuando terminan.
+
+    Parámetros:
+    -----------
+    workers : int
+        Cantidad de workers.
+    host, puerto : str, int
+        Dirección de escucha (el socket lo abre el maestro y lo heredan los workers).
+    max_peticiones : int
+        Requests que atiende un worker antes de reciclarse (0: sin límite).
+    variacion : int
+        Máximo de requests aleatorios que se suman a max_peticiones en cada worker.
+    max_privada_mb : float
+        Memoria privada (páginas ya copiadas) a partir de la cual se recicla un worker (0: sin límite).
+    espera_cierre : int
+        Segundos que un worker espera a que terminen sus requests en curso al reciclarse.
+    """
+
+    def __init__(self, workers=4, host='0.0.0.0', puerto=8000, max_peticiones=10000, variacion=1000,
+                 max_privada_mb=0, espera_cierre=30):
+        self.workers, self.host, self.puerto = workers, host, puerto
+        self.max_peticiones, self.variacion = max_peticiones, variacion
+        self.max_privada_mb, self.espera_cierre = max_privada_mb, espera_cierre
+        self.hijos = {}
+        self.activo = True
+
+    def cargar(self):
+        """
+        Importa main.py (motor, índices y app) y prepara la memoria para compartirla.
+        """
+        gc.disable()
+        import main
+        if main.ingesta is not None:
+            main.ingesta = None
+        if hasattr(main.motor, 'data_movies'):
+            main.motor.data_movies = compartir_catalogo(main.motor.data_movies)
+            main.data_movies = main.motor.data_movies
+        self.app = main.app
+        gc.collect()
+        gc.freeze()
+        _log(f"app cargada en {main.estado_servicio['carga_ms']} ms (motor {main.motor.nombre}); "
+             f"{gc.get_freeze_count()} objetos congelados")
+
+    def _abrir_socket(self):
+        self.socket = socket.socket(socket.AF_INET6 if ':' in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.puerto))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+    def _lanzar(self):
+        pid = os.fork()
+        if pid:
+            self.hijos[pid] = time.monotonic()
+            return
+        # Worker: señales por defecto (uvicorn instala las suyas para el cierre ordenado)
+        for senal in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(senal, signal.SIG_DFL)
+        random.seed()
+        gc.enable()
+        codigo = 0
+        try:
+            limite = self.max_peticiones + random.randint(0, self.variacion) if self.max_peticiones else None
+            configuracion = uvicorn.Config(self.app, limit_max_requests=limite, log_level='warning',
+                                           timeout_graceful_shutdown=self.espera_cierre)
+            uvicorn.Server(configuracion).run(sockets=[self.socket])
+        except BaseException as error:
+            _log(f"worker terminó con error: {error!r}")
+            codigo = 1
+        finally:
+            os._exit(codigo)
+
+    def reciclar(self, pids=None):
+        """
+        Pide a los workers (todos por defecto) que terminen sus requests y salgan; el maestro los reemplaza.
+        """
+        for pid in list(pids if pids is not None else self.hijos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _detener(self, *_):
+        self.activo = False
+        self.reciclar()
+
+    def _informar(self, *_):
+        _log(f"memoria total del nodo (maestro + {len(self.hijos)} workers): {memoria([os.getpid(), *self.hijos])}")
+
+    def _vigilar(self):
+        while True:
+            try:
+                pid, estado = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid:
+                self.hijos.pop(pid, None)
+                if self.activo:
+                    # (un worker reciclado con SIGTERM sale con -15 después de cerrar en orden: uvicorn re-emite la señal)
+                    _log(f"worker {pid} terminó (código {os.waitstatus_to_exitcode(estado)}); se lanza un reemplazo")
+                    self._lanzar()
+                continue
+            if not self.activo and not self.hijos:
+                return
+            if self.activo and self.max_privada_mb:
+                for hijo in list(self.hijos):
+                    if memoria([hijo])['privada'] > self.max_privada_mb:
+                        _log(f"worker {hijo} superó {self.max_privada_mb} MB de memoria privada; se recicla")
+                        self.reciclar([hijo])
+            time.sleep(INTERVALO_VIGILANCIA)
+
+    def ejecutar(self):
+        """
+        Carga la app, abre el socket, lanza los workers y los vigila hasta recibir SIGTERM / SIGINT.
+        """
+        self.cargar()
+        self._abrir_socket()
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+        signal.signal(signal.SIGHUP, lambda *_: self.reciclar())
+        signal.signal(signal.SIGUSR1, self._informar)
+        for _ in range(self.workers):
+            self._lanzar()
+        _log(f"{self.workers} workers escuchando en {self.host}:{self.puerto}")
+        self._vigilar()
+        self.socket.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor preforked: carga los datos una vez y los comparte entre workers.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--max-peticiones', type=int, default=10000)
+    parser.add_argument('--variacion', type=int, default=1000)
+    parser.add_argument('--max-privada-mb', type=float, default=0)
+    parser.add_argument('--espera-cierre', type=int, default=30)
+    args = parser.parse_args()
+    Maestro(args.workers, args.host, args.puerto, args.max_peticiones, args.variacion,
+            args.max_privada_mb, args.espera_cierre).ejecutar()
@@ -0,0 +1,193 @@
+# Generador de catálogos sintéticos para pruebas de escala (10× – 100× el tamaño del dataset real)
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.etl import calcular_columnas_derivadas
+
+
+def _fechas_sinteticas(fechas, n, rng, max_semanas=2):
+    """
+    Remuestrea fechas de estreno de la distribución empírica y les suma un desplazamiento
+    aleatorio de semanas completas, de modo que se conserva la distribución por día de la
+    semana y, casi siempre, la del mes.
+
+    Parámetros:
+    -----------
+    fechas : pd.Series
+        Fechas de estreno reales (datetime64).
+    n : int
+        Cantidad de fechas a generar.
+    rng : np.random.Generator
+        Generador de números aleatorios.
+    max_semanas : int
+        Desplazamiento máximo (en semanas) hacia adelante o hacia atrás.
+
+    Retorno:
+    --------
+    np.ndarray
+        Arreglo datetime64[ns] con las fechas generadas.
+    """
+    base = fechas.dropna().to_numpy(dtype='datetime64[ns]')
+    muestra = base[rng.integers(0, len(base), n)]
+    semanas = rng.integers(-max_semanas, max_semanas + 1, n)
+    return muestra + (semanas * 7).astype('timedelta64[D]')
+
+
+def generar_movies(df_movies, factor, rng):
+    """
+    Genera la tabla de películas sintética remuestreando filas completas del catálogo real
+    (bootstrap), lo que preserva la distribución conjunta de budget, revenue, votos y los
+    campos anidados (genres, production_companies, ...). Las fechas se remuestrean aparte
+    con `_fechas_sinteticas` y las columnas derivadas (return, release_year, release_month,
+    release_weekday) se recalculan con etl.calcular_columnas_derivadas, igual que en el ETL.
+
+    Parámetros:
+    -----------
+    df_movies : pd.DataFrame
+        Tabla de películas real (esquema de data_movies.parquet).
+    factor : float
+        Factor de escala respecto al tamaño real.
+    rng : np.random.Generator
+        Generador de números aleatorios.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Tabla de películas sintética con el mismo esquema que la original.
+    """
+    n = int(round(len(df_movies) * factor))
+    filas = rng.integers(0, len(df_movies), n)
+    df = df_movies.iloc[filas].reset_index(drop=True)
+
+    # Identificadores nuevos y únicos; la réplica se agrega al título para que siga siendo buscable
+    df['movie_id'] = np.arange(1, n + 1, dtype=df_movies['movie_id'].dtype)
+    replica = np.arange(n) // len(df_movies)
+    df['title'] = df['title'].astype(str) + np.where(replica > 0, ' #' + replica.astype(str), '')
+
+    # Las columnas derivadas se recalculan a partir de la fecha y del par (budget, revenue) remuestreados
+    df['release_date'] = _fechas_sinteticas(df_movies['release_date'], n, rng)
+    df = calcular_columnas_derivadas(df)
+
+    return df[df_movies.columns].astype(df_movies.dtypes.to_dict())
+
+
+def generar_creditos(df_creditos, df_movies_real, movie_ids, factor, rng):
+    """
+    Genera una tabla de créditos (cast o crew) sintética para las películas indicadas.
+
+    Se conservan tres distribuciones del dato real:
+      - Tamaño del reparto/equipo por película (remuestreado de los conteos reales).
+      - Cardinalidad de nombres: el universo de personas crece proporcionalmente al factor.
+      - Créditos por persona: cada persona sintética hereda el peso (cantidad de créditos) de
+        una persona real "plantilla", junto con el resto de sus atributos (job, gender, ...).
+
+    Las películas sin créditos conservan, igual que en el ETL real, una única fila con nulos.
+
+    Parámetros:
+    -----------
+    df_creditos : pd.DataFrame
+        Tabla real de créditos (esquema de data_cast.parquet o data_crew.parquet).
+    df_movies_real : pd.DataFrame
+        Tabla real de películas, usada para contar también las películas sin créditos.
+    movie_ids : np.ndarray
+        Identificadores de las películas sintéticas.
+    factor : float
+        Factor de escala respecto al tamaño real.
+    rng : np.random.Generator
+        Generador de números aleatorios.
+
+    Retorno:
+    --------
+    pd.DataFrame
+        Tabla de créditos sintética con el mismo esquema que la original.
+    """
+    validos = df_creditos[df_creditos['name'].notna()].reset_index(drop=True)
+
+    # Distribución de tamaños por película (incluye ceros para películas sin créditos)
+    conteos = validos.groupby('movie_id').size()
+    conteos = conteos.reindex(df_movies_real['movie_id'].unique(), fill_value=0).to_numpy()
+    tamanos = conteos[rng.integers(0, len(conteos), len(movie_ids))]
+    total = int(tamanos.sum())
+
+    # Personas plantilla: código, primera fila y cantidad de créditos de cada nombre real
+    codigos, nombres = pd.factorize(validos['name'])
+    _, primera_fila = np.unique(codigos, return_index=True)
+    pesos_plantilla = np.bincount(codigos).astype(float)
+
+    # Universo sintético de personas: U * factor, cada una apuntando a una plantilla real
+    n_plantillas = len(nombres)
+    n_personas = max(int(round(n_plantillas * factor)), n_plantillas)
+    pesos = pesos_plantilla[np.arange(n_personas) % n_plantillas]
+    personas = rng.choice(n_personas, size=total, p=pesos / pesos.sum())
+    plantilla = personas % n_plantillas
+    replica = personas // n_plantillas
+
+    df = validos.iloc[primera_fila[plantilla]].reset_index(drop=True)
+    df['movie_id'] = np.repeat(movie_ids, tamanos)
+    df['name'] = pd.Series(nombres.to_numpy()[plantilla], dtype=object) + np.where(
+        replica > 0, ' ' + replica.astype(str), '')
+    df['id'] = (personas + 1).astype(df_creditos['id'].dtype)
+    df['credit_id'] = np.char.mod('%024x', rng.integers(0, 2**62, total))
+
+    # Una fila nula por cada película sin créditos, igual que en el dataset procesado
+    sin_creditos = pd.DataFrame({'movie_id': movie_ids[tamanos == 0]})
+    df = pd.concat([df, sin_creditos], ignore_index=True)
+    df = df.sort_values('movie_id', kind='stable').reset_index(drop=True)
+    return df[df_creditos.columns].astype(df_creditos.dtypes.to_dict())
+
+
+def generar_catalogo(df_movies, df_cast, df_crew, factor=10, semilla=42):
+    """
+    Genera un catálogo sintético (movies, cast, crew) estadísticamente similar al real.
+
+    Parámetros:
+    -----------
+    df_movies, df_cast, df_crew : pd.DataFrame
+        Tablas reales procesadas por el ETL.
+    factor : float
+        Factor de escala (10 → diez veces la cantidad de películas).
+    semilla : int
+        Semilla para que la generación sea reproducible.
+
+    Retorno:
+    --------
+    tuple
+        (movies, cast, crew) sintéticos con el mismo esquema que las tablas de entrada.
+    """
+    rng = np.random.default_rng(semilla)
+    movies = generar_movies(df_movies, factor, rng)
+    movie_ids = movies['movie_id'].to_numpy()
+    cast = generar_creditos(df_cast, df_movies, movie_ids, factor, rng)
+    crew = generar_creditos(df_crew, df_movies, movie_ids, factor, rng)
+    return movies, cast, crew
+
+
+def escribir_catalogo(movies, cast, crew, directorio):
+    """
+    Escribe el catálogo en `directorio` con los mismos nombres de archivo que transformados_processed.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    movies.to_parquet(os.path.join(directorio, 'data_movies.parquet'), index=False)
+    cast.to_parquet(os.path.join(directorio, 'data_cast.parquet'), index=False)
+    crew.to_parquet(os.path.join(directorio, 'data_crew.parquet'), index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un catálogo sintético a escala del dataset procesado.")
+    parser.add_argument('--origen', default='transformados_processed')
+    parser.add_argument('--destino', default='sinteticos')
+    parser.add_argument('--factor', type=float, default=10)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    df_movies = pd.read_parquet(os.path.join(args.origen, 'data_movies.parquet'))
+    df_cast = pd.read_parquet(os.path.join(args.origen, 'data_cast.parquet'))
+    df_crew = pd.read_parquet(os.path.join(args.origen, 'data_crew.parquet'))
+
+    movies, cast, crew = generar_catalogo(df_movies, df_cast, df_crew, args.factor, args.semilla)
+    escribir_catalogo(movies, cast, crew, args.destino)
+    print(f"Catálogo x{args.factor}: {len(movies)} películas, {len(cast)} filas de cast, "
+          f"{len(crew)} filas de crew -> {args.destino}")
@@ -0,0 +1,371 @@
+# Snapshot binario versionado de todas las estructuras que usa la API.
+#
+# El ETL (src/pipeline.py, etapa 'snapshot') serializa en un directorio:
+#   - movies.arrow         : data_movies en formato Arrow IPC sin compresión (se mapea en memoria).
+#   - titulos_*.npy        : índice de títulos (hash del título en minúsculas, ordenado -> fila).
+#   - histograma_*.npy     : cantidad de estrenos por mes (1..12) y por día de la semana (1..7).
+#   - grafo/               : arreglos CSR de GrafoCreditos (src/grafo.py) y nombres/jobs en Arrow IPC.
+#   - colaboraciones/      : matrices persona x persona de GrafoColaboraciones (src/colaboraciones.py).
+#   - series/              : sumas acumuladas diarias de SeriesDiarias (src/series.py).
+#   - texto/               : vocabulario, conteos y agregados por año / género de IndiceTexto (src/texto.py).
+#   - rankings/            : grupos por año / mes / género y top-K precalculados de Rankings (src/rankings.py).
+#   - aproximado/          : muestras y sketches por año / género de ConsultasAproximadas (src/aproximado.py).
+#   - recomendacion/       : matriz de características (y su transpuesta) en CSR, columnas de
+#                            MascarasCatalogo y, opcionalmente, el IndiceLSH.
+#   - manifest.json        : versión del formato, versión del snapshot, tamaño y sha256 de cada archivo.
+#
+# Cada snapshot se escribe en <directorio>/<version>/ y el archivo ACTUAL apunta al vigente (se
+# reemplaza de forma atómica), así un worker que arranca nunca lee un snapshot a medio escribir.
+# Los workers lo cargan con cargar_snapshot: todo se abre con memory-map, sin reconstruir nada.
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import scipy.sparse as sp
+
+from src.etl import tabla_arrow
+from src.grafo import GrafoCreditos, Relacion, _hash_nombres
+from src.colaboraciones import GrafoColaboraciones
+from src.series import SeriesDiarias
+from src.texto import IndiceTexto
+from src.rankings import Rankings
+from src.aproximado import ConsultasAproximadas
+from src.recommendation import IndiceExacto, IndiceLSH, MascarasCatalogo, construir_caracteristicas
+from src.services import VOTOS_MINIMOS
+
+# 2: colaboraciones/, series/, texto/, rankings/ y aproximado/ son obligatorios (los snapshots de formato 1
+# no los traen y hay que regenerarlos con el ETL)
+# 3: aproximado/ incluye las réplicas bootstrap de los promedios (bootstrap_<metrica>_<por>)
+# 4: las sumas de retorno de colaboraciones/ son float64
+VERSION_FORMATO = 4
+DIRECTORIO_SNAPSHOT = os.path.join('transformados_processed', 'snapshot')
+VERSIONES_CONSERVADAS = 2
+
+
+def _sha256(ruta, bloque=2**20):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for datos in iter(lambda: archivo.read(bloque), b''):
+            sha.update(datos)
+    return sha.hexdigest()
+
+
+def _guardar_arrow(ruta, tabla):
+    with pa.OSFile(ruta, 'wb') as archivo, pa.ipc.new_file(archivo, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+
+def _cargar_arrow(ruta):
+    # read_all sobre un memory_map no copia los buffers: la tabla apunta directo al archivo mapeado
+    return pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+
+
+def hash_titulos(titulos):
+    """
+    Hash int64 de títulos en minúsculas (misma comparación que services.score_titulo).
+    """
+    return _hash_nombres(pd.Series(titulos, dtype=object).fillna('').str.lower())
+
+
+def _escribir_estructuras(ruta, version, df_movies, df_cast, df_crew, lsh):
+    """
+    Escribe en `ruta` los archivos del snapshot y su manifest.json.
+    """
+    guardar = lambda nombre, arreglo: np.save(os.path.join(ruta, f'{nombre}.npy'), np.ascontiguousarray(arreglo))
+
+    _guardar_arrow(os.path.join(ruta, 'movies.arrow'), tabla_arrow(df_movies))
+
+    # Índice de títulos: hashes ordenados (a igual hash, la primera fila del catálogo queda primero)
+    hashes = hash_titulos(df_movies['title'])
+    orden = np.lexsort((np.arange(len(hashes)), hashes))
+    guardar('titulos_hash', hashes[orden])
+    guardar('titulos_fila', orden.astype(np.int32))
+
+    guardar('histograma_mes', np.bincount(df_movies['release_month'].to_numpy(dtype=np.int64), minlength=13))
+    guardar('histograma_dia', np.bincount(df_movies['release_weekday'].to_numpy(dtype=np.int64), minlength=8))
+
+    grafo = GrafoCreditos(df_cast, df_crew, df_movies)
+    for nombre in ('hashes', 'movie_ids', 'filas'):
+        guardar(f'grafo/{nombre}', getattr(grafo, nombre))
+    for relacion in ('cast', 'crew'):
+        for nombre, arreglo in getattr(grafo, relacion).arreglos().items():
+            guardar(f'grafo/{relacion}_{nombre}', arreglo)
+    _guardar_arrow(os.path.join(ruta, 'grafo', 'nombres.arrow'), pa.table({'valor': grafo.nombres}))
+    _guardar_arrow(os.path.join(ruta, 'grafo', 'jobs.arrow'), pa.table({'valor': grafo.jobs}))
+
+    os.makedirs(os.path.join(ruta, 'colaboraciones'))
+    for nombre, arreglo in GrafoColaboraciones(grafo, df_movies['return'].to_numpy()).arreglos().items():
+        guardar(f'colaboraciones/{nombre}', arreglo)
+    os.makedirs(os.path.join(ruta, 'series'))
+    for nombre, arreglo in SeriesDiarias(df_movies).arreglos().items():
+        guardar(f'series/{nombre}', arreglo)
+    os.makedirs(os.path.join(ruta, 'rankings'))
+    for nombre, arreglo in Rankings(df_movies).arreglos().items():
+        guardar(f'rankings/{nombre}', arreglo)
+    os.makedirs(os.path.join(ruta, 'aproximado'))
+    for nombre, arreglo in ConsultasAproximadas(df_movies, grafo).arreglos().items():
+        guardar(f'aproximado/{nombre}', arreglo)
+
+    matriz, codificadores = construir_caracteristicas(df_movies)
+    os.makedirs(os.path.join(ruta, 'texto'))
+    for nombre, arreglo in codificadores['texto'].arreglos().items():
+        guardar(f'texto/{nombre}', arreglo)
+    transpuesta = matriz.T.tocsr()
+    for prefijo, m in (('', matriz), ('t_', transpuesta)):
+        for nombre in ('data', 'indices', 'indptr'):
+            guardar(f'recomendacion/{prefijo}{nombre}', getattr(m, nombre))
+    mascaras = MascarasCatalogo(df_movies)
+    codigos, idiomas = pd.factorize(df_movies['original_language'].fillna('').str.lower())
+    guardar('recomendacion/anios', mascaras.anios)
+    guardar('recomendacion/votos', mascaras.votos)
+    guardar('recomendacion/idiomas', codigos.astype(np.int16))
+    if lsh:
+        IndiceLSH(matriz).guardar(os.path.join(ruta, 'recomendacion', 'lsh'))
+
+    archivos = {}
+    for carpeta, _, nombres in os.walk(ruta):
+        for nombre in nombres:
+            completa = os.path.join(carpeta, nombre)
+            archivos[os.path.relpath(completa, ruta)] = {'bytes': os.path.getsize(completa), 'sha256': _sha256(completa)}
+    manifest = {'formato': VERSION_FORMATO, 'version': version, 'filas': len(df_movies),
+                'forma_caracteristicas': list(matriz.shape), 'idiomas': list(idiomas), 'lsh': lsh,
+                'archivos': dict(sorted(archivos.items()))}
+    with open(os.path.join(ruta, 'manifest.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(manifest, archivo, indent=1, ensure_ascii=False)
+
+
+def indice_configurado(tipo=None):
+    """
+    Tipo de índice del recomendador: `tipo` o, si no se indica, la variable de entorno
+    INDICE_RECOMENDACION ('exacto' por defecto o 'lsh'). Lanza ValueError si no es ninguno de los dos.
+    """
+    tipo = (tipo or os.environ.get('INDICE_RECOMENDACION', 'exacto')).lower()
+    if tipo not in ('exacto', 'lsh'):
+        raise ValueError(f"Tipo de índice '{tipo}' no soportado. Opciones: exacto, lsh.")
+    return tipo
+
+
+def construir_snapshot(df_movies, df_cast, df_crew, directorio=DIRECTORIO_SNAPSHOT, lsh=None):
+    """
+    Construye y publica un snapshot nuevo a partir de las tablas procesadas del ETL.
+
+    df_movies debe venir en el mismo orden de filas que data_movies.parquet, para que las filas del
+    snapshot (y por lo tanto el orden de los resultados) coincidan con los demás motores de consulta.
+
+    Parámetros:
+    -----------
+    df_movies, df_cast, df_crew : pd.DataFrame
+        Tablas procesadas (salidas de las etapas transformar_movies y desanidar_creditos).
+    directorio : str
+        Directorio raíz de los snapshots.
+    lsh : bool, opcional
+        Si se incluye también el IndiceLSH del recomendador; por defecto, si INDICE_RECOMENDACION=lsh
+        (así una compactación de la API de ingesta lo conserva).
+
+    Retorno:
+    --------
+    str
+        Ruta del snapshot publicado (<directorio>/<version>).
+    """
+    lsh = indice_configurado() == 'lsh' if lsh is None else bool(lsh)
+    df_movies = df_movies.reset_index(drop=True)
+    version = datetime.datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    # Se escribe en un directorio temporal que solo se renombra al final, si todo salió bien
+    ruta = os.path.join(directorio, f'.{version}.tmp')
+    os.makedirs(os.path.join(ruta, 'grafo'))
+    os.makedirs(os.path.join(ruta, 'recomendacion'))
+    try:
+        _escribir_estructuras(ruta, version, df_movies, df_cast, df_crew, lsh)
+    except BaseException:
+        shutil.rmtree(ruta, ignore_errors=True)
+        raise
+    ruta_final = os.path.join(directorio, version)
+    os.rename(ruta, ruta_final)
+
+    # Publicación atómica: se escribe ACTUAL en un temporal y se reemplaza
+    temporal = os.path.join(directorio, 'ACTUAL.tmp')
+    with open(temporal, 'w') as archivo:
+        archivo.write(version)
+    os.replace(temporal, os.path.join(directorio, 'ACTUAL'))
+
+    anteriores = sorted(v for v in os.listdir(directorio)
+                        if not v.startswith('.') and os.path.isdir(os.path.join(directorio, v)))
+    for vieja in anteriores[:-VERSIONES_CONSERVADAS]:
+        shutil.rmtree(os.path.join(directorio, vieja), ignore_errors=True)
+    return ruta_final
+
+
+class TitulosSnapshot:
+    """
+    Títulos de data_movies en el snapshot: la columna title queda en Arrow (mapeada en memoria) y las
+    búsquedas por título usan el índice de hashes, sin armar un objeto Python por película. Reemplaza
+    al DataFrame del catálogo en recommendation.recomendacion y rankings.ranking.
+    """
+
+    def __init__(self, columna, hashes, filas):
+        self.columna, self._hashes, self._filas = columna, hashes, filas
+
+    def __len__(self):
+        return len(self.columna)
+
+    def fila(self, titulo):
+        """
+        Primera fila del catálogo con ese título (sin distinguir mayúsculas) o -1.
+        """
+        h = hash_titulos([titulo])[0]
+        posicion = np.searchsorted(self._hashes, h)
+        while posicion < len(self._hashes) and self._hashes[posicion] == h:
+            fila = int(self._filas[posicion])
+            if str(self.columna[fila].as_py()).lower() == titulo.lower():
+                return fila
+            posicion += 1
+        return -1
+
+    def tomar(self, filas):
+        """
+        Lista con los títulos de las filas indicadas (solo esas filas se convierten a str).
+        """
+        return self.columna.take(pa.array(np.asarray(filas, dtype=np.int64))).to_pylist()
+
+
+class Snapshot:
+    """
+    Estructuras de la API cargadas desde un snapshot (ver cargar_snapshot).
+
+    Atributos principales:
+      manifest      : contenido de manifest.json (version, formato, archivos).
+      movies        : pa.Table de data_movies mapeada en memoria.
+      titulos       : TitulosSnapshot (lo usan recommendation.recomendacion y rankings.ranking).
+      grafo         : GrafoCreditos reconstruido sobre arreglos mapeados.
+      colaboraciones: GrafoColaboraciones sobre arreglos mapeados.
+      series        : SeriesDiarias sobre arreglos mapeados.
+      texto         : IndiceTexto sobre arreglos mapeados.
+      rankings      : Rankings sobre arreglos mapeados.
+      aproximado    : ConsultasAproximadas sobre arreglos mapeados.
+      indice        : IndiceExacto o IndiceLSH del recomendador.
+      mascaras      : MascarasCatalogo.
+      histograma_mes, histograma_dia : conteos de estrenos por mes / día de la semana.
+      carga_ms      : tiempo que tomó la carga.
+    """
+
+    def __init__(self, ruta, manifest, tipo_indice='exacto'):
+        inicio = time.perf_counter()
+        self.ruta, self.manifest = ruta, manifest
+        cargar = lambda nombre: np.load(os.path.join(ruta, f'{nombre}.npy'), mmap_mode='r')
+
+        self.movies = _cargar_arrow(os.path.join(ruta, 'movies.arrow'))
+        self.titulos = TitulosSnapshot(self.movies.column('title'), cargar('titulos_hash'), cargar('titulos_fila'))
+        self.histograma_mes, self.histograma_dia = cargar('histograma_mes'), cargar('histograma_dia')
+
+        grafo = GrafoCreditos.__new__(GrafoCreditos)
+        for nombre in ('hashes', 'movie_ids', 'filas'):
+            setattr(grafo, nombre, cargar(f'grafo/{nombre}'))
+        grafo.nombres = _cargar_arrow(os.path.join(ruta, 'grafo', 'nombres.arrow')).column('valor').combine_chunks()
+        grafo.jobs = _cargar_arrow(os.path.join(ruta, 'grafo', 'jobs.arrow')).column('valor').combine_chunks()
+        for relacion in ('cast', 'crew'):
+            arreglos = Relacion.__new__(Relacion)
+            for nombre in ('persona_indptr', 'persona_indices', 'pelicula_indptr', 'pelicula_indices',
+                           'persona_roles', 'pelicula_roles'):
+                existe = os.path.exists(os.path.join(ruta, 'grafo', f'{relacion}_{nombre}.npy'))
+                setattr(arreglos, nombre, cargar(f'grafo/{relacion}_{nombre}') if existe else None)
+            setattr(grafo, relacion, arreglos)
+        self.grafo = grafo
+
+        carpeta = lambda nombre: {n[:-4]: cargar(f'{nombre}/{n[:-4]}') for n in os.listdir(os.path.join(ruta, nombre))}
+        self.colaboraciones = GrafoColaboraciones.desde_arreglos(grafo, carpeta('colaboraciones'))
+        self.series = SeriesDiarias.desde_arreglos(carpeta('series'))
+        self.texto = IndiceTexto.desde_arreglos(carpeta('texto'))
+        self.rankings = Rankings.desde_arreglos(carpeta('rankings'))
+        self.aproximado = ConsultasAproximadas.desde_arreglos(carpeta('aproximado'))
+
+        forma = tuple(manifest['forma_caracteristicas'])
+        if tipo_indice == 'lsh':
+            self.indice = IndiceLSH.cargar(os.path.join(ruta, 'recomendacion', 'lsh'))
+        else:
+            self.indice = IndiceExacto.__new__(IndiceExacto)
+            self.indice.matriz = sp.csr_matrix((cargar('recomendacion/data'), cargar('recomendacion/indices'),
+                                                cargar('recomendacion/indptr')), shape=forma, copy=False)
+            self.indice._transpuesta = sp.csr_matrix((cargar('recomendacion/t_data'), cargar('recomendacion/t_indices'),
+                                                      cargar('recomendacion/t_indptr')), shape=forma[::-1], copy=False)
+
+        mascaras = MascarasCatalogo.__new__(MascarasCatalogo)
+        mascaras.anios, mascaras.votos = cargar('recomendacion/anios'), cargar('recomendacion/votos')
+        codigos = cargar('recomendacion/idiomas')
+        mascaras.idiomas = {idioma: codigos == i for i, idioma in enumerate(manifest['idiomas'])}
+        mascaras.votos_minimos = mascaras.votos >= VOTOS_MINIMOS
+        mascaras._cache, mascaras._tamano_cache = {}, 256
+        self.mascaras = mascaras
+        self.carga_ms = round((time.perf_counter() - inicio) * 1000, 2)
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    def fila_titulo(self, titulo):
+        """
+        Primera fila del catálogo con ese título (sin distinguir mayúsculas) o -1.
+        """
+        return self.titulos.fila(titulo)
+
+    def filas_movies(self, filas, columnas=None):
+        """
+        DataFrame con las filas indicadas de data_movies (solo esas filas se convierten a pandas).
+        """
+        tabla = self.movies.select(columnas) if columnas else self.movies
+        return tabla.take(pa.array(np.asarray(filas, dtype=np.int64))).to_pandas()
+
+    def columnas_movies(self, columnas):
+        """
+        pa.Table (mapeada en memoria, sin copias) con las columnas indicadas de data_movies que existen
+        en el snapshot.
+        """
+        return self.movies.select([c for c in columnas if c in self.movies.column_names])
+
+
+def cargar_snapshot(directorio=DIRECTORIO_SNAPSHOT, verificar=False, tipo_indice=None):
+    """
+    Carga el snapshot vigente (el que indica <directorio>/ACTUAL).
+
+    Siempre se valida la versión del formato y el tamaño de cada archivo del manifest; con
+    verificar=True también se recalcula el sha256 de cada archivo (lee todo el snapshot, así que
+    es para validaciones fuera del arranque de los workers).
+
+    Parámetros:
+    -----------
+    directorio : str
+        Directorio raíz de los snapshots.
+    verificar : bool
+        Si se comprueban los checksums.
+    tipo_indice : str, opcional
+        'exacto' o 'lsh'; por defecto la variable de entorno INDICE_RECOMENDACION.
+
+    Retorno:
+    --------
+    Snapshot
+        Lanza ValueError si el snapshot está incompleto o es de otro formato, o si se pide el índice
+        'lsh' y el snapshot se generó sin él.
+    """
+    with open(os.path.join(directorio, 'ACTUAL')) as archivo:
+        ruta = os.path.join(directorio, archivo.read().strip())
+    with open(os.path.join(ruta, 'manifest.json'), encoding='utf-8') as archivo:
+        manifest = json.load(archivo)
+    if manifest['formato'] != VERSION_FORMATO:
+        raise ValueError(f"Formato de snapshot {manifest['formato']} no soportado (se esperaba {VERSION_FORMATO}); "
+                         f"hay que volver a generarlo con el ETL.")
+    for nombre, datos in manifest['archivos'].items():
+        completa = os.path.join(ruta, nombre)
+        if not os.path.exists(completa) or os.path.getsize(completa) != datos['bytes']:
+            raise ValueError(f"Snapshot {manifest['version']} incompleto o corrupto: {nombre}.")
+        if verificar and _sha256(completa) != datos['sha256']:
+            raise ValueError(f"Checksum inválido en el snapshot {manifest['version']}: {nombre}.")
+    tipo = indice_configurado(tipo_indice)
+    if tipo == 'lsh' and not manifest['lsh']:
+        raise ValueError(f"El snapshot {manifest['version']} no incluye el IndiceLSH pedido por INDICE_RECOMENDACION=lsh; "
+                         f"hay que volver a generarlo con el ETL usando esa misma variable.")
+    return Snapshot(ruta, manifest, tipo)
@@ -0,0 +1,387 @@
+# Índice de texto de títulos y resúmenes (overview), tokenizado una sola vez y compartido por los
+# reportes de palabras frecuentes (nubes de palabras del EDA / README), la API y el recomendador.
+#
+# `IndiceTexto.ajustar` normaliza los textos en una sola pasada vectorizada con pyarrow.compute
+# (minúsculas, sin acentos, apóstrofos ni puntuación, sin palabras vacías) y arma:
+#   - vocabulario : términos ordenados que aparecen en al menos `min_documentos` películas.
+#   - documentos  : document frequency de cada término (películas que lo usan en algún campo).
+#   - conteos     : por campo, matriz película x término (CSR int32) con la cantidad de apariciones.
+#   - por año / por género : conteos sumados con productos dispersos (una fila por año o género),
+#                   así /palabras_frecuentes es un slice de CSR y un top-N con argpartition.
+#   - matriz      : TF-IDF (tf sublineal, idf suavizado, filas normalizadas L2) de todos los campos,
+#                   el bloque de texto de las características del recomendador (src/recommendation.py).
+# Se persiste en el snapshot (carpeta texto/) y las películas de la API de ingesta se suman con
+# `actualizar` usando el vocabulario y el idf ya ajustados.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from src.codificacion import _aplanar
+
+CAMPOS_TEXTO = ('title', 'overview')
+LARGO_MINIMO = 2
+PALABRAS_VACIAS = frozenset('''
+    a about above after again against all am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has have
+    having he her here hers herself him himself his how if in into is it its itself just me more most my
+    myself no nor not now of off on once only or other our ours ourselves out over own same she should so
+    some such than that the their theirs them themselves then there these they this those through to too
+    under until up very was we were what when where which while who whom why will with would you your
+    yours yourself yourselves also
+'''.split())
+_PALABRAS_VACIAS = pa.array(sorted(PALABRAS_VACIAS), type=pa.string())
+
+
+def tokenizar(textos):
+    """
+    Tokeniza una columna de textos en una sola pasada vectorizada (pyarrow.compute): minúsculas,
+    descomposición NFKD sin marcas diacríticas ni apóstrofos, todo lo que no es [a-z0-9] como
+    separador, y sin palabras vacías ni tokens de menos de LARGO_MINIMO caracteres.
+
+    Parámetros:
+    -----------
+    textos : pd.Series | pa.Array | pa.ChunkedArray
+        Textos (los nulos no aportan tokens).
+
+    Retorno:
+    --------
+    tuple
+        (pa.Array de tokens, np.ndarray int64 con la posición del texto de origen de cada token)
+    """
+    if isinstance(textos, pa.ChunkedArray):
+        textos = textos.combine_chunks()
+    elif not isinstance(textos, pa.Array):
+        textos = pa.array(pd.Series(textos, dtype=object).reset_index(drop=True), type=pa.string(), from_pandas=True)
+    texto = pc.utf8_normalize(pc.utf8_lower(textos), 'NFKD')
+    texto = pc.replace_substring_regex(texto, r"[\p{Mn}'’]", '')
+    texto = pc.replace_substring_regex(texto, r'[^a-z0-9]+', ' ')
+    listas = pc.utf8_split_whitespace(texto)
+    tokens = pc.list_flatten(listas)
+    documentos = pc.list_parent_indices(listas).to_numpy()
+    validos = pc.and_(pc.greater_equal(pc.utf8_length(tokens), LARGO_MINIMO),
+                      pc.invert(pc.is_in(tokens, value_set=_PALABRAS_VACIAS)))
+    validos = validos.to_numpy(zero_copy_only=False)
+    return tokens.filter(pa.array(validos)), documentos[validos]
+
+
+def _top_terminos(columnas, valores, top):
+    """
+    Posiciones (de `columnas`) de los `top` valores más altos; a igual valor, por columna (orden alfabético).
+    """
+    positivos = np.flatnonzero(valores > 0)
+    if len(positivos) > top:
+        # argpartition acota los candidatos; se conservan todos los empatados con el último
+        umbral = valores[positivos[np.argpartition(-valores[positivos], top - 1)[top - 1]]]
+        positivos = positivos[valores[positivos] >= umbral]
+    return positivos[np.lexsort((columnas[positivos], -valores[positivos]))][:top]
+
+
+def _csr_arreglos(prefijo, matriz):
+    return {f'{prefijo}_data': matriz.data, f'{prefijo}_indices': matriz.indices, f'{prefijo}_indptr': matriz.indptr}
+
+
+def _csr_desde_arreglos(arreglos, prefijo, forma):
+    return sp.csr_matrix((arreglos[f'{prefijo}_data'], arreglos[f'{prefijo}_indices'], arreglos[f'{prefijo}_indptr']),
+                         shape=forma, copy=False)
+
+
+def _reemplazar_filas(matriz, filas, nuevas, n):
+    """
+    CSR de n filas igual a `matriz` (completada con filas vacías) salvo las `filas`, que pasan a ser
+    las de `nuevas`. Es una sola copia de data / indices (sin sumas ni productos dispersos); las
+    columnas son las de `nuevas`, que puede tener más (géneros nuevos).
+    """
+    largos = np.zeros(n, dtype=np.int64)
+    largos[:matriz.shape[0]] = np.diff(matriz.indptr)
+    inicios = np.zeros(n, dtype=np.int64)
+    inicios[:matriz.shape[0]] = matriz.indptr[:-1]
+    largos[filas] = np.diff(nuevas.indptr)
+    inicios[filas] = len(matriz.data) + nuevas.indptr[:-1]
+    indptr = np.concatenate([[0], np.cumsum(largos)])
+    origen = np.repeat(inicios - indptr[:-1], largos) + np.arange(indptr[-1])
+    data = np.concatenate([matriz.data, nuevas.data.astype(matriz.data.dtype)])[origen]
+    indices = np.concatenate([matriz.indices, nuevas.indices.astype(matriz.indices.dtype)])[origen]
+    return sp.csr_matrix((data, indices, indptr), shape=(n, nuevas.shape[1]))
+
+
+class IndiceTexto:
+    """
+    Vocabulario, document frequencies, conteos por campo y TF-IDF de los textos del catálogo.
+
+    El vocabulario y el idf se aprenden una vez con `ajustar`; `transformar` vectoriza textos nuevos
+    con ellos (los términos que no están en el vocabulario se ignoran hasta volver a ajustarlo).
+
+    Parámetros:
+    -----------
+    campos : tuple
+        Columnas de texto de data_movies que se indexan.
+    min_documentos : int
+        Mínimo de películas en las que debe aparecer un término para entrar al vocabulario.
+    """
+
+    def __init__(self, campos=CAMPOS_TEXTO, min_documentos=2):
+        self.campos = tuple(campos)
+        self.min_documentos = min_documentos
+        self.vocabulario = np.empty(0, dtype=object)
+        self.documentos = np.empty(0, dtype=np.int64)
+        self.n_documentos = 0
+
+    @property
+    def idf(self):
+        # idf suavizado (como sklearn): log((1 + n) / (1 + df)) + 1
+        return (np.log((1 + self.n_documentos) / (1 + self.documentos)) + 1).astype(np.float32)
+
+    def _contar(self, tokens, documentos, n):
+        """
+        Matriz de conteos (CSR int32, n x vocabulario) de los tokens que están en el vocabulario.
+        """
+        columnas = pc.fill_null(pc.index_in(tokens, value_set=self._vocabulario), -1).to_numpy()
+        validos = columnas >= 0
+        conteos = sp.csr_matrix((np.ones(int(validos.sum()), dtype=np.int32), (documentos[validos], columnas[validos])),
+                                shape=(n, len(self.vocabulario)))
+        conteos.sum_duplicates()
+        return conteos
+
+    def _pertenencia(self, generos):
+        """
+        Matriz película x género (CSR binaria) de una columna genres; los géneros que no estaban
+        se agregan al final de self.generos.
+        """
+        etiquetas = _aplanar(generos, 'name')
+        for genero in etiquetas.drop_duplicates():
+            if genero.lower() not in self._posicion_genero:
+                self._posicion_genero[genero.lower()] = len(self.generos)
+                self.generos = np.append(self.generos, np.array([genero], dtype=object))
+        columnas = etiquetas.str.lower().map(self._posicion_genero).to_numpy(dtype=np.int64)
+        pertenencia = sp.csr_matrix((np.ones(len(columnas), dtype=np.int32), (etiquetas.index.to_numpy(), columnas)),
+                                    shape=(len(generos), len(self.generos)))
+        pertenencia.data[:] = 1
+        return pertenencia
+
+    def _agregar(self):
+        """
+        Recalcula frecuencias totales y por año / género de cada campo a partir de los conteos.
+        """
+        self.anios_indexados, codigos = np.unique(self.anios, return_inverse=True)
+        por_anio = sp.csr_matrix((np.ones(len(codigos), dtype=np.int32), (codigos, np.arange(len(codigos)))),
+                                 shape=(len(self.anios_indexados), len(codigos)))
+        por_genero = self.pertenencia.T.tocsr()
+        self.frecuencias, self.por_anio, self.por_genero = {}, {}, {}
+        for campo, conteos in self.conteos.items():
+            self.frecuencias[campo] = np.asarray(conteos.sum(axis=0), dtype=np.int64).ravel()
+            self.por_anio[campo] = (por_anio @ conteos).tocsr()
+            self.por_genero[campo] = (por_genero @ conteos).tocsr()
+        self._posicion_anio = {int(a): i for i, a in enumerate(self.anios_indexados)}
+
+    def ajustar(self, df_movies):
+        """
+        Tokeniza los campos de texto (una sola vez), aprende vocabulario y document frequencies,
+        y precalcula conteos y agregados por año y género.
+
+        Parámetros:
+        -----------
+        df_movies : pd.DataFrame
+            Catálogo con los campos de texto, release_year (o release_date) y genres.
+        """
+        n = len(df_movies)
+        tokenizados = {campo: tokenizar(df_movies[campo]) for campo in self.campos}
+
+        # Vocabulario: términos distintos de todos los campos con su document frequency
+        codificado = pc.dictionary_encode(pa.concat_arrays([t for t, _ in tokenizados.values()]))
+        terminos = codificado.dictionary.to_numpy(zero_copy_only=False)
+        presencia = sp.csr_matrix((np.ones(len(codificado), dtype=np.int32),
+                                   (np.concatenate([d for _, d in tokenizados.values()]), codificado.indices.to_numpy())),
+                                  shape=(n, len(terminos)))
+        presencia.sum_duplicates()
+        documentos = np.bincount(presencia.indices, minlength=len(terminos))
+        conservar = np.flatnonzero(documentos >= self.min_documentos)
+        orden = conservar[np.argsort(terminos[conservar], kind='stable')]
+        self.vocabulario = terminos[orden].astype(object)
+        self.documentos = documentos[orden].astype(np.int64)
+        self.n_documentos = n
+        self._vocabulario = pa.array(self.vocabulario, type=pa.string())
+
+        self.conteos = {campo: self._contar(tokens, docs, n) for campo, (tokens, docs) in tokenizados.items()}
+        anios = df_movies['release_year'] if 'release_year' in df_movies.columns else df_movies['release_date'].dt.year
+        self.anios = pd.to_numeric(anios, errors='coerce').fillna(0).to_numpy(dtype=np.int16)
+        self.generos, self._posicion_genero = np.empty(0, dtype=object), {}
+        generos = df_movies['genres'] if 'genres' in df_movies.columns else pd.Series([None] * n)
+        self.pertenencia = self._pertenencia(generos)
+        self._agregar()
+        return self
+
+    def vectorizar(self, conteos):
+        """
+        TF-IDF (CSR float32, filas normalizadas L2) a partir de conteos por campo: tf sublineal
+        (1 + log tf) sobre la suma de los campos, multiplicado por el idf.
+        """
+        tf = sum(conteos[campo] for campo in self.campos).astype(np.float32)
+        tf.data = 1 + np.log(tf.data)
+        tfidf = tf.multiply(self.idf).tocsr()
+        # Sin vocabulario (catálogos muy chicos) no hay columnas que normalizar
+        return (normalize(tfidf) if tfidf.shape[1] else tfidf).astype(np.float32)
+
+    @property
+    def matriz(self):
+        """
+        TF-IDF del catálogo indexado, a partir de los conteos ya calculados (sin volver a tokenizar).
+        """
+        return self.vectorizar(self.conteos)
+
+    def transformar(self, df):
+        """
+        TF-IDF de los textos de df con el vocabulario y el idf ajustados.
+        """
+        return self.vectorizar({campo: self._contar(*tokenizar(df[campo]), len(df)) for campo in self.campos})
+
+    def actualizar(self, filas, df_movies):
+        """
+        Reemplaza (o agrega, si son filas nuevas al final) los conteos, año y géneros de las películas
+        de df_movies, que ocupan las `filas` del catálogo. Los agregados no se recalculan: a las
+        frecuencias y a las filas por año / género se les restan los conteos viejos de esas
+        películas y se les suman los nuevos. El vocabulario y el idf no cambian hasta volver a
+        ajustar el índice.
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        n = max(len(self.anios), int(filas.max()) + 1 if len(filas) else 0)
+        previas = filas[filas < len(self.anios)]
+        conteos = {campo: self._contar(*tokenizar(df_movies[campo]), len(df_movies)) for campo in self.campos}
+        viejos = {campo: self.conteos[campo][previas] for campo in self.campos}
+        pertenencia_vieja, anios_viejos = self.pertenencia[previas], self.anios[previas]
+        pertenencia = self._pertenencia(df_movies['genres'] if 'genres' in df_movies.columns
+                                        else pd.Series([None] * len(df_movies)))
+        anios = df_movies['release_year'] if 'release_year' in df_movies.columns else df_movies['release_date'].dt.year
+        anios = pd.to_numeric(anios, errors='coerce').fillna(0).to_numpy(dtype=np.int16)
+
+        # Años que no estaban: filas vacías al final de por_anio (anios_indexados deja de estar ordenado)
+        for anio in np.unique(anios):
+            if int(anio) not in self._posicion_anio:
+                self._posicion_anio[int(anio)] = len(self.anios_indexados)
+                self.anios_indexados = np.append(self.anios_indexados, np.array([anio], dtype=self.anios_indexados.dtype))
+        # Matrices año x película y género x película de las películas viejas y de las nuevas
+        n_anios, n_generos = len(self.anios_indexados), len(self.generos)
+
+        def por_anio(valores):
+            codigos = np.array([self._posicion_anio[int(a)] for a in valores], dtype=np.int64)
+            return sp.csr_matrix((np.ones(len(codigos), dtype=np.int32), (codigos, np.arange(len(codigos)))),
+                                 shape=(n_anios, len(codigos)))
+
+        def por_genero(matriz):
+            return sp.csr_matrix((matriz.data, matriz.indices, matriz.indptr), shape=(matriz.shape[0], n_generos)).T.tocsr()
+
+        def sumar(matriz, delta):
+            matriz = sp.csr_matrix((matriz.data, matriz.indices, matriz.indptr), shape=(matriz.shape[0], delta.shape[1]))
+            if matriz.shape[0] < delta.shape[0]:
+                matriz = sp.vstack([matriz, sp.csr_matrix((delta.shape[0] - matriz.shape[0], delta.shape[1]),
+                                                          dtype=matriz.dtype)])
+            resultado = (matriz + delta).tocsr().astype(np.int32)
+            resultado.eliminate_zeros()
+            return resultado
+
+        for campo in self.campos:
+            nuevos, quitados = conteos[campo], viejos[campo]
+            self.frecuencias[campo] = (self.frecuencias[campo] + np.asarray(nuevos.sum(axis=0), dtype=np.int64).ravel()
+                                       - np.asarray(quitados.sum(axis=0), dtype=np.int64).ravel())
+            self.por_anio[campo] = sumar(self.por_anio[campo], por_anio(anios) @ nuevos - por_anio(anios_viejos) @ quitados)
+            self.por_genero[campo] = sumar(self.por_genero[campo],
+                                           por_genero(pertenencia) @ nuevos - por_genero(pertenencia_vieja) @ quitados)
+            self.conteos[campo] = _reemplazar_filas(self.conteos[campo], filas, nuevos, n)
+        self.pertenencia = _reemplazar_filas(self.pertenencia, filas, pertenencia, n)
+        self.anios = np.concatenate([self.anios, np.zeros(n - len(self.anios), dtype=np.int16)])
+        self.anios[filas] = anios
+
+    def palabras_frecuentes(self, top=20, campo='title', anio=None, genero=None):
+        """
+        Términos más frecuentes de un campo, en todo el catálogo, en un año de estreno o en un género.
+
+        Parámetros:
+        -----------
+        top : int
+            Cantidad de términos.
+        campo : str
+            Campo de texto ('title' u 'overview').
+        anio : int, opcional
+            Año de estreno.
+        genero : str, opcional
+            Nombre del género (sin distinguir mayúsculas). Con año y género a la vez se suman las
+            filas de las películas que cumplen ambos.
+
+        Retorno:
+        --------
+        list
+            Lista de diccionarios {palabra, frecuencia}. Lanza ValueError si el campo o el género
+            no existen.
+        """
+        if campo not in self.conteos:
+            raise ValueError(f"El campo '{campo}' no está indexado. Opciones: {', '.join(self.campos)}.")
+        if genero is not None and genero.lower() not in self._posicion_genero:
+            raise ValueError(f"El género '{genero}' no existe en el catálogo.")
+        top = max(int(top), 0)
+        if anio is not None and genero is not None:
+            filas = (self.anios == anio) & (np.asarray(self.pertenencia[:, self._posicion_genero[genero.lower()]]
+                                                       .todense()).ravel() > 0)
+            valores = np.asarray(self.conteos[campo][np.flatnonzero(filas)].sum(axis=0), dtype=np.int64).ravel()
+            columnas = np.arange(len(valores))
+        elif anio is not None or genero is not None:
+            if anio is not None:
+                matriz, fila = self.por_anio[campo], self._posicion_anio.get(int(anio))
+            else:
+                matriz, fila = self.por_genero[campo], self._posicion_genero[genero.lower()]
+            if fila is None:
+                return []
+            inicio, fin = matriz.indptr[fila], matriz.indptr[fila + 1]
+            columnas, valores = np.asarray(matriz.indices[inicio:fin]), np.asarray(matriz.data[inicio:fin])
+        else:
+            valores = self.frecuencias[campo]
+            columnas = np.arange(len(valores))
+        if top == 0:
+            return []
+        mejores = _top_terminos(columnas, valores, top)
+        return [{'palabra': self.vocabulario[c], 'frecuencia': int(v)} for c, v in zip(columnas[mejores], valores[mejores])]
+
+    def arreglos(self):
+        """
+        Arreglos NumPy del índice (para persistirlo en el snapshot).
+        """
+        arreglos = {'vocabulario': self.vocabulario.astype(str), 'documentos': self.documentos,
+                    'parametros': np.array([self.n_documentos, self.min_documentos], dtype=np.int64),
+                    'campos': np.array(self.campos, dtype=str), 'anios': self.anios,
+                    'anios_indexados': self.anios_indexados, 'generos': self.generos.astype(str)}
+        arreglos.update(_csr_arreglos('pertenencia', self.pertenencia))
+        for campo in self.campos:
+            arreglos.update(_csr_arreglos(f'conteos_{campo}', self.conteos[campo]))
+            arreglos.update(_csr_arreglos(f'anio_{campo}', self.por_anio[campo]))
+            arreglos.update(_csr_arreglos(f'genero_{campo}', self.por_genero[campo]))
+        return arreglos
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        """
+        Reconstruye el índice a partir de `arreglos()` (p. ej. mapeados en memoria desde el snapshot).
+        """
+        n_documentos, min_documentos = (int(v) for v in arreglos['parametros'])
+        indice = cls([str(c) for c in arreglos['campos']], min_documentos)
+        indice.vocabulario = np.asarray(arreglos['vocabulario'], dtype=object)
+        indice._vocabulario = pa.array(indice.vocabulario, type=pa.string())
+        indice.documentos, indice.n_documentos = arreglos['documentos'], n_documentos
+        indice.anios, indice.anios_indexados = arreglos['anios'], arreglos['anios_indexados']
+        indice.generos = np.asarray(arreglos['generos'], dtype=object)
+        indice._posicion_genero = {str(g).lower(): i for i, g in enumerate(indice.generos)}
+        indice._posicion_anio = {int(a): i for i, a in enumerate(indice.anios_indexados)}
+        n, v = len(indice.anios), len(indice.vocabulario)
+        indice.pertenencia = _csr_desde_arreglos(arreglos, 'pertenencia', (n, len(indice.generos)))
+        indice.conteos, indice.por_anio, indice.por_genero, indice.frecuencias = {}, {}, {}, {}
+        for campo in indice.campos:
+            indice.conteos[campo] = _csr_desde_arreglos(arreglos, f'conteos_{campo}', (n, v))
+            indice.por_anio[campo] = _csr_desde_arreglos(arreglos, f'anio_{campo}', (len(indice.anios_indexados), v))
+            indice.por_genero[campo] = _csr_desde_arreglos(arreglos, f'genero_{campo}', (len(indice.generos), v))
+            indice.frecuencias[campo] = np.asarray(indice.por_anio[campo].sum(axis=0), dtype=np.int64).ravel()
+        return indice
+
+    @property
+    def nbytes(self):
+        return sum(np.asarray(arreglo).nbytes for arreglo in self.arreglos().values())
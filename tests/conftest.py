@@ -0,0 +1,137 @@
+# Datos de prueba: un movies_dataset.csv y un credits.csv chicos (mismo formato que los crudos de Kaggle)
+# generados con una semilla fija, procesados una sola vez por sesión con el pipeline del ETL
+# (src/pipeline.py), que publica data_movies / data_cast / data_crew y el snapshot.
+
+import os
+import sys
+import shutil
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+GENEROS = ['Drama', 'Comedy', 'Action', 'Animation', 'Romance', 'Thriller']
+COMPANIAS = ['Pixar', 'Warner Bros.', 'Paramount', 'Gaumont', 'Toho']
+PAISES = [('US', 'United States of America'), ('FR', 'France'), ('JP', 'Japan')]
+IDIOMAS = [('en', 'English'), ('fr', 'Français'), ('ja', '日本語')]
+ACTORES = [f'Actor {i}' for i in range(40)] + ['Tom Hanks']
+DIRECTORES = [f'Director {i}' for i in range(12)] + ['John Lasseter']
+JOBS = ['Producer', 'Screenplay', 'Editor', 'Original Music Composer']
+PALABRAS = ['love', 'war', 'city', 'night', 'family', 'story', 'dream', 'space', 'friend', 'secret']
+N_PELICULAS = 160
+
+
+def _lista(rng, pool, maximo, clave='name', codigo=None):
+    elegidos = rng.choice(len(pool), size=rng.integers(0, maximo + 1), replace=False)
+    if codigo:
+        return str([{codigo: pool[i][0], 'name': pool[i][1]} for i in sorted(elegidos)])
+    return str([{'id': int(i) + 1, clave: pool[i]} for i in sorted(elegidos)])
+
+
+def generar_crudos(directorio, n=N_PELICULAS, semilla=7):
+    """
+    Escribe movies_dataset.csv y credits.csv en `directorio`. Incluye un id repetido, una fecha
+    inválida y un presupuesto no numérico, como los crudos reales.
+    """
+    rng = np.random.default_rng(semilla)
+    ids = np.arange(1, n + 1) * 3
+    titulos = [' '.join(rng.choice(PALABRAS, size=2)).title() + f' {i}' for i in range(n)]
+    titulos[0], titulos[1] = 'Toy Story', 'Jumanji'
+    fechas = pd.Timestamp('1980-01-01') + pd.to_timedelta(rng.integers(0, 40 * 365, n), unit='D')
+    movies = pd.DataFrame({
+        'adult': False,
+        'belongs_to_collection': None,
+        'budget': np.where(rng.random(n) < 0.6, rng.integers(1, 200, n) * 1_000_000, 0).astype(str),
+        'genres': [_lista(rng, GENEROS, 3) for _ in range(n)],
+        'homepage': None,
+        'id': ids.astype(str),
+        'imdb_id': 'tt',
+        'original_language': rng.choice([c for c, _ in IDIOMAS], n),
+        'original_title': titulos,
+        'overview': [' '.join(rng.choice(PALABRAS, size=8)) for _ in range(n)],
+        'popularity': rng.exponential(5, n).round(3),
+        'poster_path': 'p',
+        'production_companies': [_lista(rng, COMPANIAS, 2) for _ in range(n)],
+        'production_countries': [_lista(rng, PAISES, 2, codigo='iso_3166_1') for _ in range(n)],
+        'release_date': fechas.strftime('%Y-%m-%d'),
+        'revenue': np.where(rng.random(n) < 0.6, rng.integers(1, 900, n) * 1_000_000, 0).astype(float),
+        'runtime': rng.normal(105, 20, n).round(),
+        'spoken_languages': [_lista(rng, IDIOMAS, 2, codigo='iso_639_1') for _ in range(n)],
+        'status': 'Released',
+        'tagline': 't',
+        'title': titulos,
+        'video': False,
+        'vote_average': rng.uniform(3, 9, n).round(1),
+        'vote_count': np.where(rng.random(n) < 0.2, rng.integers(2000, 9000, n), rng.integers(0, 1500, n)),
+    })
+    movies.loc[5, 'budget'] = 'x'
+    movies.loc[7, 'release_date'] = None
+    movies = pd.concat([movies, movies.iloc[[3]]], ignore_index=True)
+
+    cast, crew = [], []
+    for i, movie_id in enumerate(ids):
+        # El ETL conserva solo el primer elemento de cast y de crew (etl.extraer_campo): Tom Hanks
+        # encabeza el reparto de las 3 primeras películas y John Lasseter dirige las 4 primeras
+        actores = rng.choice(ACTORES[:-1], size=rng.integers(1, 6), replace=False).tolist()
+        if i < 3:
+            actores.insert(0, 'Tom Hanks')
+        cast.append(str([{'cast_id': j, 'character': 'c', 'credit_id': 'x', 'gender': 2, 'id': ACTORES.index(a),
+                          'name': a, 'order': j, 'profile_path': None} for j, a in enumerate(dict.fromkeys(actores))]))
+        equipo = [('Directing', 'Director', 'John Lasseter' if i < 4 else str(rng.choice(DIRECTORES[:-1])))]
+        equipo += [('Crew', str(job), str(rng.choice(ACTORES + DIRECTORES))) for job in rng.choice(JOBS, size=2)]
+        crew.append(str([{'credit_id': 'y', 'department': d, 'gender': 2, 'id': 1, 'job': j, 'name': nombre,
+                          'profile_path': None} for d, j, nombre in equipo]))
+    credits = pd.DataFrame({'cast': cast, 'crew': crew, 'id': ids})
+
+    os.makedirs(directorio, exist_ok=True)
+    movies.to_csv(os.path.join(directorio, 'movies_dataset.csv'), index=False)
+    credits.to_csv(os.path.join(directorio, 'credits.csv'), index=False)
+    return directorio
+
+
+@pytest.fixture(scope='session')
+def crudos(tmp_path_factory):
+    return generar_crudos(str(tmp_path_factory.mktemp('crudos_raw')))
+
+
+@pytest.fixture(scope='session')
+def datos(tmp_path_factory, crudos):
+    """
+    Carpeta con transformados_processed/ (parquet + snapshot) generada por el pipeline del ETL.
+    """
+    from src.pipeline import pipeline_etl
+    raiz = tmp_path_factory.mktemp('proyecto')
+    destino = os.path.join(raiz, 'transformados_processed')
+    pipeline_etl(crudos, destino, os.path.join(raiz, '.cache_etl')).ejecutar()
+    return str(raiz)
+
+
+@pytest.fixture
+def copia_datos(datos, tmp_path):
+    """
+    Copia de la carpeta de `datos` para las pruebas que escriben (API de ingesta, compactación).
+    """
+    destino = os.path.join(tmp_path, 'proyecto')
+    shutil.copytree(datos, destino)
+    return destino
+
+
+@pytest.fixture
+def cargar_app(monkeypatch):
+    """
+    Retorna una función que importa main.py desde cero con el motor indicado y los datos de `raiz`
+    (el directorio de trabajo pasa a ser `raiz`, como al levantar la API en el proyecto).
+    """
+    def cargar(raiz, motor='pandas', **entorno):
+        monkeypatch.chdir(raiz)
+        monkeypatch.setenv('MOTOR_CONSULTAS', motor)
+        for variable, valor in entorno.items():
+            monkeypatch.setenv(variable, valor)
+        sys.modules.pop('main', None)
+        return importlib.import_module('main')
+    yield cargar
+    sys.modules.pop('main', None)
@@ -0,0 +1,175 @@
+# Modo aproximado (src/aproximado.py) contra ConsultasExactas sobre el catálogo de prueba: cada respuesta
+# de ConsultasAproximadas debe quedar dentro de la cota de error que reporta (HyperLogLog dentro de
+# `error`, cuantiles dentro de `error_relativo`, count-min sin subestimar nunca).
+
+import os
+import ast
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src.etl import cargar_parquet
+from src.grafo import GrafoCreditos
+from src.aproximado import (DIMENSIONES, METRICAS_APROXIMADAS, RELACIONES, ConsultasAproximadas, ConsultasExactas,
+                            _estimar_hll, _hll)
+
+
+@pytest.fixture(scope='module')
+def catalogo(datos, crudos):
+    # Todos los créditos de credits.csv (el ETL conserva solo el primero de cada lista) para que los
+    # estratos tengan varias personas y jobs
+    df_movies = cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+    credits = pd.read_csv(os.path.join(crudos, 'credits.csv'))
+    df_cast, df_crew = (pd.DataFrame([{'movie_id': fila.id, **credito} for fila in credits.itertuples()
+                                      for credito in ast.literal_eval(getattr(fila, columna))])
+                        for columna in ('cast', 'crew'))
+    return df_movies, GrafoCreditos(df_cast, df_crew, df_movies)
+
+
+@pytest.fixture(scope='module')
+def exactas(catalogo):
+    return ConsultasExactas(*catalogo)
+
+
+@pytest.fixture(scope='module')
+def aproximadas(catalogo):
+    return ConsultasAproximadas(*catalogo)
+
+
+def _por_grupo(respuesta):
+    return {grupo['grupo']: grupo for grupo in respuesta['grupos']}
+
+
+@pytest.mark.parametrize('relacion', RELACIONES)
+@pytest.mark.parametrize('por', DIMENSIONES)
+def test_personas_distintas_dentro_del_error(exactas, aproximadas, relacion, por):
+    exacto = exactas.personas_distintas(relacion, por)
+    aproximado = aproximadas.personas_distintas(relacion, por)
+    assert aproximado['aproximado'] and not exacto['aproximado']
+    esperados = _por_grupo(exacto)
+    assert _por_grupo(aproximado).keys() == esperados.keys()
+    for grupo, estimado in _por_grupo(aproximado).items():
+        assert abs(estimado['valor'] - esperados[grupo]['valor']) <= estimado['error']
+    if por == 'anio':
+        assert abs(aproximado['total']['valor'] - exacto['total']['valor']) <= aproximado['total']['error']
+    else:
+        assert aproximado['total'] is None
+
+
+def test_hll_con_cardinalidades_grandes():
+    # El catálogo de prueba solo ejercita el conteo lineal: acá el estimador bruto, con la misma cota
+    # que reporta personas_distintas (1.96 errores estándar de 1.04 / sqrt(m))
+    rng = np.random.default_rng(3)
+    cardinalidades = np.array([5_000, 40_000, 150_000])
+    hashes = rng.integers(0, 2**63, size=cardinalidades.sum(), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    estratos = np.repeat(np.arange(len(cardinalidades)), cardinalidades)
+    registros = _hll(estratos, hashes, len(cardinalidades), 12)
+    estimados = _estimar_hll(registros)
+    cota = 1.96 * 1.04 / np.sqrt(registros.shape[1])
+    assert np.all(np.abs(estimados - cardinalidades) <= np.ceil(cota * estimados))
+    # Los repetidos no cambian los registros (máximo por registro)
+    repetidos = _hll(np.concatenate([estratos, estratos]), np.concatenate([hashes, hashes]), len(cardinalidades), 12)
+    assert np.array_equal(repetidos, registros)
+
+
+@pytest.mark.parametrize('metrica', list(METRICAS_APROXIMADAS))
+@pytest.mark.parametrize('por', DIMENSIONES)
+def test_cuantiles_dentro_del_error_relativo(exactas, aproximadas, metrica, por):
+    cuantiles = [0, 0.1, 0.5, 0.75, 0.99, 1]
+    exacto = exactas.cuantiles(metrica, por, cuantiles=cuantiles)
+    aproximado = aproximadas.cuantiles(metrica, por, cuantiles=cuantiles)
+    esperados = _por_grupo(exacto)
+    assert _por_grupo(aproximado).keys() == esperados.keys()
+    pares = [(g, esperados[clave]) for clave, g in _por_grupo(aproximado).items()]
+    if por == 'anio':
+        pares.append((aproximado['total'], exacto['total']))
+    for estimado, esperado in pares:
+        assert estimado['cantidad'] == esperado['cantidad']
+        assert estimado['cuantiles'].keys() == esperado['cuantiles'].keys()
+        for nombre, valor in esperado['cuantiles'].items():
+            # Los valores <= 0 caen en el bucket del 0; el resto, dentro del error relativo (más el redondeo)
+            cota = estimado['error_relativo'] * abs(valor) + 1e-4 if valor > 0 else 1e-4
+            assert abs(estimado['cuantiles'][nombre] - max(valor, 0)) <= cota
+
+
+def test_cuantiles_con_filtros(exactas, aproximadas):
+    for filtros in ({'por': 'anio', 'desde': 1990, 'hasta': 1999}, {'por': 'genero', 'genero': 'drama'}):
+        exacto = exactas.cuantiles('presupuesto', cuantiles='0.5', **filtros)
+        aproximado = aproximadas.cuantiles('presupuesto', cuantiles='0.5', **filtros)
+        assert list(_por_grupo(aproximado)) == list(_por_grupo(exacto))
+        assert len(exacto['grupos']) > 0
+
+
+@pytest.mark.parametrize('ancho', [2048, 2])
+@pytest.mark.parametrize('por', DIMENSIONES)
+def test_count_min_nunca_subestima(catalogo, exactas, por, ancho):
+    # Con ancho 2 los jobs colisionan: las cantidades crecen pero nunca quedan por debajo de las exactas
+    aproximadas = ConsultasAproximadas(*catalogo, ancho=ancho, muestra_creditos=3)
+    exacto = exactas.jobs_frecuentes(por, top=1000)
+    aproximado = aproximadas.jobs_frecuentes(por, top=1000)
+    esperados = _por_grupo(exacto)
+    assert _por_grupo(aproximado).keys() == esperados.keys()
+    pares = [(g, esperados[clave]) for clave, g in _por_grupo(aproximado).items()]
+    if por == 'anio':
+        pares.append((aproximado['total'], exacto['total']))
+    excesos = []
+    for estimado, esperado in pares:
+        assert estimado['creditos'] == esperado['creditos']
+        cantidades = {valor['job']: valor['cantidad'] for valor in esperado['valores']}
+        assert estimado['valores']
+        for valor in estimado['valores']:
+            excesos.append(valor['cantidad'] - cantidades[valor['job']])
+            if ancho == 2048:
+                assert excesos[-1] <= estimado['error']
+    assert min(excesos) >= 0
+    assert (max(excesos) > 0) == (ancho == 2)
+
+
+def test_top_de_jobs(exactas, aproximadas):
+    for consultas in (exactas, aproximadas):
+        respuesta = consultas.jobs_frecuentes('genero', top=2)
+        assert all(len(grupo['valores']) <= 2 for grupo in respuesta['grupos'])
+        assert all(len(grupo['valores']) == 1 for grupo in consultas.jobs_frecuentes('anio', top='1')['grupos'])
+
+
+def test_desde_arreglos(aproximadas):
+    arreglos = aproximadas.arreglos()
+    reconstruida = ConsultasAproximadas.desde_arreglos(arreglos)
+    assert reconstruida.arreglos().keys() == arreglos.keys()
+    for nombre, arreglo in reconstruida.arreglos().items():
+        np.testing.assert_array_equal(arreglo, arreglos[nombre])
+    assert reconstruida.nbytes == aproximadas.nbytes
+    consultas = [('personas_distintas', {'relacion': 'crew', 'por': 'genero'}),
+                 ('cuantiles', {'metrica': 'retorno', 'por': 'anio', 'desde': 1985}),
+                 ('jobs_frecuentes', {'por': 'genero', 'genero': 'Comedy', 'top': 3}),
+                 ('promedio', {'metrica': 'puntaje', 'por': 'anio'})]
+    for consulta, parametros in consultas:
+        assert getattr(reconstruida, consulta)(**parametros) == getattr(aproximadas, consulta)(**parametros)
+
+
+@pytest.mark.parametrize('consulta,parametros', [
+    ('personas_distintas', {'por': 'decada'}),
+    ('personas_distintas', {'relacion': 'productores'}),
+    ('personas_distintas', {'por': 'genero', 'genero': 'Western'}),
+    ('personas_distintas', {'por': 'anio', 'genero': 'Drama'}),
+    ('promedio', {'por': 'genero', 'desde': 1990}),
+    ('promedio', {'metrica': 'duracion'}),
+    ('cuantiles', {'cuantiles': '0.5,1.5'}),
+    ('cuantiles', {'cuantiles': 'mediana'}),
+    ('cuantiles', {'cuantiles': []}),
+    ('jobs_frecuentes', {'top': 0}),
+    ('jobs_frecuentes', {'top': -3}),
+])
+def test_parametros_invalidos(exactas, aproximadas, consulta, parametros):
+    for consultas in (exactas, aproximadas):
+        with pytest.raises(ValueError):
+            getattr(consultas, consulta)(**parametros)
+
+
+def test_api_informa_parametros_invalidos(datos, cargar_app):
+    cliente = TestClient(cargar_app(datos, 'pandas').app)
+    for aproximado in ('false', 'true'):
+        respuesta = cliente.get(f'/analitica/jobs_frecuentes?top=-1&aproximado={aproximado}')
+        assert respuesta.status_code == 200
+        assert 'top debe ser un entero positivo' in respuesta.json()['resultado']
@@ -0,0 +1,129 @@
+# Codificación de src/codificacion.py: CodificadorMultietiqueta debe dar la misma matriz por el camino
+# pandas (listas de diccionarios) y por el camino Arrow (ColumnaAnidada), igual a un one-hot hecho con
+# pandas, y TransformadorNumerico debe reproducir en float32 el recorte / log1p / escalado robusto
+# calculado columna a columna, también después de guardarlo y cargarlo.
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl import cargar_anidado, cargar_parquet
+from src.codificacion import COLUMNAS_NUMERICAS, CodificadorMultietiqueta, TransformadorNumerico
+
+CAMPOS = ['genres', 'production_companies', 'production_countries', 'spoken_languages']
+
+
+@pytest.fixture(scope='module')
+def ruta_movies(datos):
+    return os.path.join(datos, 'transformados_processed', 'data_movies.parquet')
+
+
+@pytest.fixture(scope='module')
+def df_movies(ruta_movies):
+    return cargar_parquet(ruta_movies)
+
+
+def _one_hot(serie, campo='name'):
+    # Referencia densa: explode + get_dummies, una columna por etiqueta y 1 si la fila la tiene
+    etiquetas = serie.reset_index(drop=True).explode().dropna().str.get(campo).dropna()
+    return pd.get_dummies(etiquetas).groupby(level=0).max().reindex(range(len(serie)), fill_value=False)
+
+
+@pytest.mark.parametrize('campo', CAMPOS)
+def test_multietiqueta_igual_a_one_hot(df_movies, ruta_movies, campo):
+    anidada = cargar_anidado(ruta_movies, campo)
+    pandas = CodificadorMultietiqueta().ajustar(df_movies[campo])
+    arrow = CodificadorMultietiqueta().ajustar(anidada)
+    # Mismo vocabulario y frecuencias por los dos caminos (el orden de los empates puede variar)
+    assert dict(zip(pandas.vocabulario, pandas.frecuencias)) == dict(zip(arrow.vocabulario, arrow.frecuencias))
+    assert np.all(np.diff(pandas.frecuencias) <= 0) and np.all(np.diff(arrow.frecuencias) <= 0)
+
+    esperada = _one_hot(df_movies[campo])
+    for codificador in (pandas, arrow):
+        for columna in (df_movies[campo], anidada):
+            matriz = codificador.transformar(columna)
+            assert matriz.format == 'csr' and matriz.dtype == np.float32
+            assert matriz.shape == (len(df_movies), len(codificador.vocabulario))
+            densa = pd.DataFrame(matriz.toarray(), columns=codificador.vocabulario)
+            np.testing.assert_array_equal(densa[esperada.columns].to_numpy(), esperada.to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(pandas.frecuencias, esperada.sum().reindex(pandas.vocabulario).to_numpy())
+
+
+def test_multietiqueta_min_frecuencia_y_desconocidas(df_movies, ruta_movies, tmp_path):
+    codificador = CodificadorMultietiqueta(min_frecuencia=3).ajustar(df_movies['production_companies'])
+    conteos = _one_hot(df_movies['production_companies']).sum()
+    assert set(codificador.vocabulario) == set(conteos[conteos >= 3].index)
+    np.testing.assert_array_equal(codificador.transformar(cargar_anidado(ruta_movies, 'production_companies')).toarray(),
+                                  codificador.transformar(df_movies['production_companies']).toarray())
+
+    nuevas = pd.Series([[{'name': 'Drama'}, {'name': 'Drama'}, {'name': 'Inexistente'}], None, []])
+    generos = CodificadorMultietiqueta().ajustar(df_movies['genres'])
+    matriz = generos.transformar(nuevas)
+    # Las repetidas cuentan una vez y las desconocidas o los nulos no agregan columnas
+    assert matriz.sum() == 1 and matriz[0, list(generos.vocabulario).index('Drama')] == 1
+
+    ruta = str(tmp_path / 'genres.json')
+    generos.guardar(ruta)
+    cargado = CodificadorMultietiqueta.cargar(ruta)
+    np.testing.assert_array_equal(cargado.vocabulario, generos.vocabulario)
+    assert (cargado.transformar(df_movies['genres']) != generos.transformar(df_movies['genres'])).nnz == 0
+    reporte = cargado.reporte_frecuencias(top=2)
+    assert len(reporte) == 2 and reporte['proporcion'].iloc[0] == generos.frecuencias[0] / generos.frecuencias.sum()
+
+
+def _referencia(df, columnas, cuantiles):
+    # Los mismos pasos de TransformadorNumerico, columna a columna con pandas y en float64
+    resultado = {}
+    for columna, log in columnas.items():
+        x = pd.to_numeric(df[columna], errors='coerce').astype(float)
+        x = x.fillna(x.median() if x.notna().any() else 0)
+        x = x.clip(*x.quantile(list(cuantiles)))
+        if log:
+            x = np.log1p(x.clip(lower=0))
+        q1, q3 = x.quantile([0.25, 0.75])
+        escala = q3 - q1 if q3 > q1 else (x.max() - x.min() or 1.0)
+        resultado[columna] = (x - x.median()) / escala
+    return pd.DataFrame(resultado).to_numpy()
+
+
+def test_numerico_igual_a_referencia(df_movies):
+    transformador = TransformadorNumerico().ajustar(df_movies)
+    x = transformador.transformar(df_movies)
+    assert x.dtype == np.float32 and x.shape == (len(df_movies), len(COLUMNAS_NUMERICAS))
+    for nombre in ('imputacion', 'minimos', 'maximos', 'centros', 'escalas'):
+        assert getattr(transformador, nombre).dtype == np.float32
+    np.testing.assert_allclose(x, _referencia(df_movies, COLUMNAS_NUMERICAS, (0.01, 0.99)), rtol=1e-4, atol=1e-4)
+    assert list(transformador.reporte().index) == list(COLUMNAS_NUMERICAS)
+
+
+def test_numerico_nulos_y_escala_cero():
+    columnas = {'a': True, 'b': False, 'c': False}
+    df = pd.DataFrame({'a': [0, 0, 0, 0, 0, 0, 5e8], 'b': [1, np.nan, 3, 'x', 5, 6, 7],
+                       'c': [2.0] * 7})
+    transformador = TransformadorNumerico(columnas, cuantiles=(0.0, 1.0)).ajustar(df)
+    x = transformador.transformar(df)
+    assert np.isfinite(x).all()
+    # a: rango intercuartil 0 -> se divide por el rango; c: constante -> escala 1
+    np.testing.assert_array_equal(transformador.escalas[[0, 2]], np.float32([np.log1p(5e8), 1.0]))
+    np.testing.assert_allclose(x, _referencia(df, columnas, (0.0, 1.0)), rtol=1e-5, atol=1e-6)
+
+    # Una película que llega sola (API de ingesta) usa los parámetros ajustados, no los suyos
+    np.testing.assert_array_equal(transformador.transformar(df.iloc[[1]]), x[[1]])
+    with pytest.raises(ValueError, match='Faltan columnas numéricas: c'):
+        transformador.transformar(df[['a', 'b']])
+    with pytest.raises(ValueError, match='vacío'):
+        TransformadorNumerico(columnas).ajustar(df.iloc[:0])
+
+
+def test_numerico_guardar_cargar(df_movies, tmp_path):
+    transformador = TransformadorNumerico().ajustar(df_movies)
+    ruta = str(tmp_path / 'numericas.json')
+    transformador.guardar(ruta)
+    cargado = TransformadorNumerico.cargar(ruta)
+    assert cargado.columnas == transformador.columnas and cargado.cuantiles == transformador.cuantiles
+    for nombre in ('imputacion', 'minimos', 'maximos', 'centros', 'escalas'):
+        np.testing.assert_array_equal(getattr(cargado, nombre), getattr(transformador, nombre))
+        assert getattr(cargado, nombre).dtype == np.float32
+    np.testing.assert_array_equal(cargado.transformar(df_movies), transformador.transformar(df_movies))
+    np.testing.assert_array_equal(cargado.transformar(df_movies.iloc[:5]), transformador.transformar(df_movies)[:5])
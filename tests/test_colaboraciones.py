@@ -0,0 +1,117 @@
+# Colaboraciones (src/colaboraciones.py): las filas de las matrices persona x persona deben coincidir con
+# un self-join de data_cast / data_crew por movie_id (una vez por película y persona, personas
+# identificadas por su nombre normalizado) con la suma del return de las películas compartidas.
+
+import os
+import ast
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl import cargar_parquet, normalizar_nombre
+from src.grafo import GrafoCreditos
+from src.colaboraciones import GrafoColaboraciones
+
+PERSONAS = ['Tom Hanks', 'tom hanks', 'John Lasseter', 'Actor 3', 'Actor 17', 'Director 5']
+
+
+@pytest.fixture(scope='module')
+def tablas(datos, crudos):
+    # El ETL conserva solo el primer crédito de cada lista; acá se usan todos, para que haya repartos
+    # compartidos y personas repetidas en una misma película (varios jobs de crew)
+    df_movies = cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+    credits = pd.read_csv(os.path.join(crudos, 'credits.csv'))
+    df_cast, df_crew = (pd.DataFrame([{'movie_id': fila.id, **credito} for fila in credits.itertuples()
+                                      for credito in ast.literal_eval(getattr(fila, columna))])
+                        for columna in ('cast', 'crew'))
+    return df_movies, df_cast, df_crew
+
+
+@pytest.fixture(scope='module')
+def colaboraciones(tablas):
+    df_movies, df_cast, df_crew = tablas
+    return GrafoColaboraciones(GrafoCreditos(df_cast, df_crew, df_movies), df_movies['return'].to_numpy())
+
+
+def _creditos(df):
+    return df.assign(persona=df['name'].map(normalizar_nombre))[['movie_id', 'persona']].drop_duplicates()
+
+
+def _self_join(izquierda, derecha, df_movies, excluir_diagonal):
+    retornos = df_movies.set_index('movie_id')['return'].fillna(0)
+    pares = izquierda.merge(derecha, on='movie_id', suffixes=('', '_otra'))
+    if excluir_diagonal:
+        pares = pares[pares['persona'] != pares['persona_otra']]
+    pares = pares.assign(retorno=pares['movie_id'].map(retornos).fillna(0))
+    agregado = pares.groupby(['persona', 'persona_otra']).agg(peliculas=('movie_id', 'size'), total=('retorno', 'sum'))
+    return {par: (fila.peliculas, fila.total) for par, fila in zip(agregado.index, agregado.itertuples())}
+
+
+@pytest.fixture(scope='module')
+def esperados(tablas):
+    df_movies, df_cast, df_crew = tablas
+    cast = _creditos(df_cast)
+    todos = _creditos(df_cast).merge(_creditos(df_crew), how='outer')
+    directores = _creditos(df_crew[df_crew['job'] == 'Director'])
+    return {'cast': _self_join(cast, cast, df_movies, True), 'todos': _self_join(todos, todos, df_movies, True),
+            'director_actor': _self_join(directores, cast, df_movies, False)}
+
+
+def _comparar(obtenido, esperado):
+    assert obtenido.keys() == esperado.keys()
+    for clave, (peliculas, total) in esperado.items():
+        assert obtenido[clave][0] == peliculas, clave
+        assert obtenido[clave][1] == pytest.approx(total, abs=0.006), clave
+
+
+@pytest.mark.parametrize('matriz', ['todos', 'cast', 'director_actor'])
+@pytest.mark.parametrize('nombre', PERSONAS)
+def test_colaboradores_igual_a_self_join(colaboraciones, esperados, nombre, matriz):
+    resultado = colaboraciones.colaboradores(nombre, top=10_000, matriz=matriz)
+    persona = normalizar_nombre(nombre)
+    esperado = {otra: valores for (una, otra), valores in esperados[matriz].items() if una == persona}
+    _comparar({normalizar_nombre(fila['nombre']): (fila['peliculas'], fila['retorno_total']) for fila in resultado},
+              esperado)
+    claves = [(-fila['peliculas'], -fila['retorno_total']) for fila in resultado]
+    assert claves == sorted(claves)
+    for fila in resultado:
+        assert fila['retorno_promedio'] == pytest.approx(fila['retorno_total'] / fila['peliculas'], abs=0.01)
+
+
+def test_top_y_minimo_de_peliculas(colaboraciones):
+    completo = colaboraciones.colaboradores('Tom Hanks', top=10_000)
+    assert colaboraciones.colaboradores('Tom Hanks', top=3) == completo[:3]
+    assert colaboraciones.colaboradores('Tom Hanks', top=10_000, min_peliculas=2) == \
+        [fila for fila in completo if fila['peliculas'] >= 2]
+    assert colaboraciones.colaboradores('Nadie Conocido') is None
+
+
+def test_pares_director_actor_igual_a_self_join(colaboraciones, esperados):
+    pares = colaboraciones.pares_director_actor(top=10_000, min_peliculas=2)
+    esperado = {par: valores for par, valores in esperados['director_actor'].items() if valores[0] >= 2}
+    _comparar({(normalizar_nombre(par['director']), normalizar_nombre(par['actor'])): (par['peliculas'], par['retorno_total'])
+               for par in pares}, esperado)
+    promedios = [par['retorno_promedio'] for par in pares]
+    assert promedios == sorted(promedios, reverse=True)
+    assert colaboraciones.pares_director_actor(top=2, min_peliculas=2) == pares[:2]
+
+
+def test_top_no_positivo(colaboraciones):
+    for top in (0, -2):
+        with pytest.raises(ValueError):
+            colaboraciones.colaboradores('Tom Hanks', top=top)
+        with pytest.raises(ValueError):
+            colaboraciones.pares_director_actor(top=top)
+
+
+def test_retornos_grandes_sin_perder_precision():
+    # Retornos del orden de 1e7 (presupuesto de 1 dólar), como en los datos reales de TMDB
+    df_movies = pd.DataFrame({'movie_id': [1, 2, 3], 'return': [12_345_678.37, 9_876_543.21, 0.01]})
+    df_cast = pd.DataFrame({'movie_id': [1, 2, 3], 'name': ['Actor A'] * 3})
+    df_crew = pd.DataFrame({'movie_id': [1, 2, 3], 'name': ['Director B'] * 3, 'job': ['Director'] * 3})
+    colaboraciones = GrafoColaboraciones(GrafoCreditos(df_cast, df_crew, df_movies), df_movies['return'].to_numpy())
+    fila, = colaboraciones.colaboradores('Actor A')
+    assert (fila['nombre'], fila['peliculas'], fila['retorno_total']) == ('Director B', 3, round(np.sum(df_movies['return']), 2))
+    assert fila['retorno_promedio'] == round(np.sum(df_movies['return']) / 3, 2)
+    par, = colaboraciones.pares_director_actor(min_peliculas=3)
+    assert par['retorno_total'] == fila['retorno_total']
@@ -0,0 +1,109 @@
+# Layout de los parquet procesados (etl.guardar_parquet_optimizado): filas ordenadas por la columna de
+# búsqueda también entre row groups (para que un filtro descarte grupos enteros), diccionario salvo en
+# las columnas de LAYOUT_PARQUET['sin_diccionario'] y bloom filters solo si pyarrow los soporta.
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src import etl
+from src.etl import LAYOUT_PARQUET, cargar_parquet, guardar_parquet_optimizado, normalizar_nombre
+
+FILAS_POR_GRUPO = 64
+
+
+@pytest.fixture
+def cast():
+    rng = np.random.default_rng(5)
+    n = 700
+    return pd.DataFrame({
+        'movie_id': rng.integers(0, 5000, n),
+        'name': [f'{" " * (i % 2)}Persona {i}' if i % 3 else f'PERSONA {i}' for i in rng.integers(0, 60, n)],
+        'character': [f'Personaje {i}' for i in range(n)],
+        'credit_id': [f'{i:024x}' for i in range(n)],
+        'gender': rng.integers(0, 3, n),
+        'order': rng.integers(0, 20, n),
+    })
+
+
+def _columnas(metadata, grupo=0):
+    fila = metadata.row_group(grupo)
+    return {fila.column(i).path_in_schema: fila.column(i) for i in range(fila.num_columns)}
+
+
+def test_row_groups_ordenados(cast, tmp_path):
+    ruta = str(tmp_path / 'data_cast.parquet')
+    escrito = guardar_parquet_optimizado(cast, ruta, 'cast', FILAS_POR_GRUPO)
+    metadata = pq.ParquetFile(ruta).metadata
+    assert metadata.num_row_groups == -(-len(cast) // FILAS_POR_GRUPO)
+    assert all(metadata.row_group(i).num_rows <= FILAS_POR_GRUPO for i in range(metadata.num_row_groups))
+
+    leido = cargar_parquet(ruta)
+    claves = list(zip(leido['name_norm'], leido['movie_id']))
+    assert claves == sorted(claves)
+    assert leido['name_norm'].tolist() == normalizar_nombre(leido['name']).tolist()
+    pd.testing.assert_frame_equal(leido, escrito, check_dtype=False)
+
+    # Rangos de name_norm de grupos consecutivos sin solaparse (salvo el valor del borde)
+    rangos = [(_columnas(metadata, i)['name_norm'].statistics.min, _columnas(metadata, i)['name_norm'].statistics.max)
+              for i in range(metadata.num_row_groups)]
+    assert all(maximo <= siguiente for (_, maximo), (siguiente, _) in zip(rangos, rangos[1:]))
+    orden = metadata.row_group(0).sorting_columns
+    assert [metadata.schema.column(c.column_index).name for c in orden] == ['name_norm']
+
+    # Un filtro por persona lee solo los grupos que la pueden contener
+    persona = leido['name_norm'].iloc[len(leido) // 2]
+    filtrado = cargar_parquet(ruta, filtros=[('name_norm', '==', persona)])
+    assert sorted(filtrado['movie_id']) == sorted(leido.loc[leido['name_norm'] == persona, 'movie_id'])
+    grupos = [i for i, (minimo, maximo) in enumerate(rangos) if minimo <= persona <= maximo]
+    assert 0 < len(grupos) < metadata.num_row_groups
+
+
+def test_diccionario(cast, tmp_path):
+    ruta = str(tmp_path / 'data_cast.parquet')
+    guardar_parquet_optimizado(cast, ruta, 'cast', FILAS_POR_GRUPO)
+    metadata = pq.ParquetFile(ruta).metadata
+    for grupo in range(metadata.num_row_groups):
+        for nombre, columna in _columnas(metadata, grupo).items():
+            con_diccionario = nombre not in LAYOUT_PARQUET['cast']['sin_diccionario']
+            assert columna.has_dictionary_page == con_diccionario, nombre
+            assert any('DICTIONARY' in codificacion for codificacion in columna.encodings) == con_diccionario, nombre
+
+
+def test_diccionario_en_columnas_anidadas(tmp_path):
+    movies = pd.DataFrame({
+        'movie_id': [1, 2, 3],
+        'title': ['A', 'B', 'C'],
+        'release_date': pd.to_datetime(['2001-01-01', '1999-05-05', None]),
+        'genres': [[{'id': 1, 'name': 'Drama'}], [], [{'id': 2, 'name': 'Comedy'}, {'id': 1, 'name': 'Drama'}]],
+    })
+    ruta = str(tmp_path / 'data_movies.parquet')
+    guardar_parquet_optimizado(movies, ruta, 'movies')
+    columnas = _columnas(pq.ParquetFile(ruta).metadata)
+    assert columnas['genres.list.element.name'].has_dictionary_page
+    assert not columnas['title'].has_dictionary_page and not columnas['movie_id'].has_dictionary_page
+    assert cargar_parquet(ruta)['movie_id'].tolist() == [2, 1, 3]
+
+
+@pytest.mark.parametrize('soporta', [False, True])
+def test_bloom_filters(cast, tmp_path, monkeypatch, soporta):
+    if soporta and not etl._SOPORTA_BLOOM:
+        pytest.skip('esta versión de pyarrow no escribe bloom filters')
+    monkeypatch.setattr(etl, '_SOPORTA_BLOOM', soporta)
+    escrituras = []
+    guardar = etl.guardar_parquet
+
+    def registrar(tabla, ruta, **opciones):
+        escrituras.append(opciones)
+        guardar(tabla, ruta, **opciones)
+    monkeypatch.setattr(etl, 'guardar_parquet', registrar)
+    ruta = str(tmp_path / 'data_cast.parquet')
+    escrito = guardar_parquet_optimizado(cast, ruta, 'cast', FILAS_POR_GRUPO)
+
+    assert ('bloom_filter_options' in escrituras[0]) == soporta
+    for nombre, columna in _columnas(pq.ParquetFile(ruta).metadata).items():
+        con_bloom = soporta and nombre in LAYOUT_PARQUET['cast']['bloom']
+        assert (columna.bloom_filter_offset not in (None, -1, 0)) == con_bloom, nombre
+    # Con o sin bloom filters el archivo se lee igual
+    pd.testing.assert_frame_equal(cargar_parquet(ruta), escrito, check_dtype=False)
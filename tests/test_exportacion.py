@@ -0,0 +1,190 @@
+# Exportación en streaming (src/exportacion.py): los filtros empujados al lector deben dar las mismas filas
+# que filtrar data_movies / data_cast / data_crew con pandas, las escrituras pendientes de compactar se
+# incluyen, y cada formato (con y sin gzip) se puede volver a leer.
+
+import io
+import os
+import gzip
+import json
+import fcntl
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+from src.etl import cargar_parquet, normalizar_nombre
+from src.exportacion import lotes_exportacion
+from src.ingesta import AlmacenDeltas
+
+TOKEN = 'secreto'
+ENCABEZADOS = {'Authorization': f'Bearer {TOKEN}'}
+
+
+@pytest.fixture(scope='module')
+def tablas(datos):
+    carpeta = os.path.join(datos, 'transformados_processed')
+    return {tabla: cargar_parquet(os.path.join(carpeta, f'data_{tabla}.parquet')) for tabla in ('movies', 'cast', 'crew')}
+
+
+def _exportar(directorio, tabla, **filtros):
+    return pa.Table.from_batches(list(lotes_exportacion(directorio, tabla, **filtros))).to_pandas()
+
+
+def _ids_esperados(tablas, anio_min=None, anio_max=None, mes=None, dia=None, genero=None, persona=None):
+    movies = tablas['movies']
+    filtro = pd.Series(True, index=movies.index)
+    if anio_min is not None:
+        filtro &= movies['release_date'].dt.year >= anio_min
+    if anio_max is not None:
+        filtro &= movies['release_date'].dt.year <= anio_max
+    if mes is not None:
+        filtro &= movies['release_date'].dt.month == mes
+    if dia is not None:
+        filtro &= movies['release_date'].dt.dayofweek == dia
+    if genero is not None:
+        filtro &= movies['genres'].map(lambda g: genero.lower() in {x['name'].lower() for x in g} if g is not None else False)
+    if persona is not None:
+        norm = normalizar_nombre(persona)
+        ids = pd.concat([tablas[t].loc[tablas[t]['name'].map(normalizar_nombre) == norm, 'movie_id'] for t in ('cast', 'crew')])
+        filtro &= movies['movie_id'].isin(ids)
+    return sorted(movies.loc[filtro, 'movie_id'])
+
+
+CASOS = [
+    ({}, {}),
+    ({'anio_min': 1990, 'anio_max': 1999}, {'anio_min': 1990, 'anio_max': 1999}),
+    ({'mes': 'marzo'}, {'mes': 3}),
+    ({'mes': 11, 'anio_min': 2000}, {'mes': 11, 'anio_min': 2000}),
+    ({'dia': 'lunes'}, {'dia': 0}),
+    ({'genero': 'animation'}, {'genero': 'Animation'}),
+    ({'genero': 'Drama', 'anio_max': 1995}, {'genero': 'Drama', 'anio_max': 1995}),
+    ({'persona': 'tom hanks'}, {'persona': 'Tom Hanks'}),
+    ({'persona': 'John Lasseter', 'dia': 'sabado'}, {'persona': 'John Lasseter', 'dia': 5}),
+    ({'anio_min': 2100}, {'anio_min': 2100}),
+]
+
+
+@pytest.mark.parametrize('filtros,esperado', CASOS)
+def test_filtros_de_movies_igual_a_pandas(datos, tablas, filtros, esperado):
+    exportado = _exportar(os.path.join(datos, 'transformados_processed'), 'movies', **filtros)
+    assert sorted(exportado['movie_id']) == _ids_esperados(tablas, **esperado)
+    assert list(exportado.columns) == list(tablas['movies'].columns)
+
+
+@pytest.mark.parametrize('tabla', ['cast', 'crew'])
+@pytest.mark.parametrize('filtros,esperado', [caso for caso in CASOS if 'persona' not in caso[0]])
+def test_filtros_de_creditos_igual_a_pandas(datos, tablas, tabla, filtros, esperado):
+    exportado = _exportar(os.path.join(datos, 'transformados_processed'), tabla, **filtros)
+    creditos = tablas[tabla]
+    if filtros:
+        creditos = creditos[creditos['movie_id'].isin(_ids_esperados(tablas, **esperado))]
+    assert sorted(zip(exportado['movie_id'], exportado['name'])) == sorted(zip(creditos['movie_id'], creditos['name']))
+    assert 'name_norm' not in exportado.columns
+
+
+def test_creditos_de_una_persona(datos, tablas):
+    exportado = _exportar(os.path.join(datos, 'transformados_processed'), 'crew', persona=' JOHN LASSETER ',
+                          columnas=['movie_id', 'job'])
+    crew = tablas['crew'][tablas['crew']['name'] == 'John Lasseter']
+    assert list(exportado.columns) == ['movie_id', 'job']
+    assert sorted(exportado['movie_id']) == sorted(crew['movie_id'])
+
+
+def test_parametros_invalidos(datos):
+    directorio = os.path.join(datos, 'transformados_processed')
+    for argumentos in ({'tabla': 'personas'}, {'tabla': 'movies', 'mes': 'brumario'},
+                       {'tabla': 'movies', 'dia': 'feriado'}, {'tabla': 'movies', 'columnas': ['no_existe']}):
+        with pytest.raises(ValueError):
+            lotes_exportacion(directorio, **argumentos)
+    vacio = list(lotes_exportacion(directorio, 'movies', anio_min=2100, columnas=['movie_id', 'title']))
+    assert [lote.num_rows for lote in vacio] == [0] and vacio[0].schema.names == ['movie_id', 'title']
+
+
+def _leer(formato, contenido):
+    if formato == 'ndjson':
+        return pd.DataFrame([json.loads(linea) for linea in contenido.decode('utf-8').splitlines()])
+    if formato == 'csv':
+        return pd.read_csv(io.BytesIO(contenido))
+    return pa.ipc.open_stream(contenido).read_all().to_pandas()
+
+
+@pytest.mark.parametrize('formato', ['ndjson', 'csv', 'arrow'])
+def test_formatos_y_gzip(datos, tablas, cargar_app, formato):
+    cliente = TestClient(cargar_app(datos, 'pandas').app)
+    url = f'/exportar/movies?formato={formato}&anio_min=1990&anio_max=2005&columnas=movie_id,title,budget,genres'
+    plano = cliente.get(url)
+    comprimido = cliente.get(url + '&gzip=true')
+    assert plano.status_code == comprimido.status_code == 200
+    assert 'content-encoding' not in comprimido.headers
+    assert comprimido.headers['content-type'] == 'application/gzip'
+    assert comprimido.headers['content-disposition'].endswith('.gz"')
+    assert gzip.decompress(comprimido.content) == plano.content
+
+    leido = _leer(formato, plano.content)
+    esperado = tablas['movies'].set_index('movie_id').loc[_ids_esperados(tablas, anio_min=1990, anio_max=2005)]
+    leido = leido.set_index('movie_id').sort_index()
+    assert list(leido.columns) == ['title', 'budget', 'genres']
+    assert leido['title'].tolist() == esperado['title'].tolist()
+    assert leido['budget'].tolist() == esperado['budget'].tolist()
+    generos = leido['genres'].map(json.loads) if formato == 'csv' else leido['genres']
+    assert [[g['name'] for g in lista] for lista in generos] == [[g['name'] for g in lista] for lista in esperado['genres']]
+    assert cliente.get('/exportar/movies?formato=xml').status_code == 400
+
+
+def test_incluye_escrituras_pendientes(copia_datos, cargar_app):
+    directorio = os.path.join(copia_datos, 'transformados_processed')
+    main = cargar_app(copia_datos, 'pandas', TOKEN_INGESTA=TOKEN)
+    cliente = TestClient(main.app)
+    modificada = int(main.motor.data_movies.loc[main.motor.data_movies['title'] == 'Jumanji', 'movie_id'].iloc[0])
+    cliente.post('/movies', json=[{'id': 900001, 'title': 'Pelicula Nueva', 'release_date': '2030-05-07'},
+                                  {'id': modificada, 'title': 'Jumanji 2'}], headers=ENCABEZADOS)
+    cliente.post('/creditos', json={'id': modificada, 'cast': [{'name': 'Zed Zed', 'order': 0}], 'crew': []},
+                 headers=ENCABEZADOS)
+
+    antes = {tabla: _exportar(directorio, tabla) for tabla in ('movies', 'cast', 'crew')}
+    movies = antes['movies'].set_index('movie_id')
+    assert movies.index.is_unique
+    assert movies.loc[modificada, 'title'] == 'Jumanji 2' and movies.loc[900001, 'title'] == 'Pelicula Nueva'
+    assert antes['cast'].loc[antes['cast']['movie_id'] == modificada, 'name'].tolist() == ['Zed Zed']
+    # Sin crew queda, como en el ETL, una sola fila sin nombre
+    assert antes['crew'].loc[antes['crew']['movie_id'] == modificada, 'name'].isna().tolist() == [True]
+    # Los filtros también se aplican a las filas pendientes
+    assert _exportar(directorio, 'movies', anio_min=2030)['movie_id'].tolist() == [900001]
+    assert _exportar(directorio, 'movies', persona='Zed Zed')['movie_id'].tolist() == [modificada]
+
+    assert AlmacenDeltas(directorio).compactar() == 2
+    for tabla, df in antes.items():
+        despues = _exportar(directorio, tabla)
+        clave = ['movie_id'] + (['name'] if tabla != 'movies' else [])
+        assert sorted(map(tuple, despues[clave].fillna('').to_numpy().tolist())) == \
+            sorted(map(tuple, df[clave].fillna('').to_numpy().tolist()))
+
+
+def test_compactacion_concurrente(copia_datos, cargar_app):
+    directorio = os.path.join(copia_datos, 'transformados_processed')
+    cliente = TestClient(cargar_app(copia_datos, 'pandas', TOKEN_INGESTA=TOKEN).app)
+    cliente.post('/movies', json={'id': 900002, 'title': 'Pelicula Concurrente', 'release_date': '2031-01-02'},
+                 headers=ENCABEZADOS)
+    esperado = sorted(_exportar(directorio, 'movies')['movie_id'])
+
+    # Una exportación ya preparada no ve los deltas borrados ni el parquet reemplazado por la compactación
+    lotes = lotes_exportacion(directorio, 'movies', filas_por_lote=16)
+    primero = next(lotes)
+    assert AlmacenDeltas(directorio).compactar() == 1
+    assert not [a for a in os.listdir(os.path.join(directorio, 'deltas')) if a.endswith('.parquet')]
+    exportado = pa.Table.from_batches([primero, *lotes]).column('movie_id').to_pylist()
+    assert sorted(exportado) == esperado
+
+    # Mientras una compactación tiene el candado, la exportación espera a que lo suelte
+    cliente.post('/movies', json={'id': 900003, 'title': 'Otra', 'release_date': '2032-01-02'}, headers=ENCABEZADOS)
+    resultado = {}
+    with open(os.path.join(directorio, 'deltas', '.compactacion'), 'w') as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        hilo = threading.Thread(target=lambda: resultado.update(df=_exportar(directorio, 'movies', anio_min=2031)))
+        hilo.start()
+        hilo.join(0.5)
+        assert hilo.is_alive() and not resultado
+    hilo.join(10)
+    assert sorted(resultado['df']['movie_id']) == [900002, 900003]
@@ -0,0 +1,117 @@
+# Grafo de créditos (src/grafo.py): las matrices CSR persona <-> película deben dar lo mismo que
+# desanidar credits.csv con pandas (explode) y agrupar por nombre normalizado o por movie_id.
+
+import os
+import ast
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl import cargar_parquet, normalizar_nombre
+from src.grafo import GrafoCreditos
+
+
+def _explode(credits, columna):
+    # Todos los créditos de cada lista (el ETL conserva solo el primero), una fila por crédito
+    creditos = credits[['id', columna]].assign(**{columna: credits[columna].map(ast.literal_eval)}).explode(columna)
+    creditos = creditos[creditos[columna].notna()]
+    df = pd.DataFrame({'movie_id': creditos['id'].to_numpy(dtype=np.int64),
+                       'name': creditos[columna].str.get('name').to_numpy()})
+    if columna == 'crew':
+        df['job'] = creditos[columna].str.get('job').to_numpy()
+    return df
+
+
+@pytest.fixture(scope='module')
+def tablas(datos, crudos):
+    df_movies = cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+    credits = pd.read_csv(os.path.join(crudos, 'credits.csv'))
+    return df_movies, _explode(credits, 'cast'), _explode(credits, 'crew')
+
+
+@pytest.fixture(scope='module')
+def grafo(tablas):
+    return GrafoCreditos(tablas[1], tablas[2], tablas[0])
+
+
+def _por_persona(df):
+    return df.assign(persona=normalizar_nombre(df['name'])).groupby('persona')['movie_id'] \
+        .agg(lambda ids: sorted(set(ids)))
+
+
+def _aristas(df):
+    # Aristas distintas (movie_id, persona[, job]) con nombres y jobs normalizados
+    columnas = [df['movie_id'], normalizar_nombre(df['name'])]
+    if 'job' in df.columns:
+        columnas.append(normalizar_nombre(df['job']))
+    return set(zip(*columnas))
+
+
+def test_csr_int32_en_ambos_sentidos(grafo, tablas):
+    _, df_cast, df_crew = tablas
+    for relacion, df in (('cast', df_cast), ('crew', df_crew)):
+        aristas = getattr(grafo, relacion)
+        for indptr, indices, n in ((aristas.persona_indptr, aristas.persona_indices, len(grafo.hashes)),
+                                   (aristas.pelicula_indptr, aristas.pelicula_indices, len(grafo.movie_ids))):
+            assert indptr.dtype == indices.dtype == np.int32
+            assert len(indptr) == n + 1 and indptr[0] == 0 and np.all(np.diff(indptr) >= 0)
+        # Una arista por (persona, película[, job]) distinta, contada igual en los dos sentidos
+        assert aristas.persona_indptr[-1] == aristas.pelicula_indptr[-1] == len(_aristas(df))
+        # Un sentido es la transpuesta del otro
+        personas = np.repeat(np.arange(len(grafo.hashes)), np.diff(aristas.persona_indptr))
+        peliculas = np.repeat(np.arange(len(grafo.movie_ids)), np.diff(aristas.pelicula_indptr))
+        directas = sorted(zip(personas.tolist(), aristas.persona_indices.tolist()))
+        inversas = sorted(zip(aristas.pelicula_indices.tolist(), peliculas.tolist()))
+        assert directas == inversas
+
+
+def test_tablas_internadas(grafo, tablas):
+    df_movies, df_cast, df_crew = tablas
+    nombres = pd.concat([df_cast['name'], df_crew['name']])
+    assert len(grafo.hashes) == normalizar_nombre(nombres).nunique()
+    assert np.all(np.diff(grafo.hashes) > 0) and np.all(np.diff(grafo.movie_ids) > 0)
+    assert set(grafo.movie_ids) == set(df_movies['movie_id']) | set(df_cast['movie_id']) | set(df_crew['movie_id'])
+    presentes = grafo.filas >= 0
+    np.testing.assert_array_equal(df_movies['movie_id'].to_numpy()[grafo.filas[presentes]], grafo.movie_ids[presentes])
+
+
+@pytest.mark.parametrize('relacion', ['cast', 'crew'])
+def test_peliculas_de_igual_a_explode(grafo, tablas, relacion):
+    df_movies, df_cast, df_crew = tablas
+    df = df_cast if relacion == 'cast' else df_crew
+    filas = pd.Series(np.arange(len(df_movies)), index=df_movies['movie_id'])
+    for persona, movie_ids in _por_persona(df).items():
+        assert grafo.peliculas_de(persona, relacion).tolist() == movie_ids
+        assert grafo.peliculas_de(persona.upper() + ' ', relacion).tolist() == movie_ids
+        assert grafo.filas_de(persona, relacion).tolist() == sorted(filas.reindex(movie_ids).dropna().astype(int))
+
+
+def test_peliculas_de_por_job(grafo, tablas):
+    df_crew = tablas[2]
+    directores = _por_persona(df_crew[df_crew['job'] == 'Director'])
+    assert directores['john lasseter'] == grafo.peliculas_de('John Lasseter', 'crew', job='Director').tolist()
+    for persona, movie_ids in directores.items():
+        assert grafo.peliculas_de(persona, 'crew', job=' DIRECTOR').tolist() == movie_ids
+    assert grafo.peliculas_de('John Lasseter', 'crew', job='Astronauta').tolist() == []
+    assert grafo.peliculas_de('Nadie', 'cast').tolist() == []
+
+
+@pytest.mark.parametrize('relacion', ['cast', 'crew'])
+def test_personas_de_igual_a_explode(grafo, tablas, relacion):
+    df = tablas[1] if relacion == 'cast' else tablas[2]
+    esperadas = df.assign(persona=normalizar_nombre(df['name'])).groupby('movie_id')['persona'].agg(set)
+    for movie_id, personas in esperadas.items():
+        assert set(normalizar_nombre(pd.Series(grafo.personas_de(movie_id, relacion), dtype=object))) == personas
+    assert grafo.personas_de(-1, relacion) == []
+
+
+def test_creditos_reconstruye_las_aristas(grafo, tablas):
+    _, df_cast, df_crew = tablas
+    for relacion, df in (('cast', df_cast), ('crew', df_crew)):
+        obtenido = grafo.creditos(relacion)
+        assert len(obtenido) == len(_aristas(obtenido)) and _aristas(obtenido) == _aristas(df)
+
+
+def test_nbytes_menor_que_las_tablas(grafo, tablas):
+    _, df_cast, df_crew = tablas
+    assert grafo.nbytes < (df_cast.memory_usage(deep=True).sum() + df_crew.memory_usage(deep=True).sum())
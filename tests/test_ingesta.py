@@ -0,0 +1,128 @@
+# API de ingesta (src/ingesta.py): las escrituras requieren el token, se ven en las consultas apenas
+# responden, sobreviven a un reinicio (deltas) y, una vez compactadas, también las ve el snapshot.
+
+import os
+import json
+from fastapi.testclient import TestClient
+
+from src.ingesta import AlmacenDeltas
+
+TOKEN = 'secreto'
+ENCABEZADOS = {'Authorization': f'Bearer {TOKEN}'}
+NUEVA = {'id': 900001, 'title': 'Pelicula Nueva', 'release_date': '2001-05-07', 'budget': 10_000_000,
+         'revenue': 35_000_000, 'vote_average': 7.5, 'vote_count': 3000, 'genres': [{'id': 1, 'name': 'Drama'}]}
+CREDITOS = {'id': 900001, 'cast': [{'cast_id': 0, 'character': 'c', 'credit_id': 'z', 'gender': 2, 'id': 40,
+                                    'name': 'Tom Hanks', 'order': 0, 'profile_path': None}],
+            'crew': [{'credit_id': 'w', 'department': 'Directing', 'gender': 2, 'id': 1, 'job': 'Director',
+                      'name': 'Director Nuevo', 'profile_path': None}]}
+
+
+def _cliente(cargar_app, raiz, motor='pandas'):
+    return TestClient(cargar_app(raiz, motor, TOKEN_INGESTA=TOKEN).app)
+
+
+def test_escrituras_requieren_token(copia_datos, cargar_app):
+    cliente = _cliente(cargar_app, copia_datos)
+    assert cliente.post('/movies', json=NUEVA).status_code == 401
+    assert cliente.post('/movies', json=NUEVA, headers={'Authorization': 'Bearer otro'}).status_code == 401
+    assert cliente.get('/score_titulo/Pelicula Nueva').json()['resultado'].startswith('No se encontró')
+
+    cliente = _cliente(cargar_app, copia_datos, 'duckdb')
+    assert cliente.post('/movies', json=NUEVA, headers=ENCABEZADOS).status_code == 409
+
+
+def test_registros_invalidos(copia_datos, cargar_app):
+    cliente = _cliente(cargar_app, copia_datos)
+    sin_fecha = {k: v for k, v in NUEVA.items() if k != 'release_date'}
+    assert cliente.post('/movies', json=sin_fecha, headers=ENCABEZADOS).status_code == 400
+    assert cliente.post('/movies', json=dict(NUEVA, release_date='07/05/2001'), headers=ENCABEZADOS).status_code == 400
+    assert not AlmacenDeltas(os.path.join(copia_datos, 'transformados_processed')).pendientes()
+
+
+def test_alta_y_consulta(copia_datos, cargar_app):
+    cliente = _cliente(cargar_app, copia_datos)
+    mayo = cliente.get('/cantidad_filmaciones_mes/mayo').json()['resultado']
+
+    respuesta = cliente.post('/movies', json=NUEVA, headers=ENCABEZADOS).json()['resultado']
+    assert (respuesta['insertadas'], respuesta['actualizadas']) == (1, 0)
+
+    score = cliente.get('/score_titulo/pelicula nueva').json()['resultado']
+    assert '2001' in score and '7.5' in score
+    votos = cliente.get('/votos_titulo/Pelicula Nueva').json()['resultado']
+    assert '3000' in votos
+    antes, despues = int(mayo.split()[0]), int(cliente.get('/cantidad_filmaciones_mes/mayo').json()['resultado'].split()[0])
+    assert despues == antes + 1
+
+
+def test_modificacion_parcial_conserva_los_demas_campos(copia_datos, cargar_app):
+    main = cargar_app(copia_datos, 'pandas', TOKEN_INGESTA=TOKEN)
+    cliente = TestClient(main.app)
+    fila = main.motor.data_movies.loc[main.motor.data_movies['title'] == 'Jumanji'].iloc[0]
+
+    respuesta = cliente.post('/movies', json={'id': int(fila['movie_id']), 'vote_average': 1.5}, headers=ENCABEZADOS)
+    assert respuesta.json()['resultado']['actualizadas'] == 1
+
+    nueva = main.motor.data_movies.loc[main.motor.data_movies['movie_id'] == fila['movie_id']]
+    assert len(nueva) == 1
+    nueva = nueva.iloc[0]
+    assert nueva['vote_average'] == 1.5
+    for columna in ('title', 'release_date', 'budget', 'revenue', 'vote_count', 'return', 'release_weekday'):
+        assert nueva[columna] == fila[columna], columna
+    assert list(nueva['genres']) == list(fila['genres'])
+    assert '1.5' in cliente.get('/score_titulo/Jumanji').json()['resultado']
+
+
+def test_creditos_y_consulta(copia_datos, cargar_app):
+    cliente = _cliente(cargar_app, copia_datos)
+    assert 'ha participado en 3 filmación(es)' in cliente.get('/exito_actor/Tom Hanks').json()['resultado']
+
+    cliente.post('/movies', json=NUEVA, headers=ENCABEZADOS)
+    respuesta = cliente.post('/creditos', json=CREDITOS, headers=ENCABEZADOS)
+    assert respuesta.status_code == 200
+    assert 'ha participado en 4 filmación(es)' in cliente.get('/exito_actor/Tom Hanks').json()['resultado']
+    assert 'Pelicula Nueva' in cliente.get('/exito_director/Director Nuevo').json()['resultado']
+
+
+def test_reinicio_exportacion_y_compactacion(copia_datos, cargar_app):
+    cliente = _cliente(cargar_app, copia_datos)
+    cliente.post('/movies', json=NUEVA, headers=ENCABEZADOS)
+    cliente.post('/creditos', json=CREDITOS, headers=ENCABEZADOS)
+
+    # Un proceso nuevo reaplica los deltas pendientes
+    cliente = _cliente(cargar_app, copia_datos)
+    assert '7.5' in cliente.get('/score_titulo/Pelicula Nueva').json()['resultado']
+    exportadas = [json.loads(linea) for linea in cliente.get('/exportar/movies').text.splitlines()]
+    assert [m for m in exportadas if m['movie_id'] == NUEVA['id']][0]['title'] == 'Pelicula Nueva'
+    assert len({m['movie_id'] for m in exportadas}) == len(exportadas)
+
+    assert AlmacenDeltas(os.path.join(copia_datos, 'transformados_processed')).compactar() == 2
+    assert not AlmacenDeltas(os.path.join(copia_datos, 'transformados_processed')).pendientes()
+    for motor in ('pandas', 'duckdb', 'snapshot'):
+        cliente = _cliente(cargar_app, copia_datos, motor)
+        assert '7.5' in cliente.get('/score_titulo/Pelicula Nueva').json()['resultado'], motor
+        assert 'ha participado en 4 filmación(es)' in cliente.get('/exito_actor/Tom Hanks').json()['resultado'], motor
+
+
+def test_colaboraciones_y_analitica_ven_las_escrituras(copia_datos, cargar_app):
+    cliente = _cliente(cargar_app, copia_datos)
+    futura = dict(NUEVA, release_date='2030-03-01')
+    creditos = dict(CREDITOS, cast=[dict(CREDITOS['cast'][0], name='Zed Zed')])
+    analitica = '/analitica/personas_distintas?desde=2030&hasta=2030'
+    assert cliente.get(analitica).json()['resultado']['grupos'] == []
+    assert cliente.get('/colaboradores/Zed Zed').json()['resultado'].startswith('No se encontró')
+
+    cliente.post('/movies', json=futura, headers=ENCABEZADOS)
+    cliente.post('/creditos', json=creditos, headers=ENCABEZADOS)
+
+    def verificar(cliente):
+        grupos = cliente.get(analitica).json()['resultado']['grupos']
+        assert [(g['grupo'], g['valor']) for g in grupos] == [(2030, 1)]
+        aproximados = cliente.get(analitica + '&aproximado=true').json()['resultado']['grupos']
+        assert [g['grupo'] for g in aproximados] == [2030]
+        colaboradores = cliente.get('/colaboradores/Zed Zed').json()['resultado']
+        assert [(c['nombre'], c['peliculas'], c['retorno_total']) for c in colaboradores] == \
+            [('Director Nuevo', 1, 3.5)]
+
+    verificar(cliente)
+    # Los deltas reaplicados al arrancar también se ven
+    verificar(_cliente(cargar_app, copia_datos))
@@ -0,0 +1,62 @@
+# Paridad de los motores de consulta (src/motores.py): los seis endpoints originales responden lo
+# mismo con MOTOR_CONSULTAS=pandas, duckdb y snapshot, y lo mismo que un filtro de pandas sobre
+# data_movies.
+
+import os
+from fastapi.testclient import TestClient
+
+from src.etl import cargar_parquet
+
+MOTORES = ('pandas', 'duckdb', 'snapshot')
+
+
+def _movies(raiz):
+    return cargar_parquet(os.path.join(raiz, 'transformados_processed', 'data_movies.parquet'))
+
+
+def _urls(raiz):
+    movies = _movies(raiz)
+    votada = movies.loc[movies['vote_count'] >= 2000, 'title'].iloc[0]
+    poco_votada = movies.loc[movies['vote_count'] < 2000, 'title'].iloc[0]
+    return [
+        '/cantidad_filmaciones_mes/enero', '/cantidad_filmaciones_mes/12', '/cantidad_filmaciones_mes/brumario',
+        '/cantidad_filmaciones_dia/lunes', '/cantidad_filmaciones_dia/7', '/cantidad_filmaciones_dia/feriado',
+        '/score_titulo/Toy Story', '/score_titulo/toy story', '/score_titulo/No Existe',
+        f'/votos_titulo/{votada}', f'/votos_titulo/{poco_votada}', '/votos_titulo/No Existe',
+        '/exito_actor/Tom Hanks', '/exito_actor/tom hanks', '/exito_actor/Nadie',
+        '/exito_director/John Lasseter', '/exito_director/Nadie',
+    ]
+
+
+def test_seis_endpoints_iguales_en_los_tres_motores(datos, cargar_app):
+    urls = _urls(datos)
+    respuestas = {}
+    for motor in MOTORES:
+        main = cargar_app(datos, motor)
+        assert main.estado_servicio['motor'] == motor
+        cliente = TestClient(main.app)
+        respuestas[motor] = {url: cliente.get(url).json() for url in urls}
+    for motor in ('duckdb', 'snapshot'):
+        for url in urls:
+            assert respuestas[motor][url] == respuestas['pandas'][url], (motor, url)
+
+
+def test_respuestas_coinciden_con_filtros_de_pandas(datos, cargar_app):
+    movies = _movies(datos)
+    cliente = TestClient(cargar_app(datos, 'pandas').app)
+
+    enero = int((movies['release_date'].dt.month == 1).sum())
+    assert cliente.get('/cantidad_filmaciones_mes/enero').json()['resultado'].startswith(f'{enero} ')
+    lunes = int((movies['release_date'].dt.dayofweek == 0).sum())
+    assert cliente.get('/cantidad_filmaciones_dia/lunes').json()['resultado'].startswith(f'{lunes} ')
+
+    toy_story = movies[movies['title'] == 'Toy Story'].iloc[0]
+    score = cliente.get('/score_titulo/Toy Story').json()['resultado']
+    assert str(toy_story['release_date'].year) in score and str(toy_story['vote_average']) in score
+
+    actor = cliente.get('/exito_actor/Tom Hanks').json()['resultado']
+    assert 'ha participado en 3 filmación(es)' in actor
+    crew = cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_crew.parquet'))
+    dirigidas = crew.loc[(crew['job'] == 'Director') & (crew['name'] == 'John Lasseter'), 'movie_id'].nunique()
+    director = cliente.get('/exito_director/John Lasseter').json()['resultado']
+    assert director.count('\n- ') == dirigidas == 4
@@ -0,0 +1,102 @@
+# Caché del pipeline del ETL (src/pipeline.py): una etapa se salta solo si la huella de sus entradas,
+# su código y sus parámetros no cambió desde la última ejecución.
+
+import os
+import pandas as pd
+import pytest
+
+from conftest import generar_crudos
+from src.etl import cargar_parquet
+from src.pipeline import pipeline_etl
+from src.snapshot import cargar_snapshot
+
+ETAPAS_CREDITS = {'leer_credits', 'tipar_credits', 'desanidar_creditos'}
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    crudos = generar_crudos(os.path.join(tmp_path, 'crudos_raw'), n=60)
+    return crudos, os.path.join(tmp_path, 'transformados_processed'), os.path.join(tmp_path, '.cache_etl')
+
+
+def _estados(reporte):
+    return dict(zip(reporte['etapa'], reporte['estado']))
+
+
+def test_segunda_ejecucion_sale_del_cache(rutas):
+    primera = pipeline_etl(*rutas).ejecutar()
+    assert set(primera['estado']) == {'ejecutada'}
+    assert len(primera) == 8
+
+    publicado = cargar_parquet(os.path.join(rutas[1], 'data_movies.parquet'))
+    segunda = pipeline_etl(*rutas).ejecutar()
+    assert set(segunda['estado']) == {'cache'}
+    assert segunda['clave'].tolist() == primera['clave'].tolist()
+    pd.testing.assert_frame_equal(cargar_parquet(os.path.join(rutas[1], 'data_movies.parquet')), publicado)
+
+
+def test_cambio_en_movies_reejecuta_solo_sus_etapas(rutas):
+    crudos = rutas[0]
+    pipeline_etl(*rutas).ejecutar()
+
+    ruta_movies = os.path.join(crudos, 'movies_dataset.csv')
+    movies = pd.read_csv(ruta_movies)
+    movies.loc[0, 'vote_average'] = 9.9
+    movies.to_csv(ruta_movies, index=False)
+    estados = _estados(pipeline_etl(*rutas).ejecutar())
+
+    assert {etapa for etapa, estado in estados.items() if estado == 'cache'} == ETAPAS_CREDITS
+    publicado = cargar_parquet(os.path.join(rutas[1], 'data_movies.parquet'))
+    assert publicado.loc[publicado['title'] == 'Toy Story', 'vote_average'].iloc[0] == 9.9
+
+
+def test_tocar_el_archivo_sin_cambiar_su_contenido_no_invalida(rutas):
+    pipeline_etl(*rutas).ejecutar()
+    ruta = os.path.join(rutas[0], 'credits.csv')
+    os.utime(ruta, (0, 0))
+    assert set(pipeline_etl(*rutas).ejecutar()['estado']) == {'cache'}
+
+
+def test_salida_publicada_borrada_se_regenera(rutas):
+    pipeline_etl(*rutas).ejecutar()
+    os.remove(os.path.join(rutas[1], 'data_cast.parquet'))
+    estados = _estados(pipeline_etl(*rutas).ejecutar())
+    assert estados['publicar'] == 'ejecutada'
+    assert estados['desanidar_creditos'] == 'cache'
+    assert os.path.exists(os.path.join(rutas[1], 'data_cast.parquet'))
+
+
+def test_hasta_y_forzar(rutas):
+    parcial = pipeline_etl(*rutas).ejecutar(hasta='tipar_credits')
+    assert parcial['etapa'].tolist() == ['leer_credits', 'tipar_credits']
+
+    estados = _estados(pipeline_etl(*rutas).ejecutar(forzar=['tipar_credits']))
+    assert estados['leer_credits'] == 'cache' and estados['tipar_credits'] == 'ejecutada'
+    assert estados['leer_movies'] == 'ejecutada'
+
+    assert set(pipeline_etl(*rutas).ejecutar(forzar=['*'])['estado']) == {'ejecutada'}
+    with pytest.raises(ValueError):
+        pipeline_etl(*rutas).ejecutar(hasta='no_existe')
+
+
+@pytest.mark.parametrize('etapa', ['tipar_movies', 'tipar_credits', 'transformar_movies', 'desanidar_creditos'])
+def test_etapa_con_entradas_del_cache_publica_lo_mismo(rutas, etapa):
+    pipeline_etl(*rutas).ejecutar()
+    publicados = {tabla: cargar_parquet(os.path.join(rutas[1], f'data_{tabla}.parquet'))
+                  for tabla in ('movies', 'cast', 'crew')}
+
+    estados = _estados(pipeline_etl(*rutas).ejecutar(forzar=[etapa, 'publicar']))
+    assert estados[etapa] == 'ejecutada' and estados['leer_movies'] == estados['leer_credits'] == 'cache'
+    for tabla, df in publicados.items():
+        pd.testing.assert_frame_equal(cargar_parquet(os.path.join(rutas[1], f'data_{tabla}.parquet')), df)
+
+
+def test_indice_lsh_invalida_solo_el_snapshot(rutas, monkeypatch):
+    monkeypatch.delenv('INDICE_RECOMENDACION', raising=False)
+    pipeline_etl(*rutas).ejecutar()
+    assert not cargar_snapshot(os.path.join(rutas[1], 'snapshot')).manifest['lsh']
+    monkeypatch.setenv('INDICE_RECOMENDACION', 'lsh')
+    estados = _estados(pipeline_etl(*rutas).ejecutar())
+    assert {etapa for etapa, estado in estados.items() if estado == 'ejecutada'} == {'snapshot'}
+    assert cargar_snapshot(os.path.join(rutas[1], 'snapshot')).manifest['lsh']
+    assert set(pipeline_etl(*rutas, indice='lsh').ejecutar()['estado']) == {'cache'}
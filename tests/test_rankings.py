@@ -0,0 +1,113 @@
+# Rankings (src/rankings.py): el top de cada combinación de filtros debe coincidir con un sort_values
+# del catálogo filtrado (valor descendente, desempate por fila, sin valores no finitos), y los
+# Rankings actualizados con la API de ingesta deben ser iguales a uno recién construido.
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src.etl import cargar_parquet, calcular_columnas_derivadas
+from src.rankings import DIMENSIONES_RANKING, METRICAS_RANKING, Rankings
+from src.sintetico import generar_movies
+
+K = 20
+
+
+@pytest.fixture(scope='module')
+def catalogo(datos):
+    df = cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+    df = generar_movies(df, 12, np.random.default_rng(3))
+    df['movie_id'] = np.arange(len(df))
+    df['vote_average'] = df['vote_average'].round(0)  # muchos empates
+    df.loc[df.index[::37], 'return'] = np.inf
+    df.loc[df.index[5::41], 'vote_average'] = np.nan
+    return df
+
+
+def _esperado(df, metrica, top, anio=None, genero=None, mes=None, votos_min=None):
+    columna = METRICAS_RANKING[metrica]
+    filtro = np.isfinite(df[columna].to_numpy(dtype=np.float64))
+    if anio is not None:
+        filtro &= df['release_year'] == anio
+    if mes is not None:
+        filtro &= df['release_month'] == mes
+    if genero is not None:
+        filtro &= df['genres'].map(lambda g: genero.lower() in {x['name'].lower() for x in g} if g is not None else False)
+    if votos_min:
+        filtro &= df['vote_count'] >= votos_min
+    ordenado = df[filtro].assign(fila=np.flatnonzero(filtro)).sort_values([columna, 'fila'], ascending=[False, True])
+    return ordenado['fila'].to_numpy()[:top], ordenado[columna].to_numpy(dtype=np.float64)[:top]
+
+
+FILTROS = [{}, {'anio': 1995}, {'anio': 2040}, {'mes': 3}, {'genero': 'drama'}, {'votos_min': 2000},
+           {'votos_min': 500}, {'anio': 2001, 'genero': 'Comedy'}, {'mes': 12, 'votos_min': 2000},
+           {'anio': 1990, 'mes': 6, 'genero': 'Action', 'votos_min': 100}]
+
+
+@pytest.mark.parametrize('top', [1, 10, K, 3 * K])
+@pytest.mark.parametrize('filtros', FILTROS)
+@pytest.mark.parametrize('metrica', list(METRICAS_RANKING))
+def test_top_igual_a_sort_values(catalogo, metrica, filtros, top):
+    rankings = Rankings(catalogo, k=K)
+    filas, valores = rankings.top(metrica, top, **filtros)
+    esperadas, esperados = _esperado(catalogo, metrica, top, **filtros)
+    np.testing.assert_array_equal(filas, esperadas)
+    np.testing.assert_array_equal(valores, esperados)
+
+
+def test_errores(catalogo):
+    rankings = Rankings(catalogo, k=K)
+    for argumentos in ({'metrica': 'taquilla'}, {'metrica': 'puntaje', 'genero': 'Western'},
+                       {'metrica': 'puntaje', 'mes': 'brumario'}, {'metrica': 'puntaje', 'top': 0},
+                       {'metrica': 'puntaje', 'top': -5, 'anio': 1995, 'genero': 'Drama'}):
+        with pytest.raises(ValueError):
+            rankings.top(**argumentos)
+    # La columna también sirve como nombre de la métrica
+    np.testing.assert_array_equal(rankings.top('vote_average', 5)[0], rankings.top('puntaje', 5)[0])
+
+
+def _por_nombre(rankings, dimension, grupos):
+    return {str(rankings.generos[clave]) if dimension == 'genero' else clave: filas for clave, filas in grupos.items()}
+
+
+def _mismos_rankings(a, b):
+    # Las posiciones de los géneros dependen del orden en que aparecieron: se comparan por nombre
+    for dimension in DIMENSIONES_RANKING:
+        miembros_a, miembros_b = _por_nombre(a, dimension, a.miembros[dimension]), _por_nombre(b, dimension, b.miembros[dimension])
+        assert miembros_a.keys() == miembros_b.keys(), dimension
+        for clave in miembros_b:
+            np.testing.assert_array_equal(miembros_a[clave], miembros_b[clave], err_msg=f'{dimension} {clave}')
+    assert a.tops.keys() == b.tops.keys()
+    for llave in b.tops:
+        tops_a, tops_b = _por_nombre(a, llave[0], a.tops[llave]), _por_nombre(b, llave[0], b.tops[llave])
+        assert tops_a.keys() == tops_b.keys(), llave
+        for clave in tops_b:
+            np.testing.assert_array_equal(tops_a[clave], tops_b[clave], err_msg=f'{llave} {clave}')
+    for metrica in METRICAS_RANKING:
+        np.testing.assert_array_equal(a.valores[metrica], b.valores[metrica])
+
+
+def test_actualizar_igual_a_reconstruir(catalogo):
+    rng = np.random.default_rng(0)
+    actual = catalogo.iloc[:1500].reset_index(drop=True)
+    rankings = Rankings(actual, k=K)
+    for paso in range(15):
+        filas = np.sort(rng.choice(len(actual), 4, replace=False))
+        modificadas = catalogo.iloc[rng.choice(len(catalogo), 4)].reset_index(drop=True)
+        altas = catalogo.iloc[1500 + paso * 3:1503 + paso * 3].reset_index(drop=True)
+        rankings.actualizar(np.concatenate([filas, np.arange(len(actual), len(actual) + len(altas))]),
+                            pd.concat([modificadas, altas], ignore_index=True))
+        actual = pd.concat([actual, altas], ignore_index=True)
+        actual = pd.concat([actual.drop(index=filas), modificadas.set_axis(filas)]).sort_index()
+    _mismos_rankings(rankings, Rankings(actual, k=K))
+
+
+def test_api_rechaza_top_no_positivo(datos, cargar_app):
+    cliente = TestClient(cargar_app(datos, 'pandas').app)
+    for top in (0, -1):
+        respuesta = cliente.get(f'/ranking/puntaje?top={top}&genero=Drama')
+        assert respuesta.status_code == 200
+        assert 'top debe ser un entero positivo' in respuesta.json()['resultado']
+    assert len(cliente.get('/ranking/puntaje?top=3').json()['resultado']) == 3
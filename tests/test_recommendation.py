@@ -0,0 +1,121 @@
+# Recomendador (src/recommendation.py): el IndiceLSH debe recuperar casi los mismos vecinos que el
+# IndiceExacto sobre el catálogo de prueba, los filtros de MascarasCatalogo deben dar el mismo top-k que
+# filtrar el catálogo con pandas antes de buscar, y cargar_indice no debe reutilizar un índice guardado
+# con otro catálogo.
+
+import os
+import json
+import numpy as np
+import pytest
+
+from src.etl import cargar_parquet
+from src.services import VOTOS_MINIMOS
+from src.recommendation import (IndiceExacto, IndiceLSH, MascarasCatalogo, cargar_indice, construir_caracteristicas,
+                                huella_caracteristicas, recomendacion)
+
+K = 10
+FILTROS = [{'anio_min': 2000}, {'anio_max': 1990}, {'idioma': 'FR'}, {'votos_min': VOTOS_MINIMOS},
+           {'anio_min': 1990, 'anio_max': 2010, 'idioma': 'ja'}, {'idioma': 'en', 'votos_min': 1000},
+           {'idioma': 'xx'}]
+
+
+@pytest.fixture(scope='module')
+def df_movies(datos):
+    return cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+
+
+@pytest.fixture(scope='module')
+def matriz(df_movies):
+    return construir_caracteristicas(df_movies)[0]
+
+
+def _recall(matriz, indice, k=K):
+    exacto = IndiceExacto(matriz)
+    aciertos = [len(set(exacto.buscar(fila, k)[0]) & set(indice.buscar(fila, k)[0])) / k
+                for fila in range(matriz.shape[0])]
+    return float(np.mean(aciertos))
+
+
+def _prefiltro(df_movies, anio_min=None, anio_max=None, idioma=None, votos_min=None):
+    seleccion = df_movies
+    if anio_min is not None:
+        seleccion = seleccion[seleccion['release_year'] >= anio_min]
+    if anio_max is not None:
+        seleccion = seleccion[seleccion['release_year'] <= anio_max]
+    if idioma:
+        seleccion = seleccion[seleccion['original_language'].str.lower() == idioma.lower()]
+    if votos_min is not None:
+        seleccion = seleccion[seleccion['vote_count'] >= votos_min]
+    return np.flatnonzero(df_movies.index.isin(seleccion.index))
+
+
+def test_recall_lsh(matriz):
+    # Con buckets acordes al tamaño del catálogo (160 películas) el LSH recupera casi todo el top-k exacto
+    assert _recall(matriz, IndiceLSH(matriz, bits=6, tablas=8, sondas=2)) >= 0.8
+    # Las sondas solo agregan candidatos: el recall no baja al aumentarlas
+    recalls = [_recall(matriz, IndiceLSH(matriz, bits=8, tablas=8, sondas=sondas)) for sondas in range(4)]
+    assert recalls == sorted(recalls)
+    # Con un único bit sondeado todas las películas son candidatas y el resultado es el exacto
+    assert _recall(matriz, IndiceLSH(matriz, bits=1, tablas=1, sondas=1)) == 1.0
+
+
+def test_similitudes_lsh_exactas(matriz):
+    # Los candidatos se re-ordenan con la similitud exacta: el puntaje de cada vecino es el del coseno
+    indice = IndiceLSH(matriz, bits=6, tablas=8, sondas=2)
+    for fila in range(0, matriz.shape[0], 7):
+        indices, puntajes = indice.buscar(fila, K)
+        assert fila not in indices
+        assert np.all(np.diff(puntajes) <= 0)
+        np.testing.assert_allclose(puntajes, (matriz[indices] @ matriz[fila].T).toarray().ravel(), rtol=1e-5)
+
+
+@pytest.mark.parametrize('filtros', FILTROS)
+@pytest.mark.parametrize('tipo', ['exacto', 'lsh'])
+def test_filtros_igual_a_prefiltro(df_movies, matriz, tipo, filtros):
+    indice = IndiceExacto(matriz) if tipo == 'exacto' else IndiceLSH(matriz)
+    mascaras = MascarasCatalogo(df_movies)
+    validas = _prefiltro(df_movies, **filtros)
+    for fila in range(0, len(df_movies), 9):
+        titulo = df_movies['title'].iloc[fila]
+        recomendadas = recomendacion(titulo, df_movies, indice, k=K, mascaras=mascaras, **filtros)
+        indices, puntajes = indice.buscar(fila, K, mascara=mascaras.mascara(**filtros))
+        assert recomendadas == df_movies['title'].iloc[indices].tolist()
+
+        # Top-k exacto sobre el catálogo filtrado con pandas, sin la película consultada
+        candidatas = validas[validas != fila]
+        esperados = np.sort((matriz[candidatas] @ matriz[fila].T).toarray().ravel())[::-1][:K]
+        assert len(indices) == len(esperados) == min(K, len(candidatas))
+        assert set(indices) <= set(candidatas)
+        if tipo == 'exacto':
+            # Los empates pueden resolverse con otras películas: se comparan las similitudes
+            np.testing.assert_allclose(puntajes, esperados, rtol=1e-5)
+
+
+def _huella_guardada(directorio):
+    with open(os.path.join(directorio, 'parametros.json')) as archivo:
+        return json.load(archivo)['huella']
+
+
+def test_cargar_indice_rechaza_huella_vieja(df_movies, tmp_path):
+    directorio = str(tmp_path / 'indice_lsh')
+    cargar_indice(df_movies, 'lsh', directorio)
+    huella = _huella_guardada(directorio)
+    assert huella == huella_caracteristicas(df_movies)
+
+    # Mismo catálogo: se carga con memory-map sin reconstruir
+    indice = cargar_indice(df_movies, 'lsh', directorio)
+    assert isinstance(indice.orden, np.memmap) and indice.huella == huella
+
+    # Mismas filas pero otra característica: la huella no coincide y el índice se reconstruye
+    modificado = df_movies.copy()
+    modificado.loc[modificado.index[0], 'vote_average'] = modificado['vote_average'].iloc[0] + 3
+    indice = cargar_indice(modificado, 'lsh', directorio)
+    assert not isinstance(indice.orden, np.memmap)
+    assert _huella_guardada(directorio) == huella_caracteristicas(modificado) != huella
+    np.testing.assert_allclose(indice.matriz.toarray(), construir_caracteristicas(modificado)[0].toarray(),
+                               rtol=1e-6)
+
+    # Un catálogo con otra cantidad de filas tampoco reutiliza el índice
+    indice = cargar_indice(df_movies.iloc[:-1], 'lsh', directorio)
+    assert indice.matriz.shape[0] == len(df_movies) - 1
+    assert _huella_guardada(directorio) == huella_caracteristicas(df_movies.iloc[:-1])
@@ -0,0 +1,77 @@
+# Series diarias (src/series.py): cada consulta por rango de fechas (y género) debe dar lo mismo que
+# filtrar data_movies con pandas, también después de sumar o restar películas con `actualizar`.
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl import cargar_parquet
+from src.series import SeriesDiarias
+
+RANGOS = [(None, None), ('1990-01-01', '1999-12-31'), ('1985-06-15', '1985-06-15'), ('2005-01-01', '2004-01-01'),
+          ('1900-01-01', '1979-12-31'), ('2019-01-01', '2100-01-01'), (None, '1995-03-01'), ('2000-02-29', None)]
+
+
+@pytest.fixture(scope='module')
+def movies(datos):
+    return cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+
+
+def _esperado(df, desde=None, hasta=None, genero=None):
+    fechas = pd.to_datetime(df['release_date'], errors='coerce')
+    filtro = fechas.notna()
+    if desde is not None:
+        filtro &= fechas >= pd.Timestamp(desde)
+    if hasta is not None:
+        filtro &= fechas <= pd.Timestamp(hasta)
+    if genero is not None:
+        filtro &= df['genres'].map(lambda g: genero.lower() in {x['name'].lower() for x in g} if g is not None else False)
+    sub = df[filtro]
+    cantidad = len(sub)
+    retorno = float(sub['return'].fillna(0).sum())
+    return {'cantidad': cantidad, 'retorno_total': round(retorno, 2),
+            'retorno_promedio': round(retorno / cantidad, 2) if cantidad else 0.0,
+            'presupuesto_total': int(sub['budget'].fillna(0).sum()), 'recaudacion_total': int(sub['revenue'].fillna(0).sum())}
+
+
+def _sin_rango(resultado):
+    return {k: v for k, v in resultado.items() if k not in ('desde', 'hasta', 'genero')}
+
+
+@pytest.mark.parametrize('genero', [None, 'Drama', 'animation'])
+@pytest.mark.parametrize('desde,hasta', RANGOS)
+def test_consultar_igual_a_filtro_de_pandas(movies, desde, hasta, genero):
+    series = SeriesDiarias(movies)
+    assert _sin_rango(series.consultar(desde, hasta, genero)) == _esperado(movies, desde, hasta, genero)
+
+
+def test_fechas_invalidas_y_faltantes(movies):
+    df = movies.copy()
+    df['release_date'] = df['release_date'].astype(object)
+    df.loc[:9, 'release_date'] = None
+    series = SeriesDiarias(df)
+    assert _sin_rango(series.consultar()) == _esperado(df)
+    with pytest.raises(ValueError):
+        series.consultar('1999-13-40')
+    with pytest.raises(ValueError):
+        series.consultar(genero='Western')
+
+
+def test_actualizar_igual_a_reconstruir(movies):
+    base, nuevas = movies.iloc[:120], movies.iloc[120:].copy()
+    nuevas.loc[nuevas.index[0], 'release_date'] = pd.Timestamp('2031-07-01')
+    generos = nuevas['genres'].tolist()
+    generos[1] = np.array([{'id': 99, 'name': 'Western'}], dtype=object)
+    nuevas['genres'] = pd.Series(generos, index=nuevas.index, dtype=object)
+    series = SeriesDiarias(base)
+    series.actualizar(nuevas)
+
+    completo = pd.concat([base, nuevas], ignore_index=True)
+    for desde, hasta in RANGOS + [('2030-01-01', None)]:
+        for genero in (None, 'Drama', 'Western'):
+            assert _sin_rango(series.consultar(desde, hasta, genero)) == _esperado(completo, desde, hasta, genero)
+
+    series.actualizar(nuevas, signo=-1)
+    for desde, hasta in RANGOS:
+        assert _sin_rango(series.consultar(desde, hasta, 'Comedy')) == _esperado(base, desde, hasta, 'Comedy')
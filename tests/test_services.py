@@ -0,0 +1,66 @@
+# Funciones de consulta de src/services.py: la búsqueda de personas compara siempre nombres normalizados
+# con etl.normalizar_nombre (la columna name_norm del parquet o name normalizada de la misma forma) y
+# los conteos por mes / día usan las columnas que precalcula el ETL, sin derivarlas de release_date.
+
+import os
+import pandas as pd
+import pytest
+
+from src.etl import cargar_parquet, normalizar_nombre
+from src.services import cantidad_filmaciones_dia, cantidad_filmaciones_mes, exito_actor, exito_director
+
+MOVIES = pd.DataFrame({
+    'movie_id': [1, 2, 3],
+    'title': ['Uno', 'Dos', 'Tres'],
+    'release_date': pd.to_datetime(['2000-01-03', '2001-02-04', '2002-03-05']),
+    'return': [1.5, 2.0, 0.5],
+    'budget': [10, 20, 30],
+    'revenue': [15, 40, 15],
+})
+CREDITOS = pd.DataFrame({
+    'movie_id': [1, 2, 3, 3],
+    'name': ['  Tom Hanks', 'TOM HANKS ', 'Straße Nombre', 'Otro'],
+    'job': ['Director', ' director', 'DIRECTOR', 'Producer'],
+})
+
+
+@pytest.mark.parametrize('con_name_norm', [False, True])
+@pytest.mark.parametrize('consulta,titulos', [('Tom Hanks', ['Uno', 'Dos']), (' tom hanks ', ['Uno', 'Dos']),
+                                                ('STRASSE nombre', ['Tres']), ('Otro', []), ('Nadie', [])])
+def test_personas_normalizadas(con_name_norm, consulta, titulos):
+    creditos = CREDITOS.assign(name_norm=normalizar_nombre(CREDITOS['name'])) if con_name_norm else CREDITOS
+    actor = exito_actor(consulta, creditos, MOVIES)
+    director = exito_director(consulta, creditos, MOVIES)
+    if consulta == 'Otro':
+        # Figura en crew, pero como Producer: es actor y no director
+        assert 'en 1 filmación' in actor and director.startswith('No se encontró')
+    elif titulos:
+        assert f'en {len(titulos)} filmación' in actor
+        assert [linea.split(' (')[0] for linea in director.splitlines() if linea.startswith('- ')] == \
+            [f'- {titulo}' for titulo in titulos]
+    else:
+        assert actor.startswith('No se encontró') and director.startswith('No se encontró')
+
+
+def test_mismo_resultado_con_y_sin_name_norm():
+    con_name_norm = CREDITOS.assign(name_norm=normalizar_nombre(CREDITOS['name']))
+    for funcion in (exito_actor, exito_director):
+        for consulta in ('tom hanks', 'Straße Nombre', 'otro'):
+            assert funcion(consulta, CREDITOS, MOVIES) == funcion(consulta, con_name_norm, MOVIES)
+
+
+def test_conteos_usan_las_columnas_del_etl(datos):
+    df_movies = cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+    fechas = df_movies['release_date']
+    assert cantidad_filmaciones_mes('marzo', df_movies).startswith(f'{int((fechas.dt.month == 3).sum())} ')
+    assert cantidad_filmaciones_dia('lunes', df_movies).startswith(f'{int((fechas.dt.dayofweek == 0).sum())} ')
+
+    sin_derivadas = df_movies.drop(columns=['release_month', 'release_weekday'])
+    copia = sin_derivadas.copy()
+    with pytest.raises(KeyError):
+        cantidad_filmaciones_mes('marzo', sin_derivadas)
+    with pytest.raises(KeyError):
+        cantidad_filmaciones_dia('lunes', sin_derivadas)
+    pd.testing.assert_frame_equal(sin_derivadas, copia)
+    # Un mes o día inválido se informa igual que antes
+    assert 'brumario' in cantidad_filmaciones_mes('brumario', sin_derivadas)
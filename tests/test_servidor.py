@@ -0,0 +1,124 @@
+# Servidor preforked (src/servidor.py): con el catálogo pasado a buffers Arrow (compartir_catalogo, lo
+# que hace Maestro.cargar antes del fork) todos los endpoints responden lo mismo que con el DataFrame
+# original, y un Maestro real con un worker arranca, responde /listo y recicla el worker con SIGHUP.
+
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import subprocess
+import urllib.request
+import pytest
+from fastapi.testclient import TestClient
+
+from src.servidor import Maestro, compartir_catalogo
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URLS = [
+    '/',
+    '/cantidad_filmaciones_mes/enero', '/cantidad_filmaciones_mes/brumario',
+    '/cantidad_filmaciones_dia/lunes', '/cantidad_filmaciones_dia/feriado',
+    '/score_titulo/Toy Story', '/score_titulo/toy story', '/score_titulo/No Existe',
+    '/votos_titulo/Toy Story', '/votos_titulo/Jumanji', '/votos_titulo/No Existe',
+    '/exito_actor/Tom Hanks', '/exito_actor/Nadie', '/exito_director/John Lasseter', '/exito_director/Nadie',
+    '/recomendacion/Toy Story', '/recomendacion/jumanji?anio_min=1990&anio_max=2010',
+    '/recomendacion/Toy Story?idioma=FR&votos_min=100', '/recomendacion/No Existe',
+    '/exportar/movies?genero=Drama&anio_min=1990', '/exportar/cast?persona=Tom Hanks&formato=csv',
+    '/exportar/crew?formato=arrow&mes=enero', '/exportar/peliculas',
+    '/colaboradores/Tom Hanks', '/colaboradores/Tom Hanks?rol=cast&top=3', '/colaboradores/Nadie',
+    '/actores_director/John Lasseter', '/pares_director_actor?min_peliculas=1',
+    '/estadisticas?desde=1990-01-01&hasta=2009-12-31', '/estadisticas?genero=Animation',
+    '/palabras_frecuentes', '/palabras_frecuentes?campo=overview&genero=Drama&top=5', '/palabras_frecuentes?anio=2001',
+    '/ranking/retorno', '/ranking/puntaje?genero=Drama&votos_min=2000', '/ranking/popularidad?mes=enero&top=3',
+    '/ranking/recaudacion?anio=1995', '/ranking/retorno?top=0',
+    '/analitica/personas_distintas?por=genero', '/analitica/personas_distintas?desde=1990&hasta=1999&aproximado=true',
+    '/analitica/cuantiles?metrica=presupuesto&cuantiles=0.5,0.9', '/analitica/cuantiles?por=anio&aproximado=true',
+    '/analitica/jobs_frecuentes?top=3', '/analitica/jobs_frecuentes?por=genero&aproximado=true',
+    '/analitica/promedio?metrica=puntaje&por=genero', '/analitica/promedio?desde=1995&hasta=1999&aproximado=true',
+]
+
+
+def _respuestas(app):
+    cliente = TestClient(app)
+    respuestas = {}
+    for url in URLS:
+        respuesta = cliente.get(url)
+        es_json = respuesta.headers['content-type'].startswith('application/json')
+        respuestas[url] = (respuesta.status_code, respuesta.json() if es_json else respuesta.content)
+    return respuestas
+
+
+def test_compartir_catalogo_no_cambia_los_valores(datos, cargar_app):
+    df = cargar_app(datos).data_movies
+    compartido = compartir_catalogo(df)
+    assert not (compartido.dtypes == object).any()
+    assert list(compartido.columns) == list(df.columns) and compartido.index.equals(df.index)
+    for columna in df.columns[df.dtypes == object]:
+        assert compartido[columna].tolist() == df[columna].map(
+            lambda valor: valor.tolist() if hasattr(valor, 'tolist') else valor).tolist(), columna
+
+
+def test_endpoints_iguales_con_catalogo_compartido(datos, cargar_app):
+    main = cargar_app(datos)
+    originales = _respuestas(main.app)
+    try:
+        # Lo mismo que hace el maestro antes del fork (cargar reutiliza el main ya importado)
+        Maestro(workers=1).cargar()
+    finally:
+        gc.unfreeze()
+        gc.enable()
+    assert main.data_movies is main.motor.data_movies and not (main.data_movies.dtypes == object).any()
+    compartidas = _respuestas(main.app)
+    for url in URLS:
+        assert compartidas[url] == originales[url], url
+
+
+def _puerto_libre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _listo(base, proceso, espera=60, distinto_de=None):
+    # Espera a que responda /listo (y, si se indica, un worker distinto al anterior)
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        assert proceso.poll() is None, proceso.stderr.read().decode()
+        try:
+            with urllib.request.urlopen(f'{base}/listo', timeout=5) as respuesta:
+                estado = json.load(respuesta)
+            if estado['pid'] != distinto_de:
+                return estado
+        except OSError:
+            pass
+        time.sleep(0.2)
+    pytest.fail(f'El servidor no respondió /listo en {espera} s.')
+
+
+def test_maestro_con_un_worker(datos):
+    puerto = _puerto_libre()
+    base = f'http://127.0.0.1:{puerto}'
+    entorno = {**os.environ, 'MOTOR_CONSULTAS': 'pandas', 'PYTHONPATH': RAIZ}
+    proceso = subprocess.Popen([sys.executable, '-m', 'src.servidor', '--workers', '1', '--host', '127.0.0.1',
+                                '--puerto', str(puerto), '--espera-cierre', '5'],
+                               cwd=datos, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        estado = _listo(base, proceso)
+        assert estado['listo'] and estado['motor'] == 'pandas' and estado['pid'] != proceso.pid
+        with urllib.request.urlopen(f'{base}/score_titulo/Toy%20Story', timeout=5) as respuesta:
+            assert 'Toy Story' in json.load(respuesta)['resultado']
+
+        # SIGHUP recicla el worker: el maestro lanza otro fork y sigue atendiendo
+        proceso.send_signal(signal.SIGHUP)
+        assert _listo(base, proceso, distinto_de=estado['pid'])['listo']
+
+        proceso.send_signal(signal.SIGTERM)
+        assert proceso.wait(timeout=30) == 0
+    finally:
+        if proceso.poll() is None:
+            proceso.kill()
+            proceso.wait()
+        proceso.stderr.close()
@@ -0,0 +1,136 @@
+# Snapshot binario de la API (src/snapshot.py): lo que carga cargar_snapshot con memory-map debe ser
+# igual a lo que se construye en memoria desde las tablas del ETL, y un snapshot dañado no se carga.
+
+import os
+import json
+import numpy as np
+import pytest
+
+from src.etl import cargar_parquet
+from src.grafo import GrafoCreditos
+from src.colaboraciones import GrafoColaboraciones
+from src.series import SeriesDiarias
+from src.rankings import Rankings
+from src.recommendation import IndiceExacto, IndiceLSH, construir_caracteristicas
+from src.snapshot import VERSIONES_CONSERVADAS, cargar_snapshot, construir_snapshot
+
+
+@pytest.fixture(scope='module')
+def tablas(datos):
+    carpeta = os.path.join(datos, 'transformados_processed')
+    return tuple(cargar_parquet(os.path.join(carpeta, f'data_{tabla}.parquet')) for tabla in ('movies', 'cast', 'crew'))
+
+
+@pytest.fixture
+def directorio(tablas, tmp_path, monkeypatch):
+    monkeypatch.delenv('INDICE_RECOMENDACION', raising=False)
+    construir_snapshot(*tablas, directorio=str(tmp_path))
+    return str(tmp_path)
+
+
+def _iguales(a, b):
+    assert a.keys() == b.keys()
+    for nombre in a:
+        np.testing.assert_array_equal(np.asarray(a[nombre]), np.asarray(b[nombre]), err_msg=nombre)
+
+
+def test_ida_y_vuelta(tablas, directorio):
+    df_movies, df_cast, df_crew = tablas
+    snapshot = cargar_snapshot(directorio, verificar=True)
+
+    assert snapshot.manifest['filas'] == len(df_movies)
+    assert snapshot.movies.column('movie_id').to_pylist() == df_movies['movie_id'].tolist()
+    assert snapshot.fila_titulo('TOY STORY') == df_movies.index[df_movies['title'] == 'Toy Story'][0]
+    assert snapshot.fila_titulo('No Existe') == -1
+    np.testing.assert_array_equal(snapshot.histograma_mes, np.bincount(df_movies['release_month'], minlength=13))
+    np.testing.assert_array_equal(snapshot.histograma_dia, np.bincount(df_movies['release_weekday'], minlength=8))
+
+    grafo = GrafoCreditos(df_cast, df_crew, df_movies)
+    _iguales(snapshot.colaboraciones.arreglos(), GrafoColaboraciones(grafo, df_movies['return'].to_numpy()).arreglos())
+    _iguales(snapshot.series.arreglos(), SeriesDiarias(df_movies).arreglos())
+    _iguales(snapshot.rankings.arreglos(), Rankings(df_movies).arreglos())
+    _iguales(snapshot.texto.arreglos(), construir_caracteristicas(df_movies)[1]['texto'].arreglos())
+
+
+def test_consultas_sobre_el_snapshot(tablas, directorio):
+    df_movies = tablas[0]
+    snapshot = cargar_snapshot(directorio)
+    assert snapshot.rankings.top('vote_average', 5, anio=2000) == Rankings(df_movies).top('vote_average', 5, anio=2000)
+    assert snapshot.series.consultar('1990-01-01', '1999-12-31') == \
+        SeriesDiarias(df_movies).consultar('1990-01-01', '1999-12-31')
+    columnas = snapshot.filas_movies([0, 2], ['title', 'vote_count'])
+    assert columnas['title'].tolist() == df_movies['title'].iloc[[0, 2]].tolist()
+
+
+def _ruta_actual(directorio):
+    with open(os.path.join(directorio, 'ACTUAL')) as archivo:
+        return os.path.join(directorio, archivo.read().strip())
+
+
+def test_checksum_invalido(directorio):
+    ruta = os.path.join(_ruta_actual(directorio), 'histograma_mes.npy')
+    with open(ruta, 'r+b') as archivo:
+        archivo.seek(-1, os.SEEK_END)
+        ultimo = archivo.read(1)
+        archivo.seek(-1, os.SEEK_END)
+        archivo.write(bytes([ultimo[0] ^ 0xFF]))
+    cargar_snapshot(directorio)
+    with pytest.raises(ValueError, match='Checksum'):
+        cargar_snapshot(directorio, verificar=True)
+
+
+@pytest.mark.parametrize('dano', ['truncado', 'faltante'])
+def test_archivo_truncado_o_faltante(directorio, dano):
+    ruta = os.path.join(_ruta_actual(directorio), 'series', os.listdir(os.path.join(_ruta_actual(directorio), 'series'))[0])
+    if dano == 'truncado':
+        with open(ruta, 'r+b') as archivo:
+            archivo.truncate(os.path.getsize(ruta) - 8)
+    else:
+        os.remove(ruta)
+    with pytest.raises(ValueError, match='incompleto'):
+        cargar_snapshot(directorio)
+
+
+def test_formato_viejo(directorio):
+    ruta = os.path.join(_ruta_actual(directorio), 'manifest.json')
+    with open(ruta, encoding='utf-8') as archivo:
+        manifest = json.load(archivo)
+    manifest['formato'] -= 1
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(manifest, archivo)
+    with pytest.raises(ValueError, match='Formato'):
+        cargar_snapshot(directorio)
+
+
+def test_versiones_conservadas(tablas, directorio):
+    rutas = [construir_snapshot(*tablas, directorio=directorio) for _ in range(VERSIONES_CONSERVADAS + 1)]
+    versiones = sorted(v for v in os.listdir(directorio) if os.path.isdir(os.path.join(directorio, v)))
+    assert len(versiones) == VERSIONES_CONSERVADAS
+    assert _ruta_actual(directorio) == rutas[-1]
+    _iguales(cargar_snapshot(directorio).rankings.arreglos(), Rankings(tablas[0]).arreglos())
+
+
+def test_rankings_no_dependen_del_snapshot_anterior(tablas, directorio):
+    # Un snapshot nuevo se construye solo desde su catálogo: alterar los top del vigente no lo afecta
+    ruta = os.path.join(_ruta_actual(directorio), 'rankings', 'top_todos_puntaje_0_filas.npy')
+    filas = np.load(ruta)
+    np.save(ruta, np.arange(len(filas), dtype=filas.dtype))
+    construir_snapshot(*tablas, directorio=directorio)
+    _iguales(cargar_snapshot(directorio).rankings.arreglos(), Rankings(tablas[0]).arreglos())
+
+
+def test_indice_lsh(tablas, directorio, tmp_path_factory, monkeypatch):
+    # Pedir LSH a un snapshot generado sin él es un error, no una vuelta silenciosa al índice exacto
+    with pytest.raises(ValueError, match='IndiceLSH'):
+        cargar_snapshot(directorio, tipo_indice='lsh')
+    monkeypatch.setenv('INDICE_RECOMENDACION', 'lsh')
+    with pytest.raises(ValueError, match='IndiceLSH'):
+        cargar_snapshot(directorio)
+    # Sin lsh explícito se sigue la variable de entorno (como en la compactación de la API de ingesta)
+    con_lsh = str(tmp_path_factory.mktemp('snapshot_lsh'))
+    construir_snapshot(*tablas, directorio=con_lsh)
+    snapshot = cargar_snapshot(con_lsh, verificar=True)
+    assert snapshot.manifest['lsh'] and isinstance(snapshot.indice, IndiceLSH)
+    assert isinstance(cargar_snapshot(con_lsh, tipo_indice='exacto').indice, IndiceExacto)
+    with pytest.raises(ValueError, match='no soportado'):
+        cargar_snapshot(con_lsh, tipo_indice='hnsw')
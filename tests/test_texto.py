@@ -0,0 +1,52 @@
+# Índice de texto (src/texto.py): los agregados que `actualizar` corrige de forma incremental deben ser
+# iguales a recalcularlos desde los conteos, y palabras_frecuentes debe dar lo mismo en ambos casos.
+
+import os
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.etl import cargar_parquet
+from src.texto import IndiceTexto
+
+
+@pytest.fixture(scope='module')
+def movies(datos):
+    return cargar_parquet(os.path.join(datos, 'transformados_processed', 'data_movies.parquet'))
+
+
+def _por_anio(indice, campo):
+    matriz = indice.por_anio[campo]
+    return {int(anio): matriz[fila].toarray().ravel() for anio, fila in indice._posicion_anio.items()
+            if matriz[fila].nnz}
+
+
+def test_actualizar_igual_a_recalcular(movies):
+    rng = np.random.default_rng(4)
+    base = movies.iloc[:130].reset_index(drop=True)
+    indice = IndiceTexto().ajustar(base)
+
+    filas = np.sort(rng.choice(len(base), 10, replace=False))
+    modificadas = movies.iloc[rng.choice(len(movies), 10)].reset_index(drop=True)
+    modificadas.loc[0, 'release_year'] = 2031
+    altas = movies.iloc[130:].reset_index(drop=True)
+    indice.actualizar(np.concatenate([filas, np.arange(len(base), len(base) + len(altas))]),
+                      pd.concat([modificadas, altas], ignore_index=True))
+
+    recalculado = copy.deepcopy(indice)
+    recalculado._agregar()
+    for campo in indice.campos:
+        np.testing.assert_array_equal(indice.frecuencias[campo], recalculado.frecuencias[campo])
+        assert (indice.por_genero[campo] != recalculado.por_genero[campo]).nnz == 0
+        obtenido, esperado = _por_anio(indice, campo), _por_anio(recalculado, campo)
+        assert obtenido.keys() == esperado.keys()
+        for anio in esperado:
+            np.testing.assert_array_equal(obtenido[anio], esperado[anio], err_msg=f'{campo} {anio}')
+
+    consultas = [{}, {'anio': 2031}, {'anio': int(base['release_year'].iloc[filas[0]])}, {'genero': 'Drama'},
+                 {'anio': int(altas['release_year'].iloc[0]), 'genero': 'Comedy'}]
+    for campo in indice.campos:
+        for filtros in consultas:
+            assert indice.palabras_frecuentes(50, campo, **filtros) == recalculado.palabras_frecuentes(50, campo, **filtros)
+    assert indice.palabras_frecuentes(5, 'title', anio=2031)